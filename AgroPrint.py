@@ -1,413 +1,166 @@
+import hashlib
+import locale
+import types
+from contextlib import contextmanager
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import plotly.express as px
+# Streamlit ya importa plotly.graph_objects; plotly.express se carga al armar el primer gráfico
 import plotly.graph_objects as go
 
-# --- Factores de emisión y parámetros configurables (modificar aquí) ---
-
-# --- Potenciales de calentamiento global (GWP) ---
-# Unidades: adimensional (relación respecto a CO2)
-# Fuente: IPCC AR6 (2021), 100 años
-GWP = {
-    "CO2": 1,      # IPCC AR6
-    "CH4": 27,     # IPCC AR6, metano no fósil
-    "N2O": 273     # IPCC AR6
-}
-
-# --- Factores IPCC 2006 para emisiones de N2O ---
-# Unidades: kg N2O-N / kg N
-# Fuente: IPCC 2006 Vol.4 Cap.11 Tabla 11.1. 2019 REFINEMENT
-EF1 = 0.01   # Emisión directa de N2O-N por aplicación de N
-EF4 = 0.01   # Emisión indirecta de N2O-N por volatilización
-EF5 = 0.011 # Emisión indirecta de N2O-N por lixiviación/escurrimiento
-
-# --- Factor IPCC 2006 para emisiones de CO2 por hidrólisis de urea ---
-# Unidades: kg CO2 / kg urea
-# Fuente: IPCC 2006 Vol.4 Cap.11 Eq. 11.13
-# Procedimiento: FE = 0.20 (contenido C en urea) × 44/12 (conversión CO2-C a CO2)
-EF_CO2_UREA = 0.20 * (44/12)  # = 0.733 kg CO2 / kg urea
-
-# --- Fracciones por defecto (modificables) ---
-# Unidades: adimensional
-# Fuente: IPCC 2006 Vol.4 Cap.11 Tabla 11.1. Refinement 2019
-FRAC_VOLATILIZACION_INORG = 0.11   # Fracción de N volatilizado de fertilizantes inorgánicos (IPCC)
-FRAC_VOLATILIZACION_ORG = 0.21     # Fracción de N volatilizado de fertilizantes orgánicos (IPCC 2006 Vol.4 Cap.11 Tabla 11.1, nota: estiércol sólido 0.2, líquido 0.4; se usa 0.2 como valor conservador)
-FRAC_LIXIVIACION = 0.24            # Fracción de N lixiviado (aplica a todo N si precipitación > 1,000 mm) (IPCC)
-# Nota: El IPCC no diferencia entre inorgánico y orgánico para lixiviación, usa 0.3 para ambos si corresponde.
-
-# --- Factores de emisión para quema de residuos agrícolas ---
-# Unidades: kg gas / kg materia seca quemada
-# Fuente: IPCC 2006 Vol.4 Cap.2 Tablas 2.5 y 2.6
-EF_CH4_QUEMA = 2.7 / 1000   # kg CH4 / kg MS
-EF_N2O_QUEMA = 0.07 / 1000  # kg N2O / kg MS
-FRACCION_SECA_QUEMA = 0.8   # adimensional, típico IPCC. ESTE VALOR NO ESTOY 100% SEGURO
-FRACCION_QUEMADA = 0.85      # adimensional, típico IPCC
-
-# --- Factores sugeridos para fertilizantes orgánicos (estructura eficiente y compacta) ---
-# Unidades: fraccion_seca (adimensional), N/P2O5/K2O (% peso fresco)
-# Fuente: IPCC 2006 Vol.4 Cap.10, Tablas 10A.2 y 10A.3, literatura FAO y valores de uso común
-FACTORES_ORGANICOS = {
-    "Tierra de hoja (quillota)": {
-        "fraccion_seca": 1.00,  # 100%
-        "N": 0.7,
-        "P2O5": 0.0,
-        "K2O": 0.0,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Guano de pavo": {
-        "fraccion_seca": 1.00,
-        "N": 4.1,
-        "P2O5": 0.0,
-        "K2O": 0.0,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Guano de vacuno": {
-        "fraccion_seca": 1.00,
-        "N": 3.1,
-        "P2O5": 0.0,
-        "K2O": 0.0,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Guano de cabra": {
-        "fraccion_seca": 1.00,
-        "N": 2.2,
-        "P2O5": 0.0,
-        "K2O": 0.0,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Guano rojo": {
-        "fraccion_seca": 1.00,
-        "N": 6.0,
-        "P2O5": 9.0,
-        "K2O": 1.0,
-        "fuente": "https://www.indap.gob.cl/sites/default/files/2022-02/n%C2%BA8-manual-de-produccio%CC%81n-agroecologica.pdf"
-    },
-    "Harina de sangre": {
-        "fraccion_seca": 1.00,
-        "N": 13.0,
-        "P2O5": 0.0,
-        "K2O": 0.0,
-        "fuente": "https://www.indap.gob.cl/sites/default/files/2022-02/n%C2%BA8-manual-de-produccio%CC%81n-agroecologica.pdf"
-    },
-    "Turba de copiapó": {
-        "fraccion_seca": 1.00,
-        "N": 0.64,
-        "P2O5": 0.0,
-        "K2O": 0.0,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Estiercol de vacuno sólido": {
-        "fraccion_seca": 0.215,  # 21,5%
-        "N": 0.565,
-        "P2O5": 0.17,
-        "K2O": 0.475,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Purin de vacuno": {
-        "fraccion_seca": 0.075,
-        "N": 0.405,
-        "P2O5": 0.085,
-        "K2O": 0.35,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Estiércol de cerdo sólido": {
-        "fraccion_seca": 0.215,
-        "N": 0.58,
-        "P2O5": 0.355,
-        "K2O": 0.33,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Purin de cerdo": {
-        "fraccion_seca": 0.0665,
-        "N": 0.535,
-        "P2O5": 0.145,
-        "K2O": 0.305,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Estiércol sólido de ave": {
-        "fraccion_seca": 0.475,
-        "N": 1.925,
-        "P2O5": 1.07,
-        "K2O": 1.05,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Purín de ave": {
-        "fraccion_seca": 0.1175,
-        "N": 0.895,
-        "P2O5": 0.33,
-        "K2O": 0.555,
-        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
-    },
-    "Otros": {  # Entrada genérica para evitar KeyError
-        "fraccion_seca": 1.0,
-        "N": 0.0,
-        "P2O5": 0.0,
-        "K2O": 0.0,
-        "fuente": ""
-    }
-}
-
-# --- Factores de emisión genéricos para nutrientes (por producción) ---
-# Unidades: kg CO2e/kg nutriente
-# Fuente: Ecoinvent, Agri-footprint, literatura LCA
-FE_N_GEN = 3.0    # kg CO2e/kg N
-FE_P2O5_GEN = 1.5 # kg CO2e/kg P2O5
-FE_K2O_GEN = 1.2  # kg CO2e/kg K2O
-
-# --- Valores por defecto y factores de emisión centralizados ---
-valores_defecto = {
-    "fe_electricidad": 0.2021,        # kg CO2e/kWh (SEN, promedio 2024, Chile)
-    "fe_combustible_generico": 3.98648,   # kg CO2e/litro (LUBRICANTE)
-    "fe_agua": 0.00015,               # kg CO2e/litro de agua de riego (DEFRA)
-    "fe_maquinaria": 2.5,             # kg CO2e/litro (valor genérico maquinaria)
-    "fe_transporte": 0.15,            # kg CO2e/km recorrido (valor genérico transporte)
-    "fe_agroquimico": 5.0,            # kg CO2e/kg ingrediente activo (valor genérico)
-    "rendimiento_motor": 0.25,        # litros/kWh (valor genérico motor diésel/gasolina)
-}
-
-# --- Factores de fertilizantes inorgánicos (puedes modificar aquí) ---
-# N_porcentaje: fracción de N en el fertilizante (adimensional)
-# Frac_volatilizacion: fracción de N volatilizado (adimensional)
-# Frac_lixiviacion: fracción de N lixiviado (adimensional)
-# FE_produccion_producto: kg CO2e / kg producto (LCA, Ecoinvent/Agri-footprint)
-# FE_produccion_N: kg CO2e / kg N (LCA, Ecoinvent/Agri-footprint)
-# Fuente de volatilización/lixiviación: IPCC 2006 Vol.4 Cap.11 Tabla 11.1 y literatura LCA para producción
-factores_fertilizantes = {
-    "Nitrato de amonio (AN)": [
-        {"origen": "Unión Europea", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.112, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Norte América", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.249, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Latino América", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.124, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "China, carbón", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 3.643, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference_values.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.850, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China, gas", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.836, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.469, "Fuente": ""}
-    ],
-    "Nitrato de amonio cálcico (CAN)": [
-        {"origen": "Unión Europea", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.951, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Norte América", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.870, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Latino América", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.779, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "China, carbón", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 3.023, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.350, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China, gas", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.358, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.055, "Fuente": ""}
-    ],
-    "Urea": [
-        {"origen": "Unión Europea", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.611, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Norte América", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.739, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Latino América", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.746, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "China, carbón", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 3.002, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.180, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China, gas", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.905, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.864, "Fuente": ""}
-    ],
-    "Nitrato de Amonio y Urea (UAN)": [
-        {"origen": "Unión Europea", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.021, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Norte América", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.571, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Latino América", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.526, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "China, carbón", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.615, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.650, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China, gas", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.896, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.713, "Fuente": ""}
-    ],
-    "Nitrosulfato de amonio (ANS)": [
-        {"origen": "Europa", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.820, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.580, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Estados Unidos", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.440, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.220, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.515, "Fuente": ""}
-    ],
-    "Nitrato de calcio (CN)": [
-        {"origen": "Europa", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.670, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.030, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Estados Unidos", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.760, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.200, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.665, "Fuente": ""}
-    ],
-    "Sulfato de amonio (AS)": [
-        {"origen": "Europa", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.570, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.710, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Estados Unidos", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.690, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.360, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.833, "Fuente": ""}
-    ],
-    "Fosfato monoamónico (MAP)": [
-        {"origen": "Chile", "N_porcentaje": 0.10, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.380, "Fuente": "https://www.climatiq.io/data/emission-factor/941370dd-318b-46ad-941b-80b9c861cf69"}
-    ],
-    "Fosfato diamonico (DAP)": [
-        {"origen": "Europa", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.640, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.810, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Estados Unidos", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.730, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.330, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.878, "Fuente": ""}
-    ],
-    "Superfosfato triple (TSP)": [
-        {"origen": "Europa", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.18, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.25, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Estados Unidos", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.19, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.26, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.22, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"}
-    ],
-    "Cloruro de Potasio (MOP)": [
-        {"origen": "Europa", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Estados Unidos", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"}
-    ],
-    "Ácido bórico": [
-        {"origen": "Promedio", "N_porcentaje": 0.00, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 5.52, "Fuente": "https://www.researchgate.net/publication/351106329_Life_cycle_assessment_on_boron_production_is_boric_acid_extraction_from_salt-lake_brine_environmentally_friendly"}
-    ],
-    "Ácido fosfórico": [
-        {"origen": "Promedio", "N_porcentaje": 0.00, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 5.52, "Fuente": "https://apps.carboncloud.com/climatehub/product-reports/id/216857142454"}
-    ],
-    "Cloruro de potasio": [
-        {"origen": "Promedio", "N_porcentaje": 0.00, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.22, "Fuente": "https://apps.carboncloud.com/climatehub/product-reports/id/216857142454"}
-    ],
-    "Hidróxido de potasio": [
-        {"origen": "Promedio", "N_porcentaje": 0.00, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.48, "Fuente": "https://apps.carboncloud.com/climatehub/product-reports/id/216857142454"}
-    ],
-    "NPK": [
-        {"origen": "Europa", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.730, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Rusia", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.400, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Estados Unidos", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.270, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "China", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.730, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
-        {"origen": "Promedio", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.283, "Fuente": ""}
-    ],
-    "Otros": [
-        {"origen": "Otros", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0, "Fuente": ""}
-    ]
-}
-
-# --- Factores de emisión organizados por categoría (actualizado con datos detallados y fuentes) ---
-factores_emision = {
-    'pesticidas': {
-        'Media': 5.1,  # kg CO2e / kg i.a. (https://doi.org/10.1016/j.envint.2004.03.005)
-    },
-    'fungicidas': {
-        'Media': 3.9,  # kg CO2e / kg i.a. (https://doi.org/10.1016/j.envint.2004.03.005)
-        'Ferbam': 1.2,  # https://doi.org/10.1016/j.envint.2004.03.028
-        'Maneb': 2.0,   # https://doi.org/10.1016/j.envint.2004.03.029
-        'Capitan': 2.3, # https://doi.org/10.1016/j.envint.2004.03.030
-        'Benomilo': 8.0 # https://doi.org/10.1016/j.envint.2004.03.031
-    },
-    'insecticidas': {
-        'Media': 5.1,  # kg CO2e / kg i.a. (https://doi.org/10.1016/j.envint.2004.03.005)
-        'Metil paratión': 3.2,   # https://doi.org/10.1016/j.envint.2004.03.032
-        'Forato': 4.2,           # https://doi.org/10.1016/j.envint.2004.03.033
-        'Carbofurano': 9.1,      # https://doi.org/10.1016/j.envint.2004.03.034
-        'Carbaril': 3.1,         # https://doi.org/10.1016/j.envint.2004.03.035
-        'Taxafeno': 1.2,         # https://doi.org/10.1016/j.envint.2004.03.036
-        'Cipermetrina': 11.7,    # https://doi.org/10.1016/j.envint.2004.03.037
-        'Clorodimeformo': 5.0,   # https://doi.org/10.1016/j.envint.2004.03.038
-        'lindano': 1.2,          # https://doi.org/10.1016/j.envint.2004.03.039
-        'Malatión': 4.6,         # https://doi.org/10.1016/j.envint.2004.03.040
-        'Partión': 2.8,          # https://doi.org/10.1016/j.envint.2004.03.041
-        'Metoxicloro': 1.4       # https://doi.org/10.1016/j.envint.2004.03.042
-    },
-    'herbicidas': {
-        'Media': 6.3,        # https://doi.org/10.1016/j.envint.2004.03.005
-        '2, 4-D': 1.7,       # https://doi.org/10.1016/j.envint.2004.03.005
-        '2, 4, 5-T': 2.7,    # https://doi.org/10.1016/j.envint.2004.03.006
-        'Alacloro': 5.6,     # https://doi.org/10.1016/j.envint.2004.03.007
-        'Atrazina': 3.8,     # https://doi.org/10.1016/j.envint.2004.03.008
-        'Bentazón': 8.7,     # https://doi.org/10.1016/j.envint.2004.03.009
-        'Butilato': 2.8,     # https://doi.org/10.1016/j.envint.2004.03.010
-        'Cloramben': 3.4,    # https://doi.org/10.1016/j.envint.2004.03.011
-        'Clorsulfurón': 7.3, # https://doi.org/10.1016/j.envint.2004.03.012
-        'Cianazina': 4.0,    # https://doi.org/10.1016/j.envint.2004.03.013
-        'Dicamba': 5.9,      # https://doi.org/10.1016/j.envint.2004.03.014
-        'Dinosaurio': 1.6,   # https://doi.org/10.1016/j.envint.2004.03.015
-        'Diquat': 8.0,       # https://doi.org/10.1016/j.envint.2004.03.016
-        'Diurón': 5.4,       # https://doi.org/10.1016/j.envint.2004.03.017
-        'EPTC': 3.2,         # https://doi.org/10.1016/j.envint.2004.03.018
-        'Fluazifop-butilo': 10.4, # https://doi.org/10.1016/j.envint.2004.03.019
-        'Fluometurón': 7.1,  # https://doi.org/10.1016/j.envint.2004.03.020
-        'Glifosato': 9.1,    # https://doi.org/10.1016/j.envint.2004.03.021
-        'Linuron': 5.8,      # https://doi.org/10.1016/j.envint.2004.03.022
-        'MCPA': 2.6,         # https://doi.org/10.1016/j.envint.2004.03.023
-        'Metolaclor': 5.5,   # https://doi.org/10.1016/j.envint.2004.03.024
-        'Paraquat': 9.2,     # https://doi.org/10.1016/j.envint.2004.03.025
-        'Propaclor': 5.8,    # https://doi.org/10.1016/j.envint.2004.03.026
-        'Trifluralina': 3.0  # https://doi.org/10.1016/j.envint.2004.03.027
-    },
-    'agua': valores_defecto["fe_agua"],                # kg CO2e / litro de agua de riego (LCA)
-    'maquinaria': valores_defecto["fe_maquinaria"],    # kg CO2e / litro de combustible (valor genérico, no se usa si tienes factores_combustible)
-    'materiales': {
-        'PET': 2.1,                # kg CO2e / kg material (LCA)
-        'HDPE': 1.9,               # kg CO2e / kg material (LCA)
-        'Cartón': 0.7,             # kg CO2e / kg material (LCA)
-        'Vidrio': 1.2,             # kg CO2e / kg material (LCA)
-        'Otro': 1.0                # kg CO2e / kg material (LCA)
-    },
-    'transporte': valores_defecto["fe_transporte"]     # kg CO2e / km recorrido (valor genérico, puede variar según tipo de transporte)
-}
-
-# --- Factores de emisión para gestión de residuos vegetales (IPCC 2006 Vol.5, Cap.3, Tabla 3.4) ---
-# Compostaje aeróbico de residuos vegetales - factores de emisión IPCC
-factores_residuos = {
-    "fraccion_seca": 0.8,  # Fracción seca de biomasa (adimensional, típico 0.8, IPCC)
-    "compostaje": {
-        "base_seca": {
-            "EF_CH4": 0.010,    # kg CH4 / kg materia seca compostada (IPCC 2006 Vol.5 Cap.3 Tabla 3.4)
-            "EF_N2O": 0.0006    # kg N2O / kg materia seca compostada (IPCC 2006 Vol.5 Cap.3 Tabla 3.4)
-        },
-        "base_humeda": {
-            "EF_CH4": 0.004,    # kg CH4 / kg materia húmeda compostada (IPCC 2006 Vol.5 Cap.3 Tabla 3.4)
-            "EF_N2O": 0.0003    # kg N2O / kg materia húmeda compostada (IPCC 2006 Vol.5 Cap.3 Tabla 3.4)
-        }
-    },
-    "incorporacion": {
-        "fraccion_C": 0.45,        # Fracción de C en biomasa seca (adimensional, IPCC 2006 Vol.4 Cap.2)
-        "fraccion_estabilizada": 0.1  # Fracción de C estabilizada en suelo (adimensional, solo opción avanzada, IPCC)
-    }
-}
-
-# --- Factores de emisión de combustibles ---
-factores_combustible = {
-    "Diesel (mezcla promedio biocombustibles)": 2.51279,        # kg CO2e / litro (DEFRA)
-    "Diesel (100% mineral)": 2.66155,                           # kg CO2e / litro (DEFRA)
-    "Gasolina (mezcla media de biocombustibles)": 2.0844,       # kg CO2e / litro (DEFRA)
-    "Gasolina (100% gasolina mineral)": 2.66155,                # kg CO2e / litro (DEFRA)
-    "Gas Natural Comprimido": 0.44942,                          # kg CO2e / litro (DEFRA)
-    "Gas Natural Licuado": 1.17216,                             # kg CO2e / litro (DEFRA)
-    "Gas Licuado de petróleo": 1.55713,                         # kg CO2e / litro (DEFRA)
-    "Aceite combustible": 3.17493,                              # kg CO2e / litro (DEFRA)
-    "Gasóleo": 2.75541,                                         # kg CO2e / litro (DEFRA) (original:)
-    "Lubricante": 2.74934,                                      # kg CO2e / litro (DEFRA) (original:)
-    "Nafta": 2.11894,                                           # kg CO2e / litro (DEFRA)
-    "Butano": 1.74532,                                          # kg CO2e / litro (DEFRA)
-    "Otros gases de petróleo": 0.94441,                         # kg CO2e / litro (DEFRA)
-    "Propano": 1.54357,                                         # kg CO2e / litro (DEFRA)
-    "Aceite quemado": 2.54015,                                  # kg CO2e / litro (DEFRA)
-    "Eléctrico": valores_defecto["fe_electricidad"],            # kg CO2e / kWh (valor genérico)
-    "Otro": valores_defecto["fe_combustible_generico"]
-}
-
-# --- Rendimientos de maquinaria (litros/hora) ---
-rendimientos_maquinaria = {
-    "Tractor": 10,         # litros de combustible / hora de uso (valor típico)
-    "Cosechadora": 15,     # litros de combustible / hora de uso (valor típico)
-    "Camión": 25,          # litros de combustible / hora de uso (valor típico)
-    "Pulverizadora": 8,    # litros de combustible / hora de uso (valor típico)
-    "Otro": 10             # litros de combustible / hora de uso (valor genérico)
-}
-
-# --- Opciones de labores ---
-opciones_labores = [
-    "Siembra", "Cosecha", "Fertilización", "Aplicación de agroquímicos",
-    "Riego", "Poda", "Transporte interno", "Otro"
-]
+# --- Factores de emisión y calculadoras (núcleo sin interfaz; los factores se modifican en nucleo/factores.py) ---
+from nucleo.factores import (
+    GWP,
+    FRACCION_QUEMADA,
+    FACTORES_ORGANICOS,
+    valores_defecto,
+    factores_emision,
+    factores_residuos,
+    factores_combustible,
+    rendimientos_maquinaria,
+    opciones_labores,
+)
+from nucleo.calculos import (
+    calcular_agroquimico,
+    calcular_emisiones_agroquimicos,
+    calcular_labor,
+    calcular_actividad_riego,
+)
+# Versiones memoizadas (caché LRU compartida entre sesiones; ver nucleo/memoria.py)
+from nucleo.memoria import (
+    CacheLRU,
+    forma_canonica,
+    calcular_emisiones_fertilizantes,
+    calcular_emisiones_maquinaria,
+    calcular_emisiones_residuos,
+)
+from nucleo.actividades import TIPOS_REGISTRO, Fertilizante, GestionResiduo
+from nucleo.archivo import EXTENSION_ARCHIVO, crear_archivo, estado_serializable, leer_archivo, serializar
+from nucleo.etapas import resumir_etapa
+from nucleo.formato import formatear_numero, formatear_numeros
+from nucleo.importacion import importar_actividades, leer_planilla
+from nucleo.incremental import GrafoProyecto
+from nucleo.registro import registro_factores
+from nucleo.sensibilidad import analizar_sensibilidad
+from nucleo.vectorizado import (
+    agroquimicos_vectorizado,
+    calcular_emisiones_fertilizantes_vectorizado,
+    labores_vectorizado,
+    normalizar_fertilizantes,
+    registros,
+    riego_vectorizado,
+    tabla_registros,
+    tabla_vacia,
+)
+
+# --- ARRANQUE: MÓDULOS DIFERIDOS Y CONFIGURACIÓN POR PROCESO ---
+# Streamlit vuelve a ejecutar este archivo en cada interacción, así que la configuración
+# global (locale, valores por defecto de Plotly) se hace en funciones con st.cache_resource:
+# una vez por proceso, no una vez por ejecución.
+class ModuloDiferido(types.ModuleType):
+    """
+    Módulo que se importa recién al usar uno de sus atributos (p. ej. px.bar), con la
+    función `cargar`. Es un ModuleType para que huella_grafico lo ignore como a los módulos.
+    """
+    def __init__(self, nombre, cargar):
+        super().__init__(nombre)
+        self._cargar = cargar
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        if self._modulo is None:
+            self._modulo = self._cargar()
+        return getattr(self._modulo, atributo)
+
+@st.cache_resource(show_spinner=False)
+def cargar_plotly_express():
+    """Importa plotly.express y fija su plantilla por defecto (una vez por proceso)."""
+    import plotly.express
+    plotly.express.defaults.template = "plotly_white"
+    return plotly.express
+
+@st.cache_resource(show_spinner=False)
+def configurar_locale():
+    """Establece el locale a español (una vez por proceso; si no está instalado, el del sistema)."""
+    for nombre in ('es_ES.UTF-8', 'es_ES', 'Spanish_Spain.1252', ''):
+        try:
+            return locale.setlocale(locale.LC_ALL, nombre)
+        except locale.Error:
+            continue
+
+px = ModuloDiferido("plotly.express", cargar_plotly_express)
+
+# --- GRÁFICOS: CLAVES ESTABLES Y CACHÉ DE FIGURAS ---
+# Cada gráfico tiene una clave derivada de su etapa, fuente e ítem, que no cambia entre
+# ejecuciones: el navegador conserva el gráfico y, si la figura es la misma, Streamlit no
+# vuelve a enviarla (los mensajes grandes que el cliente ya tiene se envían como una
+# referencia). Las figuras se guardan en caché por el hash de los datos con que se arman
+# (que se pasan a mostrar_grafico junto con la función que arma la figura), así que un
+# gráfico sin cambios tampoco se reconstruye en el servidor.
+MAXIMO_FIGURAS = 512
+
+@st.cache_resource
+def cache_figuras():
+    """Caché LRU de figuras Plotly, compartida entre sesiones (como las de nucleo.memoria)."""
+    return CacheLRU(MAXIMO_FIGURAS)
+
+def clave_grafico(*partes):
+    """Clave estable de un gráfico a partir de su etapa, fuente e ítem."""
+    return "grafico_" + "_".join(str(parte) for parte in partes)
+
+def _actualizar_huella(h, valor):
+    """Agrega `valor` al hash `h`; las tablas y arreglos se resumen por su contenido."""
+    if isinstance(valor, (pd.DataFrame, pd.Series, pd.Index)):
+        etiquetas = list(valor.columns) if isinstance(valor, pd.DataFrame) else [valor.name]
+        h.update(repr((type(valor).__name__, etiquetas)).encode("utf-8"))
+        try:
+            h.update(pd.util.hash_pandas_object(valor, index=not isinstance(valor, pd.Index)).to_numpy().tobytes())
+        except TypeError:
+            # Celdas no hashables (listas, dicts)
+            h.update(repr(valor.to_numpy().tolist()).encode("utf-8"))
+    elif hasattr(valor, "dtype") and hasattr(valor, "tobytes"):
+        # Arreglos de NumPy
+        if valor.dtype == object:
+            h.update(repr(valor.tolist()).encode("utf-8"))
+        else:
+            h.update(f"{valor.dtype.str}{valor.shape}".encode("utf-8"))
+            h.update(valor.tobytes())
+    elif isinstance(valor, dict):
+        h.update(b"{")
+        for k, v in valor.items():
+            h.update(repr(k).encode("utf-8"))
+            _actualizar_huella(h, v)
+        h.update(b"}")
+    elif isinstance(valor, (list, tuple)):
+        h.update(b"[")
+        for v in valor:
+            _actualizar_huella(h, v)
+        h.update(b"]")
+    else:
+        h.update(repr(forma_canonica(valor)).encode("utf-8"))
 
-# --- FIN DE BLOQUE DE FACTORES Y UNIDADES ---
+def huella_grafico(*datos):
+    """Hash de los datos con que se arma una figura (tablas, listas, etiquetas)."""
+    h = hashlib.blake2b(digest_size=16)
+    _actualizar_huella(h, datos)
+    return h.hexdigest()
 
-# --- GENERADOR DE CLAVES ÚNICAS PARA GRÁFICOS ---
-if 'plot_counter' not in st.session_state:
-    st.session_state.plot_counter = 0
+def mostrar_grafico(clave, construir, *datos):
+    """
+    Muestra con una clave estable la figura que devuelve construir(). `datos` son todos los
+    valores con que construir arma la figura: si no cambiaron, se reutiliza la figura
+    guardada en vez de volver a armarla.
+    """
+    figura = cache_figuras().obtener((clave, huella_grafico(*datos)), lambda: compactar_figura(construir()))
+    st.plotly_chart(figura, use_container_width=True, key=clave)
 
-def get_unique_key():
-    st.session_state.plot_counter += 1
-    return f"plot_{st.session_state.plot_counter}"
+def compactar_figura(figura):
+    """
+    Quita la plantilla de Plotly de la figura: son varios KB por gráfico y el tema de
+    Streamlit la reemplaza en el navegador (los colores de px quedan en las trazas).
+    """
+    figura.update_layout(template=None)
+    return figura
 
 # --- DATOS DE ENTRADA ---
 st.set_page_config(layout="wide")
@@ -573,12 +326,102 @@ emisiones_fuentes = {         # Emisiones acumuladas por fuente (kg CO2e/ha)
     "Fin de vida": 0
 }
 
+# -----------------------------
+# Guardar y abrir proyectos
+# -----------------------------
+# Claves de session_state que no son datos ingresados (resultados, estado interno, botones
+# y archivos); el resto de los valores simples son los de los widgets y se guardan
+ESTADO_NO_GUARDADO = {
+    "modo_anterior", "version_importacion", "proyecto_pendiente",
+    "em_imp", "prod_imp", "em_csp", "prod_csp", "em_pc", "prod_pc", "em_anual", "prod_anual",
+    "importar_planilla", "archivo_importacion", "destino_importacion", "sens_calcular",
+    "preparar_proyecto", "descargar_proyecto", "archivo_proyecto", "abrir_proyecto",
+}
+PREFIJOS_NO_GUARDADOS = ("_", "tabla_", "importado_", "datos_tabla_")
+CATEGORIAS_TABLA = ["fertilizantes", "agroquimicos", "labores", "riego"]
+
+def restaurar_proyecto(archivo):
+    """
+    Reemplaza los datos ingresados en la sesión por los de un archivo de proyecto
+    (nucleo/archivo.py). Debe llamarse antes de crear los widgets.
+    """
+    anteriores = estado_serializable(st.session_state, ESTADO_NO_GUARDADO, PREFIJOS_NO_GUARDADOS)
+    for clave in list(anteriores) + [c for c in st.session_state if str(c).startswith(("tabla_", "importado_"))]:
+        del st.session_state[clave]
+    st.session_state.pop("grafo_proyecto", None)
+    interfaz = archivo["interfaz"]
+    st.session_state.update(interfaz["estado"])
+    # Las filas de las tablas se cargan como una importación (ver ingresar_tabla)
+    version = st.session_state.get("version_importacion", 0) + 1
+    st.session_state["version_importacion"] = version
+    for clave, tablas in interfaz["tablas"].items():
+        for categoria, filas in tablas.items():
+            st.session_state[f"importado_{categoria}_{clave}"] = {
+                "tabla": tabla_registros(categoria, filas), "version": version
+            }
+
+def archivo_interfaz():
+    """Archivo de proyecto con los datos de actividad y el estado actual de la interfaz."""
+    tablas = {}
+    if st.session_state.get("modo_tablas"):
+        for clave in claves_etapas:
+            filas = {
+                categoria: registros(st.session_state[f"datos_tabla_{categoria}_{clave}"])
+                for categoria in CATEGORIAS_TABLA
+                if f"datos_tabla_{categoria}_{clave}" in st.session_state
+            }
+            if filas:
+                tablas[clave] = filas
+    estado = estado_serializable(st.session_state, ESTADO_NO_GUARDADO, PREFIJOS_NO_GUARDADOS)
+    return crear_archivo(proyecto_interfaz(), estado, tablas)
+
+def mostrar_archivo_proyecto():
+    """Guardar el proyecto en un archivo o abrir uno guardado (barra lateral)."""
+    with st.sidebar:
+        st.subheader("Proyecto")
+        st.caption(
+            "Guarde los datos ingresados para retomar el proyecto si se cierra la sesión o "
+            "reutilizarlo en otra temporada."
+        )
+        # Las secciones de ingreso se actualizan como fragmentos, sin volver a ejecutar esta
+        # parte: el archivo se arma en la ejecución completa que provoca el botón
+        if st.button("Preparar archivo del proyecto", key="preparar_proyecto"):
+            nombre = (st.session_state.get("cultivo") or "").strip().replace(" ", "_") or "proyecto"
+            st.download_button(
+                "Descargar archivo",
+                data=serializar(archivo_interfaz()),
+                file_name=f"{nombre}{EXTENSION_ARCHIVO}",
+                mime="application/json",
+                key="descargar_proyecto",
+                type="primary"
+            )
+        subido = st.file_uploader("Abrir un proyecto guardado", type=["json", "gz"], key="archivo_proyecto")
+        if not st.button("Abrir proyecto", key="abrir_proyecto", disabled=subido is None):
+            return
+        try:
+            archivo = leer_archivo(subido)
+        except (UnicodeDecodeError, ValueError, OSError) as e:
+            st.error(f"No se pudo abrir el archivo: {e}")
+            return
+        if "interfaz" not in archivo:
+            st.error(
+                "El archivo solo tiene los datos de actividad (sin los de la interfaz); "
+                "puede calcularlo con `python -m nucleo.archivo`."
+            )
+            return
+        # Se restaura al inicio de la próxima ejecución, antes de crear los widgets
+        st.session_state["proyecto_pendiente"] = archivo
+        st.rerun()
+
+if "proyecto_pendiente" in st.session_state:
+    restaurar_proyecto(st.session_state.pop("proyecto_pendiente"))
+
 # -----------------------------
 # Sección 1: Caracterización General
 # -----------------------------
 st.header("1. Caracterización General")
-cultivo = st.text_input("Nombre del cultivo o fruta")
-anual = st.radio("¿Es un cultivo anual o perenne?", ["Anual", "Perenne"])
+cultivo = st.text_input("Nombre del cultivo o fruta", key="cultivo")
+anual = st.radio("¿Es un cultivo anual o perenne?", ["Anual", "Perenne"], key="tipo_cultivo")
 
 # --- Inicialización de resultados según modo anual/perenne ---
 if 'modo_anterior' not in st.session_state or st.session_state['modo_anterior'] != anual:
@@ -592,15 +435,15 @@ if 'modo_anterior' not in st.session_state or st.session_state['modo_anterior']
     st.session_state['emisiones_fuente_etapa'] = {}
 
 emisiones_fuente_etapa = st.session_state['emisiones_fuente_etapa']
-morfologia = st.selectbox("Morfología", ["Árbol", "Arbusto", "Hierba", "Otro"])
-ubicacion = st.text_input("Ubicación geográfica del cultivo (región, país)")
+morfologia = st.selectbox("Morfología", ["Árbol", "Arbusto", "Hierba", "Otro"], key="morfologia")
+ubicacion = st.text_input("Ubicación geográfica del cultivo (región, país)", key="ubicacion")
 tipo_suelo = st.selectbox("Tipo de suelo", [
     "Franco", "Arenoso", "Arcilloso", "Franco-arenoso", "Franco-arcilloso", "Otro"
-])
+], key="tipo_suelo")
 clima = st.selectbox("Zona agroclimática o clima predominante", [
     "Mediterráneo", "Tropical", "Templado", "Desértico", "Húmedo", "Otro"
-])
-extra = st.text_area("Información complementaria (opcional)")
+], key="clima")
+extra = st.text_area("Información complementaria (opcional)", key="informacion_complementaria")
 
 # -----------------------------
 # Inicialización de estructuras para guardar resultados
@@ -617,17 +460,315 @@ emisiones_fuentes = {         # Emisiones acumuladas por fuente (kg CO2e/ha)
     "Residuos": 0,
     "Fin de vida": 0
 }
+etapas_proyecto = {}          # Datos de actividad por etapa (formato de nucleo.calcular_proyecto)
+claves_etapas = {}            # Sufijo de widgets de la etapa -> nombre en etapas_proyecto
+
+def registrar_etapa(nombre, duracion, produccion, fert, agroq, labores, energia_actividades, clave,
+                    riego_por_anio=True, tipo_riego=None, ciclos=None):
+    """
+    Guarda los datos de actividad ingresados para una etapa (o año, sub-etapa o ciclo) en
+    `etapas_proyecto`, para los análisis del núcleo (sensibilidad, incertidumbre, exportación).
+    - clave: sufijo usado por los widgets de la etapa (el mismo que recibe ingresar_gestion_residuos)
+    """
+    etapa = {
+        "nombre": nombre,
+        "duracion": int(duracion),
+        "produccion": produccion,
+        "fertilizantes": fert["fertilizantes"],
+        "agroquimicos": agroq,
+        "labores": labores,
+        "riego": energia_actividades,
+        "riego_por_anio": riego_por_anio,
+        "residuos": st.session_state.get(f"detalle_residuos_{clave}", {})
+    }
+    if tipo_riego:
+        etapa["tipo_riego"] = tipo_riego
+    if ciclos is not None:
+        etapa["ciclos"] = ciclos
+    etapas_proyecto[nombre] = etapa
+    claves_etapas[clave] = nombre
+    grafo_interfaz().actualizar_etapa(nombre, etapa)
+
+def grafo_interfaz():
+    """
+    Grafo incremental del proyecto (se conserva entre ejecuciones del script): solo se
+    recalculan los ítems que cambiaron desde la ejecución anterior.
+    """
+    tipo = "anual" if anual.strip().lower() == "anual" else "perenne"
+    grafo = st.session_state.get("grafo_proyecto")
+    if grafo is None or grafo.tipo != tipo:
+        grafo = GrafoProyecto(tipo)
+        st.session_state["grafo_proyecto"] = grafo
+    return grafo
+
+def proyecto_interfaz():
+    """Proyecto con los datos ingresados en la interfaz (entrada de nucleo.calcular_proyecto)."""
+    return {
+        "tipo": "anual" if anual.strip().lower() == "anual" else "perenne",
+        "etapas": list(etapas_proyecto.values())
+    }
+
+# -----------------------------
+# Secciones de ingreso aisladas (st.fragment)
+# -----------------------------
+# Cada sección de ingreso es un fragmento: al cambiar uno de sus widgets solo se vuelve a
+# ejecutar esa sección (no todo el script). La sección actualiza su parte de la etapa en
+# el grafo incremental y muestra el subtotal de la fuente y el total del proyecto.
+FUENTE_CAMPO = {
+    "fertilizantes": "Fertilizantes",
+    "agroquimicos": "Agroquímicos",
+    "labores": "Maquinaria",
+    "riego": "Riego",
+    "residuos": "Residuos",
+}
+_ejecucion_completa = [False]
+
+def _datos_seccion(campo, etapa, resultado):
+    """Convierte el valor devuelto por una función ingresar_* en el campo de la etapa."""
+    if campo == "fertilizantes":
+        return resultado["fertilizantes"]
+    if campo == "riego":
+        return resultado[2]
+    if campo == "residuos":
+        return st.session_state.get(f"detalle_residuos_{etapa}", {})
+    return resultado
+
+def actualizar_seccion(etapa, campo, resultado):
+    """Tras re-ejecutar solo una sección: actualiza la etapa en el grafo y muestra los totales."""
+    nombre = claves_etapas.get(etapa)
+    if nombre not in etapas_proyecto:
+        return
+    datos = dict(etapas_proyecto[nombre])
+    datos[campo] = _datos_seccion(campo, etapa, resultado)
+    etapas_proyecto[nombre] = datos
+    grafo = grafo_interfaz()
+    grafo.actualizar_etapa(nombre, datos)
+    fuente = FUENTE_CAMPO[campo]
+    st.caption(
+        f"{fuente} de la etapa: {format_num(grafo.emisiones_etapa(nombre)[fuente])} kg CO₂e/ha · "
+        f"Total del proyecto: {format_num(grafo.em_total)} kg CO₂e/ha"
+    )
+
+def seccion_aislada(campo):
+    """
+    Decorador de las funciones ingresar_*(etapa, ...): la sección se ejecuta como fragmento
+    y el valor devuelto se guarda en session_state para el resto de la etapa.
+    - campo: clave de la etapa que completa la sección ("fertilizantes", "riego", ...)
+    """
+    def decorador(ingresar):
+        clave_resultado = f"_seccion_{ingresar.__name__}"
+
+        @st.fragment
+        def fragmento(etapa, *args, **kwargs):
+            resultado = ingresar(etapa, *args, **kwargs)
+            st.session_state[f"{clave_resultado}_{etapa}"] = resultado
+            if not _ejecucion_completa[0]:
+                actualizar_seccion(etapa, campo, resultado)
+
+        def envoltura(etapa, *args, **kwargs):
+            if st.session_state.get("modo_formulario"):
+                # Dentro de un formulario no hay re-ejecuciones parciales
+                return ingresar(etapa, *args, **kwargs)
+            _ejecucion_completa[0] = True
+            try:
+                fragmento(etapa, *args, **kwargs)
+            finally:
+                _ejecucion_completa[0] = False
+            return st.session_state[f"{clave_resultado}_{etapa}"]
+
+        envoltura.__name__ = ingresar.__name__
+        envoltura.__doc__ = ingresar.__doc__
+        return envoltura
+    return decorador
+
+# -----------------------------
+# Ingreso por formularios
+# -----------------------------
+# En modo formulario cada etapa (implantación, crecimiento, cada sub-etapa de producción
+# y cada ciclo anual) es un st.form: editar sus widgets no vuelve a ejecutar el script y
+# el cálculo se hace solo al enviarlo. Las secciones aisladas se ejecutan en línea.
+@contextmanager
+def formulario_etapa(clave, titulo):
+    """
+    Agrupa los widgets de una etapa en un formulario si está activo el modo formulario.
+    - clave: identificador estable del formulario (no debe depender de textos editables)
+    - titulo: nombre de la etapa en el botón de envío
+    """
+    if not st.session_state.get("modo_formulario"):
+        yield
+        return
+    with st.form(key=f"form_{clave}"):
+        yield
+        st.form_submit_button(f"Calcular {titulo}", type="primary")
+
+# -----------------------------
+# Ingreso en tablas (st.data_editor)
+# -----------------------------
+# En modo tabla, fertilizantes, agroquímicos, labores y riego se ingresan en una tabla
+# editable (una fila por ítem) en vez de un expander con widgets por ítem; las emisiones
+# de la categoría se calculan en una sola pasada vectorizada (nucleo/vectorizado.py).
+def columnas_tabla(categoria, sufijo="año"):
+    """Configuración de columnas (tipos y listas desplegables) de la tabla de una categoría."""
+    cc = st.column_config
+    if categoria == "fertilizantes":
+        tipos = registro_factores.tipos()
+        tipos += [t for t in FACTORES_ORGANICOS if t not in tipos]
+        origenes = list(dict.fromkeys(o for t in registro_factores.tipos() for o in registro_factores.origenes(t)))
+        return {
+            "es_organico": cc.CheckboxColumn("Orgánico", default=False),
+            "tipo": cc.SelectboxColumn("Fertilizante", options=tipos, required=True),
+            "origen": cc.SelectboxColumn("Origen", options=origenes, help="Vacío: primer origen del producto"),
+            "cantidad": cc.NumberColumn(f"Cantidad (kg/ha·{sufijo})", min_value=0.0, format="%.6g"),
+            "N": cc.NumberColumn("N (%)", min_value=0.0, max_value=100.0, format="%.6g",
+                                 help="Orgánicos y 'Otros' (vacío: valor de la base de datos)"),
+            "fraccion_seca": cc.NumberColumn("Fracción seca (0-1)", min_value=0.0, max_value=1.0, format="%.4g",
+                                             help="Solo orgánicos (vacío: valor de la base de datos)"),
+            "fe_personalizado": cc.NumberColumn("FE personalizado (kg CO₂e/kg)", min_value=0.0, format="%.6g"),
+        }
+    if categoria == "agroquimicos":
+        categorias = ["pesticidas", "fungicidas", "insecticidas", "herbicidas"]
+        tipos = list(dict.fromkeys(t for c in categorias for t in factores_emision[c]))
+        return {
+            "categoria": cc.SelectboxColumn("Categoría", options=categorias, default="pesticidas", required=True),
+            "tipo": cc.SelectboxColumn("Tipo", options=tipos, default="Media", required=True),
+            "nombre_comercial": cc.TextColumn("Nombre comercial"),
+            "cantidad_ia": cc.NumberColumn(f"Ingrediente activo (kg/ha·{sufijo})", min_value=0.0, format="%.6g"),
+            "fe": cc.NumberColumn("FE personalizado (kg CO₂e/kg i.a.)", min_value=0.0, format="%.6g"),
+        }
+    if categoria == "labores":
+        return {
+            "nombre_labor": cc.SelectboxColumn("Labor", options=opciones_labores, required=True),
+            "tipo_maquinaria": cc.SelectboxColumn("Maquinaria", options=["Manual"] + list(rendimientos_maquinaria.keys()), default="Tractor", required=True),
+            "tipo_combustible": cc.SelectboxColumn("Combustible", options=list(factores_combustible.keys())),
+            "pasadas": cc.NumberColumn("Pasadas", min_value=1, step=1, default=1),
+            "litros_pasada": cc.NumberColumn("Litros por pasada (L/ha)", min_value=0.0, format="%.6g"),
+            "horas_pasada": cc.NumberColumn("Horas por pasada (h/ha)", min_value=0.0, format="%.6g",
+                                            help="Si no ingresa litros: horas × rendimiento"),
+            "rendimiento": cc.NumberColumn("Rendimiento (L/h)", min_value=0.0, format="%.6g",
+                                           help="Vacío: rendimiento típico de la maquinaria"),
+            "fe_personalizado": cc.NumberColumn("FE personalizado (kg CO₂e/L)", min_value=0.0, format="%.6g"),
+        }
+    return {
+        "tipo_actividad": cc.SelectboxColumn("Actividad", options=["Goteo", "Aspersión", "Surco", "Fertirriego", "Otro"], required=True),
+        "actividad": cc.TextColumn("Nombre (opcional)"),
+        "agua_total_m3": cc.NumberColumn(f"Agua (m³/ha·{sufijo})", min_value=0.0, format="%.6g"),
+        "tipo_energia": cc.SelectboxColumn("Energía", options=list(factores_combustible.keys()), default="Eléctrico"),
+        "consumo_energia": cc.NumberColumn(f"Consumo (kWh o L/ha·{sufijo})", min_value=0.0, format="%.6g"),
+        "fe_energia": cc.NumberColumn("FE personalizado (kg CO₂e/kWh o L)", min_value=0.0, format="%.6g"),
+    }
+
+def ingresar_tabla(categoria, etapa, sufijo="año"):
+    """
+    Tabla editable de una categoría ("fertilizantes", "agroquimicos", "labores" o "riego").
+    Devuelve la lista de ítems (mismo formato que el ingreso por widgets) y muestra el subtotal.
+    """
+    # Datos importados desde una planilla (ver importar_planilla); cada importación
+    # cambia la clave del editor para descartar las ediciones anteriores
+    importado = st.session_state.get(f"importado_{categoria}_{etapa}")
+    tabla = st.data_editor(
+        importado["tabla"] if importado else tabla_vacia(categoria),
+        column_config=columnas_tabla(categoria, sufijo),
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        key=f"tabla_{categoria}_{etapa}" + (f"_{importado['version']}" if importado else "")
+    ).dropna(how="all")
+    st.session_state[f"datos_tabla_{categoria}_{etapa}"] = tabla  # para guardar el proyecto
+    if categoria == "fertilizantes":
+        tabla = normalizar_fertilizantes(tabla)
+        subtotal = sum(calcular_emisiones_fertilizantes_vectorizado(tabla, 1)[:4])
+    elif categoria == "agroquimicos":
+        tabla = agroquimicos_vectorizado(tabla)
+        subtotal = tabla["emisiones"].sum()
+    elif categoria == "labores":
+        tabla = labores_vectorizado(tabla)
+        subtotal = tabla["emisiones"].sum()
+    else:
+        tabla = riego_vectorizado(tabla)
+        subtotal = tabla["emisiones_agua"].sum() + tabla["emisiones_energia"].sum()
+    st.caption(f"{len(tabla)} ítems · {format_num(subtotal)} kg CO₂e/ha·{sufijo}")
+    return registros(tabla, TIPOS_REGISTRO[categoria])
+
+# -----------------------------
+# Importación de planillas (CSV/XLSX)
+# -----------------------------
+def importar_residuos(clave, detalle):
+    """Completa los widgets de gestión de residuos de una etapa con el detalle importado."""
+    vias = [via for via in detalle if via != "Sin gestión"]
+    st.session_state[f"activar_residuos_{clave}"] = "Sí"
+    st.session_state[f"biomasa_total_{clave}"] = float(sum(d["biomasa"] for d in detalle.values()))
+    st.session_state[f"modo_residuos_{clave}"] = "Kilogramos (kg)"
+    st.session_state[f"opciones_residuos_{clave}"] = vias
+    for via in vias:
+        st.session_state[f"kg_{via}_{clave}"] = float(detalle[via]["biomasa"])
+    ajustes = detalle.get("Quema", {}).get("ajustes", {})
+    if "fraccion_seca" in ajustes:
+        st.session_state[f"fraccion_seca_quema_{clave}"] = float(ajustes["fraccion_seca"])
+    if "fraccion_quemada" in ajustes:
+        st.session_state[f"fraccion_quemada_{clave}"] = float(ajustes["fraccion_quemada"])
+
+def importar_planilla():
+    """
+    Carga fertilizantes, agroquímicos, labores, riego y residuos desde una planilla (formato
+    de nucleo.lote) para todo el proyecto o para una etapa. La lectura y la validación se
+    hacen en bloque (nucleo/importacion.py); los datos quedan en las tablas de ingreso.
+    """
+    # Etapas visibles en la ejecución anterior: nombre -> sufijo de sus widgets
+    claves = {nombre: clave for clave, nombre in st.session_state.get("claves_etapas", {}).items()}
+    with st.expander("Importar datos desde una planilla (CSV o Excel)"):
+        st.caption(
+            "Una fila por actividad, con las columnas 'etapa', 'fuente' (fertilizante, agroquimico, "
+            "labor, riego o residuo) y las de cada actividad, como en el cálculo por lotes "
+            "(nucleo/lote.py). Los datos importados reemplazan las tablas de la etapa."
+        )
+        archivo = st.file_uploader("Planilla de actividades", type=["csv", "xlsx", "xls"], key="archivo_importacion")
+        todas = "Todo el proyecto (columna 'etapa')"
+        destino = st.selectbox("Etapa de destino", [todas] + list(claves), key="destino_importacion")
+        if not st.button("Importar", key="importar_planilla", disabled=archivo is None):
+            return
+        try:
+            etapas, errores = importar_actividades(
+                leer_planilla(archivo),
+                etapa=None if destino == todas else destino
+            )
+        except (ImportError, ValueError) as e:
+            st.error(f"No se pudo leer la planilla: {e}")
+            return
+        desconocidas = [nombre for nombre in etapas if nombre not in claves]
+        if desconocidas:
+            errores.append(
+                f"Etapas que no existen en el proyecto: {', '.join(desconocidas)}. "
+                f"Etapas disponibles: {', '.join(claves) or 'ninguna'}"
+            )
+        if errores:
+            st.error("No se importó la planilla:\n\n" + "\n".join(f"- {e}" for e in errores))
+            return
+        version = st.session_state.get("version_importacion", 0) + 1
+        st.session_state["version_importacion"] = version
+        for nombre, datos in etapas.items():
+            clave = claves[nombre]
+            for categoria, tabla in datos.items():
+                if categoria == "residuos":
+                    importar_residuos(clave, tabla)
+                else:
+                    st.session_state[f"importado_{categoria}_{clave}"] = {"tabla": tabla, "version": version}
+        # Las tablas se muestran en el modo de ingreso en tablas
+        st.session_state["modo_tablas"] = True
+        st.success(f"Planilla importada en {len(etapas)} etapa(s): {', '.join(etapas)}")
 
 # -----------------------------
 # Funciones de ingreso y cálculo
 # -----------------------------
+@seccion_aislada("fertilizantes")
 def ingresar_fertilizantes(etapa, unidad_cantidad="ciclo"):
     st.markdown("##### Fertilizantes")
-    tipos_inorg = list(factores_fertilizantes.keys())
+    tipos_inorg = registro_factores.tipos()
     tipos_org = list(FACTORES_ORGANICOS.keys())
 
     sufijo = "ciclo" if unidad_cantidad == "ciclo" else "año"
 
+    if st.session_state.get("modo_tablas"):
+        return {"fertilizantes": ingresar_tabla("fertilizantes", etapa, sufijo)}
     n_fert = st.number_input(
         f"Ingrese la cantidad de fertilizantes que utiliza (orgánicos e inorgánicos)",
         min_value=0, step=1, format="%.6g", key=f"num_fert_total_{etapa}"
@@ -663,16 +804,16 @@ def ingresar_fertilizantes(etapa, unidad_cantidad="ciclo"):
                             fe_personalizado = st.number_input("Factor de emisión personalizado (kg CO₂e/kg producto)", min_value=0.0, step=0.000001, format="%.6g", key=f"fe_personalizado_otros_{etapa}_{i}")
                         else:
                             fe_personalizado = None
-                        fertilizantes.append({
-                            "tipo": nombre_otro if nombre_otro else "Otros",
-                            "cantidad": cantidad,
-                            "N": n,
-                            "P": p,
-                            "K": k,
-                            "modo_otros": "porcentaje",
-                            "es_organico": False,
-                            "fe_personalizado": fe_personalizado
-                        })
+                        fertilizantes.append(Fertilizante(
+                            tipo=nombre_otro if nombre_otro else "Otros",
+                            cantidad=cantidad,
+                            N=n,
+                            P=p,
+                            K=k,
+                            modo_otros="porcentaje",
+                            es_organico=False,
+                            fe_personalizado=fe_personalizado
+                        ))
                     else:  # modo_otros == "nutriente"
                         nutriente = st.selectbox("Nutriente aplicado", ["N", "P", "K"], key=f"nutriente_otros_{etapa}_{i}")
                         cantidad = st.number_input(f"Cantidad de {nutriente} aplicada (kg {nutriente}/ha·{sufijo})", min_value=0.0, format="%.6g", key=f"cant_nutriente_otros_{etapa}_{i}")
@@ -681,19 +822,18 @@ def ingresar_fertilizantes(etapa, unidad_cantidad="ciclo"):
                             fe_personalizado = st.number_input("Factor de emisión personalizado (kg CO₂e/kg producto)", min_value=0.0, step=0.000001, format="%.6g", key=f"fe_personalizado_otros_nutriente_{etapa}_{i}")
                         else:
                             fe_personalizado = None
-                        fertilizantes.append({
-                            "tipo": nombre_otro if nombre_otro else "Otros",
-                            "cantidad": cantidad,
-                            "nutriente": nutriente,
-                            "modo_otros": "nutriente",
-                            "es_organico": False,
-                            "fe_personalizado": fe_personalizado
-                        })
+                        fertilizantes.append(Fertilizante(
+                            tipo=nombre_otro if nombre_otro else "Otros",
+                            cantidad=cantidad,
+                            nutriente=nutriente,
+                            modo_otros="nutriente",
+                            es_organico=False,
+                            fe_personalizado=fe_personalizado
+                        ))
                 else:
-                    variantes = factores_fertilizantes[tipo]
-                    origenes = [v["origen"] for v in variantes]
+                    origenes = registro_factores.origenes(tipo)
                     origen = st.selectbox("Origen del fertilizante", origenes, key=f"origen_inorg_{etapa}_{i}")
-                    variante = next((v for v in variantes if v["origen"] == origen), variantes[0])
+                    variante = registro_factores.variante(tipo, origen)
                     cantidad = st.number_input(f"Cantidad aplicada (kg/ha·{sufijo})", min_value=0.0, format="%.6g", key=f"cant_inorg_{etapa}_{i}")
                     # CORRECCIÓN: fuerza el tipo de value a float para evitar errores de Streamlit
                     n = st.number_input(
@@ -709,14 +849,14 @@ def ingresar_fertilizantes(etapa, unidad_cantidad="ciclo"):
                         fe_personalizado = st.number_input("Factor de emisión personalizado (kg CO₂e/kg producto)", min_value=0.0, step=0.000001, format="%.6g", key=f"fe_personalizado_inorg_{etapa}_{i}")
                     else:
                         fe_personalizado = None
-                    fertilizantes.append({
-                        "tipo": tipo,
-                        "origen": origen,
-                        "cantidad": cantidad,
-                        "N": n,
-                        "es_organico": False,
-                        "fe_personalizado": fe_personalizado
-                    })
+                    fertilizantes.append(Fertilizante(
+                        tipo=tipo,
+                        origen=origen,
+                        cantidad=cantidad,
+                        N=n,
+                        es_organico=False,
+                        fe_personalizado=fe_personalizado
+                    ))
             else:
                 tipo = st.selectbox("Tipo de fertilizante orgánico", tipos_org, key=f"tipo_org_{etapa}_{i}")
                 valores = FACTORES_ORGANICOS[tipo]
@@ -740,259 +880,19 @@ def ingresar_fertilizantes(etapa, unidad_cantidad="ciclo"):
                 k = st.number_input("Contenido de K₂O (%)", min_value=0.0, max_value=100.0, value=float(valores['K2O']), format="%.6g", key=f"K_org_{etapa}_{i}")
                 fraccion_seca_pct = st.number_input("Fracción seca del fertilizante (%)", min_value=0.0, max_value=100.0, value=float(valores['fraccion_seca'])*100, format="%.6g", key=f"fraccion_seca_org_{etapa}_{i}")
                 st.info("Para el cálculo de huella de carbono, el contenido de N es el principal responsable de la huella de carbono de N₂O. Si no dispone de los otros nutrientes, puede dejarlos en cero.")
-                fertilizantes.append({
-                    "tipo": nombre_otro_org if (tipo == "Otros" and nombre_otro_org) else tipo,
-                    "cantidad": cantidad,
-                    "N": n,
-                    "P": p,
-                    "K": k,
-                    "fraccion_seca": fraccion_seca_pct / 100,  # Convierte a fracción
-                    "es_organico": True
-                })
+                fertilizantes.append(Fertilizante(
+                    tipo=nombre_otro_org if (tipo == "Otros" and nombre_otro_org) else tipo,
+                    cantidad=cantidad,
+                    N=n,
+                    P=p,
+                    K=k,
+                    fraccion_seca=fraccion_seca_pct / 100,  # Convierte a fracción
+                    es_organico=True
+                ))
 
     return {"fertilizantes": fertilizantes}
 
-def calcular_emisiones_n2o_fertilizantes_desglosado(fertilizantes, duracion):
-    total_n_aplicado = 0
-    total_n_volatilizado = 0
-    total_n_lixiviado = 0
-
-    for fert in fertilizantes:
-        if fert.get("es_organico", False):
-            cantidad = fert.get("cantidad", 0)  # kg/ha
-            tipo = fert.get("tipo", "Otros")
-            valores = FACTORES_ORGANICOS.get(tipo, FACTORES_ORGANICOS["Otros"])
-            fraccion_seca = fert.get("fraccion_seca", valores["fraccion_seca"])
-            n = fert.get("N", valores["N"]) / 100  # %
-            n_aplicado = cantidad * fraccion_seca * n
-            frac_vol = FRAC_VOLATILIZACION_ORG
-            frac_lix = FRAC_LIXIVIACION
-        elif fert["tipo"] == "Otros":
-            if fert.get("modo_otros") == "porcentaje":
-                cantidad = fert.get("cantidad", 0)
-                n = fert.get("N", 0) / 100
-                n_aplicado = cantidad * n
-                frac_vol = FRAC_VOLATILIZACION_INORG
-                frac_lix = FRAC_LIXIVIACION
-            elif fert.get("modo_otros") == "nutriente":
-                nutriente = fert.get("nutriente")
-                cantidad = fert.get("cantidad", 0)
-                n_aplicado = cantidad if nutriente == "N" else 0
-                frac_vol = FRAC_VOLATILIZACION_INORG
-                frac_lix = FRAC_LIXIVIACION
-            else:
-                n_aplicado = 0
-                frac_vol = 0
-                frac_lix = 0
-        else:
-            tipo = fert["tipo"]
-            origen = fert.get("origen", None)
-            variantes = factores_fertilizantes.get(tipo, [])
-            if isinstance(variantes, list):
-                variante = next((v for v in variantes if v["origen"] == origen), variantes[0] if variantes else None)
-            else:
-                variante = None
-            if variante:
-                cantidad = fert.get("cantidad", 0)
-                n_porcentaje = variante.get("N_porcentaje", 0)
-                n_aplicado = cantidad * n_porcentaje
-                frac_vol = variante.get("Frac_volatilizacion", FRAC_VOLATILIZACION_INORG)
-                frac_lix = variante.get("Frac_lixiviacion", FRAC_LIXIVIACION)
-            else:
-                n_aplicado = 0
-                frac_vol = FRAC_VOLATILIZACION_INORG
-                frac_lix = FRAC_LIXIVIACION
-
-        n_volatilizado = n_aplicado * frac_vol
-        n_lixiviado = n_aplicado * frac_lix
-
-        total_n_aplicado += n_aplicado * duracion
-        total_n_volatilizado += n_volatilizado * duracion
-        total_n_lixiviado += n_lixiviado * duracion
-
-    n2o_n_directo = total_n_aplicado * EF1
-    n2o_n_ind_vol = total_n_volatilizado * EF4
-    n2o_n_ind_lix = total_n_lixiviado * EF5
-
-    n2o_n_indirecto = n2o_n_ind_vol + n2o_n_ind_lix
-
-    n2o_directo = n2o_n_directo * (44/28)
-    n2o_indirecto = n2o_n_indirecto * (44/28)
-    n2o_total = n2o_directo + n2o_indirecto
-
-    n2o_directo_co2e = n2o_directo * GWP["N2O"]
-    n2o_indirecto_co2e = n2o_indirecto * GWP["N2O"]
-    emision_n2o_co2e_total = n2o_total * GWP["N2O"]
-
-    return emision_n2o_co2e_total, total_n_aplicado, n2o_directo_co2e, n2o_indirecto_co2e
-
-def calcular_emisiones_fertilizantes(fert_data, duracion):
-    fertilizantes = fert_data.get("fertilizantes", [])
-
-    emision_produccion = 0
-    emision_co2_urea = 0  # Nueva variable para emisiones CO2 por hidrólisis de urea
-    n_aplicado_inorg = 0
-    n_aplicado_org = 0
-    volatilizacion_inorg = 0
-    lixiviacion_inorg = 0
-    volatilizacion_org = 0
-    lixiviacion_org = 0
-
-    desglose = []
-
-    for fert in fertilizantes:
-        em_prod = 0
-        em_co2_urea_individual = 0  # CO2 de urea para este fertilizante específico
-        em_n2o_dir = 0
-        em_n2o_ind = 0
-        em_n2o_ind_vol = 0
-        em_n2o_ind_lix = 0
-
-        tipo_fertilizante = "Orgánico" if fert.get("es_organico", False) else "Inorgánico"
-
-        # --- Cálculo de N aplicado y fracciones ---
-        n_aplicado = 0
-        frac_vol = 0
-        frac_lix = 0
-
-        if fert.get("es_organico", False):
-            cantidad = fert.get("cantidad", 0)
-            tipo = fert.get("tipo", "Otros")
-            valores = FACTORES_ORGANICOS.get(tipo, FACTORES_ORGANICOS["Otros"])
-            fraccion_seca = fert.get("fraccion_seca", valores["fraccion_seca"])
-            n = fert.get("N", valores["N"]) / 100
-            n_aplicado = cantidad * fraccion_seca * n
-            n_aplicado_org += n_aplicado
-            frac_vol = FRAC_VOLATILIZACION_ORG
-            frac_lix = FRAC_LIXIVIACION
-            volatilizacion_org += n_aplicado * frac_vol
-            lixiviacion_org += n_aplicado * frac_lix
-
-        elif fert.get("tipo", "") == "Otros" or fert.get("modo_otros") in ["porcentaje", "nutriente"]:
-            nombre_otro = fert.get("tipo", "Otros")
-            if fert.get("modo_otros") == "porcentaje":
-                cantidad = fert.get("cantidad", 0)
-                n = fert.get("N", 0) / 100
-                n_aplicado = cantidad * n
-            elif fert.get("modo_otros") == "nutriente":
-                nutriente = fert.get("nutriente", "").strip().upper()
-                cantidad = fert.get("cantidad", 0)
-                n_aplicado = cantidad if nutriente == "N" else 0
-            else:
-                n_aplicado = 0
-
-            if n_aplicado > 0:
-                n_aplicado_inorg += n_aplicado
-                frac_vol = FRAC_VOLATILIZACION_INORG
-                frac_lix = FRAC_LIXIVIACION
-                volatilizacion_inorg += n_aplicado * frac_vol
-                lixiviacion_inorg += n_aplicado * frac_lix
-            else:
-                frac_vol = 0
-                frac_lix = 0
-
-            # FE personalizado para "Otros"
-            fe = fert.get("fe_personalizado", None)
-            if fe is not None and fe > 0:
-                em_prod = cantidad * fe * duracion
-            else:
-                em_prod = 0
-
-        else:
-            tipo = fert.get("tipo", "")
-            origen = fert.get("origen", None)
-            variantes = factores_fertilizantes.get(tipo, [])
-            if isinstance(variantes, list):
-                variante = next((v for v in variantes if v["origen"] == origen), variantes[0] if variantes else None)
-            else:
-                variante = None
-            if variante:
-                cantidad = fert.get("cantidad", 0)
-                n_porcentaje = variante.get("N_porcentaje", 0)
-                n_aplicado = cantidad * n_porcentaje
-                n_aplicado_inorg += n_aplicado
-                frac_vol = variante.get("Frac_volatilizacion", FRAC_VOLATILIZACION_INORG)
-                frac_lix = variante.get("Frac_lixiviacion", FRAC_LIXIVIACION)
-                volatilizacion_inorg += n_aplicado * frac_vol
-                lixiviacion_inorg += n_aplicado * frac_lix
-                
-                # --- CÁLCULO DE EMISIONES CO2 POR HIDRÓLISIS DE UREA (IPCC 2006 Vol.4 Cap.2) ---
-                if tipo == "Urea" or "Urea" in tipo:
-                    em_co2_urea_individual = cantidad * EF_CO2_UREA * duracion
-                    emision_co2_urea += em_co2_urea_individual
-                
-                # FE personalizado
-                fe = fert.get("fe_personalizado", None)
-                if fe is not None and fe > 0:
-                    em_prod = cantidad * fe * duracion
-                else:
-                    fe_default = variante.get("FE_produccion_producto", 0)
-                    em_prod = cantidad * fe_default * duracion if fe_default else 0
-            else:
-                cantidad = 0
-                n_aplicado = 0
-                frac_vol = FRAC_VOLATILIZACION_INORG
-                frac_lix = FRAC_LIXIVIACION
-
-        # --- Emisiones N2O directas e indirectas por fertilizante individual ---
-        n_volatilizado = n_aplicado * frac_vol
-        n_lixiviado = n_aplicado * frac_lix
-
-        n2o_n_directo = n_aplicado * EF1
-        n2o_n_ind_vol = n_volatilizado * EF4
-        n2o_n_ind_lix = n_lixiviado * EF5
-        n2o_n_indirecto = n2o_n_ind_vol + n2o_n_ind_lix
-        n2o_directo = n2o_n_directo * (44/28)
-        n2o_ind_vol = n2o_n_ind_vol * (44/28)
-        n2o_ind_lix = n2o_n_ind_lix * (44/28)
-        n2o_indirecto = n2o_ind_vol + n2o_ind_lix
-        em_n2o_dir = n2o_directo * GWP["N2O"]
-        em_n2o_ind_vol = n2o_ind_vol * GWP["N2O"]
-        em_n2o_ind_lix = n2o_ind_lix * GWP["N2O"]
-        em_n2o_ind = em_n2o_ind_vol + em_n2o_ind_lix
-
-        desglose.append({
-            "Tipo fertilizante": tipo_fertilizante,
-            "tipo": fert.get("tipo", fert.get("nutriente", "")),
-            "origen": fert.get("origen", ""),
-            "cantidad": fert.get("cantidad", 0),
-            "emision_produccion": em_prod,
-            "emision_co2_urea": em_co2_urea_individual,  # Nueva columna en desglose
-            "emision_n2o_directa": em_n2o_dir,
-            "emision_n2o_indirecta": em_n2o_ind,
-            "emision_n2o_ind_volatilizacion": em_n2o_ind_vol,
-            "emision_n2o_ind_lixiviacion": em_n2o_ind_lix,
-            "total": em_prod + em_co2_urea_individual + em_n2o_dir + em_n2o_ind  # Incluye CO2 urea en total
-        })
-
-        emision_produccion += em_prod
-
-    # --- EMISIONES N2O DIRECTAS E INDIRECTAS (totales) ---
-    total_n_aplicado_inorg = n_aplicado_inorg * duracion
-    total_n_volatilizado_inorg = volatilizacion_inorg * duracion
-    total_n_lixiviado_inorg = lixiviacion_inorg * duracion
-    total_n_aplicado_org = n_aplicado_org * duracion
-    total_n_volatilizado_org = volatilizacion_org * duracion
-    total_n_lixiviado_org = lixiviacion_org * duracion
-
-    total_n_aplicado = total_n_aplicado_inorg + total_n_aplicado_org
-    total_n_volatilizado = total_n_volatilizado_inorg + total_n_volatilizado_org
-    total_n_lixiviado = total_n_lixiviado_inorg + total_n_lixiviado_org
-
-    n2o_n_directo = total_n_aplicado * EF1
-    n2o_n_ind_vol = total_n_volatilizado * EF4
-    n2o_n_ind_lix = total_n_lixiviado * EF5
-    n2o_n_indirecto = n2o_n_ind_vol + n2o_n_ind_lix
-    n2o_directo = n2o_n_directo * (44/28)
-    n2o_ind_vol = n2o_n_ind_vol * (44/28)
-    n2o_ind_lix = n2o_n_ind_lix * (44/28)
-    n2o_indirecto = n2o_ind_vol + n2o_ind_lix
-    n2o_directo_co2e = n2o_directo * GWP["N2O"]
-    n2o_indirecto_co2e = n2o_indirecto * GWP["N2O"]
-    emision_n2o_co2e_total = n2o_directo_co2e + n2o_indirecto_co2e
-
-    return emision_produccion, emision_co2_urea, n2o_directo_co2e, n2o_indirecto_co2e, desglose
-
+@seccion_aislada("agroquimicos")
 def ingresar_agroquimicos(etapa):
     st.markdown("##### Agroquímicos y pesticidas")
     agroquimicos = []
@@ -1016,6 +916,8 @@ def ingresar_agroquimicos(etapa):
         ),
         "herbicidas": list(factores_emision["herbicidas"].keys())
     }
+    if st.session_state.get("modo_tablas"):
+        return ingresar_tabla("agroquimicos", etapa, "ciclo")
     n_agro = st.number_input(
         "Ingrese la cantidad de agroquímicos y/o pesticidas diferentes que utiliza",
         min_value=0, step=1, format="%.10g", key=f"num_agroquimicos_{etapa}"
@@ -1091,30 +993,19 @@ def ingresar_agroquimicos(etapa):
                     min_value=0.0, step=0.000001, format="%.10g", key=f"fe_personalizado_agro_{etapa}_{i}"
                 )
             else:
-                fe = factores_emision[clave_categoria].get(tipo, valores_defecto["fe_agroquimico"])
-            emisiones = cantidad_ia * fe
-            agroquimicos.append({
-                "categoria": clave_categoria,
-                "tipo": tipo,
-                "nombre_comercial": nombre_final,
-                "cantidad_ia": cantidad_ia,
-                "fe": fe,
-                "emisiones": emisiones
-            })
+                fe = None  # Se usa el FE de la base de datos
+            agroquimicos.append(calcular_agroquimico(clave_categoria, tipo, cantidad_ia, fe=fe, nombre_comercial=nombre_final))
     return agroquimicos
 
-def calcular_emisiones_agroquimicos(agroquimicos, duracion):
-    total = 0
-    for ag in agroquimicos:
-        total += ag["emisiones"] * duracion
-    return total
-
 # MAQUINARIA EN PERENNES
+@seccion_aislada("labores")
 def ingresar_maquinaria_perenne(etapa, tipo_etapa):
     st.markdown(f"Labores y maquinaria ({tipo_etapa})")
     if not opciones_labores:
         st.error("No hay labores definidas en la base de datos.")
         return []
+    if st.session_state.get("modo_tablas"):
+        return ingresar_tabla("labores", etapa, "año")
     labores = []
     n_labores = st.number_input(
         f"¿Cuántas labores desea agregar en la etapa '{tipo_etapa}'?",
@@ -1146,14 +1037,7 @@ def ingresar_maquinaria_perenne(etapa, tipo_etapa):
 
             if tipo_labor == "Manual":
                 st.info("Labor manual: no se considera huella de carbono directa de maquinaria ni combustible.")
-                labores.append({
-                    "nombre_labor": nombre_labor,
-                    "tipo_maquinaria": "Manual",
-                    "tipo_combustible": "N/A",
-                    "litros": 0,
-                    "emisiones": 0,
-                    "fe_personalizado": None
-                })
+                labores.append(calcular_labor(nombre_labor, "Manual", "N/A", 0))
             else:
                 if not rendimientos_maquinaria:
                     st.error("No hay tipos de maquinaria definidos en la base de datos.")
@@ -1194,7 +1078,6 @@ def ingresar_maquinaria_perenne(etapa, tipo_etapa):
                         list(factores_combustible.keys()),
                         key=f"tipo_comb_{etapa}_{tipo_etapa}_{i}_{j}"
                     )
-                    fe_comb_default = factores_combustible.get(tipo_comb, 0)
 
                     repeticiones = st.number_input(
                         f"Número de pasadas o repeticiones en la etapa '{tipo_etapa}'",
@@ -1252,24 +1135,24 @@ def ingresar_maquinaria_perenne(etapa, tipo_etapa):
                             key=f"fe_personalizado_maq_{etapa}_{tipo_etapa}_{i}_{j}"
                         )
                     else:
-                        fe_comb = fe_comb_default
+                        fe_comb = None  # Se usa el FE de la base de datos
 
                     litros_totales = litros_por_pasada * repeticiones
-                    emisiones = litros_totales * fe_comb
-
-                    labores.append({
-                        "nombre_labor": nombre_labor,
-                        "tipo_maquinaria": nombre_maq,
-                        "tipo_combustible": tipo_comb,
-                        "litros": litros_totales,
-                        "emisiones": emisiones,
-                        "fe_personalizado": fe_comb if usar_fe_personalizado else None
-                    })
+                    labores.append(calcular_labor(
+                        nombre_labor,
+                        nombre_maq,
+                        tipo_comb,
+                        litros_totales,
+                        fe_personalizado=fe_comb
+                    ))
     return labores
 
 # ====== MAQUINARIA EN ANUAL ======
+@seccion_aislada("labores")
 def ingresar_maquinaria_ciclo(etapa):
     st.markdown("##### Labores y maquinaria")
+    if st.session_state.get("modo_tablas"):
+        return ingresar_tabla("labores", etapa, "ciclo")
     labores = []
     n_labores = st.number_input(f"¿Cuántas labores desea agregar en el ciclo?", min_value=0, step=1, key=f"num_labores_{etapa}")
     for i in range(n_labores):
@@ -1284,14 +1167,7 @@ def ingresar_maquinaria_ciclo(etapa):
 
             if tipo_labor == "Manual":
                 st.info("Labor manual: no se considera huella de carbono directa de maquinaria ni combustible.")
-                labores.append({
-                    "nombre_labor": nombre_labor,
-                    "tipo_maquinaria": "Manual",
-                    "tipo_combustible": "N/A",
-                    "litros": 0,
-                    "emisiones": 0,
-                    "fe_personalizado": None
-                })
+                labores.append(calcular_labor(nombre_labor, "Manual", "N/A", 0))
             else:
                 n_maquinas = st.number_input(f"¿Cuántas maquinarias para esta labor?", min_value=1, step=1, key=f"num_maquinas_{etapa}_{i}")
                 tipos_maquinaria = list(rendimientos_maquinaria.keys())
@@ -1309,7 +1185,6 @@ def ingresar_maquinaria_ciclo(etapa):
                         rendimiento_recomendado = float(rendimientos_maquinaria.get(tipo_maq, 10))
 
                     tipo_comb = st.selectbox("Tipo de combustible", list(factores_combustible.keys()), key=f"tipo_comb_{etapa}_{i}_{j}")
-                    fe_comb_default = factores_combustible.get(tipo_comb, 0)
 
                     repeticiones = st.number_input("Número de pasadas o repeticiones en el ciclo", min_value=1, step=1, key=f"reps_ciclo_{etapa}_{i}_{j}")
 
@@ -1347,38 +1222,19 @@ def ingresar_maquinaria_ciclo(etapa):
                             key=f"fe_personalizado_maq_{etapa}_{i}_{j}"
                         )
                     else:
-                        fe_comb = fe_comb_default
+                        fe_comb = None  # Se usa el FE de la base de datos
 
                     litros_totales = litros_por_pasada * repeticiones
-                    emisiones = litros_totales * fe_comb
-
-                    labores.append({
-                        "nombre_labor": nombre_labor,
-                        "tipo_maquinaria": nombre_maq,
-                        "tipo_combustible": tipo_comb,
-                        "litros": litros_totales,
-                        "emisiones": emisiones,
-                        "fe_personalizado": fe_comb if usar_fe_personalizado else None
-                    })
+                    labores.append(calcular_labor(
+                        nombre_labor,
+                        nombre_maq,
+                        tipo_comb,
+                        litros_totales,
+                        fe_personalizado=fe_comb
+                    ))
     return labores
 
-def calcular_emisiones_maquinaria(labores, duracion):
-    """
-    Calcula las emisiones de maquinaria usando el FE personalizado si existe,
-    o el de la base de datos si no.
-    """
-    total = 0
-    for labor in labores:
-        litros = labor.get("litros", 0)
-        fe = labor.get("fe_personalizado", None)
-        if fe is not None and fe > 0:
-            fe_utilizado = fe
-        else:
-            tipo_comb = labor.get("tipo_combustible")
-            fe_utilizado = factores_combustible.get(tipo_comb, 0)
-        total += litros * fe_utilizado
-    return total * duracion
-
+@seccion_aislada("residuos")
 def ingresar_gestion_residuos(etapa):
     # Detectar si es modo anual o perenne
     modo_perenne = "Implantacion" in etapa or "Crecimiento" in etapa or "Producción" in etapa or "produccion" in etapa.lower() or "perenne" in etapa.lower()
@@ -1522,7 +1378,7 @@ def ingresar_gestion_residuos(etapa):
 
         # Guardar detalle para cálculo posterior (NO mostrar tabla aquí)
         for op in opciones:
-            detalle[op] = {"biomasa": cantidades[op], "ajustes": ajustes.get(op, {})}
+            detalle[op] = GestionResiduo(biomasa=cantidades[op], **ajustes.get(op, {}))
 
         # Si hay faltante, agregar "Sin gestión"
         if faltante > 0 and len(opciones) > 0:
@@ -1530,133 +1386,33 @@ def ingresar_gestion_residuos(etapa):
                 sin_gestion = biomasa * (faltante / 100)
             else:
                 sin_gestion = faltante
-            detalle["Sin gestión"] = {"biomasa": sin_gestion, "ajustes": {}}
+            detalle["Sin gestión"] = GestionResiduo(biomasa=sin_gestion)
+
+    st.session_state[f"detalle_residuos_{etapa}"] = detalle
 
     # Calcular emisiones y agregar al detalle
     em_residuos, detalle_emisiones = calcular_emisiones_residuos(detalle)
     return em_residuos, detalle_emisiones
 
-def calcular_emisiones_residuos(detalle):
-    """
-    Calcula las emisiones de GEI por gestión de residuos vegetales según IPCC 2006.
-    - detalle: dict con {"vía": {"biomasa": ..., "ajustes": {...}}}
-    Devuelve: total_emisiones, detalle_emisiones (dict con emisiones por vía)
-    """
-    total_emisiones = 0
-    detalle_emisiones = {}
-    for via, datos in detalle.items():
-        biomasa = datos.get("biomasa", 0)
-        ajustes = datos.get("ajustes", {})
-        emisiones = 0
-        if via == "Quema":
-            em_ch4, em_n2o = calcular_emisiones_quema_residuos(
-                biomasa,
-                fraccion_seca=ajustes.get("fraccion_seca"),
-                fraccion_quemada=ajustes.get("fraccion_quemada"),
-                ef_ch4=ajustes.get("ef_ch4"),
-                ef_n2o=ajustes.get("ef_n2o")
-            )
-            emisiones = em_ch4 + em_n2o
-        elif via == "Compostaje":
-            em_ch4, em_n2o = calcular_emisiones_compostaje(
-                biomasa,
-                base_calculo=ajustes.get("base_calculo", "base_humeda"),
-                fraccion_seca=ajustes.get("fraccion_seca")
-            )
-            emisiones = em_ch4 + em_n2o
-        elif via == "Incorporación al suelo":
-            emisiones = 0  # No se consideran emisiones directas según IPCC
-        elif via == "Retiro del campo":
-            emisiones = 0  # No se consideran emisiones dentro del predio
-        elif via == "Sin gestión":
-            emisiones = 0
-        detalle_emisiones[via] = {"biomasa": biomasa, "emisiones": emisiones}
-        total_emisiones += emisiones
-    return total_emisiones, detalle_emisiones
-
-def calcular_emisiones_quema_residuos(
-    biomasa,
-    fraccion_seca=None,
-    fraccion_quemada=None,
-    ef_ch4=None,
-    ef_n2o=None
-):
-    if fraccion_seca is None:
-        fraccion_seca = factores_residuos["fraccion_seca"]
-    if fraccion_quemada is None:
-        fraccion_quemada = FRACCION_QUEMADA
-    if ef_ch4 is None:
-        ef_ch4 = EF_CH4_QUEMA
-    if ef_n2o is None:
-        ef_n2o = EF_N2O_QUEMA
-    biomasa_seca_quemada = biomasa * fraccion_seca * fraccion_quemada
-    emision_CH4 = biomasa_seca_quemada * ef_ch4
-    emision_N2O = biomasa_seca_quemada * ef_n2o
-    emision_CH4_CO2e = emision_CH4 * GWP["CH4"]
-    emision_N2O_CO2e = emision_N2O * GWP["N2O"]
-    return emision_CH4_CO2e, emision_N2O_CO2e
-
-def calcular_emisiones_compostaje(
-    biomasa,
-    base_calculo="base_humeda",
-    fraccion_seca=None
-):
-    """
-    Calcula emisiones de CH4 y N2O por compostaje aeróbico según IPCC 2006 Vol.5 Cap.3 Tabla 3.4.
-    
-    Args:
-        biomasa: cantidad de biomasa compostada (kg, húmeda)
-        base_calculo: "base_seca" o "base_humeda" según factores IPCC
-        fraccion_seca: fracción seca de la biomasa (solo para base_seca)
-    
-    Returns:
-        tuple: (emision_CH4_CO2e, emision_N2O_CO2e) en kg CO2e
-    """
-    if fraccion_seca is None:
-        fraccion_seca = factores_residuos["fraccion_seca"]
-    
-    ef = factores_residuos["compostaje"][base_calculo]
-    
-    if base_calculo == "base_seca":
-        # Aplicar factores a materia seca
-        ms = biomasa * fraccion_seca
-        em_ch4 = ms * ef["EF_CH4"]
-        em_n2o = ms * ef["EF_N2O"]
-    else:  # base_humeda
-        # Aplicar factores directamente a materia húmeda
-        em_ch4 = biomasa * ef["EF_CH4"]
-        em_n2o = biomasa * ef["EF_N2O"]
-    
-    em_ch4_co2e = em_ch4 * GWP["CH4"]
-    em_n2o_co2e = em_n2o * GWP["N2O"]
-    return em_ch4_co2e, em_n2o_co2e
-
-def calcular_emisiones_incorporacion(biomasa, fraccion_seca=None, modo="simple"):
-    """
-    Calcula emisiones por incorporación de residuos vegetales al suelo.
-    - biomasa: cantidad de biomasa incorporada (kg/ha, húmeda)
-    - fraccion_seca: fracción seca de la biomasa (por defecto, valor recomendado)
-    - modo: "simple" (emisión nula) o "avanzado" (secuestro de carbono, pendiente)
-    """
-    if fraccion_seca is None:
-        fraccion_seca = factores_residuos["fraccion_seca"]
-    if modo == "simple":
-        return 0
-    elif modo == "avanzado":
-        return 0
-
+@seccion_aislada("riego")
 def ingresar_riego_ciclo(etapa):
     st.markdown("### Riego y energía")
     st.caption("Agregue todas las actividades de riego y energía relevantes. Para cada actividad, ingrese el consumo de agua y energía si corresponde (puede dejar en 0 si no aplica).")
 
     actividades_base = ["Goteo", "Aspersión", "Surco", "Fertirriego", "Otro"]
-    n_actividades = st.number_input(
-        "¿Cuántas actividades de riego y energía desea agregar en este ciclo?",
-        min_value=0, step=1, format="%.10g", key=f"num_actividades_riego_{etapa}"
-    )
-    energia_actividades = []
-    em_agua_total = 0
-    em_energia_total = 0
+    if st.session_state.get("modo_tablas"):
+        n_actividades = 0
+        energia_actividades = ingresar_tabla("riego", etapa, "ciclo")
+        em_agua_total = sum(ea.emisiones_agua for ea in energia_actividades)
+        em_energia_total = sum(ea.emisiones_energia for ea in energia_actividades)
+    else:
+        n_actividades = st.number_input(
+            "¿Cuántas actividades de riego y energía desea agregar en este ciclo?",
+            min_value=0, step=1, format="%.10g", key=f"num_actividades_riego_{etapa}"
+        )
+        energia_actividades = []
+        em_agua_total = 0
+        em_energia_total = 0
 
     for i in range(int(n_actividades)):
         with st.expander(f"Actividad #{i+1}"):
@@ -1747,7 +1503,7 @@ def ingresar_riego_ciclo(etapa):
                     consumo = potencia * horas * rendimiento
 
             # Factor de emisión (por defecto del diccionario, pero permitir personalizado)
-            fe_energia = factores_combustible.get(tipo_energia, valores_defecto["fe_combustible_generico"])
+            fe_energia = None  # Se usa el FE de la base de datos
             usar_fe_personalizado = st.checkbox(
                 "¿Desea ingresar un factor de emisión personalizado para este tipo de energía?",
                 key=f"usar_fe_energia_{etapa}_{i}"
@@ -1761,20 +1517,17 @@ def ingresar_riego_ciclo(etapa):
                     key=f"fe_personalizado_energia_{etapa}_{i}"
                 )
 
-            emisiones_energia = consumo * fe_energia
-
-            energia_actividades.append({
-                "actividad": nombre_actividad,
-                "tipo_actividad": actividad,
-                "agua_total_m3": agua_total,
-                "emisiones_agua": agua_total * 1000 * valores_defecto["fe_agua"],
-                "consumo_energia": consumo,
-                "tipo_energia": tipo_energia,
-                "fe_energia": fe_energia,
-                "emisiones_energia": emisiones_energia
-            })
-            em_agua_total += agua_total * 1000 * valores_defecto["fe_agua"]
-            em_energia_total += emisiones_energia
+            actividad_riego = calcular_actividad_riego(
+                nombre_actividad,
+                actividad,
+                agua_total,
+                consumo,
+                tipo_energia,
+                fe_energia=fe_energia
+            )
+            energia_actividades.append(actividad_riego)
+            em_agua_total += actividad_riego.emisiones_agua
+            em_energia_total += actividad_riego.emisiones_energia
 
     # Mostrar resultados globales de riego y energía
     st.info(
@@ -1788,18 +1541,25 @@ def ingresar_riego_ciclo(etapa):
 
     return em_agua_total, em_energia_total, energia_actividades
 
+@seccion_aislada("riego")
 def ingresar_riego_implantacion(etapa):
     st.markdown("### Riego y energía")
     st.caption("Agregue todas las actividades de riego y energía relevantes. Para cada actividad, ingrese el consumo de agua y energía si corresponde (puede dejar en 0 si no aplica).")
 
     actividades_base = ["Goteo", "Aspersión", "Surco", "Fertirriego", "Otro"]
-    n_actividades = st.number_input(
-        "¿Cuántas actividades de riego y energía desea agregar en implantación?",
-        min_value=0, step=1, format="%.10g", key=f"num_actividades_riego_implantacion_{etapa}"
-    )
-    energia_actividades = []
-    em_agua_total = 0
-    em_energia_total = 0
+    if st.session_state.get("modo_tablas"):
+        n_actividades = 0
+        energia_actividades = ingresar_tabla("riego", etapa, "etapa")
+        em_agua_total = sum(ea.emisiones_agua for ea in energia_actividades)
+        em_energia_total = sum(ea.emisiones_energia for ea in energia_actividades)
+    else:
+        n_actividades = st.number_input(
+            "¿Cuántas actividades de riego y energía desea agregar en implantación?",
+            min_value=0, step=1, format="%.10g", key=f"num_actividades_riego_implantacion_{etapa}"
+        )
+        energia_actividades = []
+        em_agua_total = 0
+        em_energia_total = 0
 
     for i in range(int(n_actividades)):
         with st.expander(f"Actividad #{i+1}"):
@@ -1889,7 +1649,7 @@ def ingresar_riego_implantacion(etapa):
                     )
                     consumo = potencia * horas * rendimiento
 
-            fe_energia = factores_combustible.get(tipo_energia, valores_defecto["fe_combustible_generico"])
+            fe_energia = None  # Se usa el FE de la base de datos
             usar_fe_personalizado = st.checkbox(
                 "¿Desea ingresar un factor de emisión personalizado para este tipo de energía?",
                 key=f"usar_fe_energia_implantacion_{etapa}_{i}"
@@ -1903,20 +1663,17 @@ def ingresar_riego_implantacion(etapa):
                     key=f"fe_personalizado_energia_implantacion_{etapa}_{i}"
                 )
 
-            emisiones_energia = consumo * fe_energia
-
-            energia_actividades.append({
-                "actividad": nombre_actividad,
-                "tipo_actividad": actividad,
-                "agua_total_m3": agua_total,
-                "emisiones_agua": agua_total * 1000 * valores_defecto["fe_agua"],
-                "consumo_energia": consumo,
-                "tipo_energia": tipo_energia,
-                "fe_energia": fe_energia,
-                "emisiones_energia": emisiones_energia
-            })
-            em_agua_total += agua_total * 1000 * valores_defecto["fe_agua"]
-            em_energia_total += emisiones_energia
+            actividad_riego = calcular_actividad_riego(
+                nombre_actividad,
+                actividad,
+                agua_total,
+                consumo,
+                tipo_energia,
+                fe_energia=fe_energia
+            )
+            energia_actividades.append(actividad_riego)
+            em_agua_total += actividad_riego.emisiones_agua
+            em_energia_total += actividad_riego.emisiones_energia
 
     # Mostrar resultados globales de riego y energía
     st.info(
@@ -2046,7 +1803,7 @@ def ingresar_riego_operacion_perenne(etapa, anios, sistema_riego_inicial):
                         )
                         consumo = potencia * horas * rendimiento
 
-                fe_energia = factores_combustible.get(tipo_energia, valores_defecto["fe_combustible_generico"])
+                fe_energia = None  # Se usa el FE de la base de datos
                 usar_fe_personalizado = st.checkbox(
                     "¿Desea ingresar un factor de emisión personalizado para este tipo de energía?",
                     key=f"usar_fe_energia_operacion_{etapa}_{anio}_{i}"
@@ -2060,20 +1817,17 @@ def ingresar_riego_operacion_perenne(etapa, anios, sistema_riego_inicial):
                         key=f"fe_personalizado_energia_operacion_{etapa}_{anio}_{i}"
                     )
 
-                emisiones_energia = consumo * fe_energia
-
-                energia_actividades.append({
-                    "actividad": nombre_actividad,
-                    "tipo_actividad": actividad,
-                    "agua_total_m3": agua_total,
-                    "emisiones_agua": agua_total * 1000 * valores_defecto["fe_agua"],
-                    "consumo_energia": consumo,
-                    "tipo_energia": tipo_energia,
-                    "fe_energia": fe_energia,
-                    "emisiones_energia": emisiones_energia
-                })
-                em_agua_total += agua_total * 1000 * valores_defecto["fe_agua"]
-                em_energia_total += emisiones_energia
+                actividad_riego = calcular_actividad_riego(
+                    nombre_actividad,
+                    actividad,
+                    agua_total,
+                    consumo,
+                    tipo_energia,
+                    fe_energia=fe_energia
+                )
+                energia_actividades.append(actividad_riego)
+                em_agua_total += actividad_riego.emisiones_agua
+                em_energia_total += actividad_riego.emisiones_energia
 
         # Mostrar resultados del año
         st.info(
@@ -2103,18 +1857,25 @@ def ingresar_riego_operacion_perenne(etapa, anios, sistema_riego_inicial):
 
     return emisiones_totales_agua, emisiones_totales_energia, emisiones_por_anio
 
+@seccion_aislada("riego")
 def ingresar_riego_crecimiento(etapa, duracion, permitir_cambio_sistema=False):
     st.markdown("### Riego y energía")
     st.caption("Agregue todas las actividades de riego y energía relevantes. Para cada actividad, ingrese el consumo de agua y energía si corresponde (puede dejar en 0 si no aplica).")
 
     actividades_base = ["Goteo", "Aspersión", "Surco", "Fertirriego", "Otro"]
-    n_actividades = st.number_input(
-        "¿Cuántas actividades de riego y energía desea agregar?",
-        min_value=0, step=1, format="%.10g", key=f"num_actividades_riego_crecimiento_{etapa}"
-    )
-    energia_actividades = []
-    em_agua_total = 0
-    em_energia_total = 0
+    if st.session_state.get("modo_tablas"):
+        n_actividades = 0
+        energia_actividades = ingresar_tabla("riego", etapa, "año")
+        em_agua_total = sum(ea.emisiones_agua for ea in energia_actividades)
+        em_energia_total = sum(ea.emisiones_energia for ea in energia_actividades)
+    else:
+        n_actividades = st.number_input(
+            "¿Cuántas actividades de riego y energía desea agregar?",
+            min_value=0, step=1, format="%.10g", key=f"num_actividades_riego_crecimiento_{etapa}"
+        )
+        energia_actividades = []
+        em_agua_total = 0
+        em_energia_total = 0
     
     for i in range(int(n_actividades)):
         with st.expander(f"Actividad #{i+1}"):
@@ -2204,7 +1965,7 @@ def ingresar_riego_crecimiento(etapa, duracion, permitir_cambio_sistema=False):
                     )
                     consumo = potencia * horas * rendimiento
 
-            fe_energia = factores_combustible.get(tipo_energia, valores_defecto["fe_combustible_generico"])
+            fe_energia = None  # Se usa el FE de la base de datos
             usar_fe_personalizado = st.checkbox(
                 "¿Desea ingresar un factor de emisión personalizado para este tipo de energía?",
                 key=f"usar_fe_energia_crecimiento_{etapa}_{i}"
@@ -2218,20 +1979,17 @@ def ingresar_riego_crecimiento(etapa, duracion, permitir_cambio_sistema=False):
                     key=f"fe_personalizado_energia_crecimiento_{etapa}_{i}"
                 )
 
-            emisiones_energia = consumo * fe_energia
-
-            energia_actividades.append({
-                "actividad": nombre_actividad,
-                "tipo_actividad": actividad,
-                "agua_total_m3": agua_total,
-                "emisiones_agua": agua_total * 1000 * valores_defecto["fe_agua"],
-                "consumo_energia": consumo,
-                "tipo_energia": tipo_energia,
-                "fe_energia": fe_energia,
-                "emisiones_energia": emisiones_energia
-            })
-            em_agua_total += agua_total * 1000 * valores_defecto["fe_agua"]
-            em_energia_total += emisiones_energia
+            actividad_riego = calcular_actividad_riego(
+                nombre_actividad,
+                actividad,
+                agua_total,
+                consumo,
+                tipo_energia,
+                fe_energia=fe_energia
+            )
+            energia_actividades.append(actividad_riego)
+            em_agua_total += actividad_riego.emisiones_agua
+            em_energia_total += actividad_riego.emisiones_energia
 
     # Mostrar resultados globales de riego y energía (POR AÑO, antes de multiplicar por duración)
     st.info(
@@ -2315,23 +2073,12 @@ def etapa_implantacion():
     emisiones_fuentes["Agroquímicos"] = em_agroq
     emisiones_fuentes["Residuos"] = em_residuos
 
-    emisiones_fuente_etapa["Implantación"] = {
-        "Fertilizantes": em_fert_total,
-        "Agroquímicos": em_agroq,
-        "Riego": em_agua + em_energia,
-        "Maquinaria": em_maq,
-        "Residuos": em_residuos,
-        "desglose_fertilizantes": desglose_fert,
-        "desglose_agroquimicos": agroq,
-        "desglose_maquinaria": labores,
-        "desglose_riego": {
-            "tipo_riego": tipo_riego,
-            "emisiones_agua": em_agua,
-            "emisiones_energia": em_energia,
-            "energia_actividades": energia_actividades
-        },
-        "desglose_residuos": detalle_residuos
-    }
+    registrar_etapa("Implantación", duracion, 0, fert, agroq, labores, energia_actividades, "Implantacion", riego_por_anio=False, tipo_riego=tipo_riego)
+    emisiones_fuente_etapa["Implantación"] = resumir_etapa(
+        em_fert_total, em_agroq, em_agua, em_energia, em_maq, em_residuos,
+        desglose_fert, agroq, labores, energia_actividades, detalle_residuos,
+        tipo_riego=tipo_riego
+    )
 
     st.success(f"Emisiones totales en etapa 'Implantación': {format_num(total)} kg CO₂e/ha para {duracion} años")
     return total, 0
@@ -2439,23 +2186,12 @@ def etapa_crecimiento(nombre_etapa, produccion_pregunta=True):
                 "Residuos": em_residuos
             })
 
-            emisiones_fuente_etapa[f"{nombre_etapa} - Año {anio}"] = {
-                "Fertilizantes": em_fert_total,
-                "Agroquímicos": em_agroq,
-                "Riego": em_agua + em_energia,
-                "Maquinaria": em_maq,
-                "Residuos": em_residuos,
-                "desglose_fertilizantes": desglose_fert,
-                "desglose_agroquimicos": agroq,
-                "desglose_maquinaria": labores,
-                "desglose_riego": {
-                    "tipo_riego": tipo_riego,
-                    "emisiones_agua": em_agua,
-                    "emisiones_energia": em_energia,
-                    "energia_actividades": energia_actividades
-                },
-                "desglose_residuos": detalle_residuos
-            }
+            registrar_etapa(f"{nombre_etapa} - Año {anio}", 1, produccion, fert, agroq, labores, energia_actividades, f"{nombre_etapa}_anio{anio}", tipo_riego=tipo_riego)
+            emisiones_fuente_etapa[f"{nombre_etapa} - Año {anio}"] = resumir_etapa(
+                em_fert_total, em_agroq, em_agua, em_energia, em_maq, em_residuos,
+                desglose_fert, agroq, labores, energia_actividades, detalle_residuos,
+                tipo_riego=tipo_riego
+            )
 
             st.info(f"Huella de carbono en año {anio}: {format_num(em_anio)} kg CO₂e/ha")
 
@@ -2536,23 +2272,12 @@ def etapa_crecimiento(nombre_etapa, produccion_pregunta=True):
         emisiones_fuentes["Maquinaria"] = em_maq
         emisiones_fuentes["Residuos"] = em_residuos
 
-        emisiones_fuente_etapa[nombre_etapa] = {
-            "Fertilizantes": em_fert_total,
-            "Agroquímicos": em_agroq,
-            "Riego": em_agua + em_energia,
-            "Maquinaria": em_maq,
-            "Residuos": em_residuos,
-            "desglose_fertilizantes": desglose_fert,
-            "desglose_agroquimicos": agroq,
-            "desglose_maquinaria": labores,
-            "desglose_riego": {
-                "tipo_riego": tipo_riego,
-                "emisiones_agua": em_agua,
-                "emisiones_energia": em_energia,
-                "energia_actividades": energia_actividades
-            },
-            "desglose_residuos": detalle_residuos
-        }
+        registrar_etapa(nombre_etapa, duracion, produccion, fert, agroq, labores, energia_actividades, nombre_etapa, tipo_riego=tipo_riego)
+        emisiones_fuente_etapa[nombre_etapa] = resumir_etapa(
+            em_fert_total, em_agroq, em_agua, em_energia, em_maq, em_residuos,
+            desglose_fert, agroq, labores, energia_actividades, detalle_residuos,
+            tipo_riego=tipo_riego
+        )
 
         st.info(f"Huella de carbono total en la etapa: {format_num(em_total)} kg CO₂e/ha para {duracion} años")
         st.info(f"Producción total en la etapa: {format_num(produccion_total)} kg/ha")
@@ -2591,58 +2316,113 @@ def etapa_produccion_segmentada():
         total_maq = 0
         total_res = 0
         for i in range(int(n_sub)):
-            st.markdown(f"### Sub-etapa {i+1}")
-            nombre = st.text_input(f"Nombre de la sub-etapa {i+1} (ej: baja producción, alta producción, fin de vida)", key=f"nombre_sub_{i}")
-            prod = st.number_input(f"Producción esperada anual en esta sub-etapa (kg/ha/año)", min_value=0.0, key=f"prod_sub_{i}")
-            dur = st.number_input(f"Años de duración de la sub-etapa", min_value=1, step=1, key=f"dur_sub_{i}")
-
-            st.markdown(f"#### Datos para sub-etapa {i+1}: {nombre}")
-            segmentar_anios = st.radio(
-                f"¿Desea ingresar información diferenciada para cada año de la sub-etapa '{nombre}'?",
-                ["No, ingresaré datos generales para toda la sub-etapa", "Sí, ingresaré datos año por año"],
-                key=f"segmentar_anios_sub_{i}"
-            )
-            em_sub = 0
-            prod_sub_total = 0
-            if segmentar_anios == "Sí, ingresaré datos año por año":
-                for anio in range(1, int(dur) + 1):
-                    st.markdown(f"##### Año {anio}")
-                    produccion = st.number_input(f"Producción de fruta en el año {anio} (kg/ha)", min_value=0.0, key=f"prod_{nombre}_{anio}_{i}")
+            with formulario_etapa(f"subetapa_{i}", f"sub-etapa {i+1}"):
+                st.markdown(f"### Sub-etapa {i+1}")
+                nombre = st.text_input(f"Nombre de la sub-etapa {i+1} (ej: baja producción, alta producción, fin de vida)", key=f"nombre_sub_{i}")
+                prod = st.number_input(f"Producción esperada anual en esta sub-etapa (kg/ha/año)", min_value=0.0, key=f"prod_sub_{i}")
+                dur = st.number_input(f"Años de duración de la sub-etapa", min_value=1, step=1, key=f"dur_sub_{i}")
+
+                st.markdown(f"#### Datos para sub-etapa {i+1}: {nombre}")
+                segmentar_anios = st.radio(
+                    f"¿Desea ingresar información diferenciada para cada año de la sub-etapa '{nombre}'?",
+                    ["No, ingresaré datos generales para toda la sub-etapa", "Sí, ingresaré datos año por año"],
+                    key=f"segmentar_anios_sub_{i}"
+                )
+                em_sub = 0
+                prod_sub_total = 0
+                if segmentar_anios == "Sí, ingresaré datos año por año":
+                    for anio in range(1, int(dur) + 1):
+                        st.markdown(f"##### Año {anio}")
+                        produccion = st.number_input(f"Producción de fruta en el año {anio} (kg/ha)", min_value=0.0, key=f"prod_{nombre}_{anio}_{i}")
                     
+                        st.markdown("---")
+                        st.subheader("Fertilizantes")
+                        fert = ingresar_fertilizantes(f"{nombre}_anio{anio}_{i}", unidad_cantidad="año")
+                        em_fert_prod, em_fert_co2_urea, em_fert_n2o_dir, em_fert_n2o_ind, desglose_fert = calcular_emisiones_fertilizantes(fert, 1)
+                        em_fert_total = em_fert_prod + em_fert_co2_urea + em_fert_n2o_dir + em_fert_n2o_ind
+                        # Mostrar resumen de fertilizantes
+                        st.info(f"**Fertilizantes (año {anio}):** {format_num(em_fert_total)} kg CO₂e/ha")
+
+                        st.markdown("---")
+                        st.subheader("Agroquímicos y pesticidas")
+                        agroq = ingresar_agroquimicos(f"{nombre}_anio{anio}_{i}")
+                        em_agroq = calcular_emisiones_agroquimicos(agroq, 1)
+                        # Mostrar resumen de agroquímicos
+                        st.info(f"**Agroquímicos (año {anio}):** {format_num(em_agroq)} kg CO₂e/ha")
+
+                        st.markdown("---")
+                        st.subheader("Riego (operación)")
+                        em_agua, em_energia, energia_actividades = ingresar_riego_crecimiento(f"{nombre}_anio{anio}_{i}", 1, permitir_cambio_sistema=True)
+                        tipo_riego = st.session_state.get(f"tipo_riego_{nombre}_anio{anio}_{i}", None)
+
+                        st.markdown("---")
+                        st.subheader("Labores y maquinaria")
+                        labores = ingresar_maquinaria_perenne(f"{nombre}_anio{anio}_{i}", nombre)
+                        em_maq = calcular_emisiones_maquinaria(labores, 1)  # Solo por año
+                        # Mostrar resumen de maquinaria
+                        st.info(f"**Maquinaria (año {anio}):** {format_num(em_maq)} kg CO₂e/ha")
+
+                        em_residuos, detalle_residuos = ingresar_gestion_residuos(f"{nombre}_anio{anio}_{i}")
+                        # Mostrar resumen de residuos
+                        st.info(f"**Gestión de residuos (año {anio}):** {format_num(em_residuos)} kg CO₂e/ha")
+
+                        em_anio = em_fert_total + em_agroq + em_agua + em_energia + em_maq + em_residuos
+                        em_sub += em_anio
+                        prod_sub_total += produccion
+
+                        total_fert += em_fert_total
+                        total_agroq += em_agroq
+                        total_riego += em_agua + em_energia
+                        total_maq += em_maq
+                        total_res += em_residuos
+
+                        # Guardar emisiones y producción por año y sub-etapa
+                        nombre_etapa = f"{nombre} - Año {anio_global}"
+                        emisiones_etapas[nombre_etapa] = em_anio
+                        produccion_etapas[nombre_etapa] = produccion
+                        emisiones_anuales.append((anio_global, em_anio, produccion, nombre))
+                        registrar_etapa(nombre_etapa, 1, produccion, fert, agroq, labores, energia_actividades, f"{nombre}_anio{anio}_{i}", tipo_riego=tipo_riego)
+                        emisiones_fuente_etapa[nombre_etapa] = resumir_etapa(
+                            em_fert_total, em_agroq, em_agua, em_energia, em_maq, em_residuos,
+                            desglose_fert, agroq, labores, energia_actividades, detalle_residuos,
+                            tipo_riego=tipo_riego
+                        )
+                        anio_global += 1
+
+                else:
                     st.markdown("---")
                     st.subheader("Fertilizantes")
-                    fert = ingresar_fertilizantes(f"{nombre}_anio{anio}_{i}", unidad_cantidad="año")
-                    em_fert_prod, em_fert_co2_urea, em_fert_n2o_dir, em_fert_n2o_ind, desglose_fert = calcular_emisiones_fertilizantes(fert, 1)
+                    fert = ingresar_fertilizantes(f"{nombre}_general_{i}", unidad_cantidad="año")
+                    em_fert_prod, em_fert_co2_urea, em_fert_n2o_dir, em_fert_n2o_ind, desglose_fert = calcular_emisiones_fertilizantes(fert, dur)
                     em_fert_total = em_fert_prod + em_fert_co2_urea + em_fert_n2o_dir + em_fert_n2o_ind
-                    # Mostrar resumen de fertilizantes
-                    st.info(f"**Fertilizantes (año {anio}):** {format_num(em_fert_total)} kg CO₂e/ha")
+                    # Mostrar resumen de fertilizantes (por año)
+                    st.info(f"**Fertilizantes (por año):** {format_num(em_fert_total/dur)} kg CO₂e/ha·año → **Total sub-etapa:** {format_num(em_fert_total)} kg CO₂e/ha")
 
                     st.markdown("---")
                     st.subheader("Agroquímicos y pesticidas")
-                    agroq = ingresar_agroquimicos(f"{nombre}_anio{anio}_{i}")
-                    em_agroq = calcular_emisiones_agroquimicos(agroq, 1)
-                    # Mostrar resumen de agroquímicos
-                    st.info(f"**Agroquímicos (año {anio}):** {format_num(em_agroq)} kg CO₂e/ha")
+                    agroq = ingresar_agroquimicos(f"{nombre}_general_{i}")
+                    em_agroq = calcular_emisiones_agroquimicos(agroq, dur)
+                    # Mostrar resumen de agroquímicos (por año)
+                    st.info(f"**Agroquímicos (por año):** {format_num(em_agroq/dur)} kg CO₂e/ha·año → **Total sub-etapa:** {format_num(em_agroq)} kg CO₂e/ha")
 
                     st.markdown("---")
                     st.subheader("Riego (operación)")
-                    em_agua, em_energia, energia_actividades = ingresar_riego_crecimiento(f"{nombre}_anio{anio}_{i}", 1, permitir_cambio_sistema=True)
-                    tipo_riego = st.session_state.get(f"tipo_riego_{nombre}_anio{anio}_{i}", None)
+                    em_agua, em_energia, energia_actividades = ingresar_riego_crecimiento(f"{nombre}_general_{i}", dur, permitir_cambio_sistema=True)
+                    tipo_riego = st.session_state.get(f"tipo_riego_{nombre}_general_{i}", None)
 
                     st.markdown("---")
                     st.subheader("Labores y maquinaria")
-                    labores = ingresar_maquinaria_perenne(f"{nombre}_anio{anio}_{i}", nombre)
-                    em_maq = calcular_emisiones_maquinaria(labores, 1)  # Solo por año
-                    # Mostrar resumen de maquinaria
-                    st.info(f"**Maquinaria (año {anio}):** {format_num(em_maq)} kg CO₂e/ha")
+                    labores = ingresar_maquinaria_perenne(f"{nombre}_general_{i}", nombre)
+                    em_maq = calcular_emisiones_maquinaria(labores, dur)  # Multiplica por duración
+                    # Mostrar resumen de maquinaria (por año)
+                    st.info(f"**Maquinaria (por año):** {format_num(em_maq/dur)} kg CO₂e/ha·año → **Total sub-etapa:** {format_num(em_maq)} kg CO₂e/ha")
 
-                    em_residuos, detalle_residuos = ingresar_gestion_residuos(f"{nombre}_anio{anio}_{i}")
-                    # Mostrar resumen de residuos
-                    st.info(f"**Gestión de residuos (año {anio}):** {format_num(em_residuos)} kg CO₂e/ha")
+                    em_residuos, detalle_residuos = ingresar_gestion_residuos(f"{nombre}_general_{i}")
+                    # Mostrar resumen de residuos (por año)
+                    st.info(f"**Gestión de residuos (por año):** {format_num(em_residuos/dur)} kg CO₂e/ha·año → **Total sub-etapa:** {format_num(em_residuos)} kg CO₂e/ha")
 
-                    em_anio = em_fert_total + em_agroq + em_agua + em_energia + em_maq + em_residuos
-                    em_sub += em_anio
-                    prod_sub_total += produccion
+                    em_sub = em_fert_total + em_agroq + em_agua + em_energia + em_maq + em_residuos
+                    prod_sub_total = prod * dur
 
                     total_fert += em_fert_total
                     total_agroq += em_agroq
@@ -2650,98 +2430,22 @@ def etapa_produccion_segmentada():
                     total_maq += em_maq
                     total_res += em_residuos
 
-                    # Guardar emisiones y producción por año y sub-etapa
-                    nombre_etapa = f"{nombre} - Año {anio_global}"
-                    emisiones_etapas[nombre_etapa] = em_anio
-                    produccion_etapas[nombre_etapa] = produccion
-                    emisiones_anuales.append((anio_global, em_anio, produccion, nombre))
-                    emisiones_fuente_etapa[nombre_etapa] = {
-                        "Fertilizantes": em_fert_total,
-                        "Agroquímicos": em_agroq,
-                        "Riego": em_agua + em_energia,
-                        "Maquinaria": em_maq,
-                        "Residuos": em_residuos,
-                        "desglose_fertilizantes": desglose_fert,
-                        "desglose_agroquimicos": agroq,
-                        "desglose_maquinaria": labores,
-                        "desglose_riego": {
-                            "tipo_riego": tipo_riego,
-                            "emisiones_agua": em_agua,
-                            "emisiones_energia": em_energia,
-                            "energia_actividades": energia_actividades
-                        },
-                        "desglose_residuos": detalle_residuos
-                    }
-                    anio_global += 1
-
-            else:
-                st.markdown("---")
-                st.subheader("Fertilizantes")
-                fert = ingresar_fertilizantes(f"{nombre}_general_{i}", unidad_cantidad="año")
-                em_fert_prod, em_fert_co2_urea, em_fert_n2o_dir, em_fert_n2o_ind, desglose_fert = calcular_emisiones_fertilizantes(fert, dur)
-                em_fert_total = em_fert_prod + em_fert_co2_urea + em_fert_n2o_dir + em_fert_n2o_ind
-                # Mostrar resumen de fertilizantes (por año)
-                st.info(f"**Fertilizantes (por año):** {format_num(em_fert_total/dur)} kg CO₂e/ha·año → **Total sub-etapa:** {format_num(em_fert_total)} kg CO₂e/ha")
-
-                st.markdown("---")
-                st.subheader("Agroquímicos y pesticidas")
-                agroq = ingresar_agroquimicos(f"{nombre}_general_{i}")
-                em_agroq = calcular_emisiones_agroquimicos(agroq, dur)
-                # Mostrar resumen de agroquímicos (por año)
-                st.info(f"**Agroquímicos (por año):** {format_num(em_agroq/dur)} kg CO₂e/ha·año → **Total sub-etapa:** {format_num(em_agroq)} kg CO₂e/ha")
-
-                st.markdown("---")
-                st.subheader("Riego (operación)")
-                em_agua, em_energia, energia_actividades = ingresar_riego_crecimiento(f"{nombre}_general_{i}", dur, permitir_cambio_sistema=True)
-                tipo_riego = st.session_state.get(f"tipo_riego_{nombre}_general_{i}", None)
-
-                st.markdown("---")
-                st.subheader("Labores y maquinaria")
-                labores = ingresar_maquinaria_perenne(f"{nombre}_general_{i}", nombre)
-                em_maq = calcular_emisiones_maquinaria(labores, dur)  # Multiplica por duración
-                # Mostrar resumen de maquinaria (por año)
-                st.info(f"**Maquinaria (por año):** {format_num(em_maq/dur)} kg CO₂e/ha·año → **Total sub-etapa:** {format_num(em_maq)} kg CO₂e/ha")
-
-                em_residuos, detalle_residuos = ingresar_gestion_residuos(f"{nombre}_general_{i}")
-                # Mostrar resumen de residuos (por año)
-                st.info(f"**Gestión de residuos (por año):** {format_num(em_residuos/dur)} kg CO₂e/ha·año → **Total sub-etapa:** {format_num(em_residuos)} kg CO₂e/ha")
-
-                em_sub = em_fert_total + em_agroq + em_agua + em_energia + em_maq + em_residuos
-                prod_sub_total = prod * dur
-
-                total_fert += em_fert_total
-                total_agroq += em_agroq
-                total_riego += em_agua + em_energia
-                total_maq += em_maq
-                total_res += em_residuos
+                    nombre_etapa = f"{nombre}"
+                    emisiones_etapas[nombre_etapa] = em_sub
+                    produccion_etapas[nombre_etapa] = prod_sub_total
+                    registrar_etapa(nombre_etapa, dur, prod, fert, agroq, labores, energia_actividades, f"{nombre}_general_{i}", tipo_riego=tipo_riego)
+                    emisiones_fuente_etapa[nombre_etapa] = resumir_etapa(
+                        em_fert_total, em_agroq, em_agua, em_energia, em_maq, em_residuos,
+                        desglose_fert, agroq, labores, energia_actividades, detalle_residuos,
+                        tipo_riego=tipo_riego
+                    )
+                    for k in range(int(dur)):
+                        emisiones_anuales.append((anio_global, em_sub/dur, prod, nombre))
+                        anio_global += 1
 
-                nombre_etapa = f"{nombre}"
-                emisiones_etapas[nombre_etapa] = em_sub
-                produccion_etapas[nombre_etapa] = prod_sub_total
-                emisiones_fuente_etapa[nombre_etapa] = {
-                    "Fertilizantes": em_fert_total,
-                    "Agroquímicos": em_agroq,
-                    "Riego": em_agua + em_energia,
-                    "Maquinaria": em_maq,
-                    "Residuos": em_residuos,
-                    "desglose_fertilizantes": desglose_fert,
-                    "desglose_agroquimicos": agroq,
-                    "desglose_maquinaria": labores,
-                    "desglose_riego": {
-                        "tipo_riego": tipo_riego,
-                        "emisiones_agua": em_agua,
-                        "emisiones_energia": em_energia,
-                        "energia_actividades": energia_actividades
-                    },
-                    "desglose_residuos": detalle_residuos
-                }
-                for k in range(int(dur)):
-                    emisiones_anuales.append((anio_global, em_sub/dur, prod, nombre))
-                    anio_global += 1
-
-            em_total += em_sub
-            prod_total += prod_sub_total
-            st.success(f"Emisiones totales en sub-etapa '{nombre}': {format_num(em_sub)} kg CO₂e/ha para {dur} años")
+                em_total += em_sub
+                prod_total += prod_sub_total
+                st.success(f"Emisiones totales en sub-etapa '{nombre}': {format_num(em_sub)} kg CO₂e/ha para {dur} años")
 
         emisiones_fuentes["Fertilizantes"] = total_fert
         emisiones_fuentes["Agroquímicos"] = total_agroq
@@ -2751,7 +2455,8 @@ def etapa_produccion_segmentada():
 
     else:
         nombre_etapa = st.text_input("Nombre para la etapa de producción (ej: Producción, Producción plena, etc.)", value="Producción", key="nombre_etapa_produccion_unica")
-        em, prod = etapa_crecimiento(nombre_etapa, produccion_pregunta=True)
+        with formulario_etapa("produccion_unica", "etapa de producción"):
+            em, prod = etapa_crecimiento(nombre_etapa, produccion_pregunta=True)
         em_total += em
         prod_total += prod
 
@@ -2786,84 +2491,76 @@ def etapa_anual():
     desglose_fuentes_ciclos = []
 
     if ciclos_diferentes == "No, todos los ciclos son iguales":
-        st.markdown("### Datos para un ciclo típico (se multiplicará por el número de ciclos)")
-        produccion = st.number_input("Producción de fruta en el ciclo (kg/ha·ciclo)", min_value=0.0, key="prod_ciclo_tipico")
+        with formulario_etapa("ciclo_tipico", "ciclo típico"):
+            st.markdown("### Datos para un ciclo típico (se multiplicará por el número de ciclos)")
+            produccion = st.number_input("Producción de fruta en el ciclo (kg/ha·ciclo)", min_value=0.0, key="prod_ciclo_tipico")
         
-        st.markdown("---")
-        st.subheader("Fertilizantes")
-        fert = ingresar_fertilizantes("ciclo_tipico", unidad_cantidad="ciclo")
-        em_fert_prod, em_fert_co2_urea, em_fert_n2o_dir, em_fert_n2o_ind, desglose_fert = calcular_emisiones_fertilizantes(fert, 1)
-        em_fert_total = em_fert_prod + em_fert_co2_urea + em_fert_n2o_dir + em_fert_n2o_ind
-        st.info(
-            f"**Fertilizantes (por ciclo):**\n"
-            f"- Producción de fertilizantes: {format_num(em_fert_prod)} kg CO₂e/ha·ciclo\n"
-            f"- Emisiones CO₂ por hidrólisis de urea: {format_num(em_fert_co2_urea)} kg CO₂e/ha·ciclo\n"
-            f"- Emisiones directas N₂O: {format_num(em_fert_n2o_dir)} kg CO₂e/ha·ciclo\n"
-            f"- Emisiones indirectas N₂O: {format_num(em_fert_n2o_ind)} kg CO₂e/ha·ciclo\n"
-            f"- **Total fertilizantes:** {format_num(em_fert_total)} kg CO₂e/ha·ciclo"
-        )
+            st.markdown("---")
+            st.subheader("Fertilizantes")
+            fert = ingresar_fertilizantes("ciclo_tipico", unidad_cantidad="ciclo")
+            em_fert_prod, em_fert_co2_urea, em_fert_n2o_dir, em_fert_n2o_ind, desglose_fert = calcular_emisiones_fertilizantes(fert, 1)
+            em_fert_total = em_fert_prod + em_fert_co2_urea + em_fert_n2o_dir + em_fert_n2o_ind
+            st.info(
+                f"**Fertilizantes (por ciclo):**\n"
+                f"- Producción de fertilizantes: {format_num(em_fert_prod)} kg CO₂e/ha·ciclo\n"
+                f"- Emisiones CO₂ por hidrólisis de urea: {format_num(em_fert_co2_urea)} kg CO₂e/ha·ciclo\n"
+                f"- Emisiones directas N₂O: {format_num(em_fert_n2o_dir)} kg CO₂e/ha·ciclo\n"
+                f"- Emisiones indirectas N₂O: {format_num(em_fert_n2o_ind)} kg CO₂e/ha·ciclo\n"
+                f"- **Total fertilizantes:** {format_num(em_fert_total)} kg CO₂e/ha·ciclo"
+            )
 
-        st.markdown("---")
-        st.subheader("Agroquímicos y pesticidas")
-        agroq = ingresar_agroquimicos("ciclo_tipico")
-        em_agroq = calcular_emisiones_agroquimicos(agroq, 1)
-        st.info(
-            f"**Agroquímicos (por ciclo):**\n"
-            f"- **Total agroquímicos:** {format_num(em_agroq)} kg CO₂e/ha·ciclo"
-        )
+            st.markdown("---")
+            st.subheader("Agroquímicos y pesticidas")
+            agroq = ingresar_agroquimicos("ciclo_tipico")
+            em_agroq = calcular_emisiones_agroquimicos(agroq, 1)
+            st.info(
+                f"**Agroquímicos (por ciclo):**\n"
+                f"- **Total agroquímicos:** {format_num(em_agroq)} kg CO₂e/ha·ciclo"
+            )
 
-        st.markdown("---")
-        st.subheader("Riego")
-        em_agua, em_energia, energia_actividades = ingresar_riego_ciclo("ciclo_tipico")
-        tipo_riego = st.session_state.get("tipo_riego_ciclo_tipico", "")
+            st.markdown("---")
+            st.subheader("Riego")
+            em_agua, em_energia, energia_actividades = ingresar_riego_ciclo("ciclo_tipico")
+            tipo_riego = st.session_state.get("tipo_riego_ciclo_tipico", "")
 
-        st.markdown("---")
-        st.subheader("Labores y maquinaria")
-        labores = ingresar_maquinaria_ciclo("ciclo_tipico")
-        em_maq = calcular_emisiones_maquinaria(labores, 1)
-        st.info(
-            f"**Maquinaria (por ciclo):**\n"
-            f"- **Total maquinaria:** {format_num(em_maq)} kg CO₂e/ha·ciclo"
-        )
+            st.markdown("---")
+            st.subheader("Labores y maquinaria")
+            labores = ingresar_maquinaria_ciclo("ciclo_tipico")
+            em_maq = calcular_emisiones_maquinaria(labores, 1)
+            st.info(
+                f"**Maquinaria (por ciclo):**\n"
+                f"- **Total maquinaria:** {format_num(em_maq)} kg CO₂e/ha·ciclo"
+            )
 
-        em_residuos, detalle_residuos = ingresar_gestion_residuos("ciclo_tipico")
-        st.info(
-            f"**Gestión de residuos (por ciclo):**\n"
-            f"- **Total gestión de residuos:** {format_num(em_residuos)} kg CO₂e/ha·ciclo"
-        )
+            em_residuos, detalle_residuos = ingresar_gestion_residuos("ciclo_tipico")
+            st.info(
+                f"**Gestión de residuos (por ciclo):**\n"
+                f"- **Total gestión de residuos:** {format_num(em_residuos)} kg CO₂e/ha·ciclo"
+            )
 
-        em_ciclo = em_fert_total + em_agroq + em_agua + em_energia + em_maq + em_residuos
-        em_total = em_ciclo * n_ciclos
-        prod_total = produccion * n_ciclos
-        for ciclo in range(1, int(n_ciclos) + 1):
-            desglose_fuentes_ciclos.append({
-                "Ciclo": ciclo,
-                "Fertilizantes": em_fert_total,
-                "Agroquímicos": em_agroq,
-                "Riego": em_agua + em_energia,
-                "Maquinaria": em_maq,
-                "Residuos": em_residuos,
-                "desglose_fertilizantes": desglose_fert,
-                "desglose_agroquimicos": agroq,
-                "desglose_maquinaria": labores,
-                "desglose_riego": {
-                    "tipo_riego": tipo_riego,
-                    "emisiones_agua": em_agua,
-                    "emisiones_energia": em_energia,
-                    "energia_actividades": energia_actividades
-                },
-                "desglose_residuos": detalle_residuos
-            })
-            emisiones_ciclos.append((ciclo, em_ciclo, produccion))
+            em_ciclo = em_fert_total + em_agroq + em_agua + em_energia + em_maq + em_residuos
+            em_total = em_ciclo * n_ciclos
+            prod_total = produccion * n_ciclos
+            registrar_etapa("Ciclo típico", 1, produccion, fert, agroq, labores, energia_actividades, "ciclo_tipico", tipo_riego=tipo_riego, ciclos=int(n_ciclos))
+            for ciclo in range(1, int(n_ciclos) + 1):
+                desglose_fuentes_ciclos.append({
+                    "Ciclo": ciclo,
+                    **resumir_etapa(
+                        em_fert_total, em_agroq, em_agua, em_energia, em_maq, em_residuos,
+                        desglose_fert, agroq, labores, energia_actividades, detalle_residuos,
+                        tipo_riego=tipo_riego
+                    )
+                })
+                emisiones_ciclos.append((ciclo, em_ciclo, produccion))
 
-        emisiones_fuentes["Fertilizantes"] = em_fert_total * n_ciclos
-        emisiones_fuentes["Agroquímicos"] = em_agroq * n_ciclos
-        emisiones_fuentes["Riego"] = (em_agua + em_energia) * n_ciclos
-        emisiones_fuentes["Maquinaria"] = em_maq * n_ciclos
-        emisiones_fuentes["Residuos"] = em_residuos * n_ciclos
+            emisiones_fuentes["Fertilizantes"] = em_fert_total * n_ciclos
+            emisiones_fuentes["Agroquímicos"] = em_agroq * n_ciclos
+            emisiones_fuentes["Riego"] = (em_agua + em_energia) * n_ciclos
+            emisiones_fuentes["Maquinaria"] = em_maq * n_ciclos
+            emisiones_fuentes["Residuos"] = em_residuos * n_ciclos
 
-        st.info(f"Huella de carbono por ciclo típico: {format_num(em_ciclo)} kg CO₂e/ha·ciclo")
-        st.info(f"Huella de carbono anual (todos los ciclos): {format_num(em_total)} kg CO₂e/ha·año")
+            st.info(f"Huella de carbono por ciclo típico: {format_num(em_ciclo)} kg CO₂e/ha·ciclo")
+            st.info(f"Huella de carbono anual (todos los ciclos): {format_num(em_total)} kg CO₂e/ha·año")
 
         emisiones_etapas["Anual"] = em_total
         produccion_etapas["Anual"] = prod_total
@@ -2882,78 +2579,70 @@ def etapa_anual():
         total_maq = 0
         total_res = 0
         for i in range(int(n_ciclos)):
-            st.markdown(f"### Ciclo {i+1}")
-            produccion = st.number_input(f"Producción de fruta en el ciclo {i+1} (kg/ha·ciclo)", min_value=0.0, key=f"prod_ciclo_{i+1}")
+            with formulario_etapa(f"ciclo_{i+1}", f"ciclo {i+1}"):
+                st.markdown(f"### Ciclo {i+1}")
+                produccion = st.number_input(f"Producción de fruta en el ciclo {i+1} (kg/ha·ciclo)", min_value=0.0, key=f"prod_ciclo_{i+1}")
 
-            st.subheader("Fertilizantes")
-            fert = ingresar_fertilizantes(f"ciclo_{i+1}", unidad_cantidad="ciclo")
-            em_fert_prod, em_fert_co2_urea, em_fert_n2o_dir, em_fert_n2o_ind, desglose_fert = calcular_emisiones_fertilizantes(fert, 1)
-            em_fert_total = em_fert_prod + em_fert_co2_urea + em_fert_n2o_dir + em_fert_n2o_ind
-            st.info(
-                f"**Fertilizantes (Ciclo {i+1}):**\n"
-                f"- Producción de fertilizantes: {format_num(em_fert_prod)} kg CO₂e/ha\n"
-                f"- Emisiones CO₂ por hidrólisis de urea: {format_num(em_fert_co2_urea)} kg CO₂e/ha\n"
-                f"- Emisiones directas N₂O: {format_num(em_fert_n2o_dir)} kg CO₂e/ha\n"
-                f"- Emisiones indirectas N₂O: {format_num(em_fert_n2o_ind)} kg CO₂e/ha\n"
-                f"- **Total fertilizantes:** {format_num(em_fert_total)} kg CO₂e/ha"
-            )
+                st.subheader("Fertilizantes")
+                fert = ingresar_fertilizantes(f"ciclo_{i+1}", unidad_cantidad="ciclo")
+                em_fert_prod, em_fert_co2_urea, em_fert_n2o_dir, em_fert_n2o_ind, desglose_fert = calcular_emisiones_fertilizantes(fert, 1)
+                em_fert_total = em_fert_prod + em_fert_co2_urea + em_fert_n2o_dir + em_fert_n2o_ind
+                st.info(
+                    f"**Fertilizantes (Ciclo {i+1}):**\n"
+                    f"- Producción de fertilizantes: {format_num(em_fert_prod)} kg CO₂e/ha\n"
+                    f"- Emisiones CO₂ por hidrólisis de urea: {format_num(em_fert_co2_urea)} kg CO₂e/ha\n"
+                    f"- Emisiones directas N₂O: {format_num(em_fert_n2o_dir)} kg CO₂e/ha\n"
+                    f"- Emisiones indirectas N₂O: {format_num(em_fert_n2o_ind)} kg CO₂e/ha\n"
+                    f"- **Total fertilizantes:** {format_num(em_fert_total)} kg CO₂e/ha"
+                )
 
-            st.subheader("Agroquímicos y pesticidas")
-            agroq = ingresar_agroquimicos(f"ciclo_{i+1}")
-            em_agroq = calcular_emisiones_agroquimicos(agroq, 1)
-            st.info(
-                f"**Agroquímicos (Ciclo {i+1}):**\n"
-                f"- **Total agroquímicos:** {format_num(em_agroq)} kg CO₂e/ha"
-            )
+                st.subheader("Agroquímicos y pesticidas")
+                agroq = ingresar_agroquimicos(f"ciclo_{i+1}")
+                em_agroq = calcular_emisiones_agroquimicos(agroq, 1)
+                st.info(
+                    f"**Agroquímicos (Ciclo {i+1}):**\n"
+                    f"- **Total agroquímicos:** {format_num(em_agroq)} kg CO₂e/ha"
+                )
 
-            st.subheader("Riego")
-            em_agua, em_energia, energia_actividades = ingresar_riego_ciclo(f"ciclo_{i+1}")
-            tipo_riego = st.session_state.get(f"tipo_riego_ciclo_{i+1}", "")
+                st.subheader("Riego")
+                em_agua, em_energia, energia_actividades = ingresar_riego_ciclo(f"ciclo_{i+1}")
+                tipo_riego = st.session_state.get(f"tipo_riego_ciclo_{i+1}", "")
 
-            st.subheader("Labores y maquinaria")
-            labores = ingresar_maquinaria_ciclo(f"ciclo_{i+1}")
-            em_maq = calcular_emisiones_maquinaria(labores, 1)
-            st.info(
-                f"**Maquinaria (Ciclo {i+1}):**\n"
-                f"- **Total maquinaria:** {format_num(em_maq)} kg CO₂e/ha"
-            )
+                st.subheader("Labores y maquinaria")
+                labores = ingresar_maquinaria_ciclo(f"ciclo_{i+1}")
+                em_maq = calcular_emisiones_maquinaria(labores, 1)
+                st.info(
+                    f"**Maquinaria (Ciclo {i+1}):**\n"
+                    f"- **Total maquinaria:** {format_num(em_maq)} kg CO₂e/ha"
+                )
 
-            em_residuos, detalle_residuos = ingresar_gestion_residuos(f"ciclo_{i+1}")
-            st.info(
-                f"**Gestión de residuos (Ciclo {i+1}):**\n"
-                f"- **Total gestión de residuos:** {format_num(em_residuos)} kg CO₂e/ha"
-            )
+                em_residuos, detalle_residuos = ingresar_gestion_residuos(f"ciclo_{i+1}")
+                st.info(
+                    f"**Gestión de residuos (Ciclo {i+1}):**\n"
+                    f"- **Total gestión de residuos:** {format_num(em_residuos)} kg CO₂e/ha"
+                )
 
-            em_ciclo = em_fert_total + em_agroq + em_agua + em_energia + em_maq + em_residuos
-            em_total += em_ciclo
-            prod_total += produccion
-            desglose_fuentes_ciclos.append({
-                "Ciclo": i+1,
-                "Fertilizantes": em_fert_total,
-                "Agroquímicos": em_agroq,
-                "Riego": em_agua + em_energia,
-                "Maquinaria": em_maq,
-                "Residuos": em_residuos,
-                "desglose_fertilizantes": desglose_fert,
-                "desglose_agroquimicos": agroq,
-                "desglose_maquinaria": labores,
-                "desglose_riego": {
-                    "tipo_riego": tipo_riego,
-                    "emisiones_agua": em_agua,
-                    "emisiones_energia": em_energia,
-                    "energia_actividades": energia_actividades
-                },
-                "desglose_residuos": detalle_residuos
-            })
-            emisiones_ciclos.append((i+1, em_ciclo, produccion))
+                em_ciclo = em_fert_total + em_agroq + em_agua + em_energia + em_maq + em_residuos
+                em_total += em_ciclo
+                prod_total += produccion
+                registrar_etapa(f"Ciclo {i+1}", 1, produccion, fert, agroq, labores, energia_actividades, f"ciclo_{i+1}", tipo_riego=tipo_riego)
+                desglose_fuentes_ciclos.append({
+                    "Ciclo": i+1,
+                    **resumir_etapa(
+                        em_fert_total, em_agroq, em_agua, em_energia, em_maq, em_residuos,
+                        desglose_fert, agroq, labores, energia_actividades, detalle_residuos,
+                        tipo_riego=tipo_riego
+                    )
+                })
+                emisiones_ciclos.append((i+1, em_ciclo, produccion))
 
-            total_fert += em_fert_total
-            total_agroq += em_agroq
-            total_riego += em_agua + em_energia
-            total_maq += em_maq
-            total_res += em_residuos
+                total_fert += em_fert_total
+                total_agroq += em_agroq
+                total_riego += em_agua + em_energia
+                total_maq += em_maq
+                total_res += em_residuos
 
-            st.info(f"Huella de carbono en ciclo {i+1}: {format_num(em_ciclo)} kg CO₂e/ha·ciclo")
+                st.info(f"Huella de carbono en ciclo {i+1}: {format_num(em_ciclo)} kg CO₂e/ha·ciclo")
 
         if n_ciclos > 1:
             st.markdown("### Comparación de emisiones entre ciclos")
@@ -2980,28 +2669,8 @@ def etapa_anual():
     st.session_state["desglose_fuentes_ciclos"] = desglose_fuentes_ciclos
     return em_total, prod_total
 
-import locale
-
 # Establecer el locale a español para los formatos numéricos
-try:
-    locale.setlocale(locale.LC_ALL, 'es_ES.UTF-8')
-except:
-    try:
-        locale.setlocale(locale.LC_ALL, 'es_ES')
-    except:
-        try:
-            locale.setlocale(locale.LC_ALL, 'Spanish_Spain.1252')
-        except:
-            locale.setlocale(locale.LC_ALL, '')
-
-# Configurar Plotly para formato español
-import plotly.io as pio
-try:
-    if pio.kaleido and pio.kaleido.scope:
-        pio.kaleido.scope.default_format = "png"
-except (AttributeError, TypeError):
-    pass  # Kaleido no está disponible o no configurado
-px.defaults.template = "plotly_white"
+configurar_locale()
 
 # Configuración global para separadores en Plotly
 def configure_plotly_locale():
@@ -3026,85 +2695,17 @@ def format_num(x, decimales=None):
     - >= 10: 2 decimales máximo
     - >= 1: 2-3 decimales
     - < 1: 3-4 decimales (eliminando ceros innecesarios)
+    Para columnas o arreglos completos usar `formatear_numeros` (nucleo.formato).
     """
-    try:
-        if pd.isnull(x) or x is None:
-            return ""
-        if isinstance(x, (float, int)):
-            abs_x = abs(x)
-            
-            # Determinar número de decimales según magnitud si no se especifica
-            if decimales is None:
-                if abs_x >= 1000:
-                    decimales = 0
-                elif abs_x >= 10:
-                    decimales = 2
-                elif abs_x >= 1:
-                    decimales = 2
-                else:
-                    decimales = 4
-            
-            # Formatear manualmente en formato español
-            # Primero formatear con el número de decimales deseado
-            if decimales == 0:
-                formatted = f"{x:.0f}"
-            else:
-                formatted = f"{x:.{decimales}f}"
-            
-            # Separar parte entera y decimal
-            if '.' in formatted:
-                parte_entera, parte_decimal = formatted.split('.')
-            else:
-                parte_entera = formatted
-                parte_decimal = ""
-            
-            # Agregar separadores de miles (puntos) a la parte entera
-            if len(parte_entera) > 3:
-                # Convertir a positivo para agregar separadores, luego restaurar signo
-                es_negativo = parte_entera.startswith('-')
-                if es_negativo:
-                    parte_entera = parte_entera[1:]
-                
-                # Agregar puntos cada 3 dígitos de derecha a izquierda
-                parte_entera_formateada = ""
-                for i, digito in enumerate(reversed(parte_entera)):
-                    if i > 0 and i % 3 == 0:
-                        parte_entera_formateada = "." + parte_entera_formateada
-                    parte_entera_formateada = digito + parte_entera_formateada
-                
-                if es_negativo:
-                    parte_entera_formateada = "-" + parte_entera_formateada
-                parte_entera = parte_entera_formateada
-            
-            # Eliminar ceros innecesarios al final de la parte decimal
-            if parte_decimal:
-                parte_decimal = parte_decimal.rstrip('0')
-                if parte_decimal:
-                    formatted = parte_entera + "," + parte_decimal
-                else:
-                    formatted = parte_entera
-            else:
-                formatted = parte_entera
-            
-            return formatted
-        return str(x)
-    except Exception:
-        return str(x) if x is not None else ""
+    return formatear_numero(x, decimales)
 
 def format_percent(x, decimales=1):
     """
     Formatea porcentajes con coma como separador decimal
     Asume que x ya está en formato de porcentaje (0-100)
     """
-    try:
-        if pd.isnull(x) or x is None:
-            return ""
-        # NO multiplicar por 100 porque ya viene en formato de porcentaje
-        # Usar format_num sin el símbolo de porcentaje
-        formatted = format_num(x, decimales)
-        return formatted + "%"
-    except Exception:
-        return str(x) + "%" if x is not None else ""
+    texto = formatear_numero(x, decimales)
+    return texto + "%" if texto else ""
 
 def format_fraction_as_percent(x, decimales=1):
     """
@@ -3114,17 +2715,7 @@ def format_fraction_as_percent(x, decimales=1):
     try:
         if pd.isnull(x) or x is None:
             return ""
-        # Multiplicar por 100 para convertir fracción a porcentaje
-        percentage = x * 100
-        formatted = locale.format_string(f"%.{decimales}f", percentage, grouping=True)
-        
-        # Asegurar formato español para porcentajes
-        if '.' in formatted and ',' not in formatted:
-            parts = formatted.split('.')
-            if len(parts) == 2 and len(parts[0]) <= 3:
-                formatted = parts[0] + ',' + parts[1]
-        
-        return formatted + "%"
+        return formatear_numero(x * 100, decimales, recortar_ceros=False) + "%"
     except Exception:
         return str(x * 100) + "%" if x is not None else ""
 
@@ -3133,18 +2724,9 @@ def format_plotly_pie_percent(percent_value):
     Formatea porcentajes específicamente para gráficos de torta de Plotly
     Convierte del formato inglés (12.3) al formato español (12,3%)
     """
-    try:
-        if isinstance(percent_value, (int, float)):
-            formatted = locale.format_string("%.1f", percent_value, grouping=True)
-            # Asegurar formato español
-            if '.' in formatted and ',' not in formatted:
-                parts = formatted.split('.')
-                if len(parts) == 2:
-                    formatted = parts[0] + ',' + parts[1]
-            return formatted + "%"
-        return str(percent_value) + "%"
-    except Exception:
-        return str(percent_value) + "%"
+    if isinstance(percent_value, (int, float)):
+        return formatear_numero(percent_value, 1, recortar_ceros=False) + "%"
+    return str(percent_value) + "%"
 
 # -----------------------------
 # Resultados Finales
@@ -3164,7 +2746,238 @@ def explicacion_fuente(fuente):
     else:
         return "Desglose no disponible para esta fuente."
 
-import numpy as np
+def abrir_seccion(titulo, clave, abierta=False):
+    """
+    Interruptor de una sección de resultados: el contenido (tablas y gráficos) solo se
+    construye cuando el usuario la abre, y queda abierta entre ejecuciones.
+    """
+    return st.toggle(titulo, value=abierta, key=f"ver_{clave}")
+
+# -----------------------------
+# Vista compacta de resultados
+# -----------------------------
+# Cada etapa (o ciclo) se resume en una tabla con los ítems de todas las fuentes y un solo
+# gráfico de varios paneles, en lugar de una docena de figuras con su propio layout: para
+# conexiones lentas (rurales o móviles) el resultado pesa una fracción de la vista completa.
+COMPONENTES_FERTILIZANTE = {
+    "emision_produccion": "Producción",
+    "emision_co2_urea": "CO₂ hidrólisis urea",
+    "emision_n2o_directa": "N₂O directa",
+    "emision_n2o_ind_volatilizacion": "N₂O indirecta (volatilización)",
+    "emision_n2o_ind_lixiviacion": "N₂O indirecta (lixiviación)",
+}
+FUENTES_COMPACTAS = ["Fertilizantes", "Agroquímicos", "Riego", "Maquinaria", "Residuos"]
+
+def vista_compacta():
+    """Interruptor de la vista compacta de resultados (se comparte entre las vistas anual y perenne)."""
+    return st.toggle(
+        "Vista compacta de resultados",
+        key="resultados_compactos",
+        help="Resume cada etapa o ciclo en una tabla y un solo gráfico de varios paneles. "
+             "Recomendado en conexiones lentas o desde el celular."
+    )
+
+def etiquetas_unicas(nombres):
+    """Numera los nombres repetidos ("Urea", "Urea (2)") para usarlos como etiquetas de un gráfico."""
+    vistos = {}
+    etiquetas = []
+    for nombre in nombres:
+        vistos[nombre] = vistos.get(nombre, 0) + 1
+        etiquetas.append(nombre if vistos[nombre] == 1 else f"{nombre} ({vistos[nombre]})")
+    return etiquetas
+
+def tabla_desglose_compacto(resultado):
+    """Ítems de todas las fuentes de una etapa o ciclo en una sola tabla (fuente, ítem, detalle, emisiones)."""
+    filas = []
+    for f in resultado.get("desglose_fertilizantes") or []:
+        filas.append(("Fertilizantes", f.get("tipo", ""), "", f.get("total", 0)))
+    for ag in resultado.get("desglose_agroquimicos") or []:
+        filas.append(("Agroquímicos", ag.get("nombre_comercial") or ag.get("tipo", ""), ag.get("categoria", ""), ag.get("emisiones", 0)))
+    for labor in resultado.get("desglose_maquinaria") or []:
+        filas.append(("Maquinaria", labor.get("nombre_labor", ""), labor.get("tipo_maquinaria", ""), labor.get("emisiones", 0)))
+    for ea in (resultado.get("desglose_riego") or {}).get("energia_actividades", []):
+        actividad = ea.get("actividad") or ea.get("tipo_actividad", "")
+        filas.append(("Riego", actividad, "Agua", ea.get("emisiones_agua", 0)))
+        filas.append(("Riego", actividad, f"Energía ({ea.get('tipo_energia', '')})", ea.get("emisiones_energia", 0)))
+    residuos = resultado.get("desglose_residuos")
+    if isinstance(residuos, dict):
+        for via, detalle in residuos.items():
+            filas.append(("Residuos", via, f"{format_num(detalle.get('biomasa', 0))} kg", detalle.get("emisiones", 0)))
+    tabla = pd.DataFrame(filas, columns=["Fuente", "Ítem", "Detalle", "Emisiones"])
+    return tabla[tabla["Emisiones"] != 0].reset_index(drop=True)
+
+def figura_desglose_compacto(resultado, unidad):
+    """
+    Un gráfico de varios paneles con los desgloses de una etapa o ciclo: fuentes,
+    fertilizantes por tipo de emisión, agroquímicos por categoría, maquinaria por labor,
+    riego por actividad y residuos por vía (solo los paneles con emisiones).
+    """
+    paneles = []
+    fuentes = [f for f in FUENTES_COMPACTAS if resultado.get(f, 0) > 0]
+    if fuentes:
+        paneles.append(("Fuentes", "domain", [go.Pie(
+            labels=fuentes, values=[resultado[f] for f in fuentes], hole=0.3, textinfo="label+percent", showlegend=False
+        )]))
+    fert = pd.DataFrame(resultado.get("desglose_fertilizantes") or [])
+    if not fert.empty and fert["total"].sum() > 0:
+        nombres = etiquetas_unicas(fert["tipo"].astype(str))
+        paneles.append(("Fertilizantes por tipo de emisión", "xy", [
+            go.Bar(x=nombres, y=fert[columna], name=nombre, legendgroup="fertilizantes")
+            for columna, nombre in COMPONENTES_FERTILIZANTE.items() if columna in fert
+        ]))
+    agro = pd.DataFrame(resultado.get("desglose_agroquimicos") or [])
+    if not agro.empty and agro["emisiones"].sum() > 0:
+        por_categoria = agro.groupby("categoria", sort=False)["emisiones"].sum()
+        paneles.append(("Agroquímicos por categoría", "domain", [go.Pie(
+            labels=list(por_categoria.index), values=por_categoria.values, hole=0.3, textinfo="label+percent", showlegend=False
+        )]))
+    maq = pd.DataFrame(resultado.get("desglose_maquinaria") or [])
+    if not maq.empty and maq["emisiones"].sum() > 0:
+        por_labor = maq.groupby("nombre_labor", sort=False)["emisiones"].sum()
+        paneles.append(("Maquinaria por labor", "domain", [go.Pie(
+            labels=list(por_labor.index), values=por_labor.values, hole=0.3, textinfo="label+percent", showlegend=False
+        )]))
+    riego = pd.DataFrame((resultado.get("desglose_riego") or {}).get("energia_actividades", []))
+    if not riego.empty and (riego["emisiones_agua"].sum() + riego["emisiones_energia"].sum()) > 0:
+        actividades = etiquetas_unicas(
+            riego["actividad"].where(riego["actividad"].astype(bool), riego["tipo_actividad"]).astype(str)
+            if "actividad" in riego else riego["tipo_actividad"].astype(str)
+        )
+        paneles.append(("Riego por actividad", "xy", [
+            go.Bar(x=actividades, y=riego["emisiones_agua"], name="Agua", legendgroup="riego"),
+            go.Bar(x=actividades, y=riego["emisiones_energia"], name="Energía", legendgroup="riego"),
+        ]))
+    residuos = resultado.get("desglose_residuos")
+    if isinstance(residuos, dict) and any(d.get("emisiones", 0) for d in residuos.values()):
+        paneles.append(("Residuos por vía", "xy", [go.Bar(
+            x=list(residuos), y=[d.get("emisiones", 0) for d in residuos.values()], showlegend=False
+        )]))
+    if not paneles:
+        return None
+    columnas = 2 if len(paneles) > 1 else 1
+    filas = -(-len(paneles) // columnas)
+    specs = [[None] * columnas for _ in range(filas)]
+    for i, (_, tipo, _) in enumerate(paneles):
+        specs[i // columnas][i % columnas] = {"type": tipo}
+    from plotly.subplots import make_subplots
+    figura = make_subplots(
+        rows=filas, cols=columnas, specs=specs,
+        subplot_titles=[titulo for titulo, _, _ in paneles],
+        vertical_spacing=0.35 / filas, horizontal_spacing=0.12
+    )
+    for i, (_, _, trazas) in enumerate(paneles):
+        for traza in trazas:
+            figura.add_trace(traza, row=i // columnas + 1, col=i % columnas + 1)
+    figura.update_layout(
+        barmode="stack", height=330 * filas, separators=',.',
+        margin=dict(t=60, b=20), legend=dict(orientation="h", y=-0.08)
+    )
+    figura.update_yaxes(title_text=f"kg CO₂e/{unidad}")
+    return figura
+
+def mostrar_desglose_compacto(resultado, prod, partes_clave, unidad):
+    """Tabla y gráfico de varios paneles de una etapa o ciclo (vista compacta)."""
+    tabla = tabla_desglose_compacto(resultado)
+    if tabla.empty:
+        st.info("Esta etapa no tiene emisiones ingresadas.")
+        return
+    columna = f"Huella de carbono (kg CO₂e/{unidad})"
+    tabla = tabla.rename(columns={"Emisiones": columna})
+    tabla[f"Huella de carbono (kg CO₂e/kg fruta)"] = tabla[columna] / prod if prod and prod > 0 else None
+    tabla["% contribución"] = tabla[columna] / tabla[columna].sum() * 100
+    st.dataframe(tabla.style.format({
+        columna: format_num,
+        "Huella de carbono (kg CO₂e/kg fruta)": lambda x: format_num(x, 3),
+        "% contribución": format_percent
+    }), hide_index=True)
+
+    def construir():
+        return figura_desglose_compacto(resultado, unidad)
+    mostrar_grafico(clave_grafico(*partes_clave, "compacto"), construir, resultado, unidad)
+
+def mostrar_analisis_sensibilidad():
+    """
+    Análisis de sensibilidad global (Morris o Sobol) sobre los datos ingresados: tabla de
+    parámetros ordenada por influencia y gráfico de tornado. Se calcula solo a pedido.
+    """
+    st.markdown("#### Análisis de sensibilidad")
+    with st.expander("¿Qué parámetros influyen más en el resultado?"):
+        st.caption(
+            "Se varían los factores de emisión (con los rangos de incertidumbre del IPCC cuando existen), los GWP "
+            "y los datos de actividad (±20 %), y se ordenan según su influencia. Morris es un cribado rápido; "
+            "Sobol estima qué fracción de la varianza explica cada parámetro."
+        )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            metodo = st.selectbox("Método", ["Morris", "Sobol"], key="sens_metodo")
+        with col2:
+            objetivo = st.selectbox(
+                "Resultado analizado",
+                ["Emisiones totales (kg CO₂e/ha)", "Huella (kg CO₂e/kg)"],
+                key="sens_objetivo"
+            )
+        with col3:
+            if metodo == "Morris":
+                n = st.number_input("Trayectorias", min_value=10, max_value=1000, value=100, step=10, key="sens_n_morris")
+            else:
+                n = st.number_input("Muestras base", min_value=256, max_value=16384, value=2048, step=256, key="sens_n_sobol")
+        if st.button("Calcular sensibilidad", key="sens_calcular"):
+            st.session_state["sensibilidad"] = analizar_sensibilidad(
+                proyecto_interfaz(),
+                metodo=metodo.lower(),
+                n=int(n),
+                semilla=0,
+                objetivo="em_total" if objetivo.startswith("Emisiones") else "huella"
+            )
+        r = st.session_state.get("sensibilidad")
+        if not r:
+            return
+        if not r["parametros"]:
+            st.info("No hay datos de actividad ingresados para analizar.")
+            return
+        unidad = "kg CO₂e/ha" if r["objetivo"] == "em_total" else "kg CO₂e/kg"
+        if r["metodo"] == "morris":
+            indices = {"μ*": "mu_estrella", "μ": "mu", "σ": "sigma"}
+        else:
+            indices = {"Sobol S1": "S1", "Sobol ST": "ST"}
+        df_sens = pd.DataFrame([
+            dict(
+                {
+                    "Parámetro": p["parametro"],
+                    "Rango (× nominal)": f"{format_num(p['minimo'], 2)} – {format_num(p['maximo'], 2)}",
+                    f"Resultado mínimo ({unidad})": p["bajo"],
+                    f"Resultado máximo ({unidad})": p["alto"],
+                },
+                **{nombre: p[clave] for nombre, clave in indices.items()}
+            )
+            for p in r["parametros"]
+        ])
+        st.write(
+            f"Resultado nominal: **{format_num(r['nominal'], 3)} {unidad}** "
+            f"({r['evaluaciones']} evaluaciones del modelo)."
+        )
+        st.dataframe(df_sens, hide_index=True)
+
+        # Tornado: los 15 parámetros más influyentes, barras desde el valor nominal
+        def construir():
+            top = r["parametros"][:15][::-1]
+            nombres = [p["parametro"] for p in top]
+            fig_tornado = go.Figure()
+            fig_tornado.add_trace(go.Bar(
+                y=nombres, x=[p["bajo"] - r["nominal"] for p in top], base=r["nominal"],
+                orientation="h", name="Parámetro en su mínimo", marker_color="#4C78A8"
+            ))
+            fig_tornado.add_trace(go.Bar(
+                y=nombres, x=[p["alto"] - r["nominal"] for p in top], base=r["nominal"],
+                orientation="h", name="Parámetro en su máximo", marker_color="#E45756"
+            ))
+            fig_tornado.update_layout(
+                barmode="overlay", height=max(300, 30 * len(top) + 120), separators=',.',
+                xaxis_title=unidad, legend=dict(orientation="h", y=-0.2)
+            )
+            fig_tornado.add_vline(x=r["nominal"], line_dash="dash", line_color="gray")
+            return fig_tornado
+        mostrar_grafico(clave_grafico("sensibilidad"), construir, r, unidad)
 
 ###################################################
 # RESULTADOS PARA CULTIVO ANUAL
@@ -3179,6 +2992,7 @@ def mostrar_resultados_anual(em_total, prod_total):
         "y finalmente el desglose interno de cada fuente. Todas las tablas muestran emisiones en kg CO₂e/ha·año y kg CO₂e/kg fruta·año. "
         "Todos los gráficos muestran emisiones en kg CO₂e/ha·año."
     )
+    compacta = vista_compacta()
 
     # --- RECONSTRUCCIÓN CORRECTA DE TOTALES GLOBALES DESDE EL DESGLOSE ---
     fuentes = ["Fertilizantes", "Agroquímicos", "Riego", "Maquinaria", "Residuos"]
@@ -3209,64 +3023,68 @@ def mostrar_resultados_anual(em_total, prod_total):
     st.markdown("#### % de contribución de cada fuente (global, kg CO₂e/ha·año)")
     col1, col2 = st.columns(2)
     with col1:
-        fig_bar = px.bar(
-            x=fuentes,
-            y=valores_fuentes,
-            labels={"x": "Fuente", "y": "Huella de carbono (kg CO₂e/ha·año)"},
-            color=fuentes,
-            color_discrete_sequence=px.colors.qualitative.Set2,
-            title="Huella de carbono por fuente en el año",
-        )
-        y_max = max(valores_fuentes) if valores_fuentes else 1
-        textos = [format_num(v) for v in valores_fuentes]
-        fig_bar.add_trace(go.Scatter(
-            x=fuentes,
-            y=valores_fuentes,
-            text=textos,
-            mode="text",
-            textposition="top center",
-            showlegend=False
-        ))
-        fig_bar.update_layout(showlegend=False, height=400, separators=',.')
-        fig_bar.update_yaxes(range=[0, y_max * 1.15])
-        st.plotly_chart(fig_bar, use_container_width=True, key=get_unique_key())
-    with col2:
-        if total_fuentes > 0:
-            # Calcular porcentajes con formato español
-            porcentajes = [(v/total_fuentes)*100 for v in valores_fuentes]
-            # Crear textos personalizados con formato español
-            textos_personalizados = [
-                f"{fuente}<br>{format_plotly_pie_percent(pct)}" 
-                for fuente, pct in zip(fuentes, porcentajes)
-            ]
-            
-            fig_pie = px.pie(
-                names=fuentes,
-                values=valores_fuentes,
-                title="% de contribución de cada fuente",
+        def construir():
+            fig_bar = px.bar(
+                x=fuentes,
+                y=valores_fuentes,
+                labels={"x": "Fuente", "y": "Huella de carbono (kg CO₂e/ha·año)"},
                 color=fuentes,
                 color_discrete_sequence=px.colors.qualitative.Set2,
-                hole=0.3
-            )
-            # Actualizar para mostrar nombres y porcentajes con formato español
-            fig_pie.update_traces(
-                textinfo='label+percent',
-                texttemplate='%{label}<br>%{percent}',
-                hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·año<br>Porcentaje: %{percent}<extra></extra>'
+                title="Huella de carbono por fuente en el año",
             )
-            # Configurar formato de números para el hover y texto
-            fig_pie.update_layout(
-                separators=',.'  # Formato español: coma decimal, punto miles
-            )
-        else:
-            fig_pie = px.pie(names=["Sin datos"], values=[1], color_discrete_sequence=["#cccccc"])
-        fig_pie.update_layout(showlegend=False, height=400, separators=',.')
-        st.plotly_chart(fig_pie, use_container_width=True, key=get_unique_key())
+            y_max = max(valores_fuentes) if valores_fuentes else 1
+            textos = formatear_numeros(valores_fuentes)
+            fig_bar.add_trace(go.Scatter(
+                x=fuentes,
+                y=valores_fuentes,
+                text=textos,
+                mode="text",
+                textposition="top center",
+                showlegend=False
+            ))
+            fig_bar.update_layout(showlegend=False, height=400, separators=',.')
+            fig_bar.update_yaxes(range=[0, y_max * 1.15])
+            return fig_bar
+        mostrar_grafico(clave_grafico("anual", "fuentes", "barras"), construir, fuentes, valores_fuentes)
+    with col2:
+        def construir():
+            if total_fuentes > 0:
+                # Calcular porcentajes con formato español
+                porcentajes = [(v/total_fuentes)*100 for v in valores_fuentes]
+                # Crear textos personalizados con formato español
+                textos_personalizados = [
+                    f"{fuente}<br>{format_plotly_pie_percent(pct)}" 
+                    for fuente, pct in zip(fuentes, porcentajes)
+                ]
+
+                fig_pie = px.pie(
+                    names=fuentes,
+                    values=valores_fuentes,
+                    title="% de contribución de cada fuente",
+                    color=fuentes,
+                    color_discrete_sequence=px.colors.qualitative.Set2,
+                    hole=0.3
+                )
+                # Actualizar para mostrar nombres y porcentajes con formato español
+                fig_pie.update_traces(
+                    textinfo='label+percent',
+                    texttemplate='%{label}<br>%{percent}',
+                    hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·año<br>Porcentaje: %{percent}<extra></extra>'
+                )
+                # Configurar formato de números para el hover y texto
+                fig_pie.update_layout(
+                    separators=',.'  # Formato español: coma decimal, punto miles
+                )
+            else:
+                fig_pie = px.pie(names=["Sin datos"], values=[1], color_discrete_sequence=["#cccccc"])
+            fig_pie.update_layout(showlegend=False, height=400, separators=',.')
+            return fig_pie
+        mostrar_grafico(clave_grafico("anual", "fuentes", "torta"), construir, total_fuentes, valores_fuentes, fuentes)
 
     st.markdown("---")
 
-    # --- Resultados por ciclo ---
-    if emisiones_ciclos:
+    # --- Resultados por ciclo (se construye al abrir la sección) ---
+    if emisiones_ciclos and abrir_seccion("Ver huella de carbono por ciclo productivo", "anual_ciclos"):
         st.markdown("#### Huella de carbono por ciclo productivo")
         df_ciclos = pd.DataFrame(emisiones_ciclos, columns=[
             "Ciclo",
@@ -3304,28 +3122,30 @@ def mostrar_resultados_anual(em_total, prod_total):
 
         # Gráfico de barras por ciclo (kg CO₂e/ha)
         st.markdown("##### Gráfico: Huella de carbono por ciclo (kg CO₂e/ha·ciclo)")
-        y_max_ciclo = df_ciclos["Huella de carbono (kg CO₂e/ha·ciclo)"].max() if not df_ciclos.empty else 1
-        textos_ciclo = [format_num(v) for v in df_ciclos["Huella de carbono (kg CO₂e/ha·ciclo)"]]
-        fig_ciclo = px.bar(
-            df_ciclos,
-            x="Nombre ciclo",
-            y="Huella de carbono (kg CO₂e/ha·ciclo)",
-            color="Nombre ciclo",
-            color_discrete_sequence=px.colors.qualitative.Pastel,
-            labels={"Huella de carbono (kg CO₂e/ha·ciclo)": "Huella de carbono (kg CO₂e/ha·ciclo)"},
-            title="Huella de carbono por ciclo"
-        )
-        fig_ciclo.add_trace(go.Scatter(
-            x=df_ciclos["Nombre ciclo"],
-            y=df_ciclos["Huella de carbono (kg CO₂e/ha·ciclo)"],
-            text=textos_ciclo,
-            mode="text",
-            textposition="top center",
-            showlegend=False
-        ))
-        fig_ciclo.update_layout(showlegend=False, height=400, separators=',.')
-        fig_ciclo.update_yaxes(range=[0, y_max_ciclo * 1.15])
-        st.plotly_chart(fig_ciclo, use_container_width=True, key=get_unique_key())
+        def construir():
+            y_max_ciclo = df_ciclos["Huella de carbono (kg CO₂e/ha·ciclo)"].max() if not df_ciclos.empty else 1
+            textos_ciclo = formatear_numeros(df_ciclos["Huella de carbono (kg CO₂e/ha·ciclo)"])
+            fig_ciclo = px.bar(
+                df_ciclos,
+                x="Nombre ciclo",
+                y="Huella de carbono (kg CO₂e/ha·ciclo)",
+                color="Nombre ciclo",
+                color_discrete_sequence=px.colors.qualitative.Pastel,
+                labels={"Huella de carbono (kg CO₂e/ha·ciclo)": "Huella de carbono (kg CO₂e/ha·ciclo)"},
+                title="Huella de carbono por ciclo"
+            )
+            fig_ciclo.add_trace(go.Scatter(
+                x=df_ciclos["Nombre ciclo"],
+                y=df_ciclos["Huella de carbono (kg CO₂e/ha·ciclo)"],
+                text=textos_ciclo,
+                mode="text",
+                textposition="top center",
+                showlegend=False
+            ))
+            fig_ciclo.update_layout(showlegend=False, height=400, separators=',.')
+            fig_ciclo.update_yaxes(range=[0, y_max_ciclo * 1.15])
+            return fig_ciclo
+        mostrar_grafico(clave_grafico("anual", "ciclos"), construir, df_ciclos)
 
     st.markdown("---")
 
@@ -3335,7 +3155,11 @@ def mostrar_resultados_anual(em_total, prod_total):
         st.markdown("#### Huella de carbono por fuente en cada ciclo")
         fuentes = ["Fertilizantes", "Agroquímicos", "Riego", "Maquinaria", "Residuos"]
         for idx, ciclo in enumerate(desglose_fuentes_ciclos):
-            st.markdown(f"##### {'Ciclo ' + str(ciclo['Ciclo']) if 'Ciclo' in ciclo else 'Ciclo típico'}")
+            nombre_ciclo = 'Ciclo ' + str(ciclo['Ciclo']) if 'Ciclo' in ciclo else 'Ciclo típico'
+            # Cada ciclo (con sus desgloses y gráficos) se construye solo al abrirlo
+            if not abrir_seccion(f"Ver {nombre_ciclo.lower()}", f"anual_ciclo_{idx}"):
+                continue
+            st.markdown(f"##### {nombre_ciclo}")
             prod = ciclo.get("Producción", None)
             if prod is None:
                 prod = None
@@ -3343,6 +3167,9 @@ def mostrar_resultados_anual(em_total, prod_total):
                     if c[0] == ciclo.get("Ciclo"):
                         prod = c[2]
                         break
+            if compacta:
+                mostrar_desglose_compacto(ciclo, prod, ("anual", idx), "ha·ciclo")
+                continue
             total_fuente = sum([ciclo[f] for f in fuentes])
             df_fuentes_ciclo = pd.DataFrame({
                 "Fuente": fuentes,
@@ -3366,27 +3193,29 @@ def mostrar_resultados_anual(em_total, prod_total):
 
             # Gráfico de barras por fuente en el ciclo (kg CO₂e/ha)
             st.markdown("##### Gráfico: Huella de carbono por fuente en el ciclo (kg CO₂e/ha·ciclo)")
-            y_max_fuente = df_fuentes_ciclo["Huella de carbono (kg CO₂e/ha·ciclo)"].max() if not df_fuentes_ciclo.empty else 1
-            textos_fuente = [format_num(v) for v in df_fuentes_ciclo["Huella de carbono (kg CO₂e/ha·ciclo)"]]
-            fig_fuente = px.bar(
-                df_fuentes_ciclo,
-                x="Fuente",
-                y="Huella de carbono (kg CO₂e/ha·ciclo)",
-                color="Fuente",
-                color_discrete_sequence=px.colors.qualitative.Set2,
-                title="Huella de carbono por fuente en el ciclo"
-            )
-            fig_fuente.add_trace(go.Scatter(
-                x=df_fuentes_ciclo["Fuente"],
-                y=df_fuentes_ciclo["Huella de carbono (kg CO₂e/ha·ciclo)"],
-                text=textos_fuente,
-                mode="text",
-                textposition="top center",
-                showlegend=False
-            ))
-            fig_fuente.update_layout(showlegend=False, height=400, separators=',.')
-            fig_fuente.update_yaxes(range=[0, y_max_fuente * 1.15])
-            st.plotly_chart(fig_fuente, use_container_width=True, key=get_unique_key())
+            def construir():
+                y_max_fuente = df_fuentes_ciclo["Huella de carbono (kg CO₂e/ha·ciclo)"].max() if not df_fuentes_ciclo.empty else 1
+                textos_fuente = formatear_numeros(df_fuentes_ciclo["Huella de carbono (kg CO₂e/ha·ciclo)"])
+                fig_fuente = px.bar(
+                    df_fuentes_ciclo,
+                    x="Fuente",
+                    y="Huella de carbono (kg CO₂e/ha·ciclo)",
+                    color="Fuente",
+                    color_discrete_sequence=px.colors.qualitative.Set2,
+                    title="Huella de carbono por fuente en el ciclo"
+                )
+                fig_fuente.add_trace(go.Scatter(
+                    x=df_fuentes_ciclo["Fuente"],
+                    y=df_fuentes_ciclo["Huella de carbono (kg CO₂e/ha·ciclo)"],
+                    text=textos_fuente,
+                    mode="text",
+                    textposition="top center",
+                    showlegend=False
+                ))
+                fig_fuente.update_layout(showlegend=False, height=400, separators=',.')
+                fig_fuente.update_yaxes(range=[0, y_max_fuente * 1.15])
+                return fig_fuente
+            mostrar_grafico(clave_grafico("anual", idx, "fuentes"), construir, df_fuentes_ciclo)
 
             # --- Desglose interno de cada fuente ---
             st.markdown("###### Desglose interno de cada fuente")
@@ -3448,25 +3277,27 @@ def mostrar_resultados_anual(em_total, prod_total):
                             st.markdown("**Gráfico: Contribución orgánicos vs inorgánicos (torta)**")
                             df_resumen_tipo = df_fert.groupby("Tipo fertilizante")["total"].sum().reset_index()
                             if len(df_resumen_tipo) > 0:
-                                fig_pie_tipo = px.pie(
-                                    values=df_resumen_tipo["total"],
-                                    names=df_resumen_tipo["Tipo fertilizante"],
-                                    title="Contribución orgánicos vs inorgánicos",
-                                    color_discrete_sequence=["#66c2a5", "#fc8d62"],
-                                    hole=0.3
-                                )
-                                # Configurar formato español para nombres y porcentajes
-                                fig_pie_tipo.update_traces(
-                                    textinfo='label+percent',
-                                    texttemplate='%{label}<br>%{percent}',
-                                    hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
-                                )
-                                fig_pie_tipo.update_layout(
-                                    showlegend=True, 
-                                    height=400,
-                                    separators=',.'  # Formato español
-                                )
-                                st.plotly_chart(fig_pie_tipo, use_container_width=True, key=get_unique_key())
+                                def construir():
+                                    fig_pie_tipo = px.pie(
+                                        values=df_resumen_tipo["total"],
+                                        names=df_resumen_tipo["Tipo fertilizante"],
+                                        title="Contribución orgánicos vs inorgánicos",
+                                        color_discrete_sequence=["#66c2a5", "#fc8d62"],
+                                        hole=0.3
+                                    )
+                                    # Configurar formato español para nombres y porcentajes
+                                    fig_pie_tipo.update_traces(
+                                        textinfo='label+percent',
+                                        texttemplate='%{label}<br>%{percent}',
+                                        hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
+                                    )
+                                    fig_pie_tipo.update_layout(
+                                        showlegend=True, 
+                                        height=400,
+                                        separators=',.'  # Formato español
+                                    )
+                                    return fig_pie_tipo
+                                mostrar_grafico(clave_grafico("anual", idx, "fertilizantes", "tipo"), construir, df_resumen_tipo)
                             
                             # --- NUEVO: Gráficos de torta por cada tipo de fertilizante ---
                             for tipo_cat in ["Orgánico", "Inorgánico"]:
@@ -3485,24 +3316,26 @@ def mostrar_resultados_anual(em_total, prod_total):
                                             tipo_counts[tipo_base] = 1
                                             etiquetas_unicas.append(tipo_base)
                                     
-                                    fig_pie_individual = px.pie(
-                                        values=df_tipo_pie["total"],
-                                        names=etiquetas_unicas,
-                                        title=f"Contribución de cada fertilizante {tipo_cat.lower()}",
-                                        hole=0.3
-                                    )
-                                    # Configurar formato español para nombres y porcentajes
-                                    fig_pie_individual.update_traces(
-                                        textinfo='label+percent',
-                                        texttemplate='%{label}<br>%{percent}',
-                                        hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
-                                    )
-                                    fig_pie_individual.update_layout(
-                                        showlegend=True, 
-                                        height=400,
-                                        separators=',.'  # Formato español
-                                    )
-                                    st.plotly_chart(fig_pie_individual, use_container_width=True, key=get_unique_key())
+                                    def construir():
+                                        fig_pie_individual = px.pie(
+                                            values=df_tipo_pie["total"],
+                                            names=etiquetas_unicas,
+                                            title=f"Contribución de cada fertilizante {tipo_cat.lower()}",
+                                            hole=0.3
+                                        )
+                                        # Configurar formato español para nombres y porcentajes
+                                        fig_pie_individual.update_traces(
+                                            textinfo='label+percent',
+                                            texttemplate='%{label}<br>%{percent}',
+                                            hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
+                                        )
+                                        fig_pie_individual.update_layout(
+                                            showlegend=True, 
+                                            height=400,
+                                            separators=',.'  # Formato español
+                                        )
+                                        return fig_pie_individual
+                                    mostrar_grafico(clave_grafico("anual", idx, "fertilizantes", tipo_cat, "torta"), construir, df_tipo_pie, etiquetas_unicas, tipo_cat)
                             
                             # --- Gráficos de barras apiladas por tipo de emisión (orgánico e inorgánico por separado) ---
                             for tipo_cat in ["Orgánico", "Inorgánico"]:
@@ -3522,37 +3355,39 @@ def mostrar_resultados_anual(em_total, prod_total):
                                             tipo_counts[tipo_base] = 1
                                             etiquetas_unicas.append(tipo_base)
                                     
-                                    labels = etiquetas_unicas
-                                    em_prod = df_tipo["emision_produccion"].values
-                                    em_co2_urea = df_tipo["emision_co2_urea"].values
-                                    em_n2o_dir = df_tipo["emision_n2o_directa"].values
-                                    em_n2o_ind_vol = df_tipo["emision_n2o_ind_volatilizacion"].values
-                                    em_n2o_ind_lix = df_tipo["emision_n2o_ind_lixiviacion"].values
-                                    fig_fert = go.Figure()
-                                    fig_fert.add_bar(x=labels, y=em_prod, name="Producción")
-                                    fig_fert.add_bar(x=labels, y=em_co2_urea, name="CO₂ hidrólisis urea")
-                                    fig_fert.add_bar(x=labels, y=em_n2o_dir, name="N₂O directa")
-                                    fig_fert.add_bar(x=labels, y=em_n2o_ind_vol, name="N₂O indirecta (volatilización)")
-                                    fig_fert.add_bar(x=labels, y=em_n2o_ind_lix, name="N₂O indirecta (lixiviación)")
-                                    totales = em_prod + em_co2_urea + em_n2o_dir + em_n2o_ind_vol + em_n2o_ind_lix
-                                    textos_tot = [format_num(v) for v in totales]
-                                    fig_fert.add_trace(go.Scatter(
-                                        x=labels,
-                                        y=totales,
-                                        text=textos_tot,
-                                        mode="text",
-                                        textposition="top center",
-                                        showlegend=False
-                                    ))
-                                    fig_fert.update_layout(
-                                        barmode='stack',
-                                        yaxis_title="Huella de carbono (kg CO₂e/ha·ciclo)",
-                                        title=f"Huella de carbono por fertilizante {tipo_cat.lower()} y tipo de emisión",
-                                        height=400,
-                                        separators=',.'  # Formato español
-                                    )
-                                    fig_fert.update_yaxes(range=[0, max(totales) * 1.15 if len(totales) > 0 else 1])
-                                    st.plotly_chart(fig_fert, use_container_width=True, key=get_unique_key())
+                                    def construir():
+                                        labels = etiquetas_unicas
+                                        em_prod = df_tipo["emision_produccion"].values
+                                        em_co2_urea = df_tipo["emision_co2_urea"].values
+                                        em_n2o_dir = df_tipo["emision_n2o_directa"].values
+                                        em_n2o_ind_vol = df_tipo["emision_n2o_ind_volatilizacion"].values
+                                        em_n2o_ind_lix = df_tipo["emision_n2o_ind_lixiviacion"].values
+                                        fig_fert = go.Figure()
+                                        fig_fert.add_bar(x=labels, y=em_prod, name="Producción")
+                                        fig_fert.add_bar(x=labels, y=em_co2_urea, name="CO₂ hidrólisis urea")
+                                        fig_fert.add_bar(x=labels, y=em_n2o_dir, name="N₂O directa")
+                                        fig_fert.add_bar(x=labels, y=em_n2o_ind_vol, name="N₂O indirecta (volatilización)")
+                                        fig_fert.add_bar(x=labels, y=em_n2o_ind_lix, name="N₂O indirecta (lixiviación)")
+                                        totales = em_prod + em_co2_urea + em_n2o_dir + em_n2o_ind_vol + em_n2o_ind_lix
+                                        textos_tot = formatear_numeros(totales)
+                                        fig_fert.add_trace(go.Scatter(
+                                            x=labels,
+                                            y=totales,
+                                            text=textos_tot,
+                                            mode="text",
+                                            textposition="top center",
+                                            showlegend=False
+                                        ))
+                                        fig_fert.update_layout(
+                                            barmode='stack',
+                                            yaxis_title="Huella de carbono (kg CO₂e/ha·ciclo)",
+                                            title=f"Huella de carbono por fertilizante {tipo_cat.lower()} y tipo de emisión",
+                                            height=400,
+                                            separators=',.'  # Formato español
+                                        )
+                                        fig_fert.update_yaxes(range=[0, max(totales) * 1.15 if len(totales) > 0 else 1])
+                                        return fig_fert
+                                    mostrar_grafico(clave_grafico("anual", idx, "fertilizantes", tipo_cat, "barras"), construir, etiquetas_unicas, df_tipo, tipo_cat)
                     # --- AGROQUÍMICOS ---
                     elif fuente == "Agroquímicos" and ciclo.get("desglose_agroquimicos"):
                         df_agro = pd.DataFrame(ciclo["desglose_agroquimicos"])
@@ -3577,78 +3412,84 @@ def mostrar_resultados_anual(em_total, prod_total):
                             # --- Gráfico de barras por nombre comercial (kg CO₂e/ha) ---
                             st.markdown("**Gráfico: Emisiones de agroquímicos por nombre comercial (kg CO₂e/ha·ciclo)**")
                             # Agrupar por categoría para crear las barras
-                            categorias = df_agro["categoria"].unique()
-                            fig_agro = go.Figure()
-                            
-                            for categoria in categorias:
-                                df_cat = df_agro[df_agro["categoria"] == categoria]
-                                fig_agro.add_bar(
-                                    x=df_cat["nombre_comercial"], 
-                                    y=df_cat["emisiones"], 
-                                    name=categoria,
-                                    text=[format_num(v) for v in df_cat["emisiones"]],
-                                    textposition="outside"
+                            def construir():
+                                categorias = df_agro["categoria"].unique()
+                                fig_agro = go.Figure()
+
+                                for categoria in categorias:
+                                    df_cat = df_agro[df_agro["categoria"] == categoria]
+                                    fig_agro.add_bar(
+                                        x=df_cat["nombre_comercial"], 
+                                        y=df_cat["emisiones"], 
+                                        name=categoria,
+                                        text=formatear_numeros(df_cat["emisiones"]),
+                                        textposition="outside"
+                                    )
+
+                                fig_agro.update_layout(
+                                    barmode='group',
+                                    yaxis_title="Huella de carbono (kg CO₂e/ha·ciclo)",
+                                    title="Huella de carbono de agroquímicos por nombre comercial",
+                                    height=400,
+                                    separators=',.',  # Formato español
+                                    xaxis_title="Nombre comercial"
                                 )
-                            
-                            fig_agro.update_layout(
-                                barmode='group',
-                                yaxis_title="Huella de carbono (kg CO₂e/ha·ciclo)",
-                                title="Huella de carbono de agroquímicos por nombre comercial",
-                                height=400,
-                                separators=',.',  # Formato español
-                                xaxis_title="Nombre comercial"
-                            )
-                            y_max_agro = df_agro["emisiones"].max() if not df_agro.empty else 1
-                            fig_agro.update_yaxes(range=[0, y_max_agro * 1.15])
-                            st.plotly_chart(fig_agro, use_container_width=True, key=get_unique_key())
+                                y_max_agro = df_agro["emisiones"].max() if not df_agro.empty else 1
+                                fig_agro.update_yaxes(range=[0, y_max_agro * 1.15])
+                                return fig_agro
+                            mostrar_grafico(clave_grafico("anual", idx, "agroquimicos", "barras"), construir, df_agro)
 
                             # --- Gráfico de torta por categoría (kg CO₂e/ha) ---
                             st.markdown("**Gráfico: % de contribución por categoría de agroquímico (kg CO₂e/ha·ciclo)**")
-                            df_cat = df_agro.groupby("categoria").agg({"emisiones": "sum"}).reset_index()
-                            fig_pie_cat = px.pie(
-                                df_cat,
-                                names="categoria",
-                                values="emisiones",
-                                title="Contribución por categoría de agroquímico",
-                                color_discrete_sequence=px.colors.qualitative.Set1,
-                                hole=0.3
-                            )
-                            # Configurar formato español para nombres y porcentajes
-                            fig_pie_cat.update_traces(
-                                textinfo='label+percent',
-                                texttemplate='%{label}<br>%{percent}',
-                                hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
-                            )
-                            fig_pie_cat.update_layout(
-                                showlegend=True, 
-                                height=400,
-                                separators=',.'  # Formato español
-                            )
-                            st.plotly_chart(fig_pie_cat, use_container_width=True, key=get_unique_key())
+                            def construir():
+                                df_cat = df_agro.groupby("categoria").agg({"emisiones": "sum"}).reset_index()
+                                fig_pie_cat = px.pie(
+                                    df_cat,
+                                    names="categoria",
+                                    values="emisiones",
+                                    title="Contribución por categoría de agroquímico",
+                                    color_discrete_sequence=px.colors.qualitative.Set1,
+                                    hole=0.3
+                                )
+                                # Configurar formato español para nombres y porcentajes
+                                fig_pie_cat.update_traces(
+                                    textinfo='label+percent',
+                                    texttemplate='%{label}<br>%{percent}',
+                                    hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
+                                )
+                                fig_pie_cat.update_layout(
+                                    showlegend=True, 
+                                    height=400,
+                                    separators=',.'  # Formato español
+                                )
+                                return fig_pie_cat
+                            mostrar_grafico(clave_grafico("anual", idx, "agroquimicos", "categorias"), construir, df_agro)
 
                             # --- Gráfico de torta por nombre comercial individual (kg CO₂e/ha) ---
                             st.markdown("**Gráfico: % de contribución de cada agroquímico individual (kg CO₂e/ha·ciclo)**")
-                            fig_pie_agro = px.pie(
-                                df_agro,
-                                names="nombre_comercial",
-                                values="emisiones",
-                                title="Contribución individual de cada agroquímico",
-                                color_discrete_sequence=px.colors.qualitative.Set2,
-                                hole=0.3
-                            )
-                            # Configurar formato español para nombres y porcentajes
-                            fig_pie_agro.update_traces(
-                                textinfo='label+percent',
-                                texttemplate='%{label}<br>%{percent}',
-                                hovertemplate='<b>%{label}</b><br>Categoría: %{customdata}<br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>',
-                                customdata=df_agro["categoria"]
-                            )
-                            fig_pie_agro.update_layout(
-                                showlegend=True, 
-                                height=400,
-                                separators=',.'  # Formato español
-                            )
-                            st.plotly_chart(fig_pie_agro, use_container_width=True, key=get_unique_key())
+                            def construir():
+                                fig_pie_agro = px.pie(
+                                    df_agro,
+                                    names="nombre_comercial",
+                                    values="emisiones",
+                                    title="Contribución individual de cada agroquímico",
+                                    color_discrete_sequence=px.colors.qualitative.Set2,
+                                    hole=0.3
+                                )
+                                # Configurar formato español para nombres y porcentajes
+                                fig_pie_agro.update_traces(
+                                    textinfo='label+percent',
+                                    texttemplate='%{label}<br>%{percent}',
+                                    hovertemplate='<b>%{label}</b><br>Categoría: %{customdata}<br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>',
+                                    customdata=df_agro["categoria"]
+                                )
+                                fig_pie_agro.update_layout(
+                                    showlegend=True, 
+                                    height=400,
+                                    separators=',.'  # Formato español
+                                )
+                                return fig_pie_agro
+                            mostrar_grafico(clave_grafico("anual", idx, "agroquimicos", "torta"), construir, df_agro)
                     # --- MAQUINARIA ---
                     elif fuente == "Maquinaria" and ciclo.get("desglose_maquinaria"):
                         df_maq = pd.DataFrame(ciclo["desglose_maquinaria"])
@@ -3672,27 +3513,29 @@ def mostrar_resultados_anual(em_total, prod_total):
 
                             # --- Gráfico de torta: emisiones por labor (kg CO₂e/ha) ---
                             st.markdown("**Gráfico: % de contribución de cada labor (torta, kg CO₂e/ha·ciclo)**")
-                            df_labor = df_maq.groupby("nombre_labor")["emisiones"].sum().reset_index()
-                            fig_pie_labor = px.pie(
-                                df_labor,
-                                names="nombre_labor",
-                                values="emisiones",
-                                title="Contribución de cada labor al total de emisiones de maquinaria",
-                                color_discrete_sequence=px.colors.qualitative.Set2,
-                                hole=0.3
-                            )
-                            # Configurar formato español para nombres y porcentajes
-                            fig_pie_labor.update_traces(
-                                textinfo='label+percent',
-                                texttemplate='%{label}<br>%{percent}',
-                                hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
-                            )
-                            fig_pie_labor.update_layout(
-                                showlegend=True, 
-                                height=400,
-                                separators=',.'  # Formato español
-                            )
-                            st.plotly_chart(fig_pie_labor, use_container_width=True, key=get_unique_key())
+                            def construir():
+                                df_labor = df_maq.groupby("nombre_labor")["emisiones"].sum().reset_index()
+                                fig_pie_labor = px.pie(
+                                    df_labor,
+                                    names="nombre_labor",
+                                    values="emisiones",
+                                    title="Contribución de cada labor al total de emisiones de maquinaria",
+                                    color_discrete_sequence=px.colors.qualitative.Set2,
+                                    hole=0.3
+                                )
+                                # Configurar formato español para nombres y porcentajes
+                                fig_pie_labor.update_traces(
+                                    textinfo='label+percent',
+                                    texttemplate='%{label}<br>%{percent}',
+                                    hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
+                                )
+                                fig_pie_labor.update_layout(
+                                    showlegend=True, 
+                                    height=400,
+                                    separators=',.'  # Formato español
+                                )
+                                return fig_pie_labor
+                            mostrar_grafico(clave_grafico("anual", idx, "maquinaria", "labores"), construir, df_maq)
 
                             # --- Gráfico de torta: emisiones por maquinaria dentro de cada labor (kg CO₂e/ha) ---
                             labores_unicas = df_maq["nombre_labor"].unique()
@@ -3700,63 +3543,67 @@ def mostrar_resultados_anual(em_total, prod_total):
                                 df_labor_maq = df_maq[df_maq["nombre_labor"] == labor]
                                 if len(df_labor_maq) > 1:
                                     st.markdown(f"**Gráfico: % de contribución de cada maquinaria en la labor '{labor}' (torta, kg CO₂e/ha·ciclo)**")
-                                    fig_pie_maq = px.pie(
-                                        df_labor_maq,
-                                        names="tipo_maquinaria",
-                                        values="emisiones",
-                                        title=f"Contribución de cada maquinaria en la labor '{labor}'",
-                                        color_discrete_sequence=px.colors.qualitative.Pastel,
-                                        hole=0.3
-                                    )
-                                    # Configurar formato español para nombres y porcentajes
-                                    fig_pie_maq.update_traces(
-                                        textinfo='label+percent',
-                                        texttemplate='%{label}<br>%{percent}',
-                                        hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
-                                    )
-                                    fig_pie_maq.update_layout(
-                                        showlegend=True, 
-                                        height=400,
-                                        separators=',.'  # Formato español
-                                    )
-                                    st.plotly_chart(fig_pie_maq, use_container_width=True, key=get_unique_key())
+                                    def construir():
+                                        fig_pie_maq = px.pie(
+                                            df_labor_maq,
+                                            names="tipo_maquinaria",
+                                            values="emisiones",
+                                            title=f"Contribución de cada maquinaria en la labor '{labor}'",
+                                            color_discrete_sequence=px.colors.qualitative.Pastel,
+                                            hole=0.3
+                                        )
+                                        # Configurar formato español para nombres y porcentajes
+                                        fig_pie_maq.update_traces(
+                                            textinfo='label+percent',
+                                            texttemplate='%{label}<br>%{percent}',
+                                            hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
+                                        )
+                                        fig_pie_maq.update_layout(
+                                            showlegend=True, 
+                                            height=400,
+                                            separators=',.'  # Formato español
+                                        )
+                                        return fig_pie_maq
+                                    mostrar_grafico(clave_grafico("anual", idx, "maquinaria", "labor", labor), construir, df_labor_maq, labor)
 
                             # --- Gráfico de barras apiladas: labor (X), emisiones (Y), apilado por maquinaria (kg CO₂e/ha) ---
                             st.markdown("**Gráfico: Emisiones por labor y tipo de maquinaria (barras apiladas, kg CO₂e/ha·ciclo)**")
-                            df_maq_grouped = df_maq.groupby(["nombre_labor", "tipo_maquinaria"]).agg({"emisiones": "sum"}).reset_index()
-                            labores = df_maq_grouped["nombre_labor"].unique()
-                            tipos_maq = df_maq_grouped["tipo_maquinaria"].unique()
-                            fig_maq = go.Figure()
-                            for maq in tipos_maq:
-                                vals = []
-                                for l in labores:
-                                    row = df_maq_grouped[(df_maq_grouped["nombre_labor"] == l) & (df_maq_grouped["tipo_maquinaria"] == maq)]
-                                    vals.append(row["emisiones"].values[0] if not row.empty else 0)
-                                fig_maq.add_bar(
+                            def construir():
+                                df_maq_grouped = df_maq.groupby(["nombre_labor", "tipo_maquinaria"]).agg({"emisiones": "sum"}).reset_index()
+                                labores = df_maq_grouped["nombre_labor"].unique()
+                                tipos_maq = df_maq_grouped["tipo_maquinaria"].unique()
+                                fig_maq = go.Figure()
+                                for maq in tipos_maq:
+                                    vals = []
+                                    for l in labores:
+                                        row = df_maq_grouped[(df_maq_grouped["nombre_labor"] == l) & (df_maq_grouped["tipo_maquinaria"] == maq)]
+                                        vals.append(row["emisiones"].values[0] if not row.empty else 0)
+                                    fig_maq.add_bar(
+                                        x=labores,
+                                        y=vals,
+                                        name=maq
+                                    )
+                                totales = df_maq_grouped.groupby("nombre_labor")["emisiones"].sum().reindex(labores).values
+                                textos_tot = formatear_numeros(totales)
+                                fig_maq.add_trace(go.Scatter(
                                     x=labores,
-                                    y=vals,
-                                    name=maq
+                                    y=totales,
+                                    text=textos_tot,
+                                    mode="text",
+                                    textposition="top center",
+                                    showlegend=False
+                                ))
+                                y_max_maq = max(totales) if len(totales) > 0 else 1
+                                fig_maq.update_layout(
+                                    barmode='stack',
+                                    yaxis_title="Huella de carbono (kg CO₂e/ha·ciclo)",
+                                    title="Huella de carbono por labor y tipo de maquinaria",
+                                    height=400,
+                                    separators=',.'  # Formato español
                                 )
-                            totales = df_maq_grouped.groupby("nombre_labor")["emisiones"].sum().reindex(labores).values
-                            textos_tot = [format_num(v) for v in totales]
-                            fig_maq.add_trace(go.Scatter(
-                                x=labores,
-                                y=totales,
-                                text=textos_tot,
-                                mode="text",
-                                textposition="top center",
-                                showlegend=False
-                            ))
-                            y_max_maq = max(totales) if len(totales) > 0 else 1
-                            fig_maq.update_layout(
-                                barmode='stack',
-                                yaxis_title="Huella de carbono (kg CO₂e/ha·ciclo)",
-                                title="Huella de carbono por labor y tipo de maquinaria",
-                                height=400,
-                                separators=',.'  # Formato español
-                            )
-                            fig_maq.update_yaxes(range=[0, y_max_maq * 1.15])
-                            st.plotly_chart(fig_maq, use_container_width=True, key=get_unique_key())
+                                fig_maq.update_yaxes(range=[0, y_max_maq * 1.15])
+                                return fig_maq
+                            mostrar_grafico(clave_grafico("anual", idx, "maquinaria", "barras"), construir, df_maq)
                     # --- RIEGO ---
                     elif fuente == "Riego" and ciclo.get("desglose_riego"):
                         dr = ciclo["desglose_riego"]
@@ -3801,39 +3648,41 @@ def mostrar_resultados_anual(em_total, prod_total):
                             st.caption("Unidades: agua (m³/ha), energía (kWh o litros/ha), huella de carbono (kg CO₂e/ha y kg CO₂e/kg fruta), % sobre el total de riego.")
                             # Gráfico de barras apiladas por actividad (agua + energía)
                             st.markdown("**Gráfico: Huella de carbono de riego por actividad (barras apiladas agua + energía, kg CO₂e/ha·ciclo)**")
-                            fig_riego = go.Figure()
-                            fig_riego.add_bar(
-                                x=df_riego["Actividad"],
-                                y=df_riego["Huella de carbono agua (kg CO₂e/ha·ciclo)"],
-                                name="Agua",
-                                marker_color="#4fc3f7"
-                            )
-                            fig_riego.add_bar(
-                                x=df_riego["Actividad"],
-                                y=df_riego["Huella de carbono energía (kg CO₂e/ha·ciclo)"],
-                                name="Energía",
-                                marker_color="#0288d1"
-                            )
-                            totales = df_riego["Huella de carbono total (kg CO₂e/ha·ciclo)"].values
-                            textos_tot = [format_num(v) for v in totales]
-                            fig_riego.add_trace(go.Scatter(
-                                x=df_riego["Actividad"],
-                                y=totales,
-                                text=textos_tot,
-                                mode="text",
-                                textposition="top center",
-                                showlegend=False
-                            ))
-                            y_max_riego = max(totales) if len(totales) > 0 else 1
-                            fig_riego.update_layout(
-                                barmode='stack',
-                                yaxis_title="Huella de carbono (kg CO₂e/ha)",
-                                title="Huella de carbono de riego por actividad (agua + energía)",
-                                height=400,
-                                separators=',.'  # Formato español
-                            )
-                            fig_riego.update_yaxes(range=[0, y_max_riego * 1.15])
-                            st.plotly_chart(fig_riego, use_container_width=True, key=get_unique_key())
+                            def construir():
+                                fig_riego = go.Figure()
+                                fig_riego.add_bar(
+                                    x=df_riego["Actividad"],
+                                    y=df_riego["Huella de carbono agua (kg CO₂e/ha·ciclo)"],
+                                    name="Agua",
+                                    marker_color="#4fc3f7"
+                                )
+                                fig_riego.add_bar(
+                                    x=df_riego["Actividad"],
+                                    y=df_riego["Huella de carbono energía (kg CO₂e/ha·ciclo)"],
+                                    name="Energía",
+                                    marker_color="#0288d1"
+                                )
+                                totales = df_riego["Huella de carbono total (kg CO₂e/ha·ciclo)"].values
+                                textos_tot = formatear_numeros(totales)
+                                fig_riego.add_trace(go.Scatter(
+                                    x=df_riego["Actividad"],
+                                    y=totales,
+                                    text=textos_tot,
+                                    mode="text",
+                                    textposition="top center",
+                                    showlegend=False
+                                ))
+                                y_max_riego = max(totales) if len(totales) > 0 else 1
+                                fig_riego.update_layout(
+                                    barmode='stack',
+                                    yaxis_title="Huella de carbono (kg CO₂e/ha)",
+                                    title="Huella de carbono de riego por actividad (agua + energía)",
+                                    height=400,
+                                    separators=',.'  # Formato español
+                                )
+                                fig_riego.update_yaxes(range=[0, y_max_riego * 1.15])
+                                return fig_riego
+                            mostrar_grafico(clave_grafico("anual", idx, "riego", "barras"), construir, df_riego)
 
                             # --- Gráficos de torta por actividad individual: contribución agua vs energía ---
                             actividades_unicas = df_riego["Actividad"].unique()
@@ -3860,25 +3709,27 @@ def mostrar_resultados_anual(em_total, prod_total):
                                             values.append(em_energia)
                                         
                                         if len(values) > 0:
-                                            fig_pie_act = px.pie(
-                                                values=values,
-                                                names=labels,
-                                                title=f"Contribución agua vs energía en '{actividad}'",
-                                                color_discrete_sequence=["#4fc3f7", "#0288d1"],
-                                                hole=0.3
-                                            )
-                                            # Configurar formato español para nombres y porcentajes
-                                            fig_pie_act.update_traces(
-                                                textinfo='label+percent',
-                                                texttemplate='%{label}<br>%{percent}',
-                                                hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
-                                            )
-                                            fig_pie_act.update_layout(
-                                                showlegend=True, 
-                                                height=400,
-                                                separators=',.'  # Formato español
-                                            )
-                                            st.plotly_chart(fig_pie_act, use_container_width=True, key=get_unique_key())
+                                            def construir():
+                                                fig_pie_act = px.pie(
+                                                    values=values,
+                                                    names=labels,
+                                                    title=f"Contribución agua vs energía en '{actividad}'",
+                                                    color_discrete_sequence=["#4fc3f7", "#0288d1"],
+                                                    hole=0.3
+                                                )
+                                                # Configurar formato español para nombres y porcentajes
+                                                fig_pie_act.update_traces(
+                                                    textinfo='label+percent',
+                                                    texttemplate='%{label}<br>%{percent}',
+                                                    hovertemplate='<b>%{label}</b><br>Huella de carbono: %{value:.2f} kg CO₂e/ha·ciclo<br>Porcentaje: %{percent}<extra></extra>'
+                                                )
+                                                fig_pie_act.update_layout(
+                                                    showlegend=True, 
+                                                    height=400,
+                                                    separators=',.'  # Formato español
+                                                )
+                                                return fig_pie_act
+                                            mostrar_grafico(clave_grafico("anual", idx, "riego", "actividad", actividad), construir, values, labels, actividad)
                                         else:
                                             st.info(f"La actividad '{actividad}' no tiene huella de carbono de agua ni energía.")
                                     else:
@@ -3910,26 +3761,28 @@ def mostrar_resultados_anual(em_total, prod_total):
                                 "% contribución": format_percent
                             }), hide_index=True)
                             st.caption("Unidades: biomasa (kg/ha·ciclo), huella de carbono (kg CO₂e/ha·ciclo y kg CO₂e/kg fruta·ciclo), % sobre el total de residuos.")
-                            textos_res = [format_num(v) for v in df_res["Huella de carbono (kg CO₂e/ha·ciclo)"]]
-                            fig_res = px.bar(
-                                df_res,
-                                x="Gestión",
-                                y="Huella de carbono (kg CO₂e/ha·ciclo)",
-                                color="Gestión",
-                                color_discrete_sequence=px.colors.qualitative.Pastel,
-                                title="Huella de carbono por gestión de residuos"
-                            )
-                            fig_res.add_trace(go.Scatter(
-                                x=df_res["Gestión"],
-                                y=df_res["Huella de carbono (kg CO₂e/ha·ciclo)"],
-                                text=textos_res,
-                                mode="text",
-                                textposition="top center",
-                                showlegend=False
-                            ))
-                            fig_res.update_layout(showlegend=False, height=400, separators=',.')
-                            fig_res.update_yaxes(range=[0, max(df_res["Huella de carbono (kg CO₂e/ha·ciclo)"]) * 1.15 if not df_res.empty else 1])
-                            st.plotly_chart(fig_res, use_container_width=True, key=get_unique_key())
+                            def construir():
+                                textos_res = formatear_numeros(df_res["Huella de carbono (kg CO₂e/ha·ciclo)"])
+                                fig_res = px.bar(
+                                    df_res,
+                                    x="Gestión",
+                                    y="Huella de carbono (kg CO₂e/ha·ciclo)",
+                                    color="Gestión",
+                                    color_discrete_sequence=px.colors.qualitative.Pastel,
+                                    title="Huella de carbono por gestión de residuos"
+                                )
+                                fig_res.add_trace(go.Scatter(
+                                    x=df_res["Gestión"],
+                                    y=df_res["Huella de carbono (kg CO₂e/ha·ciclo)"],
+                                    text=textos_res,
+                                    mode="text",
+                                    textposition="top center",
+                                    showlegend=False
+                                ))
+                                fig_res.update_layout(showlegend=False, height=400, separators=',.')
+                                fig_res.update_yaxes(range=[0, max(df_res["Huella de carbono (kg CO₂e/ha·ciclo)"]) * 1.15 if not df_res.empty else 1])
+                                return fig_res
+                            mostrar_grafico(clave_grafico("anual", idx, "residuos"), construir, df_res)
             st.markdown("---")
 
     # --- Resumen ejecutivo ---
@@ -3946,6 +3799,9 @@ def mostrar_resultados_anual(em_total, prod_total):
         )
     )
 
+    st.markdown("---")
+    mostrar_analisis_sensibilidad()
+
     st.markdown("---")
     st.markdown("#### Parámetros de cálculo")
     st.write(f"Potenciales de calentamiento global (GWP) usados: {GWP}")
@@ -3978,6 +3834,7 @@ def mostrar_resultados_perenne(em_total, prod_total):
         "y finalmente el desglose interno de cada fuente. Todas las tablas muestran emisiones en kg CO₂e/ha y kg CO₂e/kg fruta. "
         "Todos los gráficos muestran emisiones en kg CO₂e/ha."
     )
+    compacta = vista_compacta()
 
     def limpiar_nombre(etapa):
         return etapa.replace("3.1 ", "").replace("3.2 ", "").replace("3.3 ", "").replace("3. ", "").strip()
@@ -4019,51 +3876,53 @@ def mostrar_resultados_perenne(em_total, prod_total):
 
     # --- Gráfico de evolución temporal de emisiones año a año ---
     emisiones_anuales = st.session_state.get("emisiones_anuales", [])
-    if emisiones_anuales:
+    if emisiones_anuales and abrir_seccion("Ver evolución temporal año a año", "perenne_evolucion"):
         st.markdown("#### Evolución temporal de emisiones año a año")
         df_evol = pd.DataFrame(emisiones_anuales, columns=["Año", "Emisiones (kg CO₂e/ha)", "Producción (kg/ha)", "Etapa"])
-        df_evol["Emisiones_texto"] = df_evol["Emisiones (kg CO₂e/ha)"].apply(format_num)
+        df_evol["Emisiones_texto"] = formatear_numeros(df_evol["Emisiones (kg CO₂e/ha)"])
         
-        fig_evol = px.bar(
-            df_evol,
-            x="Año",
-            y="Emisiones (kg CO₂e/ha)",
-            color="Etapa",
-            color_discrete_sequence=px.colors.qualitative.Set2,
-            title="Evolución de emisiones año a año",
-            text="Emisiones_texto"  # Agregar texto directamente en las barras
-        )
-        
-        # Configurar posición del texto dentro de las barras
-        fig_evol.update_traces(
-            textposition='inside',  # Texto dentro de las barras
-            textangle=0,  # Texto horizontal
-            textfont=dict(
-                size=10,
-                color='white'  # Color blanco para contraste
+        def construir():
+            fig_evol = px.bar(
+                df_evol,
+                x="Año",
+                y="Emisiones (kg CO₂e/ha)",
+                color="Etapa",
+                color_discrete_sequence=px.colors.qualitative.Set2,
+                title="Evolución de emisiones año a año",
+                text="Emisiones_texto"  # Agregar texto directamente en las barras
+            )
+
+            # Configurar posición del texto dentro de las barras
+            fig_evol.update_traces(
+                textposition='inside',  # Texto dentro de las barras
+                textangle=0,  # Texto horizontal
+                textfont=dict(
+                    size=10,
+                    color='white'  # Color blanco para contraste
+                )
+            )
+
+            # Mejorar el layout para mejor visualización
+            fig_evol.update_layout(
+                showlegend=True, 
+                height=500,  # Aumentar altura para mejor visualización
+                xaxis_title="Año",
+                yaxis_title="Huella de carbono (kg CO₂e/ha)",
+                xaxis=dict(
+                    tickmode='linear',
+                    tick0=df_evol["Año"].min(),
+                    dtick=1
+                ),
+                separators=',.'  # Formato español
             )
-        )
-        
-        # Mejorar el layout para mejor visualización
-        fig_evol.update_layout(
-            showlegend=True, 
-            height=500,  # Aumentar altura para mejor visualización
-            xaxis_title="Año",
-            yaxis_title="Huella de carbono (kg CO₂e/ha)",
-            xaxis=dict(
-                tickmode='linear',
-                tick0=df_evol["Año"].min(),
-                dtick=1
-            ),
-            separators=',.'  # Formato español
-        )
-        
-        st.plotly_chart(fig_evol, use_container_width=True, key=get_unique_key())
+
+            return fig_evol
+        mostrar_grafico(clave_grafico("perenne", "evolucion"), construir, df_evol)
 
     st.markdown("---")
 
-    # --- Resultados por etapa ---
-    if emisiones_etapas:
+    # --- Resultados por etapa (las secciones de detalle se construyen al abrirlas) ---
+    if emisiones_etapas and abrir_seccion("Ver huella de carbono por etapa", "perenne_etapas"):
         st.markdown("#### Huella de carbono por etapa")
         df_etapas = pd.DataFrame({
             "Etapa": [limpiar_nombre(et) for et in etapas_ordenadas],
@@ -4091,35 +3950,39 @@ def mostrar_resultados_perenne(em_total, prod_total):
 
         # Gráfico de barras por etapa (texto sólo en el total)
         st.markdown("##### Gráfico: Huella de carbono por etapa (kg CO₂e/ha)")
-        y_max_etapa = df_etapas["Huella de carbono (kg CO₂e/ha)"].max() if not df_etapas.empty else 1
-        textos_etapa = [format_num(v) for v in df_etapas["Emisiones (kg CO₂e/ha)"]]
-        fig_etapa = px.bar(
-            df_etapas,
-            x="Etapa",
-            y="Huella de carbono (kg CO₂e/ha)",
-            color="Etapa",
-            color_discrete_sequence=px.colors.qualitative.Pastel,
-            title="Huella de carbono por etapa"
-        )
-        fig_etapa.add_trace(go.Scatter(
-            x=df_etapas["Etapa"],
-            y=df_etapas["Huella de carbono (kg CO₂e/ha)"],
-            text=textos_etapa,
-            mode="text",
-            textposition="top center",
-            showlegend=False
-        ))
-        fig_etapa.update_layout(showlegend=False, height=400, separators=',.')
-        fig_etapa.update_yaxes(range=[0, y_max_etapa * 1.15])
-        st.plotly_chart(fig_etapa, use_container_width=True, key=get_unique_key())
+        def construir():
+            y_max_etapa = df_etapas["Huella de carbono (kg CO₂e/ha)"].max() if not df_etapas.empty else 1
+            textos_etapa = formatear_numeros(df_etapas["Huella de carbono (kg CO₂e/ha)"])
+            fig_etapa = px.bar(
+                df_etapas,
+                x="Etapa",
+                y="Huella de carbono (kg CO₂e/ha)",
+                color="Etapa",
+                color_discrete_sequence=px.colors.qualitative.Pastel,
+                title="Huella de carbono por etapa"
+            )
+            fig_etapa.add_trace(go.Scatter(
+                x=df_etapas["Etapa"],
+                y=df_etapas["Huella de carbono (kg CO₂e/ha)"],
+                text=textos_etapa,
+                mode="text",
+                textposition="top center",
+                showlegend=False
+            ))
+            fig_etapa.update_layout(showlegend=False, height=400, separators=',.')
+            fig_etapa.update_yaxes(range=[0, y_max_etapa * 1.15])
+            return fig_etapa
+        mostrar_grafico(clave_grafico("perenne", "etapas"), construir, df_etapas)
 
     st.markdown("---")
 
     # --- Emisiones por fuente y etapa (tabla y barras apiladas) ---
-    if emisiones_etapas and emisiones_fuentes and emisiones_fuente_etapa:
+    if emisiones_etapas and emisiones_fuentes and emisiones_fuente_etapa and abrir_seccion(
+        "Ver huella de carbono por fuente y etapa", "perenne_fuente_etapa"
+    ):
         st.markdown("#### Huella de carbono por fuente y etapa (tabla y barras apiladas)")
         fuentes = [f for f in emisiones_fuentes.keys() if f != "Transporte"]
-        etapas = df_etapas["Clave"].tolist()
+        etapas = etapas_ordenadas
         data_fuente_etapa = {fuente: [emisiones_fuente_etapa.get(etapa, {}).get(fuente, 0) for etapa in etapas] for fuente in fuentes}
         df_fuente_etapa = pd.DataFrame(data_fuente_etapa, index=[limpiar_nombre(e) for e in etapas])
         df_fuente_etapa.insert(0, "Etapa", [limpiar_nombre(e) for e in etapas])
@@ -4137,44 +4000,52 @@ def mostrar_resultados_perenne(em_total, prod_total):
 
         # Gráfico de barras apiladas por fuente y etapa (kg CO₂e/ha) - texto sólo en el total
         st.markdown("##### Gráfico: Emisiones por fuente y etapa (barras apiladas, kg CO₂e/ha)")
-        fig_fuente_etapa = go.Figure()
-        for fuente in fuentes:
-            fig_fuente_etapa.add_bar(
+        def construir():
+            fig_fuente_etapa = go.Figure()
+            for fuente in fuentes:
+                fig_fuente_etapa.add_bar(
+                    x=df_fuente_etapa["Etapa"],
+                    y=df_fuente_etapa[fuente],
+                    name=fuente
+                )
+            totales = df_fuente_etapa.iloc[:, 1:].sum(axis=1).values
+            textos_tot = formatear_numeros(totales)
+            fig_fuente_etapa.add_trace(go.Scatter(
                 x=df_fuente_etapa["Etapa"],
-                y=df_fuente_etapa[fuente],
-                name=fuente
+                y=totales,
+                text=textos_tot,
+                mode="text",
+                textposition="top center",
+                showlegend=False
+            ))
+            y_max_fte = max(totales) if len(totales) > 0 else 1
+            fig_fuente_etapa.update_layout(
+                barmode='stack',
+                yaxis_title="Huella de carbono (kg CO₂e/ha)",
+                title="Huella de carbono por fuente y etapa (barras apiladas)",
+                height=400,
+                separators=',.'  # Formato español
             )
-        totales = df_fuente_etapa.iloc[:, 1:].sum(axis=1).values
-        textos_tot = [format_num(v) for v in totales]
-        fig_fuente_etapa.add_trace(go.Scatter(
-            x=df_fuente_etapa["Etapa"],
-            y=totales,
-            text=textos_tot,
-            mode="text",
-            textposition="top center",
-            showlegend=False
-        ))
-        y_max_fte = max(totales) if len(totales) > 0 else 1
-        fig_fuente_etapa.update_layout(
-            barmode='stack',
-            yaxis_title="Huella de carbono (kg CO₂e/ha)",
-            title="Huella de carbono por fuente y etapa (barras apiladas)",
-            height=400,
-            separators=',.'  # Formato español
-        )
-        fig_fuente_etapa.update_yaxes(range=[0, y_max_fte * 1.15])
-        st.plotly_chart(fig_fuente_etapa, use_container_width=True, key=get_unique_key())
+            fig_fuente_etapa.update_yaxes(range=[0, y_max_fte * 1.15])
+            return fig_fuente_etapa
+        mostrar_grafico(clave_grafico("perenne", "fuentes_etapas"), construir, fuentes, df_fuente_etapa)
 
     st.markdown("---")
 
     # --- Desglose interno de cada fuente por etapa ---
     st.markdown("#### Desglose interno de cada fuente por etapa")
-    etapas = df_etapas["Clave"].tolist()
+    etapas = etapas_ordenadas
     orden_fuentes = [f for f in emisiones_fuentes.keys() if f != "Transporte"]
     for idx, etapa in enumerate(etapas):
         nombre_etapa_limpio = limpiar_nombre(etapa)
+        # Cada etapa (con sus desgloses y gráficos) se construye solo al abrirla
+        if not abrir_seccion(f"Ver desglose de la etapa {nombre_etapa_limpio}", f"perenne_desglose_{etapa}"):
+            continue
         st.markdown(f"### Etapa: {nombre_etapa_limpio}")
         prod = produccion_etapas.get(etapa, 0)
+        if compacta:
+            mostrar_desglose_compacto(emisiones_fuente_etapa.get(etapa, {}), prod, ("perenne", etapa), "ha")
+            continue
         # ORDENAR fuentes de mayor a menor emisión en esta etapa
         fuentes_etapa = [f for f in orden_fuentes if f in emisiones_fuente_etapa.get(etapa, {})]
         fuentes_ordenadas = sorted(
@@ -4234,37 +4105,39 @@ def mostrar_resultados_perenne(em_total, prod_total):
                             df_tipo = df_fert[df_fert["Tipo fertilizante"] == tipo_cat]
                             if not df_tipo.empty:
                                 st.markdown(f"**Gráfico: Emisiones por fertilizante {tipo_cat.lower()} y tipo de emisión (kg CO₂e/ha)**")
-                                labels = df_tipo["tipo"]
-                                em_prod = df_tipo["emision_produccion"].values
-                                em_co2_urea = df_tipo["emision_co2_urea"].values
-                                em_n2o_dir = df_tipo["emision_n2o_directa"].values
-                                em_n2o_ind_vol = df_tipo["emision_n2o_ind_volatilizacion"].values
-                                em_n2o_ind_lix = df_tipo["emision_n2o_ind_lixiviacion"].values
-                                fig_fert = go.Figure()
-                                fig_fert.add_bar(x=labels, y=em_prod, name="Producción")
-                                fig_fert.add_bar(x=labels, y=em_co2_urea, name="CO₂ hidrólisis urea")
-                                fig_fert.add_bar(x=labels, y=em_n2o_dir, name="N₂O directa")
-                                fig_fert.add_bar(x=labels, y=em_n2o_ind_vol, name="N₂O indirecta (volatilización)")
-                                fig_fert.add_bar(x=labels, y=em_n2o_ind_lix, name="N₂O indirecta (lixiviación)")
-                                totales = em_prod + em_co2_urea + em_n2o_dir + em_n2o_ind_vol + em_n2o_ind_lix
-                                textos_tot = [format_num(v) for v in totales]
-                                fig_fert.add_trace(go.Scatter(
-                                    x=labels,
-                                    y=totales,
-                                    text=textos_tot,
-                                    mode="text",
-                                    textposition="top center",
-                                    showlegend=False
-                                ))
-                                fig_fert.update_layout(
-                                    barmode='stack',
-                                    yaxis_title="Emisiones (kg CO₂e/ha)",
-                                    title=f"Emisiones por fertilizante {tipo_cat.lower()} y tipo de emisión",
-                                    height=400,
-                                    separators=',.'  # Formato español
-                                )
-                                fig_fert.update_yaxes(range=[0, max(totales) * 1.15 if len(totales) > 0 else 1])
-                                st.plotly_chart(fig_fert, use_container_width=True, key=get_unique_key())
+                                def construir():
+                                    labels = df_tipo["tipo"]
+                                    em_prod = df_tipo["emision_produccion"].values
+                                    em_co2_urea = df_tipo["emision_co2_urea"].values
+                                    em_n2o_dir = df_tipo["emision_n2o_directa"].values
+                                    em_n2o_ind_vol = df_tipo["emision_n2o_ind_volatilizacion"].values
+                                    em_n2o_ind_lix = df_tipo["emision_n2o_ind_lixiviacion"].values
+                                    fig_fert = go.Figure()
+                                    fig_fert.add_bar(x=labels, y=em_prod, name="Producción")
+                                    fig_fert.add_bar(x=labels, y=em_co2_urea, name="CO₂ hidrólisis urea")
+                                    fig_fert.add_bar(x=labels, y=em_n2o_dir, name="N₂O directa")
+                                    fig_fert.add_bar(x=labels, y=em_n2o_ind_vol, name="N₂O indirecta (volatilización)")
+                                    fig_fert.add_bar(x=labels, y=em_n2o_ind_lix, name="N₂O indirecta (lixiviación)")
+                                    totales = em_prod + em_co2_urea + em_n2o_dir + em_n2o_ind_vol + em_n2o_ind_lix
+                                    textos_tot = formatear_numeros(totales)
+                                    fig_fert.add_trace(go.Scatter(
+                                        x=labels,
+                                        y=totales,
+                                        text=textos_tot,
+                                        mode="text",
+                                        textposition="top center",
+                                        showlegend=False
+                                    ))
+                                    fig_fert.update_layout(
+                                        barmode='stack',
+                                        yaxis_title="Emisiones (kg CO₂e/ha)",
+                                        title=f"Emisiones por fertilizante {tipo_cat.lower()} y tipo de emisión",
+                                        height=400,
+                                        separators=',.'  # Formato español
+                                    )
+                                    fig_fert.update_yaxes(range=[0, max(totales) * 1.15 if len(totales) > 0 else 1])
+                                    return fig_fert
+                                mostrar_grafico(clave_grafico("perenne", etapa, "fertilizantes", tipo_cat), construir, df_tipo, tipo_cat)
                 # --- AGROQUÍMICOS ---
                 elif fuente == "Agroquímicos" and emisiones_fuente_etapa[etapa].get("desglose_agroquimicos"):
                     df_agro = pd.DataFrame(emisiones_fuente_etapa[etapa]["desglose_agroquimicos"])
@@ -4287,53 +4160,57 @@ def mostrar_resultados_perenne(em_total, prod_total):
                         # Gráfico de barras por nombre comercial (kg CO₂e/ha)
                         st.markdown("**Gráfico: Emisiones de agroquímicos por nombre comercial (kg CO₂e/ha)**")
                         # Agrupar por categoría para crear las barras
-                        categorias = df_agro["categoria"].unique()
-                        fig_agro = go.Figure()
-                        
-                        for categoria in categorias:
-                            df_cat = df_agro[df_agro["categoria"] == categoria]
-                            fig_agro.add_bar(
-                                x=df_cat["nombre_comercial"], 
-                                y=df_cat["emisiones"], 
-                                name=categoria,
-                                text=[format_num(v) for v in df_cat["emisiones"]],
-                                textposition="outside"
+                        def construir():
+                            categorias = df_agro["categoria"].unique()
+                            fig_agro = go.Figure()
+
+                            for categoria in categorias:
+                                df_cat = df_agro[df_agro["categoria"] == categoria]
+                                fig_agro.add_bar(
+                                    x=df_cat["nombre_comercial"], 
+                                    y=df_cat["emisiones"], 
+                                    name=categoria,
+                                    text=formatear_numeros(df_cat["emisiones"]),
+                                    textposition="outside"
+                                )
+
+                            fig_agro.update_layout(
+                                barmode='group',
+                                yaxis_title="Emisiones (kg CO₂e/ha)",
+                                title="Emisiones de agroquímicos por nombre comercial",
+                                height=400,
+                                separators=',.',  # Formato español
+                                xaxis_title="Nombre comercial"
                             )
-                        
-                        fig_agro.update_layout(
-                            barmode='group',
-                            yaxis_title="Emisiones (kg CO₂e/ha)",
-                            title="Emisiones de agroquímicos por nombre comercial",
-                            height=400,
-                            separators=',.',  # Formato español
-                            xaxis_title="Nombre comercial"
-                        )
-                        y_max_agro = df_agro["emisiones"].max() if not df_agro.empty else 1
-                        fig_agro.update_yaxes(range=[0, y_max_agro * 1.15])
-                        st.plotly_chart(fig_agro, use_container_width=True, key=get_unique_key())
+                            y_max_agro = df_agro["emisiones"].max() if not df_agro.empty else 1
+                            fig_agro.update_yaxes(range=[0, y_max_agro * 1.15])
+                            return fig_agro
+                        mostrar_grafico(clave_grafico("perenne", etapa, "agroquimicos", "barras"), construir, df_agro)
                         # Gráfico de torta por nombre comercial (kg CO₂e/ha)
                         st.markdown("**Gráfico: % de contribución de cada agroquímico por nombre comercial (kg CO₂e/ha)**")
-                        fig_pie_agro = px.pie(
-                            df_agro,
-                            names="nombre_comercial",
-                            values="emisiones",
-                            title="Contribución de cada agroquímico por nombre comercial",
-                            color_discrete_sequence=px.colors.qualitative.Set2,
-                            hole=0.3
-                        )
-                        # Configurar formato español para nombres y porcentajes
-                        fig_pie_agro.update_traces(
-                            textinfo='label+percent',
-                            texttemplate='%{label}<br>%{percent}',
-                            hovertemplate='<b>%{label}</b><br>Categoría: %{customdata}<br>Huella de carbono: %{value:.2f} kg CO₂e/ha<br>Porcentaje: %{percent}<extra></extra>',
-                            customdata=df_agro["categoria"]
-                        )
-                        fig_pie_agro.update_layout(
-                            showlegend=True, 
-                            height=400,
-                            separators=',.'  # Formato español
-                        )
-                        st.plotly_chart(fig_pie_agro, use_container_width=True, key=get_unique_key())
+                        def construir():
+                            fig_pie_agro = px.pie(
+                                df_agro,
+                                names="nombre_comercial",
+                                values="emisiones",
+                                title="Contribución de cada agroquímico por nombre comercial",
+                                color_discrete_sequence=px.colors.qualitative.Set2,
+                                hole=0.3
+                            )
+                            # Configurar formato español para nombres y porcentajes
+                            fig_pie_agro.update_traces(
+                                textinfo='label+percent',
+                                texttemplate='%{label}<br>%{percent}',
+                                hovertemplate='<b>%{label}</b><br>Categoría: %{customdata}<br>Huella de carbono: %{value:.2f} kg CO₂e/ha<br>Porcentaje: %{percent}<extra></extra>',
+                                customdata=df_agro["categoria"]
+                            )
+                            fig_pie_agro.update_layout(
+                                showlegend=True, 
+                                height=400,
+                                separators=',.'  # Formato español
+                            )
+                            return fig_pie_agro
+                        mostrar_grafico(clave_grafico("perenne", etapa, "agroquimicos", "torta"), construir, df_agro)
                 # --- MAQUINARIA ---
                 elif fuente == "Maquinaria" and emisiones_fuente_etapa[etapa].get("desglose_maquinaria"):
                     df_maq = pd.DataFrame(emisiones_fuente_etapa[etapa]["desglose_maquinaria"])
@@ -4355,89 +4232,95 @@ def mostrar_resultados_perenne(em_total, prod_total):
                         }), hide_index=True)
                         # Gráfico de torta: emisiones por labor (kg CO₂e/ha)
                         st.markdown("**Gráfico: % de contribución de cada labor (torta, kg CO₂e/ha)**")
-                        df_labor = df_maq.groupby("nombre_labor")["emisiones"].sum().reset_index()
-                        fig_pie_labor = px.pie(
-                            df_labor,
-                            names="nombre_labor",
-                            values="emisiones",
-                            title="Contribución de cada labor al total de emisiones de maquinaria",
-                            color_discrete_sequence=px.colors.qualitative.Set2,
-                            hole=0.3
-                        )
-                        # Configurar formato español para nombres y porcentajes
-                        fig_pie_labor.update_traces(
-                            textinfo='label+percent',
-                            texttemplate='%{label}<br>%{percent}',
-                            hovertemplate='<b>%{label}</b><br>Emisiones: %{value:.2f} kg CO₂e/ha<br>Porcentaje: %{percent}<extra></extra>'
-                        )
-                        fig_pie_labor.update_layout(
-                            showlegend=True, 
-                            height=400,
-                            separators=',.'  # Formato español
-                        )
-                        st.plotly_chart(fig_pie_labor, use_container_width=True, key=get_unique_key())
+                        def construir():
+                            df_labor = df_maq.groupby("nombre_labor")["emisiones"].sum().reset_index()
+                            fig_pie_labor = px.pie(
+                                df_labor,
+                                names="nombre_labor",
+                                values="emisiones",
+                                title="Contribución de cada labor al total de emisiones de maquinaria",
+                                color_discrete_sequence=px.colors.qualitative.Set2,
+                                hole=0.3
+                            )
+                            # Configurar formato español para nombres y porcentajes
+                            fig_pie_labor.update_traces(
+                                textinfo='label+percent',
+                                texttemplate='%{label}<br>%{percent}',
+                                hovertemplate='<b>%{label}</b><br>Emisiones: %{value:.2f} kg CO₂e/ha<br>Porcentaje: %{percent}<extra></extra>'
+                            )
+                            fig_pie_labor.update_layout(
+                                showlegend=True, 
+                                height=400,
+                                separators=',.'  # Formato español
+                            )
+                            return fig_pie_labor
+                        mostrar_grafico(clave_grafico("perenne", etapa, "maquinaria", "labores"), construir, df_maq)
                         # Gráfico de torta: emisiones por maquinaria dentro de cada labor (kg CO₂e/ha)
                         labores_unicas = df_maq["nombre_labor"].unique()
                         for labor in labores_unicas:
                             df_labor_maq = df_maq[df_maq["nombre_labor"] == labor]
                             if len(df_labor_maq) > 1:
                                 st.markdown(f"**Gráfico: % de contribución de cada maquinaria en la labor '{labor}' (torta, kg CO₂e/ha)**")
-                                fig_pie_maq = px.pie(
-                                    df_labor_maq,
-                                    names="tipo_maquinaria",
-                                    values="emisiones",
-                                    title=f"Contribución de cada maquinaria en la labor '{labor}'",
-                                    color_discrete_sequence=px.colors.qualitative.Pastel,
-                                    hole=0.3
-                                )
-                                # Configurar formato español para nombres y porcentajes
-                                fig_pie_maq.update_traces(
-                                    textinfo='label+percent',
-                                    texttemplate='%{label}<br>%{percent}',
-                                    hovertemplate='<b>%{label}</b><br>Emisiones: %{value:.2f} kg CO₂e/ha<br>Porcentaje: %{percent}<extra></extra>'
-                                )
-                                fig_pie_maq.update_layout(
-                                    showlegend=True, 
-                                    height=400,
-                                    separators=',.'  # Formato español
-                                )
-                                st.plotly_chart(fig_pie_maq, use_container_width=True, key=get_unique_key())
+                                def construir():
+                                    fig_pie_maq = px.pie(
+                                        df_labor_maq,
+                                        names="tipo_maquinaria",
+                                        values="emisiones",
+                                        title=f"Contribución de cada maquinaria en la labor '{labor}'",
+                                        color_discrete_sequence=px.colors.qualitative.Pastel,
+                                        hole=0.3
+                                    )
+                                    # Configurar formato español para nombres y porcentajes
+                                    fig_pie_maq.update_traces(
+                                        textinfo='label+percent',
+                                        texttemplate='%{label}<br>%{percent}',
+                                        hovertemplate='<b>%{label}</b><br>Emisiones: %{value:.2f} kg CO₂e/ha<br>Porcentaje: %{percent}<extra></extra>'
+                                    )
+                                    fig_pie_maq.update_layout(
+                                        showlegend=True, 
+                                        height=400,
+                                        separators=',.'  # Formato español
+                                    )
+                                    return fig_pie_maq
+                                mostrar_grafico(clave_grafico("perenne", etapa, "maquinaria", "labor", labor), construir, df_labor_maq, labor)
                         # Gráfico de barras apiladas: labor (X), emisiones (Y), apilado por maquinaria (kg CO₂e/ha)
                         st.markdown("**Gráfico: Emisiones por labor y tipo de maquinaria (barras apiladas, kg CO₂e/ha)**")
-                        df_maq_grouped = df_maq.groupby(["nombre_labor", "tipo_maquinaria"]).agg({"emisiones": "sum"}).reset_index()
-                        labores = df_maq_grouped["nombre_labor"].unique()
-                        tipos_maq = df_maq_grouped["tipo_maquinaria"].unique()
-                        fig_maq = go.Figure()
-                        for maq in tipos_maq:
-                            vals = []
-                            for l in labores:
-                                row = df_maq_grouped[(df_maq_grouped["nombre_labor"] == l) & (df_maq_grouped["tipo_maquinaria"] == maq)]
-                                vals.append(row["emisiones"].values[0] if not row.empty else 0)
-                            fig_maq.add_bar(
+                        def construir():
+                            df_maq_grouped = df_maq.groupby(["nombre_labor", "tipo_maquinaria"]).agg({"emisiones": "sum"}).reset_index()
+                            labores = df_maq_grouped["nombre_labor"].unique()
+                            tipos_maq = df_maq_grouped["tipo_maquinaria"].unique()
+                            fig_maq = go.Figure()
+                            for maq in tipos_maq:
+                                vals = []
+                                for l in labores:
+                                    row = df_maq_grouped[(df_maq_grouped["nombre_labor"] == l) & (df_maq_grouped["tipo_maquinaria"] == maq)]
+                                    vals.append(row["emisiones"].values[0] if not row.empty else 0)
+                                fig_maq.add_bar(
+                                    x=labores,
+                                    y=vals,
+                                    name=maq
+                                )
+                            totales = df_maq_grouped.groupby("nombre_labor")["emisiones"].sum().reindex(labores).values
+                            textos_tot = formatear_numeros(totales)
+                            fig_maq.add_trace(go.Scatter(
                                 x=labores,
-                                y=vals,
-                                name=maq
+                                y=totales,
+                                text=textos_tot,
+                                mode="text",
+                                textposition="top center",
+                                showlegend=False
+                            ))
+                            y_max_maq = max(totales) if len(totales) > 0 else 1
+                            fig_maq.update_layout(
+                                barmode='stack',
+                                yaxis_title="Emisiones (kg CO₂e/ha)",
+                                title="Emisiones por labor y tipo de maquinaria",
+                                height=400,
+                                separators=',.'  # Formato español
                             )
-                        totales = df_maq_grouped.groupby("nombre_labor")["emisiones"].sum().reindex(labores).values
-                        textos_tot = [format_num(v) for v in totales]
-                        fig_maq.add_trace(go.Scatter(
-                            x=labores,
-                            y=totales,
-                            text=textos_tot,
-                            mode="text",
-                            textposition="top center",
-                            showlegend=False
-                        ))
-                        y_max_maq = max(totales) if len(totales) > 0 else 1
-                        fig_maq.update_layout(
-                            barmode='stack',
-                            yaxis_title="Emisiones (kg CO₂e/ha)",
-                            title="Emisiones por labor y tipo de maquinaria",
-                            height=400,
-                            separators=',.'  # Formato español
-                        )
-                        fig_maq.update_yaxes(range=[0, y_max_maq * 1.15])
-                        st.plotly_chart(fig_maq, use_container_width=True, key=get_unique_key())
+                            fig_maq.update_yaxes(range=[0, y_max_maq * 1.15])
+                            return fig_maq
+                        mostrar_grafico(clave_grafico("perenne", etapa, "maquinaria", "barras"), construir, df_maq)
                 # --- RIEGO ---
                 elif fuente == "Riego" and emisiones_fuente_etapa[etapa].get("desglose_riego"):
                     dr = emisiones_fuente_etapa[etapa]["desglose_riego"]
@@ -4480,37 +4363,39 @@ def mostrar_resultados_perenne(em_total, prod_total):
                             "% contribución": format_percent
                         }), hide_index=True)
                         # Gráfico de barras apiladas por actividad (agua + energía) - texto sólo en el total
-                        fig_riego = go.Figure()
-                        fig_riego.add_bar(
-                            x=df_riego["Actividad"],
-                            y=df_riego["Huella de carbono agua (kg CO₂e/ha)"],
-                            name="Agua"
-                        )
-                        fig_riego.add_bar(
-                            x=df_riego["Actividad"],
-                            y=df_riego["Huella de carbono energía (kg CO₂e/ha)"],
-                            name="Energía"
-                        )
-                        totales = df_riego["Huella de carbono total (kg CO₂e/ha)"].values
-                        textos_tot = [format_num(v) for v in totales]
-                        fig_riego.add_trace(go.Scatter(
-                            x=df_riego["Actividad"],
-                            y=totales,
-                            text=textos_tot,
-                            mode="text",
-                            textposition="top center",
-                            showlegend=False
-                        ))
-                        y_max_riego = max(totales) if len(totales) > 0 else 1
-                        fig_riego.update_layout(
-                            barmode='stack',
-                            yaxis_title="Huella de carbono (kg CO₂e/ha)",
-                            title="Emisiones de riego por actividad (agua + energía)",
-                            height=400,
-                            separators=',.'  # Formato español
-                        )
-                        fig_riego.update_yaxes(range=[0, y_max_riego * 1.15])
-                        st.plotly_chart(fig_riego, use_container_width=True, key=get_unique_key())
+                        def construir():
+                            fig_riego = go.Figure()
+                            fig_riego.add_bar(
+                                x=df_riego["Actividad"],
+                                y=df_riego["Huella de carbono agua (kg CO₂e/ha)"],
+                                name="Agua"
+                            )
+                            fig_riego.add_bar(
+                                x=df_riego["Actividad"],
+                                y=df_riego["Huella de carbono energía (kg CO₂e/ha)"],
+                                name="Energía"
+                            )
+                            totales = df_riego["Huella de carbono total (kg CO₂e/ha)"].values
+                            textos_tot = formatear_numeros(totales)
+                            fig_riego.add_trace(go.Scatter(
+                                x=df_riego["Actividad"],
+                                y=totales,
+                                text=textos_tot,
+                                mode="text",
+                                textposition="top center",
+                                showlegend=False
+                            ))
+                            y_max_riego = max(totales) if len(totales) > 0 else 1
+                            fig_riego.update_layout(
+                                barmode='stack',
+                                yaxis_title="Huella de carbono (kg CO₂e/ha)",
+                                title="Emisiones de riego por actividad (agua + energía)",
+                                height=400,
+                                separators=',.'  # Formato español
+                            )
+                            fig_riego.update_yaxes(range=[0, y_max_riego * 1.15])
+                            return fig_riego
+                        mostrar_grafico(clave_grafico("perenne", etapa, "riego"), construir, df_riego)
                     else:
                         st.info("No se ingresaron actividades de riego para esta etapa.")
                 # --- RESIDUOS ---
@@ -4528,7 +4413,7 @@ def mostrar_resultados_perenne(em_total, prod_total):
                         ])
                         total_res = df_res["Emisiones (kg CO₂e/ha)"].sum()
                         df_res["% contribución"] = df_res["Emisiones (kg CO₂e/ha)"] / total_res * 100
-                        textos_res = [format_num(v) for v in df_res["Emisiones (kg CO₂e/ha)"]]
+                        textos_res = formatear_numeros(df_res["Emisiones (kg CO₂e/ha)"])
                         st.markdown("**Tabla: Desglose de gestión de residuos vegetales**")
                         st.dataframe(df_res[[
                             "Gestión", "Biomasa (kg/ha)", "Emisiones (kg CO₂e/ha)", "Emisiones (kg CO₂e/kg fruta)", "% contribución"
@@ -4539,25 +4424,27 @@ def mostrar_resultados_perenne(em_total, prod_total):
                             "% contribución": format_percent
                         }), hide_index=True)
                         # Gráfico de barras por gestión de residuos
-                        fig_res = px.bar(
-                            df_res,
-                            x="Gestión",
-                            y="Emisiones (kg CO₂e/ha)",
-                            color="Gestión",
-                            color_discrete_sequence=px.colors.qualitative.Pastel,
-                            title="Emisiones por gestión de residuos"
-                        )
-                        fig_res.add_trace(go.Scatter(
-                            x=df_res["Gestión"],
-                            y=df_res["Emisiones (kg CO₂e/ha)"],
-                            text=textos_res,
-                            mode="text",
-                            textposition="top center",
-                            showlegend=False
-                        ))
-                        fig_res.update_layout(showlegend=False, height=400, separators=',.')
-                        fig_res.update_yaxes(range=[0, max(df_res["Emisiones (kg CO₂e/ha)"]) * 1.15 if not df_res.empty else 1])
-                        st.plotly_chart(fig_res, use_container_width=True, key=get_unique_key())
+                        def construir():
+                            fig_res = px.bar(
+                                df_res,
+                                x="Gestión",
+                                y="Emisiones (kg CO₂e/ha)",
+                                color="Gestión",
+                                color_discrete_sequence=px.colors.qualitative.Pastel,
+                                title="Emisiones por gestión de residuos"
+                            )
+                            fig_res.add_trace(go.Scatter(
+                                x=df_res["Gestión"],
+                                y=df_res["Emisiones (kg CO₂e/ha)"],
+                                text=textos_res,
+                                mode="text",
+                                textposition="top center",
+                                showlegend=False
+                            ))
+                            fig_res.update_layout(showlegend=False, height=400, separators=',.')
+                            fig_res.update_yaxes(range=[0, max(df_res["Emisiones (kg CO₂e/ha)"]) * 1.15 if not df_res.empty else 1])
+                            return fig_res
+                        mostrar_grafico(clave_grafico("perenne", etapa, "residuos"), construir, df_res, textos_res)
 
     st.markdown("---")
 
@@ -4576,6 +4463,9 @@ def mostrar_resultados_perenne(em_total, prod_total):
         )
     )
 
+    st.markdown("---")
+    mostrar_analisis_sensibilidad()
+
     st.markdown("---")
     st.markdown("#### Parámetros de cálculo")
     st.write(f"Potenciales de calentamiento global (GWP) usados: {GWP}")
@@ -4600,14 +4490,31 @@ def mostrar_resultados_perenne(em_total, prod_total):
 em_total = 0
 prod_total = 0
 
+importar_planilla()
+st.toggle(
+    "Ingreso en tablas (fertilizantes, agroquímicos, labores y riego)",
+    key="modo_tablas",
+    help="Cada categoría se ingresa en una tabla editable, una fila por ítem, en lugar de "
+         "un formulario por ítem. Útil para predios con muchos insumos o labores."
+)
+st.toggle(
+    "Ingreso por formularios (calcular cada etapa al enviarla)",
+    key="modo_formulario",
+    help="Los cambios en una etapa no se calculan hasta presionar su botón 'Calcular'. "
+         "Recomendado en conexiones lentas o con muchos datos; la cantidad de filas "
+         "(fertilizantes, labores, etc.) se actualiza al enviar el formulario."
+)
+
 if anual.strip().lower() == "perenne":
     tabs = st.tabs(["Implantación", "Crecimiento sin producción", "Producción", "Resultados"])
     with tabs[0]:
-        em_imp, prod_imp = etapa_implantacion()
+        with formulario_etapa("Implantacion", "implantación"):
+            em_imp, prod_imp = etapa_implantacion()
         st.session_state["em_imp"] = em_imp
         st.session_state["prod_imp"] = prod_imp
     with tabs[1]:
-        em_csp, prod_csp = etapa_crecimiento("Crecimiento sin producción", produccion_pregunta=False)
+        with formulario_etapa("Crecimiento", "crecimiento"):
+            em_csp, prod_csp = etapa_crecimiento("Crecimiento sin producción", produccion_pregunta=False)
         st.session_state["em_csp"] = em_csp
         st.session_state["prod_csp"] = prod_csp
     with tabs[2]:
@@ -4615,13 +4522,11 @@ if anual.strip().lower() == "perenne":
         st.session_state["em_pc"] = em_pc
         st.session_state["prod_pc"] = prod_pc
     with tabs[3]:
-        # Calcular los totales SOLO al mostrar resultados
-        em_total = (
-            st.session_state.get("em_imp", 0)
-            + st.session_state.get("em_csp", 0)
-            + st.session_state.get("em_pc", 0)
-        )
-        prod_total = st.session_state.get("prod_pc", 0)
+        # Totales desde el grafo incremental (sin las etapas que ya no se muestran)
+        grafo = grafo_interfaz()
+        grafo.conservar(etapas_proyecto)
+        em_total = grafo.em_total
+        prod_total = grafo.prod_total
         mostrar_resultados_perenne(em_total, prod_total)
 
 elif anual.strip().lower() == "anual":
@@ -4631,9 +4536,15 @@ elif anual.strip().lower() == "anual":
         st.session_state["em_anual"] = em_anual
         st.session_state["prod_anual"] = prod_anual
     with tabs[1]:
-        # Calcular los totales SOLO al mostrar resultados
-        em_total = st.session_state.get("em_anual", 0)
-        prod_total = st.session_state.get("prod_anual", 0)
+        # Totales desde el grafo incremental (sin los ciclos que ya no se muestran)
+        grafo = grafo_interfaz()
+        grafo.conservar(etapas_proyecto)
+        em_total = grafo.em_total
+        prod_total = grafo.prod_total
         mostrar_resultados_anual(em_total, prod_total)
 else:
-    st.warning("Debe seleccionar si el cultivo es anual o perenne para continuar.")
\ No newline at end of file
+    st.warning("Debe seleccionar si el cultivo es anual o perenne para continuar.")
+
+# Etapas de esta ejecución, para asignar las filas de una planilla importada
+st.session_state["claves_etapas"] = dict(claves_etapas)
+mostrar_archivo_proyecto()
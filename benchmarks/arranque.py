@@ -0,0 +1,87 @@
+"""
+Benchmark de arranque en frío de la aplicación.
+
+Uso:
+    python benchmarks/arranque.py [--app AgroPrint.py] [--comparar otra_version.py] [--repeticiones 5]
+
+Cada repetición corre en un intérprete nuevo (como un worker recién levantado) y mide:
+- primera ejecución: importaciones de la aplicación y primera ejecución completa del script
+  (lo que espera el primer usuario de un worker nuevo)
+- recarga: una segunda ejecución en el mismo proceso (módulos y cachés ya cargados)
+y qué módulos pesados quedaron cargados. Se informa la mediana de las repeticiones.
+
+Para comparar con una versión anterior:
+    git show HEAD~1:AgroPrint.py > /tmp/AgroPrint_anterior.py
+    python benchmarks/arranque.py --comparar /tmp/AgroPrint_anterior.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PESADOS = ["pandas", "plotly.express", "matplotlib", "scipy"]
+
+# Se ejecuta en un proceso nuevo por repetición
+MEDICION = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+inicio = time.perf_counter()
+app.run()
+primera = time.perf_counter() - inicio
+inicio = time.perf_counter()
+app.run()
+recarga = time.perf_counter() - inicio
+print(json.dumps({
+    "primera": primera,
+    "recarga": recarga,
+    "errores": [str(e.value) for e in app.exception],
+    "modulos": [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+def medir(app, repeticiones):
+    """Mediciones de `repeticiones` arranques en frío de `app`."""
+    entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ, os.environ.get("PYTHONPATH")])))
+    mediciones = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", MEDICION, os.path.abspath(app), *MODULOS_PESADOS],
+            cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True
+        )
+        mediciones.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+    return mediciones
+
+def resumir(nombre, mediciones):
+    primera = statistics.median(m["primera"] for m in mediciones)
+    recarga = statistics.median(m["recarga"] for m in mediciones)
+    print(f"{nombre}")
+    print(f"  primera ejecución: {primera:.2f} s   recarga: {recarga:.2f} s")
+    print(f"  módulos pesados cargados: {', '.join(mediciones[-1]['modulos']) or 'ninguno'}")
+    if mediciones[-1]["errores"]:
+        print(f"  errores: {mediciones[-1]['errores']}")
+    return primera
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python benchmarks/arranque.py",
+        description="Mide el arranque en frío de la aplicación (un intérprete nuevo por repetición)."
+    )
+    parser.add_argument("--app", default=os.path.join(RAIZ, "AgroPrint.py"), help="Script de la aplicación")
+    parser.add_argument("--comparar", help="Otra versión del script para comparar (p. ej. la anterior)")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Arranques por versión (se informa la mediana)")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        anterior = resumir(args.comparar, medir(args.comparar, args.repeticiones))
+    actual = resumir(args.app, medir(args.app, args.repeticiones))
+    if args.comparar:
+        print(f"Mejora de la primera ejecución: {anterior - actual:.2f} s ({(1 - actual / anterior) * 100:.0f} %)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
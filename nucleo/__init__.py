@@ -0,0 +1,55 @@
+"""
+Núcleo de cálculo de AgroPrint.
+
+Contiene los factores de emisión y las calculadoras de huella de carbono sin
+ninguna dependencia de Streamlit, Plotly ni pandas, para poder usarlos desde
+procesos por lotes, servicios o la propia aplicación.
+"""
+
+from .calculos import (
+    resolver_fertilizante,
+    calcular_fertilizantes,
+    calcular_emisiones_n2o_fertilizantes_desglosado,
+    calcular_emisiones_fertilizantes,
+    calcular_agroquimico,
+    calcular_emisiones_agroquimicos,
+    calcular_labor,
+    calcular_emisiones_maquinaria,
+    calcular_actividad_riego,
+    calcular_emisiones_riego,
+    calcular_emisiones_residuos,
+    calcular_emisiones_quema_residuos,
+    calcular_emisiones_compostaje,
+    calcular_emisiones_incorporacion,
+)
+from .etapas import (
+    FUENTES,
+    nuevas_emisiones_fuentes,
+    resumir_etapa,
+    total_etapa,
+    calcular_etapa,
+    calcular_fuente,
+    calcular_proyecto,
+    quitar_desglose,
+)
+from .actividades import (
+    Registro,
+    Fertilizante,
+    Agroquimico,
+    Labor,
+    ActividadRiego,
+    GestionResiduo,
+    DetalleResiduo,
+)
+from .registro import RegistroFactores, registro_factores
+from .paquetes import (
+    PaqueteFactores,
+    cargar_paquete,
+    paquetes_disponibles,
+    paquete_activo,
+    usar_paquete,
+)
+from .cartera import AcumuladorCartera, calcular_cartera
+from .escenarios import aplicar_cambios, barrer_escenarios
+from .incremental import GrafoProyecto
+from .memoria import CacheLRU, clave_hash, forma_canonica, memoizar
@@ -0,0 +1,200 @@
+"""
+Registros de actividad: fertilizantes, agroquímicos, labores, riego y residuos.
+
+Cada registro es un objeto con `__slots__` (campos fijos, sin dict por instancia) y
+valores por defecto explícitos, que usan tanto las funciones de ingreso de la aplicación
+como las calculadoras. Para no romper el código que los trata como dicts (tablas de
+pandas, vistas de resultados, escenarios), también se leen como un dict de solo lectura:
+
+    fert = Fertilizante(tipo="Urea", origen="Genérico", cantidad=200)
+    fert.cantidad, fert["cantidad"], fert.get("fe_personalizado"), dict(fert)
+
+`desde` arma un registro a partir de un dict (p. ej. de un archivo JSON): las claves
+ausentes o en None toman el valor por defecto y las desconocidas se ignoran. `a_dict`
+es la inversa y `a_json` sirve como `default=` de json.dump.
+"""
+
+from collections.abc import Mapping
+
+class Registro(Mapping):
+    """
+    Base de los registros de actividad. Cada subclase declara `DEFECTOS` (campo -> valor
+    por defecto, en el orden de los campos) y `__slots__ = tuple(DEFECTOS)`.
+    """
+    __slots__ = ()
+    DEFECTOS = {}
+
+    def __init__(self, **valores):
+        desconocidos = set(valores) - set(self.DEFECTOS)
+        if desconocidos:
+            raise TypeError(f"{type(self).__name__}: campos desconocidos {sorted(desconocidos)}")
+        for campo, defecto in self.DEFECTOS.items():
+            setattr(self, campo, valores.get(campo, defecto))
+
+    @classmethod
+    def desde(cls, datos):
+        """Registro a partir de un dict (o el mismo registro si ya es de esta clase)."""
+        if isinstance(datos, cls):
+            return datos
+        return cls(**{c: datos[c] for c in cls.DEFECTOS if c in datos and datos[c] is not None})
+
+    def campos(self):
+        """Valores de los campos (los argumentos con que se arma una copia)."""
+        return {c: getattr(self, c) for c in self.DEFECTOS}
+
+    def copia(self, **cambios):
+        """Copia del registro con los campos de `cambios` reemplazados."""
+        return type(self)(**{**self.campos(), **cambios})
+
+    def a_dict(self):
+        return {clave: self[clave] for clave in self}
+
+    # --- Lectura como dict ---
+    def __getitem__(self, clave):
+        if clave not in self.DEFECTOS:
+            raise KeyError(clave)
+        return getattr(self, clave)
+
+    def __iter__(self):
+        return iter(self.DEFECTOS)
+
+    def __len__(self):
+        return len(self.DEFECTOS)
+
+    def __repr__(self):
+        campos = ", ".join(f"{c}={v!r}" for c, v in self.campos().items())
+        return f"{type(self).__name__}({campos})"
+
+class Fertilizante(Registro):
+    """
+    Fertilizante aplicado (por hectárea y año de la etapa).
+    - tipo: tipo del catálogo, tipo orgánico o nombre libre de un "Otros"
+    - origen: origen del catálogo (None = el primero del tipo)
+    - cantidad: kg producto/ha (base húmeda en orgánicos; kg del nutriente si modo_otros="nutriente")
+    - N, P, K: contenido en % (N, P₂O₅, K₂O); N=None en orgánicos usa el valor del tipo
+    - es_organico: fertilizante orgánico (FACTORES_ORGANICOS)
+    - fraccion_seca: fracción de materia seca (0-1; None = la del tipo orgánico)
+    - modo_otros: "porcentaje" o "nutriente" para los "Otros" inorgánicos
+    - nutriente: "N", "P" o "K" (modo "nutriente")
+    - fe_personalizado: kg CO₂e/kg producto (None = el del catálogo)
+    """
+    DEFECTOS = {
+        "tipo": "", "origen": None, "cantidad": 0, "N": None, "P": None, "K": None,
+        "es_organico": False, "fraccion_seca": None, "modo_otros": None, "nutriente": None,
+        "fe_personalizado": None,
+    }
+    __slots__ = tuple(DEFECTOS)
+
+class Agroquimico(Registro):
+    """
+    Agroquímico aplicado por ciclo.
+    - categoria: clave de `factores_emision` ("pesticidas", "fungicidas", ...)
+    - tipo: tipo dentro de la categoría; nombre_comercial: nombre libre (por defecto, el tipo)
+    - cantidad_ia: kg ingrediente activo/ha·ciclo
+    - fe: kg CO₂e/kg i.a.; emisiones: kg CO₂e/ha·ciclo (None = sin calcular)
+    """
+    DEFECTOS = {
+        "categoria": "pesticidas", "tipo": "Media", "nombre_comercial": None,
+        "cantidad_ia": 0, "fe": None, "emisiones": None,
+    }
+    __slots__ = tuple(DEFECTOS)
+
+class Labor(Registro):
+    """
+    Labor con una maquinaria (o manual).
+    - tipo_maquinaria: "Manual" para labores sin maquinaria
+    - tipo_combustible: clave de `factores_combustible` ("N/A" en labores manuales)
+    - litros: litros totales de combustible/ha (pasadas × litros por pasada)
+    - fe_personalizado: kg CO₂e/litro (None = el de `factores_combustible`)
+    - emisiones: kg CO₂e/ha (None = sin calcular)
+    """
+    DEFECTOS = {
+        "nombre_labor": "", "tipo_maquinaria": "Otro", "tipo_combustible": "N/A",
+        "litros": 0, "emisiones": None, "fe_personalizado": None,
+    }
+    __slots__ = tuple(DEFECTOS)
+
+class ActividadRiego(Registro):
+    """
+    Actividad de riego y energía.
+    - actividad: nombre de la actividad (por defecto, el tipo); tipo_actividad: tipo de actividad
+    - agua_total_m3: m³/ha aplicados; emisiones_agua: kg CO₂e/ha
+    - consumo_energia: kWh (eléctrico) o litros (combustibles); tipo_energia: clave de `factores_combustible`
+    - fe_energia: kg CO₂e/kWh o kg CO₂e/litro; emisiones_energia: kg CO₂e/ha
+    (emisiones en None = sin calcular)
+    """
+    DEFECTOS = {
+        "actividad": None, "tipo_actividad": "", "agua_total_m3": 0, "emisiones_agua": None,
+        "consumo_energia": 0, "tipo_energia": "Otro", "fe_energia": None, "emisiones_energia": None,
+    }
+    __slots__ = tuple(DEFECTOS)
+
+    def __init__(self, **valores):
+        super().__init__(**valores)
+        if self.actividad is None:
+            self.actividad = self.tipo_actividad
+
+class GestionResiduo(Registro):
+    """
+    Biomasa de residuos vegetales con una vía de gestión (la vía es la clave del detalle
+    de residuos de la etapa: {"Quema": GestionResiduo(...), ...}).
+    - biomasa: kg/ha (base húmeda)
+    - fraccion_seca, fraccion_quemada: fracciones 0-1; ef_ch4, ef_n2o: kg gas/kg materia seca quemada
+    - base_calculo: "base_humeda" o "base_seca" (compostaje); destino: nota del retiro del campo
+    (None = valores por defecto de `factores_residuos`)
+    Se lee como {"biomasa": ..., "ajustes": {...}} (formato de los archivos de proyecto).
+    """
+    DEFECTOS = {
+        "biomasa": 0, "fraccion_seca": None, "fraccion_quemada": None, "ef_ch4": None,
+        "ef_n2o": None, "base_calculo": None, "destino": None,
+    }
+    __slots__ = tuple(DEFECTOS)
+    CLAVES = ("biomasa", "ajustes")
+
+    @classmethod
+    def desde(cls, datos):
+        if isinstance(datos, cls):
+            return datos
+        valores = dict(datos.get("ajustes") or {}, biomasa=datos.get("biomasa"))
+        return cls(**{c: valores[c] for c in cls.DEFECTOS if valores.get(c) is not None})
+
+    @property
+    def ajustes(self):
+        """Ajustes indicados (sin los que quedan en el valor por defecto)."""
+        return {c: v for c, v in self.campos().items() if c != "biomasa" and v is not None}
+
+    def __getitem__(self, clave):
+        if clave not in self.CLAVES:
+            raise KeyError(clave)
+        return getattr(self, clave)
+
+    def __iter__(self):
+        return iter(self.CLAVES)
+
+    def __len__(self):
+        return len(self.CLAVES)
+
+class DetalleResiduo(Registro):
+    """Resultado de una vía de gestión de residuos: biomasa (kg/ha) y emisiones (kg CO₂e/ha)."""
+    DEFECTOS = {"biomasa": 0, "emisiones": 0}
+    __slots__ = tuple(DEFECTOS)
+
+# Categoría de las tablas de ingreso (ver vectorizado.COLUMNAS_ENTRADA) -> tipo de registro
+TIPOS_REGISTRO = {
+    "fertilizantes": Fertilizante,
+    "agroquimicos": Agroquimico,
+    "labores": Labor,
+    "riego": ActividadRiego,
+}
+
+def detalle_residuos(detalle):
+    """Detalle de residuos de una etapa con sus vías como GestionResiduo."""
+    return {via: GestionResiduo.desde(datos) for via, datos in detalle.items()}
+
+def a_json(valor):
+    """`default=` de json.dump: registros como dicts y escalares de NumPy / pandas como números."""
+    if isinstance(valor, Registro):
+        return valor.a_dict()
+    if hasattr(valor, "item"):
+        return valor.item()
+    raise TypeError(f"Objeto de tipo {type(valor).__name__} no serializable en JSON")
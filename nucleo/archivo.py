@@ -0,0 +1,179 @@
+"""
+Archivos de proyecto: guardar y abrir un proyecto completo en un archivo JSON compacto y versionado.
+
+Uso:
+    python -m nucleo.archivo proyecto.agroprint.json [--paquete nombre] [--sin-desglose]
+
+Un archivo guarda los datos de actividad del proyecto (formato de `calcular_proyecto`),
+que cualquier herramienta del núcleo puede calcular sin la interfaz, y, si viene de la
+aplicación, el estado de la interfaz (valores de los widgets y filas de las tablas de
+ingreso) para restaurar la sesión en un solo paso:
+
+    {
+        "formato": "agroprint-proyecto",
+        "version": 1,
+        "paquete_factores": "defecto@...",      # paquete con que se guardó (informativo)
+        "proyecto": {"tipo": "perenne", "etapas": [...]},
+        "interfaz": {"estado": {clave: valor}, "tablas": {sufijo_etapa: {categoria: [fila, ...]}}}
+    }
+
+El JSON se escribe sin espacios; con extensión ".gz" (o comprimir=True) se comprime con
+gzip. Al abrir se acepta también un proyecto JSON simple (solo {"tipo", "etapas"}) y los
+archivos de versiones anteriores se actualizan con `MIGRACIONES`. Para recalcular
+proyectos guardados con otros factores basta con abrirlos y usar otro paquete:
+
+    from nucleo.archivo import leer_proyecto
+    calcular_proyecto(leer_proyecto("predio.agroprint.json"), paquete="otro-paquete")
+"""
+
+import argparse
+import gzip
+import json
+import sys
+
+from .actividades import a_json
+from .etapas import calcular_proyecto, quitar_desglose
+from .paquetes import paquete_activo
+
+FORMATO_ARCHIVO = "agroprint-proyecto"
+VERSION_ARCHIVO = 1
+EXTENSION_ARCHIVO = ".agroprint.json"
+# Versión -> función que lleva un archivo de esa versión a la siguiente
+MIGRACIONES = {}
+TIPOS_ESTADO = (str, int, float, bool, type(None))
+
+def _valor_json(valor):
+    """Registros de actividad y escalares de NumPy / pandas, que json no serializa por sí solo."""
+    try:
+        return a_json(valor)
+    except TypeError:
+        raise TypeError(f"Valor no serializable en el archivo de proyecto: {valor!r}") from None
+
+def estado_serializable(estado, excluir=(), prefijos_excluidos=()):
+    """
+    Valores de `estado` (p. ej. st.session_state) que se pueden guardar: escalares y listas
+    de escalares (los valores de los widgets). Se omiten objetos (gráficos, grafos, tablas,
+    archivos), las claves de `excluir` y las que empiezan con `prefijos_excluidos`.
+    """
+    guardado = {}
+    for clave in estado.keys():
+        clave = str(clave)
+        if clave in excluir or clave.startswith(tuple(prefijos_excluidos)):
+            continue
+        valor = estado[clave]
+        if isinstance(valor, (list, tuple)):
+            if not all(isinstance(v, TIPOS_ESTADO) for v in valor):
+                continue
+            valor = list(valor)
+        elif not isinstance(valor, TIPOS_ESTADO):
+            continue
+        guardado[clave] = valor
+    return guardado
+
+def crear_archivo(proyecto, estado=None, tablas=None):
+    """
+    Contenido de un archivo de proyecto.
+    - proyecto: datos de actividad (formato de `calcular_proyecto`)
+    - estado: valores de la interfaz (ver `estado_serializable`)
+    - tablas: filas de las tablas de ingreso por etapa {sufijo: {categoria: [fila, ...]}}
+    """
+    archivo = {
+        "formato": FORMATO_ARCHIVO,
+        "version": VERSION_ARCHIVO,
+        "paquete_factores": paquete_activo().identificador(),
+        "proyecto": proyecto
+    }
+    if estado is not None or tablas is not None:
+        archivo["interfaz"] = {"estado": estado or {}, "tablas": tablas or {}}
+    return archivo
+
+def serializar(archivo, comprimir=False):
+    """Bytes del archivo: JSON sin espacios (UTF-8), comprimido con gzip si comprimir=True."""
+    datos = json.dumps(archivo, ensure_ascii=False, separators=(",", ":"), default=_valor_json).encode("utf-8")
+    if comprimir:
+        # mtime=0: el mismo proyecto produce siempre los mismos bytes
+        return gzip.compress(datos, mtime=0)
+    return datos
+
+def guardar_archivo(ruta, archivo):
+    """Escribe un archivo de proyecto (comprimido si la ruta termina en ".gz")."""
+    with open(ruta, "wb") as f:
+        f.write(serializar(archivo, comprimir=str(ruta).lower().endswith(".gz")))
+
+def _migrar(archivo):
+    version = archivo.get("version")
+    if not isinstance(version, int) or version < 1:
+        raise ValueError(f"Versión de archivo de proyecto no válida: {version!r}")
+    if version > VERSION_ARCHIVO:
+        raise ValueError(
+            f"El archivo es de la versión {version}, posterior a la admitida ({VERSION_ARCHIVO}); "
+            "actualice AgroPrint para abrirlo"
+        )
+    while archivo["version"] < VERSION_ARCHIVO:
+        archivo = MIGRACIONES[archivo["version"]](archivo)
+    return archivo
+
+def leer_archivo(fuente):
+    """
+    Abre un archivo de proyecto y lo lleva a la versión actual.
+    - fuente: ruta, bytes, texto JSON o archivo abierto (p. ej. el de st.file_uploader)
+    """
+    if isinstance(fuente, (bytes, bytearray)):
+        datos = bytes(fuente)
+    elif hasattr(fuente, "read"):
+        datos = fuente.read()
+    elif isinstance(fuente, str) and fuente.lstrip().startswith("{"):
+        datos = fuente
+    else:
+        with open(fuente, "rb") as f:
+            datos = f.read()
+    if isinstance(datos, bytes):
+        if datos[:2] == b"\x1f\x8b":
+            datos = gzip.decompress(datos)
+        datos = datos.decode("utf-8-sig")
+    try:
+        archivo = json.loads(datos)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"El archivo no es un proyecto JSON válido: {e}") from None
+    return abrir_archivo(archivo)
+
+def abrir_archivo(archivo):
+    """
+    Valida el contenido ya leído de un archivo de proyecto (dict) y lo lleva a la versión
+    actual. Un proyecto simple ({"tipo", "etapas"}) se devuelve como archivo sin interfaz.
+    """
+    if not isinstance(archivo, dict):
+        raise ValueError("El archivo no es un proyecto JSON válido")
+    if "formato" not in archivo and "etapas" in archivo:
+        return crear_archivo(archivo)
+    if archivo.get("formato") != FORMATO_ARCHIVO:
+        raise ValueError(f"El archivo no es un proyecto de AgroPrint (formato {archivo.get('formato')!r})")
+    return _migrar(archivo)
+
+def leer_proyecto(fuente):
+    """Datos de actividad de un archivo de proyecto (o de un proyecto JSON simple)."""
+    return leer_archivo(fuente)["proyecto"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m nucleo.archivo",
+        description="Calcula la huella de un proyecto guardado desde la aplicación (o de un proyecto JSON)."
+    )
+    parser.add_argument("archivo", help="Archivo de proyecto (.agroprint.json, .gz o proyecto JSON)")
+    parser.add_argument("--paquete", help="Paquete de factores (nombre de nucleo/datos o ruta .json)")
+    parser.add_argument("--sin-desglose", action="store_true", help="Omitir los desgloses por actividad")
+    args = parser.parse_args(argv)
+
+    archivo = leer_archivo(args.archivo)
+    resultados = calcular_proyecto(archivo["proyecto"], paquete=args.paquete)
+    if args.sin_desglose:
+        resultados = quitar_desglose(resultados)
+    if resultados["paquete_factores"] != archivo["paquete_factores"]:
+        print(f"Guardado con {archivo['paquete_factores']}; calculado con {resultados['paquete_factores']}",
+              file=sys.stderr)
+    json.dump(resultados, sys.stdout, ensure_ascii=False, indent=2, default=_valor_json)
+    print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
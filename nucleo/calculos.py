@@ -0,0 +1,429 @@
+"""
+Calculadoras de emisiones de AgroPrint (sin dependencias de interfaz).
+
+Cada función recibe los mismos registros (ver `nucleo.actividades`) que construyen las
+funciones `ingresar_*` de la aplicación, de modo que puede usarse tanto desde
+Streamlit como desde procesos por lotes; también acepta los mismos datos como dicts
+(p. ej. leídos de un JSON), que se convierten en registros.
+"""
+
+from .actividades import ActividadRiego, Agroquimico, DetalleResiduo, Fertilizante, GestionResiduo, Labor
+from .paquetes import paquete_activo
+
+# -----------------------------
+# Fertilizantes
+# -----------------------------
+def resolver_fertilizante(fert, paquete=None):
+    """
+    Resuelve una sola vez el N aplicado, las fracciones de pérdida y el factor de
+    producción de un fertilizante (Fertilizante o dict; por año, sin multiplicar por la duración).
+    Devuelve: dict con es_organico, cantidad, n_aplicado, frac_vol, frac_lix,
+    fe_produccion (kg CO2e/kg producto) y es_urea.
+    - paquete: paquete de factores (por defecto, el activo)
+    """
+    f = paquete if paquete is not None else paquete_activo()
+    fert = Fertilizante.desde(fert)
+    cantidad = fert.cantidad
+    if fert.es_organico:
+        valores = f["FACTORES_ORGANICOS"].get(fert.tipo, f["FACTORES_ORGANICOS"]["Otros"])
+        fraccion_seca = fert.fraccion_seca if fert.fraccion_seca is not None else valores["fraccion_seca"]
+        n = (fert.N if fert.N is not None else valores["N"]) / 100
+        return {
+            "es_organico": True,
+            "cantidad": cantidad,
+            "n_aplicado": cantidad * fraccion_seca * n,
+            "frac_vol": f["FRAC_VOLATILIZACION_ORG"],
+            "frac_lix": f["FRAC_LIXIVIACION"],
+            "fe_produccion": 0,
+            "es_urea": False
+        }
+
+    if fert.tipo == "Otros" or fert.modo_otros in ["porcentaje", "nutriente"]:
+        if fert.modo_otros == "porcentaje":
+            n_aplicado = cantidad * ((fert.N or 0) / 100)
+        elif fert.modo_otros == "nutriente":
+            nutriente = (fert.nutriente or "").strip().upper()
+            n_aplicado = cantidad if nutriente == "N" else 0
+        else:
+            n_aplicado = 0
+        # FE personalizado para "Otros"
+        fe = fert.fe_personalizado
+        return {
+            "es_organico": False,
+            "cantidad": cantidad,
+            "n_aplicado": n_aplicado,
+            "frac_vol": f["FRAC_VOLATILIZACION_INORG"] if n_aplicado > 0 else 0,
+            "frac_lix": f["FRAC_LIXIVIACION"] if n_aplicado > 0 else 0,
+            "fe_produccion": fe if fe is not None and fe > 0 else 0,
+            "es_urea": False
+        }
+
+    tipo = fert.tipo
+    variante = f.registro.variante(tipo, fert.origen)
+    if not variante:
+        return {
+            "es_organico": False,
+            "cantidad": 0,
+            "n_aplicado": 0,
+            "frac_vol": f["FRAC_VOLATILIZACION_INORG"],
+            "frac_lix": f["FRAC_LIXIVIACION"],
+            "fe_produccion": 0,
+            "es_urea": False
+        }
+    fe = fert.fe_personalizado
+    if fe is None or fe <= 0:
+        fe = variante.get("FE_produccion_producto", 0) or 0
+    return {
+        "es_organico": False,
+        "cantidad": cantidad,
+        "n_aplicado": cantidad * variante.get("N_porcentaje", 0),
+        "frac_vol": variante.get("Frac_volatilizacion", f["FRAC_VOLATILIZACION_INORG"]),
+        "frac_lix": variante.get("Frac_lixiviacion", f["FRAC_LIXIVIACION"]),
+        "fe_produccion": fe,
+        # --- CO2 POR HIDRÓLISIS DE UREA (IPCC 2006 Vol.4 Cap.2) ---
+        "es_urea": "Urea" in tipo
+    }
+
+def calcular_fertilizantes(fertilizantes, duracion):
+    """
+    Núcleo único de cálculo de fertilizantes: resuelve cada fertilizante una vez y
+    devuelve todo lo que necesitan las distintas vistas.
+    - fertilizantes: lista de Fertilizante (o dicts) de `ingresar_fertilizantes`
+    - duracion: años de la etapa (producción, CO2 de urea y N2O total se multiplican por ella;
+      el N2O del desglose queda por año)
+    Devuelve: dict con
+        emision_produccion, emision_co2_urea, n2o_directo_co2e, n2o_indirecto_co2e,
+        n2o_ind_volatilizacion_co2e, n2o_ind_lixiviacion_co2e (kg CO2e/ha, totales de la etapa),
+        n_aplicado_inorg, n_aplicado_org, n_volatilizado, n_lixiviado (kg N/ha, totales de la etapa),
+        desglose (lista de dicts por fertilizante)
+    """
+    f = paquete_activo()
+    GWP, EF1, EF4, EF5 = f["GWP"], f["EF1"], f["EF4"], f["EF5"]
+    emision_produccion = 0
+    emision_co2_urea = 0
+    n_aplicado_inorg = 0
+    n_aplicado_org = 0
+    volatilizacion_inorg = 0
+    lixiviacion_inorg = 0
+    volatilizacion_org = 0
+    lixiviacion_org = 0
+
+    desglose = []
+
+    for fert in fertilizantes:
+        fert = Fertilizante.desde(fert)
+        r = resolver_fertilizante(fert, f)
+        n_aplicado = r["n_aplicado"]
+        n_volatilizado = n_aplicado * r["frac_vol"]
+        n_lixiviado = n_aplicado * r["frac_lix"]
+        if r["es_organico"]:
+            n_aplicado_org += n_aplicado
+            volatilizacion_org += n_volatilizado
+            lixiviacion_org += n_lixiviado
+        else:
+            n_aplicado_inorg += n_aplicado
+            volatilizacion_inorg += n_volatilizado
+            lixiviacion_inorg += n_lixiviado
+
+        em_prod = r["cantidad"] * r["fe_produccion"] * duracion if r["fe_produccion"] else 0
+        em_co2_urea_individual = r["cantidad"] * f["EF_CO2_UREA"] * duracion if r["es_urea"] else 0
+        emision_produccion += em_prod
+        emision_co2_urea += em_co2_urea_individual
+
+        # --- Emisiones N2O directas e indirectas por fertilizante individual (por año) ---
+        em_n2o_dir = n_aplicado * EF1 * (44/28) * GWP["N2O"]
+        em_n2o_ind_vol = n_volatilizado * EF4 * (44/28) * GWP["N2O"]
+        em_n2o_ind_lix = n_lixiviado * EF5 * (44/28) * GWP["N2O"]
+        em_n2o_ind = em_n2o_ind_vol + em_n2o_ind_lix
+
+        desglose.append({
+            "Tipo fertilizante": "Orgánico" if r["es_organico"] else "Inorgánico",
+            "tipo": fert.tipo or fert.nutriente or "",
+            "origen": fert.origen or "",
+            "cantidad": fert.cantidad,
+            "emision_produccion": em_prod,
+            "emision_co2_urea": em_co2_urea_individual,
+            "emision_n2o_directa": em_n2o_dir,
+            "emision_n2o_indirecta": em_n2o_ind,
+            "emision_n2o_ind_volatilizacion": em_n2o_ind_vol,
+            "emision_n2o_ind_lixiviacion": em_n2o_ind_lix,
+            "total": em_prod + em_co2_urea_individual + em_n2o_dir + em_n2o_ind
+        })
+
+    # --- EMISIONES N2O DIRECTAS E INDIRECTAS (totales de la etapa) ---
+    total_n_aplicado_inorg = n_aplicado_inorg * duracion
+    total_n_aplicado_org = n_aplicado_org * duracion
+    total_n_volatilizado = volatilizacion_inorg * duracion + volatilizacion_org * duracion
+    total_n_lixiviado = lixiviacion_inorg * duracion + lixiviacion_org * duracion
+    total_n_aplicado = total_n_aplicado_inorg + total_n_aplicado_org
+
+    n2o_directo = total_n_aplicado * EF1 * (44/28)
+    n2o_ind_vol = total_n_volatilizado * EF4 * (44/28)
+    n2o_ind_lix = total_n_lixiviado * EF5 * (44/28)
+
+    return {
+        "emision_produccion": emision_produccion,
+        "emision_co2_urea": emision_co2_urea,
+        "n2o_directo_co2e": n2o_directo * GWP["N2O"],
+        "n2o_indirecto_co2e": (n2o_ind_vol + n2o_ind_lix) * GWP["N2O"],
+        "n2o_ind_volatilizacion_co2e": n2o_ind_vol * GWP["N2O"],
+        "n2o_ind_lixiviacion_co2e": n2o_ind_lix * GWP["N2O"],
+        "n_aplicado_inorg": total_n_aplicado_inorg,
+        "n_aplicado_org": total_n_aplicado_org,
+        "n_volatilizado": total_n_volatilizado,
+        "n_lixiviado": total_n_lixiviado,
+        "desglose": desglose
+    }
+
+def calcular_emisiones_n2o_fertilizantes_desglosado(fertilizantes, duracion):
+    """
+    Vista de `calcular_fertilizantes` con solo el N2O.
+    Devuelve: emision_n2o_co2e_total, total_n_aplicado, n2o_directo_co2e, n2o_indirecto_co2e
+    """
+    r = calcular_fertilizantes(fertilizantes, duracion)
+    return (
+        r["n2o_directo_co2e"] + r["n2o_indirecto_co2e"],
+        r["n_aplicado_inorg"] + r["n_aplicado_org"],
+        r["n2o_directo_co2e"],
+        r["n2o_indirecto_co2e"]
+    )
+
+def calcular_emisiones_fertilizantes(fert_data, duracion):
+    """
+    Vista de `calcular_fertilizantes` con la firma usada por las etapas.
+    Devuelve: emision_produccion, emision_co2_urea, n2o_directo_co2e, n2o_indirecto_co2e, desglose
+    """
+    r = calcular_fertilizantes(fert_data.get("fertilizantes", []), duracion)
+    return r["emision_produccion"], r["emision_co2_urea"], r["n2o_directo_co2e"], r["n2o_indirecto_co2e"], r["desglose"]
+
+# -----------------------------
+# Agroquímicos
+# -----------------------------
+def calcular_agroquimico(categoria, tipo, cantidad_ia, fe=None, nombre_comercial=None):
+    """
+    Arma el registro (Agroquimico) de un agroquímico y calcula sus emisiones por ciclo.
+    - categoria: clave de `factores_emision` ("pesticidas", "fungicidas", ...)
+    - cantidad_ia: kg ingrediente activo/ha·ciclo
+    - fe: FE personalizado (kg CO₂e/kg i.a.); si es None se usa el de la base de datos
+    """
+    if fe is None:
+        f = paquete_activo()
+        fe = f["factores_emision"].get(categoria, {}).get(tipo, f["valores_defecto"]["fe_agroquimico"])
+    return Agroquimico(
+        categoria=categoria,
+        tipo=tipo,
+        nombre_comercial=nombre_comercial if nombre_comercial else tipo,
+        cantidad_ia=cantidad_ia,
+        fe=fe,
+        emisiones=cantidad_ia * fe
+    )
+
+def calcular_emisiones_agroquimicos(agroquimicos, duracion):
+    total = 0
+    for ag in agroquimicos:
+        total += Agroquimico.desde(ag).emisiones * duracion
+    return total
+
+# -----------------------------
+# Maquinaria
+# -----------------------------
+def calcular_labor(nombre_labor, tipo_maquinaria, tipo_combustible, litros, fe_personalizado=None):
+    """
+    Arma el registro (Labor) de una labor (una maquinaria) y calcula sus emisiones.
+    - litros: litros totales de combustible (pasadas × litros por pasada)
+    - fe_personalizado: kg CO₂e/litro; si es None se usa `factores_combustible`
+    Las labores manuales se registran con tipo_maquinaria "Manual" y sin emisiones.
+    """
+    if tipo_maquinaria == "Manual":
+        return Labor(
+            nombre_labor=nombre_labor,
+            tipo_maquinaria="Manual",
+            tipo_combustible="N/A",
+            litros=0,
+            emisiones=0,
+            fe_personalizado=None
+        )
+    if fe_personalizado is not None:
+        fe_comb = fe_personalizado
+    else:
+        fe_comb = paquete_activo()["factores_combustible"].get(tipo_combustible, 0)
+    return Labor(
+        nombre_labor=nombre_labor,
+        tipo_maquinaria=tipo_maquinaria,
+        tipo_combustible=tipo_combustible,
+        litros=litros,
+        emisiones=litros * fe_comb,
+        fe_personalizado=fe_personalizado
+    )
+
+def calcular_emisiones_maquinaria(labores, duracion):
+    """
+    Calcula las emisiones de maquinaria usando el FE personalizado si existe,
+    o el de la base de datos si no.
+    """
+    factores_combustible = paquete_activo()["factores_combustible"]
+    total = 0
+    for labor in labores:
+        labor = Labor.desde(labor)
+        fe = labor.fe_personalizado
+        if fe is not None and fe > 0:
+            fe_utilizado = fe
+        else:
+            fe_utilizado = factores_combustible.get(labor.tipo_combustible, 0)
+        total += labor.litros * fe_utilizado
+    return total * duracion
+
+# -----------------------------
+# Riego y energía
+# -----------------------------
+def calcular_actividad_riego(actividad, tipo_actividad, agua_total_m3, consumo_energia, tipo_energia, fe_energia=None):
+    """
+    Arma el registro (ActividadRiego) de una actividad de riego y energía y calcula sus emisiones.
+    - agua_total_m3: m³/ha aplicados
+    - consumo_energia: kWh (eléctrico) o litros (combustibles)
+    - fe_energia: FE personalizado; si es None se usa `factores_combustible`
+    """
+    f = paquete_activo()
+    if fe_energia is None:
+        fe_energia = f["factores_combustible"].get(tipo_energia, f["valores_defecto"]["fe_combustible_generico"])
+    return ActividadRiego(
+        actividad=actividad,
+        tipo_actividad=tipo_actividad,
+        agua_total_m3=agua_total_m3,
+        emisiones_agua=agua_total_m3 * 1000 * f["valores_defecto"]["fe_agua"],
+        consumo_energia=consumo_energia,
+        tipo_energia=tipo_energia,
+        fe_energia=fe_energia,
+        emisiones_energia=consumo_energia * fe_energia
+    )
+
+def calcular_emisiones_riego(energia_actividades, duracion=1):
+    """
+    Suma las emisiones de agua y energía de las actividades de riego.
+    Devuelve: (emisiones_agua, emisiones_energia) multiplicadas por la duración.
+    """
+    em_agua_total = 0
+    em_energia_total = 0
+    for ea in energia_actividades:
+        ea = ActividadRiego.desde(ea)
+        em_agua_total += ea.emisiones_agua
+        em_energia_total += ea.emisiones_energia
+    return em_agua_total * duracion, em_energia_total * duracion
+
+# -----------------------------
+# Residuos vegetales
+# -----------------------------
+def calcular_emisiones_residuos(detalle):
+    """
+    Calcula las emisiones de GEI por gestión de residuos vegetales según IPCC 2006.
+    - detalle: dict {"vía": GestionResiduo} (o {"vía": {"biomasa": ..., "ajustes": {...}}})
+    Devuelve: total_emisiones, detalle_emisiones ({"vía": DetalleResiduo} con biomasa y emisiones)
+    """
+    total_emisiones = 0
+    detalle_emisiones = {}
+    for via, datos in detalle.items():
+        datos = GestionResiduo.desde(datos)
+        biomasa = datos.biomasa
+        emisiones = 0
+        if via == "Quema":
+            em_ch4, em_n2o = calcular_emisiones_quema_residuos(
+                biomasa,
+                fraccion_seca=datos.fraccion_seca,
+                fraccion_quemada=datos.fraccion_quemada,
+                ef_ch4=datos.ef_ch4,
+                ef_n2o=datos.ef_n2o
+            )
+            emisiones = em_ch4 + em_n2o
+        elif via == "Compostaje":
+            em_ch4, em_n2o = calcular_emisiones_compostaje(
+                biomasa,
+                base_calculo=datos.base_calculo or "base_humeda",
+                fraccion_seca=datos.fraccion_seca
+            )
+            emisiones = em_ch4 + em_n2o
+        elif via == "Incorporación al suelo":
+            emisiones = 0  # No se consideran emisiones directas según IPCC
+        elif via == "Retiro del campo":
+            emisiones = 0  # No se consideran emisiones dentro del predio
+        elif via == "Sin gestión":
+            emisiones = 0
+        detalle_emisiones[via] = DetalleResiduo(biomasa=biomasa, emisiones=emisiones)
+        total_emisiones += emisiones
+    return total_emisiones, detalle_emisiones
+
+def calcular_emisiones_quema_residuos(
+    biomasa,
+    fraccion_seca=None,
+    fraccion_quemada=None,
+    ef_ch4=None,
+    ef_n2o=None
+):
+    f = paquete_activo()
+    GWP = f["GWP"]
+    if fraccion_seca is None:
+        fraccion_seca = f["factores_residuos"]["fraccion_seca"]
+    if fraccion_quemada is None:
+        fraccion_quemada = f["FRACCION_QUEMADA"]
+    if ef_ch4 is None:
+        ef_ch4 = f["EF_CH4_QUEMA"]
+    if ef_n2o is None:
+        ef_n2o = f["EF_N2O_QUEMA"]
+    biomasa_seca_quemada = biomasa * fraccion_seca * fraccion_quemada
+    emision_CH4 = biomasa_seca_quemada * ef_ch4
+    emision_N2O = biomasa_seca_quemada * ef_n2o
+    emision_CH4_CO2e = emision_CH4 * GWP["CH4"]
+    emision_N2O_CO2e = emision_N2O * GWP["N2O"]
+    return emision_CH4_CO2e, emision_N2O_CO2e
+
+def calcular_emisiones_compostaje(
+    biomasa,
+    base_calculo="base_humeda",
+    fraccion_seca=None
+):
+    """
+    Calcula emisiones de CH4 y N2O por compostaje aeróbico según IPCC 2006 Vol.5 Cap.3 Tabla 3.4.
+    
+    Args:
+        biomasa: cantidad de biomasa compostada (kg, húmeda)
+        base_calculo: "base_seca" o "base_humeda" según factores IPCC
+        fraccion_seca: fracción seca de la biomasa (solo para base_seca)
+    
+    Returns:
+        tuple: (emision_CH4_CO2e, emision_N2O_CO2e) en kg CO2e
+    """
+    f = paquete_activo()
+    GWP = f["GWP"]
+    factores_residuos = f["factores_residuos"]
+    if fraccion_seca is None:
+        fraccion_seca = factores_residuos["fraccion_seca"]
+    
+    ef = factores_residuos["compostaje"][base_calculo]
+    
+    if base_calculo == "base_seca":
+        # Aplicar factores a materia seca
+        ms = biomasa * fraccion_seca
+        em_ch4 = ms * ef["EF_CH4"]
+        em_n2o = ms * ef["EF_N2O"]
+    else:  # base_humeda
+        # Aplicar factores directamente a materia húmeda
+        em_ch4 = biomasa * ef["EF_CH4"]
+        em_n2o = biomasa * ef["EF_N2O"]
+    
+    em_ch4_co2e = em_ch4 * GWP["CH4"]
+    em_n2o_co2e = em_n2o * GWP["N2O"]
+    return em_ch4_co2e, em_n2o_co2e
+
+def calcular_emisiones_incorporacion(biomasa, fraccion_seca=None, modo="simple"):
+    """
+    Calcula emisiones por incorporación de residuos vegetales al suelo.
+    - biomasa: cantidad de biomasa incorporada (kg/ha, húmeda)
+    - fraccion_seca: fracción seca de la biomasa (por defecto, valor recomendado)
+    - modo: "simple" (emisión nula) o "avanzado" (secuestro de carbono, pendiente)
+    """
+    if fraccion_seca is None:
+        fraccion_seca = paquete_activo()["factores_residuos"]["fraccion_seca"]
+    if modo == "simple":
+        return 0
+    elif modo == "avanzado":
+        return 0
+
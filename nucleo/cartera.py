@@ -0,0 +1,138 @@
+"""
+Cálculo de carteras de predios en paralelo (varios procesos) y agregación de resultados.
+
+Los predios se reparten en bloques entre un pool de procesos; los resultados se
+devuelven y se agregan siempre en el orden de entrada, de modo que la salida y los
+totales son idénticos con cualquier número de procesos (incluido 1, sin pool).
+La entrada se consume de a poco (como máximo unos pocos bloques por proceso en
+vuelo), así que puede venir de un generador sobre un archivo grande.
+
+    from nucleo.cartera import calcular_cartera, AcumuladorCartera
+
+    acumulador = AcumuladorCartera()
+    for finca, resultados in calcular_cartera(fincas, procesos=8):
+        acumulador.agregar(finca, resultados)
+    resumen = acumulador.resumen()
+
+`fincas` es un iterable de tuplas (finca, proyecto) con proyectos como los de
+`calcular_proyecto`. La clave opcional "superficie" (ha) del proyecto pondera el
+predio en los promedios de la cartera (por defecto 1 ha).
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .etapas import FUENTES, calcular_proyecto, quitar_desglose
+from .memoria import calcular_etapa_lote
+
+def _calcular_bloque(bloque, paquete=None, sin_desglose=False, memoizar=False):
+    calculadora = calcular_etapa_lote if memoizar else None
+    resultados = []
+    for finca, proyecto in bloque:
+        if paquete and "paquete" not in proyecto:
+            proyecto = dict(proyecto, paquete=paquete)
+        r = calcular_proyecto(proyecto, calculadora=calculadora)
+        if sin_desglose:
+            r = quitar_desglose(r)
+        if "superficie" in proyecto:
+            r["superficie"] = proyecto["superficie"]
+        resultados.append((finca, r))
+    return resultados
+
+def _bloques(fincas, tamano_bloque):
+    iterador = iter(fincas)
+    while True:
+        bloque = list(islice(iterador, tamano_bloque))
+        if not bloque:
+            return
+        yield bloque
+
+def calcular_cartera(fincas, procesos=None, tamano_bloque=64, paquete=None,
+                     sin_desglose=False, progreso=None, memoizar=False):
+    """
+    Calcula una cartera de predios repartiéndola entre procesos.
+    - fincas: iterable de (finca, proyecto)
+    - procesos: número de procesos (por defecto, todos los núcleos; 1 = sin pool)
+    - tamano_bloque: predios por tarea enviada a un proceso
+    - paquete: nombre o ruta del paquete de factores para los predios que no indican uno
+    - progreso: función opcional progreso(fincas_terminadas), llamada tras cada bloque
+    - memoizar: reutilizar los resultados de etapas idénticas entre predios (caché LRU
+      de `nucleo.memoria`, una por proceso). Conviene con etapas repetidas y grandes;
+      en etapas chicas, armar la clave cuesta lo mismo que calcularlas.
+    Genera (finca, resultados_globales) en el orden de entrada.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    hechas = 0
+    if procesos == 1:
+        for bloque in _bloques(fincas, tamano_bloque):
+            for par in _calcular_bloque(bloque, paquete, sin_desglose, memoizar):
+                yield par
+            hechas += len(bloque)
+            if progreso:
+                progreso(hechas)
+        return
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        for bloque in _bloques(fincas, tamano_bloque):
+            pendientes.append(pool.submit(_calcular_bloque, bloque, paquete, sin_desglose, memoizar))
+            # Se limita el trabajo en vuelo para no leer toda la entrada en memoria
+            while len(pendientes) >= 2 * procesos:
+                resultados = pendientes.popleft().result()
+                yield from resultados
+                hechas += len(resultados)
+                if progreso:
+                    progreso(hechas)
+        while pendientes:
+            resultados = pendientes.popleft().result()
+            yield from resultados
+            hechas += len(resultados)
+            if progreso:
+                progreso(hechas)
+
+class AcumuladorCartera:
+    """
+    Agrega resultados de predios en totales de cartera: emisiones por fuente y por
+    etapa, producción y huella por kg, ponderando cada predio por su superficie.
+    """
+    def __init__(self):
+        self.n_fincas = 0
+        self.superficie = 0
+        self.emisiones = 0
+        self.produccion = 0
+        self.emisiones_fuentes = {f: 0 for f in FUENTES}
+        self.emisiones_etapas = {}
+        self.produccion_etapas = {}
+
+    def agregar(self, finca, resultados):
+        sup = resultados.get("superficie", 1)
+        self.n_fincas += 1
+        self.superficie += sup
+        self.emisiones += resultados["em_total"] * sup
+        self.produccion += resultados["prod_total"] * sup
+        for f in FUENTES:
+            self.emisiones_fuentes[f] += resultados["emisiones_fuentes"].get(f, 0) * sup
+        for etapa, em in resultados["emisiones_etapas"].items():
+            self.emisiones_etapas[etapa] = self.emisiones_etapas.get(etapa, 0) + em * sup
+            prod = resultados["produccion_etapas"].get(etapa, 0)
+            self.produccion_etapas[etapa] = self.produccion_etapas.get(etapa, 0) + prod * sup
+
+    def resumen(self):
+        """
+        Totales de la cartera (kg CO2e y kg de producto sobre toda la superficie),
+        promedios por hectárea y huella de carbono media (kg CO2e/kg).
+        """
+        sup = self.superficie or 1
+        return {
+            "n_fincas": self.n_fincas,
+            "superficie_ha": self.superficie,
+            "em_total": self.emisiones,
+            "prod_total": self.produccion,
+            "em_promedio_ha": self.emisiones / sup,
+            "huella_kg_co2e_kg": self.emisiones / self.produccion if self.produccion else None,
+            "emisiones_fuentes": dict(self.emisiones_fuentes),
+            "emisiones_etapas": dict(self.emisiones_etapas),
+            "produccion_etapas": dict(self.produccion_etapas)
+        }
@@ -0,0 +1,262 @@
+"""
+Barrido de escenarios ("¿qué pasa si...?") sobre un proyecto ya ingresado.
+
+Uso:
+    python -m nucleo.escenarios proyecto.json escenarios.json -o comparacion.csv
+
+El proyecto usa el formato de `calcular_proyecto`. Los escenarios son una grilla de
+cambios por eje; se evalúan todas las combinaciones:
+
+    {
+        "fertilizantes": {"Actual": null, "Urea UE": {"Urea": "Unión Europea"}},
+        "combustible": [null, {"Diesel (100% mineral)": "Diesel (mezcla promedio biocombustibles)"}],
+        "escala_combustible": {"Actual": 1.0, "-20 % diésel": 0.8},
+        "energia_riego": [null, {"Diesel (100% mineral)": "Eléctrico"}],
+        "residuos": {"Actual": null, "Compostar todo": {"Compostaje": 1.0}}
+    }
+
+Ejes (cada uno como lista de opciones o como dict {etiqueta: opción}; null = sin cambio):
+    - fertilizantes:      {tipo: origen} para los fertilizantes inorgánicos de ese tipo
+    - combustible:        {combustible actual: nuevo} en las labores de maquinaria
+    - escala_combustible: factor sobre los litros de maquinaria (0.8 = 20 % menos)
+    - energia_riego:      {energía actual: nueva} (o una energía para todas) en el riego;
+                          el consumo se mantiene y se usa el FE de la nueva energía
+    - residuos:           {vía: fracción} de la biomasa total de residuos de cada etapa
+
+Cada fuente de cada etapa se calcula una vez por combinación de los ejes que la afectan
+(los fertilizantes solo dependen de "fertilizantes", la maquinaria de "combustible" y
+"escala_combustible", etc.), y los escenarios se arman sumando esos sub-resultados: una
+grilla de 5 ejes × 4 opciones (1024 escenarios) necesita unas pocas decenas de cálculos
+por etapa. La salida tiene una fila por escenario con las emisiones por fuente, el total,
+la huella por kg y la diferencia (%) respecto del proyecto sin cambios.
+"""
+
+import argparse
+import csv
+import json
+import sys
+from itertools import product
+
+from .archivo import leer_proyecto
+from .calculos import calcular_actividad_riego
+from .etapas import FUENTES, calcular_fuente
+from .paquetes import usar_paquete
+
+# Eje -> fuentes que recalcula
+EJES = {
+    "fertilizantes": ["Fertilizantes"],
+    "combustible": ["Maquinaria"],
+    "escala_combustible": ["Maquinaria"],
+    "energia_riego": ["Riego"],
+    "residuos": ["Residuos"],
+}
+VIAS_RESIDUOS = ["Quema", "Compostaje", "Incorporación al suelo", "Retiro del campo", "Sin gestión"]
+
+def _etiqueta(valor):
+    if valor is None:
+        return "Base"
+    if isinstance(valor, dict):
+        return ", ".join(f"{k} → {v}" for k, v in valor.items())
+    return str(valor)
+
+def _opciones(eje, opciones):
+    if isinstance(opciones, dict):
+        return list(opciones.items())
+    return [(_etiqueta(valor), valor) for valor in opciones]
+
+def _validar(eje, valor, f):
+    if valor is None:
+        return
+    if eje == "fertilizantes":
+        for tipo, origen in valor.items():
+            if origen not in f.registro.origenes(tipo):
+                raise ValueError(f"Fertilizante '{tipo}' sin origen '{origen}' en el paquete de factores")
+    elif eje in ("combustible", "energia_riego"):
+        nuevos = valor.values() if isinstance(valor, dict) else [valor]
+        for combustible in nuevos:
+            if combustible not in f["factores_combustible"]:
+                raise ValueError(f"Combustible desconocido '{combustible}' en el eje '{eje}'")
+    elif eje == "escala_combustible":
+        if valor < 0:
+            raise ValueError("escala_combustible no puede ser negativa")
+    elif eje == "residuos":
+        desconocidas = set(valor) - set(VIAS_RESIDUOS)
+        if desconocidas:
+            raise ValueError(f"Vías de residuos desconocidas: {sorted(desconocidas)}; use {VIAS_RESIDUOS}")
+        if any(v < 0 for v in valor.values()) or abs(sum(valor.values()) - 1) > 1e-6:
+            raise ValueError("Las fracciones de residuos deben ser no negativas y sumar 1")
+
+def aplicar_cambios(etapa, cambios):
+    """Copia de la etapa con los cambios de escenario aplicados ({eje: valor}, None = sin cambio)."""
+    etapa = dict(etapa)
+    origenes = cambios.get("fertilizantes")
+    if origenes:
+        etapa["fertilizantes"] = [
+            dict(fert, origen=origenes[fert.get("tipo")])
+            if not fert.get("es_organico", False) and fert.get("tipo") in origenes else fert
+            for fert in etapa.get("fertilizantes", [])
+        ]
+    combustibles = cambios.get("combustible") or {}
+    escala = cambios.get("escala_combustible")
+    if combustibles or escala is not None:
+        labores = []
+        for labor in etapa.get("labores", []):
+            labor = dict(labor)
+            labor.pop("emisiones", None)
+            if labor.get("tipo_combustible") in combustibles:
+                labor["tipo_combustible"] = combustibles[labor["tipo_combustible"]]
+            if escala is not None:
+                labor["litros"] = labor.get("litros", 0) * escala
+            labores.append(labor)
+        etapa["labores"] = labores
+    energia = cambios.get("energia_riego")
+    if energia:
+        riego = []
+        for ea in etapa.get("riego", []):
+            nueva = energia.get(ea.get("tipo_energia")) if isinstance(energia, dict) else energia
+            if nueva:
+                ea = calcular_actividad_riego(
+                    ea.get("actividad", ea.get("tipo_actividad", "")),
+                    ea.get("tipo_actividad", ""),
+                    ea.get("agua_total_m3", 0),
+                    ea.get("consumo_energia", 0),
+                    nueva
+                )
+            riego.append(ea)
+        etapa["riego"] = riego
+    fracciones = cambios.get("residuos")
+    if fracciones:
+        residuos = etapa.get("residuos", {})
+        biomasa = sum(datos.get("biomasa", 0) for datos in residuos.values())
+        if biomasa:
+            etapa["residuos"] = {
+                via: {"biomasa": biomasa * fraccion, "ajustes": residuos.get(via, {}).get("ajustes", {})}
+                for via, fraccion in fracciones.items() if fraccion
+            }
+    return etapa
+
+def barrer_escenarios(proyecto, grilla, paquete=None):
+    """
+    Evalúa todas las combinaciones de la grilla sobre el proyecto.
+    - grilla: {eje: opciones} (ver el docstring del módulo)
+    - paquete: paquete de factores; tiene prioridad sobre proyecto["paquete"]
+    Devuelve: dict con "base" (fila del proyecto sin cambios), "escenarios" (lista de filas,
+    una por combinación, en el orden de la grilla) y "calculos" (sub-resultados calculados).
+    Cada fila: escenario, una columna por eje (etiqueta), emisiones por fuente, em_total,
+    prod_total, huella_kg_co2e_kg y diferencia_pct respecto de la base.
+    """
+    desconocidos = set(grilla) - set(EJES)
+    if desconocidos:
+        raise ValueError(f"Ejes desconocidos: {sorted(desconocidos)}; use {list(EJES)}")
+    ejes = [eje for eje in EJES if eje in grilla]
+    opciones = {eje: _opciones(eje, grilla[eje]) for eje in ejes}
+    for eje in ejes:
+        if not opciones[eje]:
+            raise ValueError(f"El eje '{eje}' no tiene opciones")
+        # La base (sin cambios) siempre se calcula, aunque no sea parte de la grilla
+        if all(valor is not None for _, valor in opciones[eje]):
+            opciones[eje] = opciones[eje] + [(None, None)]
+    indice_base = {eje: [valor for _, valor in opciones[eje]].index(None) for eje in ejes}
+
+    anual = proyecto.get("tipo", "perenne") == "anual"
+    with usar_paquete(paquete if paquete is not None else proyecto.get("paquete")) as f:
+        for eje in ejes:
+            for _, valor in opciones[eje]:
+                _validar(eje, valor, f)
+        # Sub-resultados: (etapa, fuente, opciones de los ejes que afectan a la fuente) -> kg CO2e/ha
+        subresultados = {}
+        produccion = 0
+        for i, etapa in enumerate(proyecto.get("etapas", [])):
+            repeticiones = int(etapa.get("ciclos", 1)) if anual else 1
+            produccion += etapa.get("produccion", 0) * etapa.get("duracion", 1) * repeticiones
+            for fuente in FUENTES:
+                ejes_fuente = [eje for eje in ejes if fuente in EJES[eje]]
+                for indices in product(*(range(len(opciones[eje])) for eje in ejes_fuente)):
+                    cambios = {eje: opciones[eje][j][1] for eje, j in zip(ejes_fuente, indices)}
+                    subresultados[i, fuente, indices] = calcular_fuente(aplicar_cambios(etapa, cambios), fuente) * repeticiones
+
+    n_etapas = len(proyecto.get("etapas", []))
+    ejes_por_fuente = {fuente: [k for k, eje in enumerate(ejes) if fuente in EJES[eje]] for fuente in FUENTES}
+
+    def fila(indices):
+        emisiones = {
+            fuente: sum(
+                subresultados[i, fuente, tuple(indices[k] for k in ejes_por_fuente[fuente])]
+                for i in range(n_etapas)
+            )
+            for fuente in FUENTES
+        }
+        em_total = sum(emisiones.values())
+        resultado = {eje: opciones[eje][j][0] for eje, j in zip(ejes, indices)}
+        resultado.update(emisiones)
+        resultado.update({
+            "em_total": em_total,
+            "prod_total": produccion,
+            "huella_kg_co2e_kg": em_total / produccion if produccion else None
+        })
+        return resultado
+
+    base = fila([indice_base[eje] for eje in ejes])
+    base.update({"escenario": 0, "diferencia_pct": 0.0})
+    escenarios = []
+    visibles = [[j for j, (etiqueta, _) in enumerate(opciones[eje]) if etiqueta is not None] for eje in ejes]
+    for n, indices in enumerate(product(*visibles), 1):
+        resultado = fila(indices)
+        resultado["escenario"] = n
+        resultado["diferencia_pct"] = (
+            (resultado["em_total"] - base["em_total"]) / base["em_total"] * 100 if base["em_total"] else None
+        )
+        escenarios.append(resultado)
+    for eje in ejes:
+        base[eje] = "Base"
+    return {
+        "ejes": ejes,
+        "base": base,
+        "escenarios": escenarios,
+        "calculos": len(subresultados),
+        "paquete_factores": f.identificador()
+    }
+
+def columnas_resultado(ejes):
+    """Columnas de la tabla comparativa de `barrer_escenarios`."""
+    return ["escenario"] + list(ejes) + FUENTES + ["em_total", "prod_total", "huella_kg_co2e_kg", "diferencia_pct"]
+
+def escribir_csv(resultado, salida, separador=","):
+    escritor = csv.writer(salida, delimiter=separador)
+    columnas = columnas_resultado(resultado["ejes"])
+    escritor.writerow(columnas)
+    for fila in [resultado["base"]] + resultado["escenarios"]:
+        escritor.writerow([fila.get(c) for c in columnas])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m nucleo.escenarios",
+        description="Compara la huella de un proyecto bajo todas las combinaciones de una grilla de escenarios."
+    )
+    parser.add_argument("proyecto", help="Proyecto JSON (formato de calcular_proyecto) o archivo de proyecto de la aplicación")
+    parser.add_argument("escenarios", help="Grilla JSON de escenarios {eje: opciones}")
+    parser.add_argument("-o", "--salida", default="-", help="Archivo de resultados (.csv o .json); '-' para salida estándar")
+    parser.add_argument("--separador", default=",", help="Separador de columnas CSV (por defecto ',')")
+    parser.add_argument("--paquete", help="Paquete de factores (nombre de nucleo/datos o ruta .json)")
+    args = parser.parse_args(argv)
+
+    proyecto = leer_proyecto(args.proyecto)
+    with open(args.escenarios, encoding="utf-8") as f:
+        grilla = json.load(f)
+    resultado = barrer_escenarios(proyecto, grilla, paquete=args.paquete)
+
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "w", newline="", encoding="utf-8")
+    try:
+        if args.salida.lower().endswith(".json"):
+            json.dump(resultado, salida, ensure_ascii=False, indent=2)
+        else:
+            escribir_csv(resultado, salida, args.separador)
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+    print(f"{len(resultado['escenarios'])} escenarios evaluados con {resultado['calculos']} cálculos parciales",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
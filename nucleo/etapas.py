@@ -0,0 +1,245 @@
+"""
+Agregación de resultados por etapa y por proyecto (sin dependencias de interfaz).
+
+Estructura de una etapa de entrada (las listas usan los mismos registros de
+`nucleo.actividades` que arman las funciones `ingresar_*` de la aplicación, o dicts con
+sus campos):
+
+    {
+        "nombre": "Implantación",
+        "duracion": 3,                 # años (o 1 para un ciclo anual)
+        "produccion": 0,               # kg/ha·año (o kg/ha·ciclo)
+        "fertilizantes": [...],
+        "agroquimicos": [...],         # categoria, tipo, nombre_comercial, cantidad_ia, fe (opcional)
+        "riego": [...],                # actividad, tipo_actividad, agua_total_m3, consumo_energia, tipo_energia, fe_energia (opcional)
+        "labores": [...],              # nombre_labor, tipo_maquinaria, tipo_combustible, litros, fe_personalizado
+        "residuos": {...},             # {"vía": {"biomasa": ..., "ajustes": {...}}}
+        "riego_por_anio": True,        # False si el riego ingresado ya es el total de la etapa
+        "tipo_riego": None
+    }
+
+`calcular_proyecto` devuelve la misma estructura que la aplicación guarda en
+`st.session_state["resultados_globales"]`.
+"""
+
+from .calculos import (
+    calcular_fertilizantes,
+    calcular_emisiones_fertilizantes,
+    calcular_agroquimico,
+    calcular_emisiones_agroquimicos,
+    calcular_labor,
+    calcular_emisiones_maquinaria,
+    calcular_actividad_riego,
+    calcular_emisiones_riego,
+    calcular_emisiones_residuos,
+)
+from .actividades import ActividadRiego, Agroquimico, Labor
+from .paquetes import usar_paquete
+
+FUENTES = ["Fertilizantes", "Agroquímicos", "Riego", "Maquinaria", "Residuos"]
+
+def nuevas_emisiones_fuentes():
+    """Acumulador de emisiones por fuente (kg CO2e/ha), con las mismas claves que usa la aplicación."""
+    return {
+        "Fertilizantes": 0,
+        "Agroquímicos": 0,
+        "Riego": 0,
+        "Maquinaria": 0,
+        "Transporte": 0,
+        "Residuos": 0,
+        "Fin de vida": 0
+    }
+
+def resumir_etapa(em_fert_total, em_agroq, em_agua, em_energia, em_maq, em_residuos,
+                  desglose_fert, agroq, labores, energia_actividades, detalle_residuos,
+                  tipo_riego=None):
+    """Arma el dict de resultados por fuente de una etapa (formato de `emisiones_fuente_etapa`)."""
+    return {
+        "Fertilizantes": em_fert_total,
+        "Agroquímicos": em_agroq,
+        "Riego": em_agua + em_energia,
+        "Maquinaria": em_maq,
+        "Residuos": em_residuos,
+        "desglose_fertilizantes": desglose_fert,
+        "desglose_agroquimicos": agroq,
+        "desglose_maquinaria": labores,
+        "desglose_riego": {
+            "tipo_riego": tipo_riego,
+            "emisiones_agua": em_agua,
+            "emisiones_energia": em_energia,
+            "energia_actividades": energia_actividades
+        },
+        "desglose_residuos": detalle_residuos
+    }
+
+def total_etapa(resultado):
+    """Suma de las fuentes de emisión de una etapa (kg CO2e/ha)."""
+    return sum(resultado.get(f, 0) for f in FUENTES)
+
+def _normalizar_agroquimico(ag):
+    ag = Agroquimico.desde(ag)
+    if ag.emisiones is not None and ag.fe is not None:
+        return ag
+    return calcular_agroquimico(ag.categoria, ag.tipo, ag.cantidad_ia, fe=ag.fe, nombre_comercial=ag.nombre_comercial)
+
+def _normalizar_labor(labor):
+    labor = Labor.desde(labor)
+    if labor.emisiones is not None:
+        return labor
+    return calcular_labor(
+        labor.nombre_labor, labor.tipo_maquinaria, labor.tipo_combustible, labor.litros,
+        fe_personalizado=labor.fe_personalizado
+    )
+
+def _normalizar_actividad_riego(ea):
+    ea = ActividadRiego.desde(ea)
+    if ea.emisiones_agua is not None and ea.emisiones_energia is not None:
+        return ea
+    return calcular_actividad_riego(
+        ea.actividad, ea.tipo_actividad, ea.agua_total_m3, ea.consumo_energia, ea.tipo_energia,
+        fe_energia=ea.fe_energia
+    )
+
+def calcular_etapa(etapa):
+    """
+    Calcula todas las fuentes de emisión de una etapa a partir de sus datos de actividad.
+    Devuelve: (total_emisiones, produccion_total, resultado_por_fuente)
+    """
+    duracion = etapa.get("duracion", 1)
+    fert = {"fertilizantes": etapa.get("fertilizantes", [])}
+    em_fert_prod, em_fert_co2_urea, em_fert_n2o_dir, em_fert_n2o_ind, desglose_fert = calcular_emisiones_fertilizantes(fert, duracion)
+    em_fert_total = em_fert_prod + em_fert_co2_urea + em_fert_n2o_dir + em_fert_n2o_ind
+
+    agroq = [_normalizar_agroquimico(ag) for ag in etapa.get("agroquimicos", [])]
+    em_agroq = calcular_emisiones_agroquimicos(agroq, duracion)
+
+    energia_actividades = [_normalizar_actividad_riego(ea) for ea in etapa.get("riego", [])]
+    duracion_riego = duracion if etapa.get("riego_por_anio", True) else 1
+    em_agua, em_energia = calcular_emisiones_riego(energia_actividades, duracion_riego)
+
+    labores = [_normalizar_labor(labor) for labor in etapa.get("labores", [])]
+    em_maq = calcular_emisiones_maquinaria(labores, duracion)
+
+    em_residuos, detalle_residuos = calcular_emisiones_residuos(etapa.get("residuos", {}))
+
+    resultado = resumir_etapa(
+        em_fert_total, em_agroq, em_agua, em_energia, em_maq, em_residuos,
+        desglose_fert, agroq, labores, energia_actividades, detalle_residuos,
+        tipo_riego=etapa.get("tipo_riego")
+    )
+    produccion_total = etapa.get("produccion", 0) * duracion
+    return total_etapa(resultado), produccion_total, resultado
+
+def calcular_fuente(etapa, fuente):
+    """
+    Emisiones (kg CO2e/ha) de una sola fuente de una etapa, con los mismos criterios de
+    duración que `calcular_etapa` (para recalcular solo lo que cambia entre escenarios).
+    """
+    duracion = etapa.get("duracion", 1)
+    if fuente == "Fertilizantes":
+        r = calcular_fertilizantes(etapa.get("fertilizantes", []), duracion)
+        return r["emision_produccion"] + r["emision_co2_urea"] + r["n2o_directo_co2e"] + r["n2o_indirecto_co2e"]
+    if fuente == "Agroquímicos":
+        return calcular_emisiones_agroquimicos([_normalizar_agroquimico(ag) for ag in etapa.get("agroquimicos", [])], duracion)
+    if fuente == "Riego":
+        duracion_riego = duracion if etapa.get("riego_por_anio", True) else 1
+        em_agua, em_energia = calcular_emisiones_riego(
+            [_normalizar_actividad_riego(ea) for ea in etapa.get("riego", [])], duracion_riego
+        )
+        return em_agua + em_energia
+    if fuente == "Maquinaria":
+        return calcular_emisiones_maquinaria([_normalizar_labor(labor) for labor in etapa.get("labores", [])], duracion)
+    if fuente == "Residuos":
+        return calcular_emisiones_residuos(etapa.get("residuos", {}))[0]
+    raise ValueError(f"Fuente desconocida '{fuente}'; use una de {FUENTES}")
+
+def calcular_proyecto(proyecto, paquete=None, calculadora=None):
+    """
+    Calcula un proyecto completo (perenne o anual).
+    - proyecto: {"tipo": "perenne" | "anual", "etapas": [etapa, ...], "paquete": opcional}
+      En modo anual cada etapa es un ciclo; la clave opcional "ciclos" repite
+      un ciclo típico n veces (equivale a "todos los ciclos son iguales").
+    - paquete: paquete de factores (nombre, ruta o PaqueteFactores); tiene prioridad
+      sobre proyecto["paquete"]. Sin ninguno se usa el paquete activo.
+    - calculadora: función que calcula cada etapa (por defecto `calcular_etapa`; p. ej.
+      la versión memoizada de `nucleo.memoria`)
+    Devuelve: dict con la estructura de `resultados_globales`, más "paquete_factores".
+    """
+    with usar_paquete(paquete if paquete is not None else proyecto.get("paquete")) as f:
+        resultados = _calcular_proyecto(proyecto, calculadora or calcular_etapa)
+    resultados["paquete_factores"] = f.identificador()
+    return resultados
+
+def _calcular_proyecto(proyecto, calculadora):
+    tipo = proyecto.get("tipo", "perenne")
+    emisiones_etapas = {}
+    produccion_etapas = {}
+    emisiones_fuentes = nuevas_emisiones_fuentes()
+    emisiones_fuente_etapa = {}
+
+    if tipo == "anual":
+        emisiones_ciclos = []
+        desglose_fuentes_ciclos = []
+        n_ciclo = 1
+        for etapa in proyecto.get("etapas", []):
+            em_ciclo, prod_ciclo, resultado = calculadora(etapa)
+            for _ in range(int(etapa.get("ciclos", 1))):
+                desglose_fuentes_ciclos.append(dict(resultado, Ciclo=n_ciclo))
+                emisiones_ciclos.append((n_ciclo, em_ciclo, prod_ciclo))
+                for f in FUENTES:
+                    emisiones_fuentes[f] += resultado[f]
+                n_ciclo += 1
+        em_total = sum(c[1] for c in emisiones_ciclos)
+        prod_total = sum(c[2] for c in emisiones_ciclos)
+        emisiones_etapas["Anual"] = em_total
+        produccion_etapas["Anual"] = prod_total
+        emisiones_fuente_etapa["Anual"] = {f: emisiones_fuentes[f] for f in FUENTES}
+        return {
+            "tipo": "anual",
+            "em_total": em_total,
+            "prod_total": prod_total,
+            "emisiones_ciclos": emisiones_ciclos,
+            "desglose_fuentes_ciclos": desglose_fuentes_ciclos,
+            "detalle_residuos": [],
+            "emisiones_fuentes": emisiones_fuentes,
+            "emisiones_etapas": emisiones_etapas,
+            "produccion_etapas": produccion_etapas,
+            "emisiones_fuente_etapa": emisiones_fuente_etapa
+        }
+
+    emisiones_anuales = []
+    anio_global = 1
+    for etapa in proyecto.get("etapas", []):
+        nombre = etapa.get("nombre", f"Etapa {len(emisiones_etapas) + 1}")
+        em_etapa, prod_etapa, resultado = calculadora(etapa)
+        emisiones_etapas[nombre] = em_etapa
+        produccion_etapas[nombre] = prod_etapa
+        emisiones_fuente_etapa[nombre] = resultado
+        for f in FUENTES:
+            emisiones_fuentes[f] += resultado[f]
+        duracion = int(etapa.get("duracion", 1)) or 1
+        for _ in range(duracion):
+            emisiones_anuales.append((anio_global, em_etapa / duracion, etapa.get("produccion", 0), nombre))
+            anio_global += 1
+
+    return {
+        "tipo": "perenne",
+        "em_total": sum(emisiones_etapas.values()),
+        "prod_total": sum(produccion_etapas.values()),
+        "emisiones_etapas": emisiones_etapas,
+        "produccion_etapas": produccion_etapas,
+        "emisiones_fuentes": emisiones_fuentes,
+        "emisiones_fuente_etapa": emisiones_fuente_etapa,
+        "detalle_residuos": [],
+        "emisiones_anuales": emisiones_anuales
+    }
+
+def quitar_desglose(resultados):
+    """Copia de `resultados_globales` sin los desgloses por actividad (solo totales por etapa y fuente)."""
+    resumen = dict(resultados)
+    resumen["emisiones_fuente_etapa"] = {
+        etapa: {f: v for f, v in datos.items() if not f.startswith("desglose_")}
+        for etapa, datos in resultados.get("emisiones_fuente_etapa", {}).items()
+    }
+    resumen.pop("desglose_fuentes_ciclos", None)
+    return resumen
@@ -0,0 +1,403 @@
+"""
+Factores de emisión y parámetros configurables de AgroPrint.
+
+Módulo sin dependencias de interfaz: lo importan tanto la aplicación Streamlit
+como el motor de cálculo headless (`nucleo.calculos`, `nucleo.etapas`).
+"""
+
+# --- Factores de emisión y parámetros configurables (modificar aquí) ---
+
+# --- Potenciales de calentamiento global (GWP) ---
+# Unidades: adimensional (relación respecto a CO2)
+# Fuente: IPCC AR6 (2021), 100 años
+GWP = {
+    "CO2": 1,      # IPCC AR6
+    "CH4": 27,     # IPCC AR6, metano no fósil
+    "N2O": 273     # IPCC AR6
+}
+
+# --- Factores IPCC 2006 para emisiones de N2O ---
+# Unidades: kg N2O-N / kg N
+# Fuente: IPCC 2006 Vol.4 Cap.11 Tabla 11.1. 2019 REFINEMENT
+EF1 = 0.01   # Emisión directa de N2O-N por aplicación de N
+EF4 = 0.01   # Emisión indirecta de N2O-N por volatilización
+EF5 = 0.011 # Emisión indirecta de N2O-N por lixiviación/escurrimiento
+
+# --- Factor IPCC 2006 para emisiones de CO2 por hidrólisis de urea ---
+# Unidades: kg CO2 / kg urea
+# Fuente: IPCC 2006 Vol.4 Cap.11 Eq. 11.13
+# Procedimiento: FE = 0.20 (contenido C en urea) × 44/12 (conversión CO2-C a CO2)
+EF_CO2_UREA = 0.20 * (44/12)  # = 0.733 kg CO2 / kg urea
+
+# --- Fracciones por defecto (modificables) ---
+# Unidades: adimensional
+# Fuente: IPCC 2006 Vol.4 Cap.11 Tabla 11.1. Refinement 2019
+FRAC_VOLATILIZACION_INORG = 0.11   # Fracción de N volatilizado de fertilizantes inorgánicos (IPCC)
+FRAC_VOLATILIZACION_ORG = 0.21     # Fracción de N volatilizado de fertilizantes orgánicos (IPCC 2006 Vol.4 Cap.11 Tabla 11.1, nota: estiércol sólido 0.2, líquido 0.4; se usa 0.2 como valor conservador)
+FRAC_LIXIVIACION = 0.24            # Fracción de N lixiviado (aplica a todo N si precipitación > 1,000 mm) (IPCC)
+# Nota: El IPCC no diferencia entre inorgánico y orgánico para lixiviación, usa 0.3 para ambos si corresponde.
+
+# --- Factores de emisión para quema de residuos agrícolas ---
+# Unidades: kg gas / kg materia seca quemada
+# Fuente: IPCC 2006 Vol.4 Cap.2 Tablas 2.5 y 2.6
+EF_CH4_QUEMA = 2.7 / 1000   # kg CH4 / kg MS
+EF_N2O_QUEMA = 0.07 / 1000  # kg N2O / kg MS
+FRACCION_SECA_QUEMA = 0.8   # adimensional, típico IPCC. ESTE VALOR NO ESTOY 100% SEGURO
+FRACCION_QUEMADA = 0.85      # adimensional, típico IPCC
+
+# --- Factores sugeridos para fertilizantes orgánicos (estructura eficiente y compacta) ---
+# Unidades: fraccion_seca (adimensional), N/P2O5/K2O (% peso fresco)
+# Fuente: IPCC 2006 Vol.4 Cap.10, Tablas 10A.2 y 10A.3, literatura FAO y valores de uso común
+FACTORES_ORGANICOS = {
+    "Tierra de hoja (quillota)": {
+        "fraccion_seca": 1.00,  # 100%
+        "N": 0.7,
+        "P2O5": 0.0,
+        "K2O": 0.0,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Guano de pavo": {
+        "fraccion_seca": 1.00,
+        "N": 4.1,
+        "P2O5": 0.0,
+        "K2O": 0.0,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Guano de vacuno": {
+        "fraccion_seca": 1.00,
+        "N": 3.1,
+        "P2O5": 0.0,
+        "K2O": 0.0,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Guano de cabra": {
+        "fraccion_seca": 1.00,
+        "N": 2.2,
+        "P2O5": 0.0,
+        "K2O": 0.0,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Guano rojo": {
+        "fraccion_seca": 1.00,
+        "N": 6.0,
+        "P2O5": 9.0,
+        "K2O": 1.0,
+        "fuente": "https://www.indap.gob.cl/sites/default/files/2022-02/n%C2%BA8-manual-de-produccio%CC%81n-agroecologica.pdf"
+    },
+    "Harina de sangre": {
+        "fraccion_seca": 1.00,
+        "N": 13.0,
+        "P2O5": 0.0,
+        "K2O": 0.0,
+        "fuente": "https://www.indap.gob.cl/sites/default/files/2022-02/n%C2%BA8-manual-de-produccio%CC%81n-agroecologica.pdf"
+    },
+    "Turba de copiapó": {
+        "fraccion_seca": 1.00,
+        "N": 0.64,
+        "P2O5": 0.0,
+        "K2O": 0.0,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Estiercol de vacuno sólido": {
+        "fraccion_seca": 0.215,  # 21,5%
+        "N": 0.565,
+        "P2O5": 0.17,
+        "K2O": 0.475,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Purin de vacuno": {
+        "fraccion_seca": 0.075,
+        "N": 0.405,
+        "P2O5": 0.085,
+        "K2O": 0.35,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Estiércol de cerdo sólido": {
+        "fraccion_seca": 0.215,
+        "N": 0.58,
+        "P2O5": 0.355,
+        "K2O": 0.33,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Purin de cerdo": {
+        "fraccion_seca": 0.0665,
+        "N": 0.535,
+        "P2O5": 0.145,
+        "K2O": 0.305,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Estiércol sólido de ave": {
+        "fraccion_seca": 0.475,
+        "N": 1.925,
+        "P2O5": 1.07,
+        "K2O": 1.05,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Purín de ave": {
+        "fraccion_seca": 0.1175,
+        "N": 0.895,
+        "P2O5": 0.33,
+        "K2O": 0.555,
+        "fuente": "https://biblioteca.inia.cl/server/api/core/bitstreams/102077ad-5b60-46b2-8b35-c0e8250a2965/content"
+    },
+    "Otros": {  # Entrada genérica para evitar KeyError
+        "fraccion_seca": 1.0,
+        "N": 0.0,
+        "P2O5": 0.0,
+        "K2O": 0.0,
+        "fuente": ""
+    }
+}
+
+# --- Factores de emisión genéricos para nutrientes (por producción) ---
+# Unidades: kg CO2e/kg nutriente
+# Fuente: Ecoinvent, Agri-footprint, literatura LCA
+FE_N_GEN = 3.0    # kg CO2e/kg N
+FE_P2O5_GEN = 1.5 # kg CO2e/kg P2O5
+FE_K2O_GEN = 1.2  # kg CO2e/kg K2O
+
+# --- Valores por defecto y factores de emisión centralizados ---
+valores_defecto = {
+    "fe_electricidad": 0.2021,        # kg CO2e/kWh (SEN, promedio 2024, Chile)
+    "fe_combustible_generico": 3.98648,   # kg CO2e/litro (LUBRICANTE)
+    "fe_agua": 0.00015,               # kg CO2e/litro de agua de riego (DEFRA)
+    "fe_maquinaria": 2.5,             # kg CO2e/litro (valor genérico maquinaria)
+    "fe_transporte": 0.15,            # kg CO2e/km recorrido (valor genérico transporte)
+    "fe_agroquimico": 5.0,            # kg CO2e/kg ingrediente activo (valor genérico)
+    "rendimiento_motor": 0.25,        # litros/kWh (valor genérico motor diésel/gasolina)
+}
+
+# --- Factores de fertilizantes inorgánicos (puedes modificar aquí) ---
+# N_porcentaje: fracción de N en el fertilizante (adimensional)
+# Frac_volatilizacion: fracción de N volatilizado (adimensional)
+# Frac_lixiviacion: fracción de N lixiviado (adimensional)
+# FE_produccion_producto: kg CO2e / kg producto (LCA, Ecoinvent/Agri-footprint)
+# FE_produccion_N: kg CO2e / kg N (LCA, Ecoinvent/Agri-footprint)
+# Fuente de volatilización/lixiviación: IPCC 2006 Vol.4 Cap.11 Tabla 11.1 y literatura LCA para producción
+factores_fertilizantes = {
+    "Nitrato de amonio (AN)": [
+        {"origen": "Unión Europea", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.112, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Norte América", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.249, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Latino América", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.124, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "China, carbón", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 3.643, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference_values.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.850, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China, gas", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.836, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0.335, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.469, "Fuente": ""}
+    ],
+    "Nitrato de amonio cálcico (CAN)": [
+        {"origen": "Unión Europea", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.951, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Norte América", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.870, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Latino América", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.779, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "China, carbón", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 3.023, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.350, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China, gas", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.358, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0.27, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.055, "Fuente": ""}
+    ],
+    "Urea": [
+        {"origen": "Unión Europea", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.611, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Norte América", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.739, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Latino América", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.746, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "China, carbón", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 3.002, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.180, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China, gas", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.905, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0.46, "Frac_volatilizacion": 0.15, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.864, "Fuente": ""}
+    ],
+    "Nitrato de Amonio y Urea (UAN)": [
+        {"origen": "Unión Europea", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.021, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Norte América", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.571, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Latino América", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.526, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "China, carbón", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.615, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.650, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China, gas", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.896, "Fuente": "https://www.fertilizerseurope.com/wp-content/uploads/2020/01/The-carbon-footprint-of-fertilizer-production_Regional-reference-values.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0.30, "Frac_volatilizacion": 0.10, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.713, "Fuente": ""}
+    ],
+    "Nitrosulfato de amonio (ANS)": [
+        {"origen": "Europa", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.820, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.580, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Estados Unidos", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.440, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.220, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0.26, "Frac_volatilizacion": 0.05, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.515, "Fuente": ""}
+    ],
+    "Nitrato de calcio (CN)": [
+        {"origen": "Europa", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.670, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.030, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Estados Unidos", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.760, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 2.200, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0.155, "Frac_volatilizacion": 0.01, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.665, "Fuente": ""}
+    ],
+    "Sulfato de amonio (AS)": [
+        {"origen": "Europa", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.570, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.710, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Estados Unidos", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.690, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.360, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0.21, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.833, "Fuente": ""}
+    ],
+    "Fosfato monoamónico (MAP)": [
+        {"origen": "Chile", "N_porcentaje": 0.10, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.380, "Fuente": "https://www.climatiq.io/data/emission-factor/941370dd-318b-46ad-941b-80b9c861cf69"}
+    ],
+    "Fosfato diamonico (DAP)": [
+        {"origen": "Europa", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.640, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.810, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Estados Unidos", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.730, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.330, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0.18, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.878, "Fuente": ""}
+    ],
+    "Superfosfato triple (TSP)": [
+        {"origen": "Europa", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.18, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.25, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Estados Unidos", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.19, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.26, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0, "Frac_volatilizacion": 0.08, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.22, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"}
+    ],
+    "Cloruro de Potasio (MOP)": [
+        {"origen": "Europa", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Estados Unidos", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.23, "Año": 2011, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"}
+    ],
+    "Ácido bórico": [
+        {"origen": "Promedio", "N_porcentaje": 0.00, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 5.52, "Fuente": "https://www.researchgate.net/publication/351106329_Life_cycle_assessment_on_boron_production_is_boric_acid_extraction_from_salt-lake_brine_environmentally_friendly"}
+    ],
+    "Ácido fosfórico": [
+        {"origen": "Promedio", "N_porcentaje": 0.00, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 5.52, "Fuente": "https://apps.carboncloud.com/climatehub/product-reports/id/216857142454"}
+    ],
+    "Cloruro de potasio": [
+        {"origen": "Promedio", "N_porcentaje": 0.00, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.22, "Fuente": "https://apps.carboncloud.com/climatehub/product-reports/id/216857142454"}
+    ],
+    "Hidróxido de potasio": [
+        {"origen": "Promedio", "N_porcentaje": 0.00, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.48, "Fuente": "https://apps.carboncloud.com/climatehub/product-reports/id/216857142454"}
+    ],
+    "NPK": [
+        {"origen": "Europa", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0.730, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Rusia", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.400, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Estados Unidos", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.270, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "China", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.730, "Fuente": "https://www.researchgate.net/profile/Frank-Brentrup-2/publication/312553933_Carbon_footprint_analysis_of_mineral_fertilizer_production_in_Europe_and_other_world_regions/links/5881ec8d4585150dde4012fe/Carbon-footprint-analysis-of-mineral-fertilizer-production-in-Europe-and-other-world-regions.pdf"},
+        {"origen": "Promedio", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 1.283, "Fuente": ""}
+    ],
+    "Otros": [
+        {"origen": "Otros", "N_porcentaje": 0.15, "Frac_volatilizacion": 0.11, "Frac_lixiviacion": 0.24, "FE_produccion_producto": 0, "Fuente": ""}
+    ]
+}
+
+# --- Factores de emisión organizados por categoría (actualizado con datos detallados y fuentes) ---
+factores_emision = {
+    'pesticidas': {
+        'Media': 5.1,  # kg CO2e / kg i.a. (https://doi.org/10.1016/j.envint.2004.03.005)
+    },
+    'fungicidas': {
+        'Media': 3.9,  # kg CO2e / kg i.a. (https://doi.org/10.1016/j.envint.2004.03.005)
+        'Ferbam': 1.2,  # https://doi.org/10.1016/j.envint.2004.03.028
+        'Maneb': 2.0,   # https://doi.org/10.1016/j.envint.2004.03.029
+        'Capitan': 2.3, # https://doi.org/10.1016/j.envint.2004.03.030
+        'Benomilo': 8.0 # https://doi.org/10.1016/j.envint.2004.03.031
+    },
+    'insecticidas': {
+        'Media': 5.1,  # kg CO2e / kg i.a. (https://doi.org/10.1016/j.envint.2004.03.005)
+        'Metil paratión': 3.2,   # https://doi.org/10.1016/j.envint.2004.03.032
+        'Forato': 4.2,           # https://doi.org/10.1016/j.envint.2004.03.033
+        'Carbofurano': 9.1,      # https://doi.org/10.1016/j.envint.2004.03.034
+        'Carbaril': 3.1,         # https://doi.org/10.1016/j.envint.2004.03.035
+        'Taxafeno': 1.2,         # https://doi.org/10.1016/j.envint.2004.03.036
+        'Cipermetrina': 11.7,    # https://doi.org/10.1016/j.envint.2004.03.037
+        'Clorodimeformo': 5.0,   # https://doi.org/10.1016/j.envint.2004.03.038
+        'lindano': 1.2,          # https://doi.org/10.1016/j.envint.2004.03.039
+        'Malatión': 4.6,         # https://doi.org/10.1016/j.envint.2004.03.040
+        'Partión': 2.8,          # https://doi.org/10.1016/j.envint.2004.03.041
+        'Metoxicloro': 1.4       # https://doi.org/10.1016/j.envint.2004.03.042
+    },
+    'herbicidas': {
+        'Media': 6.3,        # https://doi.org/10.1016/j.envint.2004.03.005
+        '2, 4-D': 1.7,       # https://doi.org/10.1016/j.envint.2004.03.005
+        '2, 4, 5-T': 2.7,    # https://doi.org/10.1016/j.envint.2004.03.006
+        'Alacloro': 5.6,     # https://doi.org/10.1016/j.envint.2004.03.007
+        'Atrazina': 3.8,     # https://doi.org/10.1016/j.envint.2004.03.008
+        'Bentazón': 8.7,     # https://doi.org/10.1016/j.envint.2004.03.009
+        'Butilato': 2.8,     # https://doi.org/10.1016/j.envint.2004.03.010
+        'Cloramben': 3.4,    # https://doi.org/10.1016/j.envint.2004.03.011
+        'Clorsulfurón': 7.3, # https://doi.org/10.1016/j.envint.2004.03.012
+        'Cianazina': 4.0,    # https://doi.org/10.1016/j.envint.2004.03.013
+        'Dicamba': 5.9,      # https://doi.org/10.1016/j.envint.2004.03.014
+        'Dinosaurio': 1.6,   # https://doi.org/10.1016/j.envint.2004.03.015
+        'Diquat': 8.0,       # https://doi.org/10.1016/j.envint.2004.03.016
+        'Diurón': 5.4,       # https://doi.org/10.1016/j.envint.2004.03.017
+        'EPTC': 3.2,         # https://doi.org/10.1016/j.envint.2004.03.018
+        'Fluazifop-butilo': 10.4, # https://doi.org/10.1016/j.envint.2004.03.019
+        'Fluometurón': 7.1,  # https://doi.org/10.1016/j.envint.2004.03.020
+        'Glifosato': 9.1,    # https://doi.org/10.1016/j.envint.2004.03.021
+        'Linuron': 5.8,      # https://doi.org/10.1016/j.envint.2004.03.022
+        'MCPA': 2.6,         # https://doi.org/10.1016/j.envint.2004.03.023
+        'Metolaclor': 5.5,   # https://doi.org/10.1016/j.envint.2004.03.024
+        'Paraquat': 9.2,     # https://doi.org/10.1016/j.envint.2004.03.025
+        'Propaclor': 5.8,    # https://doi.org/10.1016/j.envint.2004.03.026
+        'Trifluralina': 3.0  # https://doi.org/10.1016/j.envint.2004.03.027
+    },
+    'agua': valores_defecto["fe_agua"],                # kg CO2e / litro de agua de riego (LCA)
+    'maquinaria': valores_defecto["fe_maquinaria"],    # kg CO2e / litro de combustible (valor genérico, no se usa si tienes factores_combustible)
+    'materiales': {
+        'PET': 2.1,                # kg CO2e / kg material (LCA)
+        'HDPE': 1.9,               # kg CO2e / kg material (LCA)
+        'Cartón': 0.7,             # kg CO2e / kg material (LCA)
+        'Vidrio': 1.2,             # kg CO2e / kg material (LCA)
+        'Otro': 1.0                # kg CO2e / kg material (LCA)
+    },
+    'transporte': valores_defecto["fe_transporte"]     # kg CO2e / km recorrido (valor genérico, puede variar según tipo de transporte)
+}
+
+# --- Factores de emisión para gestión de residuos vegetales (IPCC 2006 Vol.5, Cap.3, Tabla 3.4) ---
+# Compostaje aeróbico de residuos vegetales - factores de emisión IPCC
+factores_residuos = {
+    "fraccion_seca": 0.8,  # Fracción seca de biomasa (adimensional, típico 0.8, IPCC)
+    "compostaje": {
+        "base_seca": {
+            "EF_CH4": 0.010,    # kg CH4 / kg materia seca compostada (IPCC 2006 Vol.5 Cap.3 Tabla 3.4)
+            "EF_N2O": 0.0006    # kg N2O / kg materia seca compostada (IPCC 2006 Vol.5 Cap.3 Tabla 3.4)
+        },
+        "base_humeda": {
+            "EF_CH4": 0.004,    # kg CH4 / kg materia húmeda compostada (IPCC 2006 Vol.5 Cap.3 Tabla 3.4)
+            "EF_N2O": 0.0003    # kg N2O / kg materia húmeda compostada (IPCC 2006 Vol.5 Cap.3 Tabla 3.4)
+        }
+    },
+    "incorporacion": {
+        "fraccion_C": 0.45,        # Fracción de C en biomasa seca (adimensional, IPCC 2006 Vol.4 Cap.2)
+        "fraccion_estabilizada": 0.1  # Fracción de C estabilizada en suelo (adimensional, solo opción avanzada, IPCC)
+    }
+}
+
+# --- Factores de emisión de combustibles ---
+factores_combustible = {
+    "Diesel (mezcla promedio biocombustibles)": 2.51279,        # kg CO2e / litro (DEFRA)
+    "Diesel (100% mineral)": 2.66155,                           # kg CO2e / litro (DEFRA)
+    "Gasolina (mezcla media de biocombustibles)": 2.0844,       # kg CO2e / litro (DEFRA)
+    "Gasolina (100% gasolina mineral)": 2.66155,                # kg CO2e / litro (DEFRA)
+    "Gas Natural Comprimido": 0.44942,                          # kg CO2e / litro (DEFRA)
+    "Gas Natural Licuado": 1.17216,                             # kg CO2e / litro (DEFRA)
+    "Gas Licuado de petróleo": 1.55713,                         # kg CO2e / litro (DEFRA)
+    "Aceite combustible": 3.17493,                              # kg CO2e / litro (DEFRA)
+    "Gasóleo": 2.75541,                                         # kg CO2e / litro (DEFRA) (original:)
+    "Lubricante": 2.74934,                                      # kg CO2e / litro (DEFRA) (original:)
+    "Nafta": 2.11894,                                           # kg CO2e / litro (DEFRA)
+    "Butano": 1.74532,                                          # kg CO2e / litro (DEFRA)
+    "Otros gases de petróleo": 0.94441,                         # kg CO2e / litro (DEFRA)
+    "Propano": 1.54357,                                         # kg CO2e / litro (DEFRA)
+    "Aceite quemado": 2.54015,                                  # kg CO2e / litro (DEFRA)
+    "Eléctrico": valores_defecto["fe_electricidad"],            # kg CO2e / kWh (valor genérico)
+    "Otro": valores_defecto["fe_combustible_generico"]
+}
+
+# --- Rendimientos de maquinaria (litros/hora) ---
+rendimientos_maquinaria = {
+    "Tractor": 10,         # litros de combustible / hora de uso (valor típico)
+    "Cosechadora": 15,     # litros de combustible / hora de uso (valor típico)
+    "Camión": 25,          # litros de combustible / hora de uso (valor típico)
+    "Pulverizadora": 8,    # litros de combustible / hora de uso (valor típico)
+    "Otro": 10             # litros de combustible / hora de uso (valor genérico)
+}
+
+# --- Opciones de labores ---
+opciones_labores = [
+    "Siembra", "Cosecha", "Fertilización", "Aplicación de agroquímicos",
+    "Riego", "Poda", "Transporte interno", "Otro"
+]
+
+# --- FIN DE BLOQUE DE FACTORES Y UNIDADES ---
@@ -0,0 +1,153 @@
+"""
+Procesamiento en flujo (streaming) de registros JSON Lines, una etapa por línea.
+
+Uso:
+    cat etapas.jsonl | python -m nucleo.flujo > resultados.jsonl
+    python -m nucleo.flujo etapas.jsonl -o resultados.jsonl --sin-desglose
+
+Cada línea de entrada es un objeto JSON con una etapa (o ciclo) de un predio. Las
+actividades usan los mismos dicts que arman las funciones de la aplicación:
+
+    {
+        "finca": "F1", "etapa": "Implantación",       identificación (se copia a la salida)
+        "duracion": 3, "produccion": 0,                datos de la etapa (kg/ha·año)
+        "riego_por_anio": true, "tipo_riego": "...",   opcionales
+        "ciclos": 1,                                   opcional: repite el ciclo n veces
+        "paquete": "ipcc2006-ar5",                     opcional: paquete de factores
+        "fertilizantes": [...],    ingresar_fertilizantes (la lista o {"fertilizantes": [...]})
+        "agroquimicos": [...],     ingresar_agroquimicos
+        "labores": [...],          ingresar_maquinaria_perenne / ingresar_maquinaria_ciclo
+        "riego": [...],            actividades de ingresar_riego_* (energia_actividades)
+        "residuos": {...}          detalle de ingresar_gestion_residuos: {"vía": {"biomasa", "ajustes"}}
+    }
+
+Por cada línea se escribe (y se vacía el búfer) una línea de salida con los campos
+de identificación más em_total, produccion_total, huella_kg_co2e_kg, fuentes (resultado
+por fuente de la etapa, como en `emisiones_fuente_etapa`) y paquete_factores. Las
+líneas inválidas producen un registro {"linea": n, "error": ...} y el flujo continúa
+(salvo con `--detener-en-error`). Todo el recorrido son generadores, así que la
+memoria no depende del tamaño de la entrada.
+"""
+
+import argparse
+import json
+import sys
+
+from .actividades import a_json
+from .etapas import FUENTES, calcular_etapa
+from .paquetes import usar_paquete
+
+CAMPOS_ACTIVIDAD = ["fertilizantes", "agroquimicos", "labores", "riego", "residuos"]
+
+def leer_registros(lineas):
+    """Genera (numero_linea, registro) desde líneas JSON; las líneas vacías se omiten."""
+    for n, linea in enumerate(lineas, 1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError as e:
+            yield n, ValueError(f"JSON inválido: {e}")
+            continue
+        if not isinstance(registro, dict):
+            yield n, ValueError("Cada línea debe ser un objeto JSON")
+            continue
+        yield n, registro
+
+def _etapa_desde_registro(registro):
+    etapa = dict(registro)
+    fertilizantes = etapa.get("fertilizantes", [])
+    if isinstance(fertilizantes, dict):
+        # Salida de ingresar_fertilizantes: {"fertilizantes": [...]}
+        etapa["fertilizantes"] = fertilizantes.get("fertilizantes", [])
+    return etapa
+
+def calcular_registro(registro, paquete=None, sin_desglose=False):
+    """
+    Calcula una etapa y devuelve el registro de salida.
+    - paquete: paquete de factores si el registro no indica uno
+    """
+    with usar_paquete(registro.get("paquete") or paquete) as f:
+        em_total, produccion, fuentes = calcular_etapa(_etapa_desde_registro(registro))
+    ciclos = int(registro.get("ciclos", 1))
+    if ciclos != 1:
+        em_total *= ciclos
+        produccion *= ciclos
+        fuentes = dict(fuentes, **{fuente: fuentes[fuente] * ciclos for fuente in FUENTES})
+    if sin_desglose:
+        fuentes = {k: v for k, v in fuentes.items() if not k.startswith("desglose_")}
+    salida = {k: v for k, v in registro.items() if k not in CAMPOS_ACTIVIDAD}
+    salida.update({
+        "em_total": em_total,
+        "produccion_total": produccion,
+        "huella_kg_co2e_kg": em_total / produccion if produccion else None,
+        "fuentes": fuentes,
+        "paquete_factores": f.identificador()
+    })
+    return salida
+
+def calcular_registros(registros, paquete=None, sin_desglose=False, detener_en_error=False):
+    """
+    Genera un registro de salida por cada (numero_linea, registro) de entrada, en orden.
+    Los errores se convierten en registros {"linea": n, "error": ...} salvo con detener_en_error.
+    """
+    for n, registro in registros:
+        try:
+            if isinstance(registro, Exception):
+                raise registro
+            yield calcular_registro(registro, paquete=paquete, sin_desglose=sin_desglose)
+        except (AttributeError, KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+            if detener_en_error:
+                raise ValueError(f"Línea {n}: {e}") from e
+            error = {"linea": n, "error": f"{type(e).__name__}: {e}"}
+            if isinstance(registro, dict):
+                for campo in ("finca", "etapa"):
+                    if campo in registro:
+                        error[campo] = registro[campo]
+            yield error
+
+def escribir_registros(registros, salida):
+    """Escribe cada registro como una línea JSON y vacía el búfer enseguida. Devuelve (escritos, errores)."""
+    escritos = errores = 0
+    for registro in registros:
+        salida.write(json.dumps(registro, ensure_ascii=False, default=a_json) + "\n")
+        salida.flush()
+        escritos += 1
+        errores += "error" in registro
+    return escritos, errores
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m nucleo.flujo",
+        description="Calcula etapas de predios leídas como JSON Lines y escribe un resultado por línea."
+    )
+    parser.add_argument("entrada", nargs="?", default="-", help="Archivo .jsonl de etapas; '-' para entrada estándar")
+    parser.add_argument("-o", "--salida", default="-", help="Archivo .jsonl de resultados; '-' para salida estándar")
+    parser.add_argument("--paquete", help="Paquete de factores por defecto (nombre de nucleo/datos o ruta .json)")
+    parser.add_argument("--sin-desglose", action="store_true", help="Omitir los desgloses por actividad")
+    parser.add_argument("--detener-en-error", action="store_true", help="Terminar ante la primera línea inválida")
+    args = parser.parse_args(argv)
+
+    entrada = sys.stdin if args.entrada == "-" else open(args.entrada, encoding="utf-8")
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8")
+    try:
+        escritos, errores = escribir_registros(
+            calcular_registros(
+                leer_registros(entrada),
+                paquete=args.paquete,
+                sin_desglose=args.sin_desglose,
+                detener_en_error=args.detener_en_error
+            ),
+            salida
+        )
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if salida is not sys.stdout:
+            salida.close()
+    print(f"{escritos} registros procesados ({errores} con error)", file=sys.stderr)
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
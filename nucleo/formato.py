@@ -0,0 +1,110 @@
+"""
+Formato de números en español (coma decimal, punto de miles) para tablas, gráficos y exportaciones.
+
+Reglas de decimales según magnitud (si no se indican los decimales):
+- >= 1000: sin decimales
+- >= 1: 2 decimales
+- < 1: 4 decimales
+y se eliminan los ceros innecesarios al final ("12,50" -> "12,5", "3,00" -> "3").
+
+`formatear_numeros` formatea columnas de pandas o arreglos de NumPy completos: los
+decimales se eligen con operaciones vectorizadas y cada grupo de decimales se formatea con
+un solo especificador de `format` (el separador de miles lo pone `format` y los
+separadores se intercambian con `str.translate`), sin ramas de Python por valor.
+`formatear_numero` es la versión escalar, con caché para los valores que se repiten en
+cada recarga (métricas, etiquetas, tablas con estilo).
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+MAXIMO_CACHE_FORMATO = 4096
+# Formato de Python ("1,234.5") -> formato español ("1.234,5")
+_SEPARADORES = str.maketrans(",.", ".,")
+# Ceros decimales sobrantes y coma sin decimales al final de cada línea (en grupos que
+# siempre tienen parte decimal, así que nunca tocan la parte entera)
+_CEROS_FINALES = re.compile(r"0+$", re.MULTILINE)
+_COMA_FINAL = re.compile(r",$", re.MULTILINE)
+
+def decimales_magnitud(valores):
+    """Decimales que corresponden a cada valor según su magnitud (arreglo de enteros)."""
+    absolutos = np.abs(np.asarray(valores, dtype=float))
+    return np.where(absolutos >= 1000, 0, np.where(absolutos >= 1, 2, 4))
+
+def _formatear_grupo(valores, decimales, recortar_ceros):
+    # Se formatea el grupo como un solo texto: el cambio de separadores y el recorte de
+    # ceros se hacen de una vez sobre todo el grupo en lugar de valor por valor
+    texto = "\n".join(map(f"{{:,.{int(decimales)}f}}".format, valores)).translate(_SEPARADORES)
+    if recortar_ceros and decimales > 0:
+        texto = _COMA_FINAL.sub("", _CEROS_FINALES.sub("", texto))
+    return texto.split("\n")
+
+def formatear_numeros(valores, decimales=None, sufijo="", recortar_ceros=True):
+    """
+    Formatea de una vez una columna de pandas o un arreglo de NumPy.
+    - decimales: fijos para todos los valores (por defecto, según la magnitud de cada uno)
+    - sufijo: texto agregado a cada valor no nulo (p. ej. "%")
+    - recortar_ceros: eliminar los ceros decimales sobrantes
+    Los nulos quedan como "". Devuelve una Series con el mismo índice si recibe una Series
+    y, si no, un arreglo de textos con la misma forma.
+    """
+    indice = valores.index if isinstance(valores, pd.Series) else None
+    arreglo = np.asarray(valores)
+    if arreglo.dtype.kind not in "biuf":
+        # Columnas de tipo object (mezcla de números y textos): valor por valor, con caché
+        textos = np.array([
+            formatear_numero(v, decimales) + sufijo if not _es_nulo(v) else ""
+            for v in arreglo.ravel().tolist()
+        ], dtype=object).reshape(arreglo.shape)
+        return pd.Series(textos, index=indice, dtype=object) if indice is not None else textos
+    # + 0.0 lleva -0.0 a 0.0 (igual que la caché escalar, que no distingue ambos)
+    numeros = arreglo.astype(float).ravel() + 0.0
+    textos = np.full(numeros.shape, "", dtype=object)
+    validos = ~np.isnan(numeros)
+    if decimales is None:
+        por_valor = decimales_magnitud(numeros)
+    else:
+        por_valor = np.full(numeros.shape, int(decimales))
+    for d in np.unique(por_valor[validos]):
+        seleccion = validos & (por_valor == d)
+        grupo = _formatear_grupo(numeros[seleccion].tolist(), d, recortar_ceros)
+        if sufijo:
+            grupo = [t + sufijo for t in grupo]
+        textos[seleccion] = grupo
+    textos = textos.reshape(arreglo.shape)
+    return pd.Series(textos, index=indice, dtype=object) if indice is not None else textos
+
+def _es_nulo(valor):
+    try:
+        return valor is None or bool(pd.isnull(valor))
+    except (TypeError, ValueError):
+        return False
+
+def _formatear_numero(x, decimales=None, recortar_ceros=True):
+    if _es_nulo(x):
+        return ""
+    if not isinstance(x, (float, int)):
+        return str(x)
+    if isinstance(x, float):
+        x = x + 0.0
+    if decimales is None:
+        decimales = int(decimales_magnitud(x))
+    return _formatear_grupo([x], decimales, recortar_ceros)[0]
+
+@lru_cache(maxsize=MAXIMO_CACHE_FORMATO, typed=True)
+def _formatear_numero_cacheado(x, decimales, recortar_ceros):
+    return _formatear_numero(x, decimales, recortar_ceros)
+
+def formatear_numero(x, decimales=None, recortar_ceros=True):
+    """
+    Formatea un valor con las mismas reglas que `formatear_numeros` (nulos -> "", textos y
+    otros objetos -> str). Los resultados se guardan en caché por valor y tipo.
+    """
+    try:
+        return _formatear_numero_cacheado(x, decimales, recortar_ceros)
+    except TypeError:
+        # Valores no hashables
+        return _formatear_numero(x, decimales, recortar_ceros)
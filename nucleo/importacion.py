@@ -0,0 +1,291 @@
+"""
+Importación de planillas de actividades (CSV o Excel) a las tablas de ingreso.
+
+Usa el mismo formato "largo" que `nucleo.lote` (una fila por actividad con las columnas
+`etapa`, `fuente` y las de cada actividad; `finca` se ignora). La lectura, el mapeo y la
+validación se hacen por columnas con pandas, sin recorrer las filas, así que una planilla
+de miles de filas se importa en una fracción de segundo:
+
+    tabla = leer_planilla("insumos.xlsx")
+    etapas, errores = importar_actividades(tabla)
+    etapas["Implantación"]["fertilizantes"]   # DataFrame con las columnas de COLUMNAS_ENTRADA
+    etapas["Implantación"]["residuos"]        # {"vía": {"biomasa": ..., "ajustes": {...}}}
+
+Además de las columnas de `nucleo.lote`, se aceptan las de las tablas de ingreso
+(pasadas, litros_pasada, horas_pasada, rendimiento) y las fuentes en plural
+("fertilizantes", "labores", ...). Requiere pandas (y openpyxl para leer .xlsx).
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from .escenarios import VIAS_RESIDUOS
+from .paquetes import paquete_activo
+from .vectorizado import COLUMNAS_ENTRADA, tabla_vacia
+
+FUENTES_IMPORTACION = {
+    "fertilizante": "fertilizantes",
+    "fertilizantes": "fertilizantes",
+    "agroquimico": "agroquimicos",
+    "agroquimicos": "agroquimicos",
+    "agroquímico": "agroquimicos",
+    "agroquímicos": "agroquimicos",
+    "labor": "labores",
+    "labores": "labores",
+    "maquinaria": "labores",
+    "riego": "riego",
+    "residuo": "residuos",
+    "residuos": "residuos",
+}
+CATEGORIAS_AGROQUIMICOS = ["pesticidas", "fungicidas", "insecticidas", "herbicidas"]
+ACTIVIDADES_RIEGO = ["Goteo", "Aspersión", "Surco", "Fertirriego", "Otro"]
+AJUSTES_RESIDUO = ["fraccion_seca", "fraccion_quemada", "ef_ch4", "ef_n2o", "base_calculo"]
+COLUMNAS_NUMERICAS = sorted(
+    {c for columnas in COLUMNAS_ENTRADA.values() for c, t in columnas.items() if t == "float64"}
+    | {"litros", "biomasa", "fraccion_quemada", "ef_ch4", "ef_n2o", "duracion", "produccion", "ciclos"}
+)
+VALORES_VERDADEROS = {"1", "1.0", "true", "si", "sí", "verdadero", "x"}
+MAXIMO_FILAS_ERROR = 5
+
+# -----------------------------
+# Lectura
+# -----------------------------
+def leer_planilla(archivo, nombre=None):
+    """
+    Lee una planilla .csv, .xlsx o .xls (ruta o archivo abierto, p. ej. de st.file_uploader).
+    En CSV el separador puede ser "," o ";" (con ";" los decimales pueden escribirse con coma).
+    """
+    nombre = str(nombre or getattr(archivo, "name", archivo)).lower()
+    if nombre.endswith((".xlsx", ".xls")):
+        try:
+            return pd.read_excel(archivo)
+        except ImportError:
+            raise ImportError("Para leer archivos Excel instale openpyxl: pip install openpyxl")
+    if hasattr(archivo, "read"):
+        datos = archivo.read()
+    else:
+        with open(archivo, "rb") as f:
+            datos = f.read()
+    texto = datos.decode("utf-8-sig") if isinstance(datos, bytes) else datos
+    encabezado = texto.split("\n", 1)[0]
+    separador = ";" if encabezado.count(";") > encabezado.count(",") else ","
+    return pd.read_csv(io.StringIO(texto), sep=separador, dtype=str, skipinitialspace=True)
+
+# -----------------------------
+# Conversión y validación por columnas
+# -----------------------------
+def _filas(mascara, tabla):
+    """Números de fila de la planilla (la fila 1 es el encabezado) donde `mascara` es verdadera."""
+    filas = (tabla.index[np.asarray(mascara)] + 2).tolist()
+    texto = ", ".join(str(f) for f in filas[:MAXIMO_FILAS_ERROR])
+    if len(filas) > MAXIMO_FILAS_ERROR:
+        texto += f" y {len(filas) - MAXIMO_FILAS_ERROR} más"
+    return texto
+
+def _por_valor(serie, funcion):
+    """
+    Aplica `funcion` una vez por valor distinto de la columna (las celdas vacías dan NaN);
+    las planillas repiten mucho los mismos valores.
+    """
+    codigos, unicos = pd.factorize(serie)
+    valores = np.empty(len(unicos) + 1, dtype=object)
+    valores[:-1] = [funcion(u) for u in unicos]
+    valores[-1] = np.nan
+    return pd.Series(valores[codigos], index=serie.index)
+
+def _limpiar(valor):
+    texto = str(valor).strip()
+    return texto if texto else np.nan
+
+def _a_numero(valor):
+    """float de una celda; acepta coma decimal ("12,5") si no hay punto. None si no es un número."""
+    texto = str(valor).strip()
+    if not texto:
+        return np.nan
+    if texto.count(",") == 1 and "." not in texto:
+        texto = texto.replace(",", ".")
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+def _texto(serie):
+    """Columna de texto sin espacios extremos; las celdas vacías quedan como NaN."""
+    return _por_valor(serie, _limpiar)
+
+def _numeros(serie):
+    """Columna numérica (float) y máscara de las celdas que no son números."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float), np.zeros(len(serie), dtype=bool)
+    valores = _por_valor(serie, _a_numero)
+    invalidos = valores.isna().to_numpy() & serie.notna().to_numpy() & np.array([v is None for v in valores], dtype=bool)
+    return pd.to_numeric(valores, errors="coerce"), invalidos
+
+def _booleanos(serie):
+    if pd.api.types.is_bool_dtype(serie):
+        return serie
+    return _texto(serie).str.lower().isin(VALORES_VERDADEROS)
+
+def _no_valido(valores, permitidos, mascara):
+    """Filas de `mascara` con un valor no vacío fuera de `permitidos` (una comparación por valor distinto)."""
+    permitidos = set(permitidos)
+    codigos, unicos = pd.factorize(valores)
+    fuera = np.array([not (isinstance(u, float) and np.isnan(u)) and u not in permitidos for u in unicos], dtype=bool)
+    if len(fuera) == 0:
+        return np.zeros(len(valores), dtype=bool)
+    return np.asarray(mascara) & np.where(codigos >= 0, fuera[np.maximum(codigos, 0)], False)
+
+def _validar_fertilizantes(tabla, mascara, errores):
+    f = paquete_activo()
+    registro = f.registro
+    organicos = f["FACTORES_ORGANICOS"]
+    tipos = set(registro.tipos()) | set(organicos)
+    tipo = tabla["tipo"]
+    sin_tipo = mascara & tipo.isna()
+    if sin_tipo.any():
+        errores.append(f"Fertilizantes sin 'tipo' (filas {_filas(sin_tipo, tabla)})")
+    fuera = _no_valido(tipo, tipos, mascara)
+    if fuera.any():
+        errores.append(f"Tipo de fertilizante desconocido (filas {_filas(fuera, tabla)})")
+    # Origen: una verificación por par (tipo, origen) distinto
+    con_origen = mascara & tipo.notna() & tabla["origen"].notna()
+    if con_origen.any():
+        pares = pd.MultiIndex.from_arrays([tipo[con_origen], tabla["origen"][con_origen]])
+        codigos, unicos = pd.factorize(pares)
+        malos = np.array([t in registro.tipos() and o not in registro.origenes(t) for t, o in unicos], dtype=bool)
+        origen_malo = np.zeros(len(tabla), dtype=bool)
+        origen_malo[np.flatnonzero(con_origen)] = malos[codigos]
+        if origen_malo.any():
+            errores.append(f"Origen no disponible para el fertilizante (filas {_filas(origen_malo, tabla)})")
+
+def _validar(tabla, errores):
+    """Validación por columnas de todas las categorías; agrega los mensajes a `errores`."""
+    f = paquete_activo()
+    categoria = tabla["_categoria"]
+    fert = (categoria == "fertilizantes").to_numpy()
+    agro = (categoria == "agroquimicos").to_numpy()
+    labores = (categoria == "labores").to_numpy()
+    riego = (categoria == "riego").to_numpy()
+    residuos = (categoria == "residuos").to_numpy()
+
+    if fert.any():
+        _validar_fertilizantes(tabla, fert, errores)
+    if agro.any():
+        fuera = _no_valido(tabla["categoria"], CATEGORIAS_AGROQUIMICOS, agro)
+        if fuera.any():
+            errores.append(f"Categoría de agroquímico desconocida; use {CATEGORIAS_AGROQUIMICOS} (filas {_filas(fuera, tabla)})")
+        sin_fe = agro & ~fuera & tabla["fe"].isna().to_numpy() & tabla["tipo"].notna().to_numpy()
+        if sin_fe.any():
+            claves = tabla["categoria"].fillna("pesticidas").to_numpy()[sin_fe]
+            tipos = tabla["tipo"].to_numpy()[sin_fe]
+            codigos, unicos = pd.factorize(pd.MultiIndex.from_arrays([claves, tipos]))
+            malos = np.array([t not in f["factores_emision"].get(c, {}) for c, t in unicos], dtype=bool)
+            tipo_malo = np.zeros(len(tabla), dtype=bool)
+            tipo_malo[np.flatnonzero(sin_fe)] = malos[codigos]
+            if tipo_malo.any():
+                errores.append(f"Tipo de agroquímico sin factor de emisión; indique 'fe' (filas {_filas(tipo_malo, tabla)})")
+    if labores.any():
+        fuera = _no_valido(tabla["tipo_maquinaria"], ["Manual"] + list(f["rendimientos_maquinaria"]), labores)
+        if fuera.any():
+            errores.append(f"Tipo de maquinaria desconocido (filas {_filas(fuera, tabla)})")
+        fuera = _no_valido(tabla["tipo_combustible"], list(f["factores_combustible"]) + ["N/A"], labores)
+        if fuera.any():
+            errores.append(f"Tipo de combustible desconocido (filas {_filas(fuera, tabla)})")
+    if riego.any():
+        fuera = _no_valido(tabla["tipo_actividad"], ACTIVIDADES_RIEGO, riego)
+        if fuera.any():
+            errores.append(f"Actividad de riego desconocida; use {ACTIVIDADES_RIEGO} (filas {_filas(fuera, tabla)})")
+        fuera = _no_valido(tabla["tipo_energia"], f["factores_combustible"], riego)
+        if fuera.any():
+            errores.append(f"Tipo de energía desconocido (filas {_filas(fuera, tabla)})")
+    if residuos.any():
+        fuera = _no_valido(tabla["via"], VIAS_RESIDUOS, residuos)
+        if fuera.any():
+            errores.append(f"Vía de residuos desconocida; use {VIAS_RESIDUOS} (filas {_filas(fuera, tabla)})")
+
+# -----------------------------
+# Importación
+# -----------------------------
+def _tabla_categoria(grupo, categoria):
+    """Filas de una categoría con las columnas (y tipos) de su tabla de ingreso."""
+    tabla = tabla_vacia(categoria)
+    if categoria == "labores":
+        grupo = grupo.copy()
+        # "litros" (total de la labor, formato de nucleo.lote) -> litros por pasada
+        sin_consumo = grupo["litros_pasada"].isna() & grupo["horas_pasada"].isna() & grupo["litros"].notna()
+        grupo.loc[sin_consumo, "litros_pasada"] = grupo["litros"] / grupo["pasadas"].fillna(1)
+    datos = {c: grupo[c].astype(t).to_numpy() for c, t in COLUMNAS_ENTRADA[categoria].items()}
+    return pd.DataFrame(datos, columns=tabla.columns).astype(tabla.dtypes.to_dict())
+
+def _residuos(grupo):
+    """{"vía": {"biomasa", "ajustes"}} de las filas de residuos de una etapa."""
+    sumas = grupo.groupby("via", sort=False).agg(
+        biomasa=("biomasa", "sum"), **{c: (c, "first") for c in AJUSTES_RESIDUO}
+    )
+    detalle = {}
+    for via, fila in sumas.iterrows():
+        ajustes = {c: fila[c] for c in AJUSTES_RESIDUO if pd.notna(fila[c])}
+        detalle[via] = {"biomasa": float(fila["biomasa"]), "ajustes": ajustes}
+    return detalle
+
+def importar_actividades(tabla, etapa=None):
+    """
+    Convierte una planilla de actividades en tablas de ingreso por etapa.
+    - etapa: si se indica, todas las filas van a esa etapa (se ignora la columna `etapa`)
+    Devuelve (etapas, errores): etapas es {nombre: {"fertilizantes", "agroquimicos",
+    "labores", "riego": DataFrame, "residuos": dict}} en el orden de la planilla (solo con
+    las categorías que tienen filas) y errores la lista de problemas encontrados; si hay
+    errores, etapas queda vacío.
+    """
+    errores = []
+    tabla = tabla.rename(columns=lambda c: str(c).strip()).dropna(how="all")
+    if "fuente" not in tabla.columns:
+        return {}, ["Falta la columna 'fuente' (fertilizante, agroquimico, labor, riego o residuo)"]
+    if etapa is None and "etapa" not in tabla.columns:
+        return {}, ["Falta la columna 'etapa' (o elija la etapa de destino)"]
+
+    columnas = {c for cols in COLUMNAS_ENTRADA.values() for c in cols} | {"via", "actividad", "litros", "biomasa"} | set(AJUSTES_RESIDUO)
+    for columna in columnas - set(tabla.columns):
+        tabla[columna] = np.nan
+
+    fuente = _texto(tabla["fuente"]).str.lower()
+    tabla["_categoria"] = fuente.map(FUENTES_IMPORTACION)
+    desconocida = fuente.notna() & tabla["_categoria"].isna()
+    if desconocida.any():
+        errores.append(f"Fuente desconocida (filas {_filas(desconocida, tabla)})")
+    tabla = tabla[tabla["_categoria"].notna()]
+
+    tabla["_etapa"] = etapa if etapa is not None else _texto(tabla["etapa"])
+    sin_etapa = tabla["_etapa"].isna()
+    if sin_etapa.any():
+        errores.append(f"Filas sin etapa (filas {_filas(sin_etapa, tabla)})")
+
+    for columna in COLUMNAS_NUMERICAS:
+        if columna not in tabla.columns:
+            continue
+        numeros, invalidos = _numeros(tabla[columna])
+        if invalidos.any():
+            errores.append(f"Valor no numérico en '{columna}' (filas {_filas(invalidos, tabla)})")
+        negativos = numeros < 0
+        if negativos.any():
+            errores.append(f"Valor negativo en '{columna}' (filas {_filas(negativos, tabla)})")
+        tabla[columna] = numeros
+    for columna in ["tipo", "origen", "categoria", "nombre_comercial", "nombre_labor", "tipo_maquinaria",
+                    "tipo_combustible", "tipo_actividad", "actividad", "tipo_energia", "via", "base_calculo"]:
+        tabla[columna] = _texto(tabla[columna])
+    tabla["es_organico"] = _booleanos(tabla["es_organico"])
+    # Riego en formato de nucleo.lote: "actividad" puede traer el tipo de actividad
+    es_tipo = tabla["actividad"].isin(ACTIVIDADES_RIEGO)
+    tabla["tipo_actividad"] = tabla["tipo_actividad"].where(tabla["tipo_actividad"].notna(), tabla["actividad"].where(es_tipo))
+
+    _validar(tabla, errores)
+    if errores:
+        return {}, errores
+
+    etapas = {}
+    for (nombre, categoria), grupo in tabla.groupby(["_etapa", "_categoria"], sort=False):
+        datos = etapas.setdefault(nombre, {})
+        datos[categoria] = _residuos(grupo) if categoria == "residuos" else _tabla_categoria(grupo, categoria)
+    return etapas, errores
@@ -0,0 +1,321 @@
+"""
+Análisis de incertidumbre por Monte Carlo (vectorizado con NumPy).
+
+El cálculo de la huella es lineal en los datos de actividad y, para una etapa dada, en
+los factores inciertos (EF1, EF4, EF5, fracciones de volatilización y lixiviación,
+fracción seca de la quema). Por eso el modelo se "compila" una sola vez con las
+calculadoras escalares (coeficientes por actividad y etapa) y luego se evalúan todas
+las muestras juntas como productos de matrices: 10.000 muestras de un ciclo de vida
+perenne completo toman del orden de milisegundos.
+
+    from nucleo.incertidumbre import simular_proyecto
+
+    r = simular_proyecto(proyecto, n=10000, semilla=1)
+    r["em_total"]["percentiles"]        # {"2.5": ..., "50": ..., "97.5": ...}
+    r["etapas"]["Producción"]["Fertilizantes"]
+
+Se muestrean:
+    - los factores de DISTRIBUCIONES_FACTORES: triangular(mínimo, valor del paquete, máximo),
+      con los rangos de incertidumbre del IPCC 2019 (Vol. 4, Cap. 11, Tabla 11.3);
+    - los datos de actividad (cantidades de fertilizantes y agroquímicos, litros de
+      maquinaria, agua y energía de riego, biomasa de residuos y producción): normal
+      truncada en 0, con una desviación relativa común (`actividad`, por defecto 10 %),
+      independiente para cada actividad.
+Con todos los factores en su valor nominal y los multiplicadores de actividad en 1, el
+modelo reproduce `calcular_proyecto`. Requiere NumPy.
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from .archivo import leer_proyecto
+from .calculos import (
+    calcular_emisiones_compostaje,
+    calcular_emisiones_maquinaria,
+    calcular_emisiones_quema_residuos,
+    resolver_fertilizante,
+)
+from .etapas import FUENTES, _normalizar_actividad_riego, _normalizar_agroquimico
+from .paquetes import usar_paquete
+
+# (mínimo, máximo) de cada factor; la moda es el valor del paquete activo
+DISTRIBUCIONES_FACTORES = {
+    "EF1": (0.001, 0.018),
+    "EF4": (0.002, 0.018),
+    "EF5": (0.0, 0.020),
+    "FRAC_VOLATILIZACION_INORG": (0.02, 0.33),
+    "FRAC_VOLATILIZACION_ORG": (0.0, 0.31),
+    "FRAC_LIXIVIACION": (0.01, 0.73),
+    # Sin rango IPCC publicado: ±15 % alrededor del valor del paquete
+    "FRACCION_SECA_QUEMA": (0.85, 1.15),
+}
+FACTORES_RELATIVOS = {"FRACCION_SECA_QUEMA"}
+
+# Grupos de datos de actividad (cada uno con un multiplicador por actividad y muestra)
+ACTIVIDADES = ["fertilizantes", "agroquimicos", "riego_agua", "riego_energia", "maquinaria", "residuos", "produccion"]
+CAMPOS_ACTIVIDAD = {
+    "fertilizantes": ["fijo", "n", "vol_inorg", "vol_org", "lix"],
+    "residuos": ["fijo", "quema"],
+}
+INCERTIDUMBRE_ACTIVIDAD = 0.10
+PERCENTILES = (2.5, 50, 97.5)
+
+class ModeloIncertidumbre:
+    """
+    Modelo lineal de un proyecto (mismo formato que `calcular_proyecto`), armado una sola
+    vez con el paquete de factores indicado. `evaluar` calcula muchas muestras a la vez.
+    """
+    def __init__(self, proyecto, paquete=None):
+        with usar_paquete(paquete if paquete is not None else proyecto.get("paquete")) as f:
+            self.paquete = f
+            self.nominales = {
+                "EF1": f["EF1"],
+                "EF4": f["EF4"],
+                "EF5": f["EF5"],
+                "FRAC_VOLATILIZACION_INORG": f["FRAC_VOLATILIZACION_INORG"],
+                "FRAC_VOLATILIZACION_ORG": f["FRAC_VOLATILIZACION_ORG"],
+                "FRAC_LIXIVIACION": f["FRAC_LIXIVIACION"],
+                # La quema usa la fracción seca de factores_residuos cuando no se ajusta
+                "FRACCION_SECA_QUEMA": f["factores_residuos"]["fraccion_seca"],
+            }
+            self._n2o = (44/28) * f["GWP"]["N2O"]
+            self._armar(proyecto)
+
+    def _armar(self, proyecto):
+        anual = proyecto.get("tipo", "perenne") == "anual"
+        etapas = proyecto.get("etapas", [])
+        self.etapas = []
+        self.repeticiones = []
+        columnas = {g: [] for g in ACTIVIDADES}
+        for e, etapa in enumerate(etapas):
+            self.etapas.append(etapa.get("nombre", f"Ciclo {e + 1}" if anual else f"Etapa {e + 1}"))
+            self.repeticiones.append(int(etapa.get("ciclos", 1)) if anual else 1)
+            duracion = etapa.get("duracion", 1)
+
+            for fert in etapa.get("fertilizantes", []):
+                r = resolver_fertilizante(fert, self.paquete)
+                n = r["n_aplicado"] * duracion
+                fijo = r["cantidad"] * r["fe_produccion"] * duracion if r["fe_produccion"] else 0
+                if r["es_urea"]:
+                    fijo += r["cantidad"] * self.paquete["EF_CO2_UREA"] * duracion
+                vol = n * r["frac_vol"]
+                columnas["fertilizantes"].append({
+                    "etapa": e,
+                    "fijo": fijo,
+                    "n": n,
+                    "vol_org": vol if r["es_organico"] else 0,
+                    "vol_inorg": 0 if r["es_organico"] else vol,
+                    "lix": n * r["frac_lix"],
+                })
+
+            for ag in etapa.get("agroquimicos", []):
+                ag = _normalizar_agroquimico(ag)
+                columnas["agroquimicos"].append({"etapa": e, "fijo": ag["emisiones"] * duracion})
+
+            duracion_riego = duracion if etapa.get("riego_por_anio", True) else 1
+            for ea in etapa.get("riego", []):
+                ea = _normalizar_actividad_riego(ea)
+                columnas["riego_agua"].append({"etapa": e, "fijo": ea["emisiones_agua"] * duracion_riego})
+                columnas["riego_energia"].append({"etapa": e, "fijo": ea["emisiones_energia"] * duracion_riego})
+
+            for labor in etapa.get("labores", []):
+                columnas["maquinaria"].append({"etapa": e, "fijo": calcular_emisiones_maquinaria([labor], duracion)})
+
+            for via, datos in etapa.get("residuos", {}).items():
+                biomasa = datos.get("biomasa", 0)
+                ajustes = datos.get("ajustes", {})
+                fijo = quema = 0
+                if via == "Quema":
+                    fraccion_seca = ajustes.get("fraccion_seca")
+                    em_ch4, em_n2o = calcular_emisiones_quema_residuos(
+                        biomasa,
+                        fraccion_seca=1 if fraccion_seca is None else fraccion_seca,
+                        fraccion_quemada=ajustes.get("fraccion_quemada"),
+                        ef_ch4=ajustes.get("ef_ch4"),
+                        ef_n2o=ajustes.get("ef_n2o")
+                    )
+                    if fraccion_seca is None:
+                        quema = em_ch4 + em_n2o   # por unidad de fracción seca
+                    else:
+                        fijo = em_ch4 + em_n2o
+                elif via == "Compostaje":
+                    fijo = sum(calcular_emisiones_compostaje(
+                        biomasa,
+                        base_calculo=ajustes.get("base_calculo", "base_humeda"),
+                        fraccion_seca=ajustes.get("fraccion_seca")
+                    ))
+                columnas["residuos"].append({"etapa": e, "fijo": fijo, "quema": quema})
+
+            columnas["produccion"].append({"etapa": e, "fijo": etapa.get("produccion", 0) * duracion})
+
+        # Matrices etapa × actividad: cada coeficiente en la fila de su etapa
+        self.n_actividades = {g: len(filas) for g, filas in columnas.items()}
+        self._matrices = {}
+        for grupo, filas in columnas.items():
+            for campo in CAMPOS_ACTIVIDAD.get(grupo, ["fijo"]):
+                matriz = np.zeros((len(etapas), len(filas)))
+                for j, fila in enumerate(filas):
+                    matriz[fila["etapa"], j] = fila[campo]
+                self._matrices[grupo, campo] = matriz
+        self._repeticiones = np.asarray(self.repeticiones, dtype=float)[:, None]
+
+    def _aplicar(self, grupo, campo, multiplicadores, n):
+        """Suma por etapa de los coeficientes de `grupo` por sus multiplicadores: (etapas, n)."""
+        matriz = self._matrices[grupo, campo]
+        m = multiplicadores.get(grupo)
+        if m is None:
+            return np.repeat(matriz.sum(axis=1)[:, None], n, axis=1)
+        m = np.asarray(m, dtype=float)
+        if m.ndim == 1:
+            return matriz.sum(axis=1)[:, None] * m[None, :]
+        return matriz @ m
+
+    def evaluar(self, factores=None, multiplicadores=None, n=None):
+        """
+        Evalúa el modelo para n muestras.
+        - factores: dict nombre -> arreglo (n,) o escalar; los ausentes toman el valor nominal
+        - multiplicadores: dict grupo de ACTIVIDADES -> arreglo (n,) (común a todas las
+          actividades del grupo) o (n_actividades[grupo], n) (uno por actividad)
+        Devuelve: dict con "etapas" {nombre: {fuente: (n,)}}, "em_etapas" (etapas, n),
+        "produccion_etapas" (etapas, n), "em_total" (n,), "prod_total" (n,) y "huella" (n,).
+        """
+        factores = factores or {}
+        multiplicadores = multiplicadores or {}
+        if n is None:
+            arreglos = [np.asarray(v) for v in list(factores.values()) + list(multiplicadores.values())]
+            n = max([a.shape[-1] for a in arreglos if a.ndim] or [1])
+
+        def factor(nombre):
+            return np.broadcast_to(np.asarray(factores.get(nombre, self.nominales[nombre]), dtype=float), (n,))
+
+        rel = {}
+        for nombre in ("FRAC_VOLATILIZACION_INORG", "FRAC_VOLATILIZACION_ORG", "FRAC_LIXIVIACION"):
+            rel[nombre] = factor(nombre) / self.nominales[nombre] if self.nominales[nombre] else np.zeros(n)
+        n2o = (
+            self._aplicar("fertilizantes", "n", multiplicadores, n) * factor("EF1")
+            + (self._aplicar("fertilizantes", "vol_inorg", multiplicadores, n) * rel["FRAC_VOLATILIZACION_INORG"]
+               + self._aplicar("fertilizantes", "vol_org", multiplicadores, n) * rel["FRAC_VOLATILIZACION_ORG"]) * factor("EF4")
+            + self._aplicar("fertilizantes", "lix", multiplicadores, n) * rel["FRAC_LIXIVIACION"] * factor("EF5")
+        ) * self._n2o
+
+        fuentes = {
+            "Fertilizantes": self._aplicar("fertilizantes", "fijo", multiplicadores, n) + n2o,
+            "Agroquímicos": self._aplicar("agroquimicos", "fijo", multiplicadores, n),
+            "Riego": self._aplicar("riego_agua", "fijo", multiplicadores, n)
+                     + self._aplicar("riego_energia", "fijo", multiplicadores, n),
+            "Maquinaria": self._aplicar("maquinaria", "fijo", multiplicadores, n),
+            "Residuos": self._aplicar("residuos", "fijo", multiplicadores, n)
+                        + self._aplicar("residuos", "quema", multiplicadores, n) * factor("FRACCION_SECA_QUEMA"),
+        }
+        for fuente in fuentes:
+            fuentes[fuente] = fuentes[fuente] * self._repeticiones
+        em_etapas = sum(fuentes.values())
+        produccion_etapas = self._aplicar("produccion", "fijo", multiplicadores, n) * self._repeticiones
+        em_total = em_etapas.sum(axis=0)
+        prod_total = produccion_etapas.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            huella = np.where(prod_total > 0, em_total / prod_total, np.nan)
+        return {
+            "etapas": {
+                nombre: {fuente: fuentes[fuente][e] for fuente in FUENTES if fuente in fuentes}
+                for e, nombre in enumerate(self.etapas)
+            },
+            "em_etapas": em_etapas,
+            "produccion_etapas": produccion_etapas,
+            "em_total": em_total,
+            "prod_total": prod_total,
+            "huella": huella
+        }
+
+    def muestrear(self, n, rng, actividad=INCERTIDUMBRE_ACTIVIDAD, distribuciones=None):
+        """Muestras (factores, multiplicadores) para `evaluar`."""
+        distribuciones = DISTRIBUCIONES_FACTORES if distribuciones is None else distribuciones
+        factores = {}
+        for nombre, (minimo, maximo) in distribuciones.items():
+            moda = self.nominales[nombre]
+            if nombre in FACTORES_RELATIVOS:
+                minimo, maximo = minimo * moda, maximo * moda
+            minimo, maximo = min(minimo, moda), max(maximo, moda)
+            factores[nombre] = rng.triangular(minimo, moda, maximo, n) if maximo > minimo else np.full(n, moda)
+        multiplicadores = {}
+        if actividad:
+            for grupo in ACTIVIDADES:
+                k = self.n_actividades[grupo]
+                if k:
+                    multiplicadores[grupo] = np.maximum(rng.normal(1.0, actividad, (k, n)), 0)
+        return factores, multiplicadores
+
+def bandas(muestras, percentiles=PERCENTILES):
+    """Media, desvío estándar y percentiles de un arreglo de muestras (ignora NaN)."""
+    muestras = np.asarray(muestras, dtype=float)
+    if np.isnan(muestras).all():
+        return {"media": None, "desvio": None, "percentiles": {f"{p:g}": None for p in percentiles}}
+    valores = np.nanpercentile(muestras, percentiles)
+    return {
+        "media": float(np.nanmean(muestras)),
+        "desvio": float(np.nanstd(muestras)),
+        "percentiles": {f"{p:g}": float(v) for p, v in zip(percentiles, valores)}
+    }
+
+def simular_proyecto(proyecto, n=10000, semilla=None, actividad=INCERTIDUMBRE_ACTIVIDAD,
+                     distribuciones=None, percentiles=PERCENTILES, paquete=None, devolver_muestras=False):
+    """
+    Monte Carlo de un proyecto (formato de `calcular_proyecto`).
+    - n: número de muestras
+    - semilla: semilla del generador (resultados reproducibles)
+    - actividad: desviación relativa de los datos de actividad (0 = solo factores)
+    - distribuciones: {factor: (mínimo, máximo)} en lugar de DISTRIBUCIONES_FACTORES
+    Devuelve: dict con bandas (media, desvío, percentiles) de em_total, prod_total y
+    huella, por fuente y por etapa y fuente; con devolver_muestras, también las muestras.
+    """
+    modelo = ModeloIncertidumbre(proyecto, paquete)
+    rng = np.random.default_rng(semilla)
+    factores, multiplicadores = modelo.muestrear(n, rng, actividad, distribuciones)
+    r = modelo.evaluar(factores, multiplicadores, n)
+    resultado = {
+        "n": n,
+        "semilla": semilla,
+        "paquete_factores": modelo.paquete.identificador(),
+        "em_total": bandas(r["em_total"], percentiles),
+        "prod_total": bandas(r["prod_total"], percentiles),
+        "huella": bandas(r["huella"], percentiles),
+        "fuentes": {
+            fuente: bandas(sum(etapa[fuente] for etapa in r["etapas"].values()), percentiles)
+            for fuente in FUENTES
+        } if r["etapas"] else {},
+        "etapas": {
+            nombre: dict(
+                {fuente: bandas(v, percentiles) for fuente, v in etapa.items()},
+                Total=bandas(r["em_etapas"][e], percentiles)
+            )
+            for e, (nombre, etapa) in enumerate(r["etapas"].items())
+        }
+    }
+    if devolver_muestras:
+        resultado["muestras"] = dict(r, factores=factores)
+    return resultado
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m nucleo.incertidumbre",
+        description="Bandas de incertidumbre (Monte Carlo) de la huella de un proyecto JSON."
+    )
+    parser.add_argument("proyecto", help="Archivo JSON con el proyecto (formato de calcular_proyecto) o archivo de proyecto de la aplicación")
+    parser.add_argument("-n", "--muestras", type=int, default=10000, help="Número de muestras (por defecto 10000)")
+    parser.add_argument("--semilla", type=int, help="Semilla del generador aleatorio")
+    parser.add_argument("--actividad", type=float, default=INCERTIDUMBRE_ACTIVIDAD,
+                        help="Desviación relativa de los datos de actividad (por defecto 0.10)")
+    parser.add_argument("--paquete", help="Paquete de factores (nombre de nucleo/datos o ruta .json)")
+    args = parser.parse_args(argv)
+    proyecto = leer_proyecto(args.proyecto)
+    resultado = simular_proyecto(proyecto, n=args.muestras, semilla=args.semilla,
+                                 actividad=args.actividad, paquete=args.paquete)
+    json.dump(resultado, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
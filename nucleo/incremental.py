@@ -0,0 +1,189 @@
+"""
+Recálculo incremental de un proyecto: grafo de dependencias entrada → ítem → fuente → etapa → total.
+
+La aplicación vuelve a ejecutar todo el script ante cada cambio de un widget. Con
+`GrafoProyecto` cada ítem (un fertilizante, un agroquímico, una labor, una actividad de
+riego o una vía de residuos) guarda la huella de sus datos de entrada y su emisión; al
+actualizar una etapa solo se recalculan los ítems cuya huella cambió, y las sumas por
+fuente, por etapa y globales se corrigen con la diferencia. Editar un fertilizante en un
+proyecto perenne segmentado año a año cuesta un cálculo, no uno por cada ítem ingresado.
+
+    grafo = GrafoProyecto("perenne")
+    grafo.actualizar_etapa("Implantación", etapa)     # mismo formato que calcular_proyecto
+    grafo.em_total, grafo.emisiones_fuentes, grafo.resultados()
+
+Cambiar la duración (o riego_por_anio) de una etapa recalcula todos sus ítems; cambiar
+la producción o los ciclos solo reescala sus sumas. Si cambia el paquete de factores
+activo se recalcula todo. Los valores coinciden con `calcular_proyecto` (salvo redondeo
+de punto flotante por el orden de las sumas).
+"""
+
+import json
+
+from .actividades import Registro
+from .etapas import FUENTES, calcular_fuente, nuevas_emisiones_fuentes
+from .paquetes import paquete_activo
+
+# Fuente -> clave de la etapa con sus ítems
+CAMPOS_FUENTE = {
+    "Fertilizantes": "fertilizantes",
+    "Agroquímicos": "agroquimicos",
+    "Riego": "riego",
+    "Maquinaria": "labores",
+    "Residuos": "residuos",
+}
+
+def huella_datos(datos):
+    """Representación canónica (comparable) de los datos de entrada de un ítem."""
+    return json.dumps(datos, sort_keys=True, ensure_ascii=False, default=_valor_huella)
+
+def _valor_huella(valor):
+    return valor.campos() if isinstance(valor, Registro) else str(valor)
+
+def _items(etapa, fuente):
+    datos = etapa.get(CAMPOS_FUENTE[fuente])
+    if not datos:
+        return []
+    if fuente == "Residuos":
+        return list(datos.items())
+    if fuente == "Fertilizantes" and isinstance(datos, dict):
+        # Salida de ingresar_fertilizantes: {"fertilizantes": [...]}
+        return datos.get("fertilizantes", [])
+    return datos
+
+class GrafoProyecto:
+    """
+    Resultados de un proyecto que se actualizan de forma incremental.
+    - tipo: "perenne" o "anual" (en modo anual, "ciclos" repite la etapa)
+    Atributos: em_total, prod_total, emisiones_fuentes y recalculados (ítems calculados
+    en la última actualización).
+    """
+    def __init__(self, tipo="perenne"):
+        self.tipo = tipo
+        self._etapas = {}   # nombre -> {"parametros", "repeticiones", "produccion", "fuentes", "items"}
+        self._paquete = None
+        self._huella_paquete = None
+        self.em_total = 0
+        self.prod_total = 0
+        self.emisiones_fuentes = nuevas_emisiones_fuentes()
+        self.recalculados = 0
+
+    def __contains__(self, nombre):
+        return nombre in self._etapas
+
+    def etapas(self):
+        return list(self._etapas)
+
+    def _aportar(self, nodo, signo):
+        """Suma (signo=1) o resta (signo=-1) el aporte de una etapa a los totales globales."""
+        repeticiones = nodo["repeticiones"] * signo
+        for fuente in FUENTES:
+            valor = nodo["fuentes"][fuente] * repeticiones
+            self.emisiones_fuentes[fuente] += valor
+            self.em_total += valor
+        self.prod_total += nodo["produccion"] * repeticiones
+
+    def _revisar_paquete(self):
+        # Se compara el contenido del paquete: dos archivos con el mismo nombre y versión
+        # pueden tener factores distintos
+        paquete = paquete_activo()
+        if paquete.huella() != self._huella_paquete:
+            self._huella_paquete = paquete.huella()
+            self._paquete = paquete.identificador()
+            if self._etapas:
+                self.recalcular()
+
+    def actualizar_etapa(self, nombre, etapa):
+        """
+        Incorpora los datos actuales de una etapa (formato de `calcular_proyecto`).
+        Solo recalcula los ítems nuevos o modificados. Devuelve la cantidad de ítems recalculados.
+        """
+        self._revisar_paquete()
+        self.recalculados = 0
+        duracion = etapa.get("duracion", 1)
+        parametros = {"duracion": duracion, "riego_por_anio": etapa.get("riego_por_anio", True)}
+        nodo = self._etapas.get(nombre)
+        if nodo is not None and nodo["parametros"] != parametros:
+            self.quitar_etapa(nombre)
+            nodo = None
+        if nodo is None:
+            nodo = {
+                "parametros": parametros,
+                "repeticiones": 0,
+                "produccion": 0,
+                "fuentes": dict.fromkeys(FUENTES, 0),
+                "items": {fuente: [] for fuente in FUENTES}
+            }
+            self._etapas[nombre] = nodo
+        self._aportar(nodo, -1)
+        for fuente in FUENTES:
+            items = nodo["items"][fuente]
+            nuevos = _items(etapa, fuente)
+            for i, item in enumerate(nuevos):
+                huella = huella_datos(item)
+                if i < len(items) and items[i][0] == huella:
+                    continue
+                valor = self._calcular_item(parametros, fuente, item)
+                anterior = items[i][1] if i < len(items) else 0
+                nodo["fuentes"][fuente] += valor - anterior
+                if i < len(items):
+                    items[i] = (huella, valor, item)
+                else:
+                    items.append((huella, valor, item))
+                self.recalculados += 1
+            while len(items) > len(nuevos):
+                nodo["fuentes"][fuente] -= items.pop()[1]
+        nodo["repeticiones"] = int(etapa.get("ciclos", 1)) if self.tipo == "anual" else 1
+        nodo["produccion"] = etapa.get("produccion", 0) * duracion
+        self._aportar(nodo, 1)
+        return self.recalculados
+
+    def _calcular_item(self, parametros, fuente, item):
+        etapa = dict(parametros)
+        etapa[CAMPOS_FUENTE[fuente]] = dict([item]) if fuente == "Residuos" else [item]
+        return calcular_fuente(etapa, fuente)
+
+    def quitar_etapa(self, nombre):
+        """Elimina una etapa y su aporte a los totales."""
+        nodo = self._etapas.pop(nombre, None)
+        if nodo is not None:
+            self._aportar(nodo, -1)
+
+    def conservar(self, nombres):
+        """Elimina las etapas que no están en `nombres` (p. ej. las que ya no se muestran)."""
+        for nombre in [n for n in self._etapas if n not in nombres]:
+            self.quitar_etapa(nombre)
+
+    def recalcular(self):
+        """Recalcula todos los ítems (p. ej. tras cambiar los factores); corrige el redondeo acumulado."""
+        self.em_total = 0
+        self.prod_total = 0
+        self.emisiones_fuentes = nuevas_emisiones_fuentes()
+        for nodo in self._etapas.values():
+            for fuente in FUENTES:
+                items = [(h, self._calcular_item(nodo["parametros"], fuente, item), item)
+                         for h, _, item in nodo["items"][fuente]]
+                nodo["items"][fuente] = items
+                nodo["fuentes"][fuente] = sum(valor for _, valor, _ in items)
+            self._aportar(nodo, 1)
+
+    def emisiones_etapa(self, nombre):
+        """Emisiones por fuente de una etapa (kg CO2e/ha, incluidas las repeticiones)."""
+        nodo = self._etapas[nombre]
+        return {fuente: nodo["fuentes"][fuente] * nodo["repeticiones"] for fuente in FUENTES}
+
+    def resultados(self):
+        """Totales por etapa, por fuente y globales (claves de `resultados_globales`, sin desgloses)."""
+        emisiones_fuente_etapa = {nombre: self.emisiones_etapa(nombre) for nombre in self._etapas}
+        return {
+            "tipo": self.tipo,
+            "em_total": self.em_total,
+            "prod_total": self.prod_total,
+            "emisiones_etapas": {nombre: sum(e.values()) for nombre, e in emisiones_fuente_etapa.items()},
+            "produccion_etapas": {
+                nombre: nodo["produccion"] * nodo["repeticiones"] for nombre, nodo in self._etapas.items()
+            },
+            "emisiones_fuentes": dict(self.emisiones_fuentes),
+            "emisiones_fuente_etapa": emisiones_fuente_etapa,
+            "paquete_factores": self._paquete
+        }
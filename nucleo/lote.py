@@ -0,0 +1,384 @@
+"""
+Cálculo por lotes de huellas de carbono para muchos predios (sin interfaz).
+
+Uso:
+    python -m nucleo.lote actividades.csv -o resultados.jsonl
+    python -m nucleo.lote actividades.parquet -o resultados.csv --sin-desglose
+
+Formato de entrada (una fila por actividad, formato "largo"):
+    - finca:           identificador del predio. Las filas de un mismo predio deben
+                       estar contiguas (el archivo se procesa en streaming, predio a predio).
+    - tipo_cultivo:    "perenne" o "anual" (basta con indicarlo en la primera fila del predio).
+    - paquete:         paquete de factores del predio (opcional; por defecto el de `--paquete`).
+    - superficie:      hectáreas del predio (opcional; pondera el predio en `--resumen`, por defecto 1).
+    - etapa:           nombre de la etapa (en modo anual, cada etapa es un ciclo).
+    - duracion, produccion, ciclos, riego_por_anio, tipo_riego: datos de la etapa
+      (se toma el primer valor no vacío de cada etapa).
+    - fuente:          "fertilizante", "agroquimico", "riego", "labor", "residuo"
+                       o vacío (fila que solo declara la etapa).
+    - Columnas de la actividad, con los mismos nombres que los campos de `nucleo.actividades`:
+        fertilizante: tipo, origen, cantidad, N, P, K, es_organico, fraccion_seca,
+                      modo_otros, nutriente, fe_personalizado
+                      (como al importar planillas: los tipos solo orgánicos se marcan
+                      es_organico y los "Otros" sin modo_otros usan N en porcentaje)
+        agroquimico:  categoria, tipo, nombre_comercial, cantidad_ia, fe
+        riego:        actividad, tipo_actividad, agua_total_m3, consumo_energia,
+                      tipo_energia, fe_energia
+        labor:        nombre_labor, tipo_maquinaria, tipo_combustible, litros, fe_personalizado
+        residuo:      via, biomasa, fraccion_seca, fraccion_quemada, ef_ch4, ef_n2o, base_calculo
+
+Salida:
+    - .jsonl: una línea por predio con {"finca": ..., **resultados_globales}
+    - .csv:   una fila por predio, etapa y fuente (kg CO2e/ha), más totales por etapa y predio.
+
+Los decimales pueden escribirse con punto o con coma (con `--separador ";"`), con
+separador de miles opcional ("1.234,5" o "1,234.5").
+La memoria usada queda acotada por el predio más grande, no por el tamaño del archivo.
+Con `--procesos N` los predios se calculan en N procesos (ver `nucleo/cartera.py`); la
+salida es la misma, en el mismo orden, con cualquier número de procesos.
+"""
+
+import argparse
+import csv
+import json
+import sys
+from itertools import groupby
+
+from .actividades import ActividadRiego, Agroquimico, Fertilizante, GestionResiduo, Labor, a_json
+from .cartera import AcumuladorCartera, calcular_cartera
+from .etapas import FUENTES
+from .paquetes import obtener_paquete
+
+COLUMNAS_NUMERICAS = {
+    "superficie", "duracion", "produccion", "ciclos",
+    "cantidad", "N", "P", "K", "fraccion_seca", "fe_personalizado",
+    "cantidad_ia", "fe",
+    "agua_total_m3", "consumo_energia", "fe_energia",
+    "litros",
+    "biomasa", "fraccion_quemada", "ef_ch4", "ef_n2o",
+}
+COLUMNAS_BOOLEANAS = {"es_organico", "riego_por_anio"}
+
+CAMPOS_FUENTE = {
+    "fertilizante": ["tipo", "origen", "cantidad", "N", "P", "K", "es_organico",
+                     "fraccion_seca", "modo_otros", "nutriente", "fe_personalizado"],
+    "agroquimico": ["categoria", "tipo", "nombre_comercial", "cantidad_ia", "fe"],
+    "riego": ["actividad", "tipo_actividad", "agua_total_m3", "consumo_energia",
+              "tipo_energia", "fe_energia"],
+    "labor": ["nombre_labor", "tipo_maquinaria", "tipo_combustible", "litros",
+              "fe_personalizado"],
+}
+# Registro de actividad de cada fuente (ver nucleo.actividades)
+TIPOS_FUENTE = {
+    "fertilizante": Fertilizante,
+    "agroquimico": Agroquimico,
+    "riego": ActividadRiego,
+    "labor": Labor,
+}
+AJUSTES_RESIDUO = ["fraccion_seca", "fraccion_quemada", "ef_ch4", "ef_n2o", "base_calculo"]
+CAMPOS_ETAPA = ["duracion", "produccion", "ciclos", "riego_por_anio", "tipo_riego"]
+
+COLUMNAS_SALIDA_CSV = [
+    "finca", "tipo", "etapa", "fuente",
+    "emisiones_kg_co2e_ha", "produccion_kg_ha", "huella_kg_co2e_kg", "paquete_factores"
+]
+
+# -----------------------------
+# Lectura en streaming
+# -----------------------------
+def _convertir(columna, valor):
+    """Convierte el texto de una celda al tipo esperado; devuelve None si está vacía."""
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = valor.strip()
+        if valor == "":
+            return None
+    if columna in COLUMNAS_NUMERICAS:
+        if isinstance(valor, str):
+            return _numero(columna, valor)
+        return float(valor)
+    if columna in COLUMNAS_BOOLEANAS:
+        if isinstance(valor, str):
+            return valor.lower() in ("1", "true", "si", "sí", "verdadero", "x")
+        return bool(valor)
+    return valor
+
+def _numero(columna, texto):
+    """
+    float de un texto con punto o coma decimal y separador de miles opcional
+    ("1234.5", "1234,5", "1.234,5", "1,234.5", "1.234.567", "1,234,567"). El separador decimal es
+    el último que aparece si hay de ambos tipos.
+    """
+    numero = texto
+    if "," in numero and "." in numero:
+        miles, decimal = (".", ",") if numero.rfind(",") > numero.rfind(".") else (",", ".")
+        numero = numero.replace(miles, "").replace(decimal, ".")
+    elif numero.count(",") == 1:
+        numero = numero.replace(",", ".")
+    elif numero.count(",") > 1 or numero.count(".") > 1:
+        numero = numero.replace(",", "").replace(".", "")
+    try:
+        return float(numero)
+    except ValueError:
+        raise ValueError(f"Valor no numérico '{texto}' en la columna '{columna}'") from None
+
+def leer_filas_csv(ruta, separador=","):
+    with open(ruta, newline="", encoding="utf-8-sig") as f:
+        for fila in csv.DictReader(f, delimiter=separador):
+            yield fila
+
+def leer_filas_parquet(ruta, tamano_lote=65536):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Para leer archivos Parquet instale pyarrow: pip install pyarrow")
+    archivo = pq.ParquetFile(ruta)
+    for lote in archivo.iter_batches(batch_size=tamano_lote):
+        yield from lote.to_pylist()
+
+def leer_filas(ruta, separador=","):
+    if str(ruta).lower().endswith(".parquet"):
+        return leer_filas_parquet(ruta)
+    return leer_filas_csv(ruta, separador)
+
+# -----------------------------
+# Armado de proyectos por predio
+# -----------------------------
+def _item_fuente(fuente, fila):
+    item = {}
+    for campo in CAMPOS_FUENTE[fuente]:
+        valor = _convertir(campo, fila.get(campo))
+        if valor is not None:
+            item[campo] = valor
+    return TIPOS_FUENTE[fuente](**item)
+
+def _normalizar_fertilizante(fert, f):
+    """
+    Mismas reglas que `vectorizado.normalizar_fertilizantes` (importación de planillas):
+    los tipos que solo existen en FACTORES_ORGANICOS son orgánicos y los inorgánicos
+    "Otros" sin modo_otros se leen con N en porcentaje.
+    """
+    if not fert.es_organico and fert.tipo in f["FACTORES_ORGANICOS"] and fert.tipo not in f.registro.tipos():
+        fert.es_organico = True
+    if not fert.es_organico and fert.tipo == "Otros" and fert.modo_otros is None:
+        fert.modo_otros = "porcentaje"
+    return fert
+
+def construir_proyecto(filas):
+    """
+    Arma el dict de proyecto (entrada de `calcular_proyecto`) a partir de las filas
+    de un mismo predio. Las etapas conservan el orden de primera aparición.
+    """
+    tipo = None
+    paquete = None
+    superficie = None
+    etapas = {}
+    for fila in filas:
+        if tipo is None:
+            tipo = _convertir("tipo_cultivo", fila.get("tipo_cultivo"))
+        if paquete is None:
+            paquete = _convertir("paquete", fila.get("paquete"))
+        if superficie is None:
+            superficie = _convertir("superficie", fila.get("superficie"))
+        nombre = _convertir("etapa", fila.get("etapa")) or "Etapa 1"
+        etapa = etapas.get(nombre)
+        if etapa is None:
+            etapa = {
+                "nombre": nombre,
+                "fertilizantes": [],
+                "agroquimicos": [],
+                "riego": [],
+                "labores": [],
+                "residuos": {}
+            }
+            etapas[nombre] = etapa
+        for campo in CAMPOS_ETAPA:
+            if campo not in etapa:
+                valor = _convertir(campo, fila.get(campo))
+                if valor is not None:
+                    etapa[campo] = valor
+
+        fuente = (_convertir("fuente", fila.get("fuente")) or "").lower()
+        if fuente == "fertilizante":
+            etapa["fertilizantes"].append(_item_fuente(fuente, fila))
+        elif fuente == "agroquimico":
+            etapa["agroquimicos"].append(_item_fuente(fuente, fila))
+        elif fuente == "riego":
+            etapa["riego"].append(_item_fuente(fuente, fila))
+        elif fuente == "labor":
+            etapa["labores"].append(_item_fuente(fuente, fila))
+        elif fuente == "residuo":
+            via = _convertir("via", fila.get("via")) or "Sin gestión"
+            datos = etapa["residuos"].setdefault(via, GestionResiduo())
+            datos.biomasa += _convertir("biomasa", fila.get("biomasa")) or 0
+            for campo in AJUSTES_RESIDUO:
+                valor = _convertir(campo, fila.get(campo))
+                if valor is not None:
+                    setattr(datos, campo, valor)
+        elif fuente:
+            raise ValueError(f"Fuente desconocida '{fuente}' en la finca '{fila.get('finca')}'")
+
+    f = obtener_paquete(paquete)
+    for etapa in etapas.values():
+        for fert in etapa["fertilizantes"]:
+            _normalizar_fertilizante(fert, f)
+        if "duracion" in etapa:
+            etapa["duracion"] = int(etapa["duracion"])
+        if "ciclos" in etapa:
+            etapa["ciclos"] = int(etapa["ciclos"])
+    proyecto = {"tipo": (tipo or "perenne").lower(), "etapas": list(etapas.values())}
+    if paquete:
+        proyecto["paquete"] = paquete
+    if superficie is not None:
+        proyecto["superficie"] = superficie
+    return proyecto
+
+def agrupar_fincas(filas):
+    """
+    Agrupa las filas por predio (contiguas) y genera tuplas (finca, proyecto)
+    sin retener predios ya procesados.
+    """
+    vistas = set()
+    for finca, filas_finca in groupby(filas, key=lambda fila: fila.get("finca")):
+        if finca in vistas:
+            raise ValueError(
+                f"Las filas de la finca '{finca}' no están contiguas; ordene el archivo por finca."
+            )
+        vistas.add(finca)
+        yield finca, construir_proyecto(filas_finca)
+
+def calcular_fincas(filas, sin_desglose=False, paquete=None, procesos=1, progreso=None, memoizar=False):
+    """
+    Agrupa las filas por predio y calcula cada uno.
+    - paquete: paquete de factores para los predios que no indican uno propio
+    - procesos: número de procesos de cálculo (1 = en este proceso; None = todos los núcleos)
+    - progreso: función opcional progreso(fincas_terminadas)
+    - memoizar: calcular una sola vez las etapas idénticas entre predios
+    Genera tuplas (finca, resultados_globales) en el orden del archivo.
+    """
+    return calcular_cartera(
+        agrupar_fincas(filas),
+        procesos=procesos,
+        paquete=paquete,
+        sin_desglose=sin_desglose,
+        progreso=progreso,
+        memoizar=memoizar
+    )
+
+def _acumular(resultados_fincas, acumulador):
+    for finca, resultados in resultados_fincas:
+        acumulador.agregar(finca, resultados)
+        yield finca, resultados
+
+# -----------------------------
+# Escritura de resultados
+# -----------------------------
+def _huella(emisiones, produccion):
+    return emisiones / produccion if produccion else None
+
+def filas_resultado_csv(finca, resultados):
+    """Filas planas (finca, etapa, fuente) de un resultado, con totales por etapa y por predio."""
+    tipo = resultados["tipo"]
+    paquete = resultados.get("paquete_factores")
+    for etapa, datos in resultados["emisiones_fuente_etapa"].items():
+        for fuente in FUENTES:
+            yield [finca, tipo, etapa, fuente, datos.get(fuente, 0), None, None, paquete]
+        em_etapa = resultados["emisiones_etapas"].get(etapa, 0)
+        prod_etapa = resultados["produccion_etapas"].get(etapa, 0)
+        yield [finca, tipo, etapa, "Total", em_etapa, prod_etapa, _huella(em_etapa, prod_etapa), paquete]
+    yield [finca, tipo, "Total", "Total", resultados["em_total"], resultados["prod_total"],
+           _huella(resultados["em_total"], resultados["prod_total"]), paquete]
+
+def escribir_jsonl(resultados_fincas, salida):
+    n = 0
+    for finca, resultados in resultados_fincas:
+        salida.write(json.dumps({"finca": finca, **resultados}, ensure_ascii=False, default=a_json) + "\n")
+        n += 1
+    return n
+
+def escribir_csv(resultados_fincas, salida, separador=","):
+    escritor = csv.writer(salida, delimiter=separador)
+    escritor.writerow(COLUMNAS_SALIDA_CSV)
+    n = 0
+    for finca, resultados in resultados_fincas:
+        escritor.writerows(filas_resultado_csv(finca, resultados))
+        n += 1
+    return n
+
+def procesar_archivo(entrada, salida, formato=None, separador=",", sin_desglose=False, paquete=None,
+                     procesos=1, resumen=None, progreso=None, memoizar=False):
+    """
+    Calcula todos los predios de `entrada` y escribe los resultados en `salida` (ruta o '-').
+    - resumen: ruta opcional donde escribir (JSON) los totales de la cartera
+    """
+    if formato is None:
+        formato = "csv" if str(salida).lower().endswith(".csv") else "jsonl"
+    resultados_fincas = calcular_fincas(
+        leer_filas(entrada, separador),
+        sin_desglose=sin_desglose,
+        paquete=paquete,
+        procesos=procesos,
+        progreso=progreso,
+        memoizar=memoizar
+    )
+    acumulador = None
+    if resumen:
+        acumulador = AcumuladorCartera()
+        resultados_fincas = _acumular(resultados_fincas, acumulador)
+    if salida == "-":
+        f = sys.stdout
+    else:
+        f = open(salida, "w", newline="" if formato == "csv" else None, encoding="utf-8")
+    try:
+        if formato == "csv":
+            n = escribir_csv(resultados_fincas, f, separador)
+        else:
+            n = escribir_jsonl(resultados_fincas, f)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    if acumulador is not None:
+        with open(resumen, "w", encoding="utf-8") as f:
+            json.dump(acumulador.resumen(), f, ensure_ascii=False, indent=2)
+    return n
+
+def _mostrar_progreso(hechas):
+    print(f"\r{hechas} fincas calculadas", end="", file=sys.stderr, flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m nucleo.lote",
+        description="Calcula la huella de carbono de muchos predios a partir de un archivo CSV o Parquet."
+    )
+    parser.add_argument("entrada", help="Archivo de actividades (.csv o .parquet)")
+    parser.add_argument("-o", "--salida", default="-", help="Archivo de resultados (.jsonl o .csv); '-' para salida estándar")
+    parser.add_argument("--formato", choices=["jsonl", "csv"], help="Formato de salida (por defecto según la extensión)")
+    parser.add_argument("--separador", default=",", help="Separador de columnas CSV (por defecto ',')")
+    parser.add_argument("--sin-desglose", action="store_true", help="Omitir los desgloses por actividad en la salida")
+    parser.add_argument("--paquete", help="Paquete de factores por defecto (nombre de nucleo/datos o ruta .json)")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos de cálculo (0 = todos los núcleos; por defecto 1)")
+    parser.add_argument("--resumen", help="Archivo JSON donde escribir los totales de la cartera")
+    parser.add_argument("--progreso", action="store_true", help="Mostrar el avance en la salida de errores")
+    parser.add_argument("--memoizar", action="store_true", help="Calcular una sola vez las etapas idénticas entre predios")
+    args = parser.parse_args(argv)
+
+    n = procesar_archivo(
+        args.entrada,
+        args.salida,
+        formato=args.formato,
+        separador=args.separador,
+        sin_desglose=args.sin_desglose,
+        paquete=args.paquete,
+        procesos=args.procesos or None,
+        resumen=args.resumen,
+        progreso=_mostrar_progreso if args.progreso else None,
+        memoizar=args.memoizar
+    )
+    if args.progreso:
+        print(file=sys.stderr)
+    print(f"{n} fincas procesadas", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
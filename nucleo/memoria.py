@@ -0,0 +1,160 @@
+"""
+Memoización de las calculadoras con claves canónicas y desalojo LRU acotado.
+
+Los datos de entrada (dicts y listas de `ingresar_*`) se llevan a una forma canónica
+(claves ordenadas, listas como tuplas, números como float normalizado a 12 cifras
+significativas) y se resumen en un hash estable (BLAKE2b), que no depende del orden de
+las claves, de 100 vs 100.0 ni del proceso. La clave incluye la función y el contenido
+del paquete de factores activo (`PaqueteFactores.huella`, no su nombre y versión), así que
+cambiar de paquete nunca devuelve un resultado de otro.
+
+Las cachés son objetos de módulo: en la aplicación se comparten entre todas las
+sesiones del mismo servidor, y en el cálculo por lotes cada proceso conserva la suya
+entre bloques, de modo que las etapas repetidas entre predios (muy comunes en
+cooperativas) se calculan una sola vez.
+
+    from nucleo.memoria import calcular_emisiones_fertilizantes, CACHE_CALCULOS
+
+    calcular_emisiones_fertilizantes(fert, duracion)   # misma firma que en nucleo.calculos
+    CACHE_CALCULOS.estadisticas()
+
+Los resultados se devuelven como copias, así que modificarlos no altera la caché
+(salvo en `calcular_etapa_lote`, de solo lectura, que usa `nucleo.cartera`).
+"""
+
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+from . import calculos, etapas
+from .actividades import Registro
+from .paquetes import paquete_activo
+
+MAXIMO_CACHE = 4096
+CIFRAS_SIGNIFICATIVAS = 12
+FORMATO_FLOAT = f"%.{CIFRAS_SIGNIFICATIVAS}g"
+
+def forma_canonica(valor):
+    """Forma canónica (hashable y comparable) de datos de entrada anidados."""
+    tipo = type(valor)
+    if tipo is str or tipo is bool or valor is None:
+        return valor
+    if tipo is float:
+        if valor.is_integer():
+            return valor + 0.0  # -0.0 -> 0.0
+        return float(FORMATO_FLOAT % valor)
+    if tipo is int:
+        return float(valor)
+    if isinstance(valor, dict):
+        return tuple(sorted((str(k), forma_canonica(v)) for k, v in valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return tuple(forma_canonica(v) for v in valor)
+    if isinstance(valor, Registro):
+        return (type(valor).__name__, forma_canonica(valor.campos()))
+    if isinstance(valor, (bool, str)):
+        return valor
+    if hasattr(valor, "item"):
+        # Escalares de NumPy / pandas
+        return forma_canonica(valor.item())
+    if isinstance(valor, (int, float)):
+        return forma_canonica(float(valor))
+    return repr(valor)
+
+def _copiar(valor):
+    """Copia de los contenedores (dict, list, tuple, registros) de un resultado; los escalares se comparten."""
+    if isinstance(valor, dict):
+        return {k: _copiar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_copiar(v) for v in valor]
+    if isinstance(valor, tuple):
+        return tuple(_copiar(v) for v in valor)
+    if isinstance(valor, Registro):
+        return valor.copia()
+    return valor
+
+def clave_hash(*partes):
+    """
+    Hash estable (hex) de la forma canónica de `partes`: igual en cualquier proceso o
+    ejecución (para claves persistentes o compartidas; en memoria se usa la forma canónica).
+    """
+    texto = repr(forma_canonica(partes)).encode("utf-8")
+    return hashlib.blake2b(texto, digest_size=16).hexdigest()
+
+class CacheLRU:
+    """Caché acotada con desalojo del elemento usado hace más tiempo; segura entre hilos."""
+    def __init__(self, maximo=MAXIMO_CACHE):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self._datos)
+
+    def obtener(self, clave, calcular):
+        """Devuelve el valor guardado para `clave`, o lo calcula con calcular() y lo guarda."""
+        with self._candado:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return self._datos[clave]
+            self.fallos += 1
+        valor = calcular()
+        with self._candado:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+        return valor
+
+    def limpiar(self):
+        with self._candado:
+            self._datos.clear()
+            self.aciertos = 0
+            self.fallos = 0
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {
+            "elementos": len(self._datos),
+            "maximo": self.maximo,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / total if total else 0.0
+        }
+
+CACHE_CALCULOS = CacheLRU()
+
+def memoizar(funcion, cache=CACHE_CALCULOS, copiar=True):
+    """
+    Versión memoizada de una calculadora pura de `nucleo` (misma firma).
+    - copiar: devolver copias de los resultados guardados; con False se devuelven los
+      mismos objetos, que el llamador no debe modificar (más rápido para procesos por lotes)
+    """
+    nombre = f"{funcion.__module__}.{funcion.__qualname__}"
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        clave = (nombre, paquete_activo().huella(), forma_canonica(args), forma_canonica(kwargs))
+        calculado = []
+
+        def calcular():
+            calculado.append(funcion(*args, **kwargs))
+            return _copiar(calculado[0]) if copiar else calculado[0]
+
+        valor = cache.obtener(clave, calcular)
+        if calculado:
+            return calculado[0]
+        return _copiar(valor) if copiar else valor
+
+    envoltura.cache = cache
+    return envoltura
+
+calcular_emisiones_fertilizantes = memoizar(calculos.calcular_emisiones_fertilizantes)
+calcular_emisiones_maquinaria = memoizar(calculos.calcular_emisiones_maquinaria)
+calcular_emisiones_residuos = memoizar(calculos.calcular_emisiones_residuos)
+calcular_etapa = memoizar(etapas.calcular_etapa)
+# Para el cálculo por lotes: los resultados solo se leen (se escriben o se resumen)
+calcular_etapa_lote = memoizar(etapas.calcular_etapa, copiar=False)
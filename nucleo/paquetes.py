@@ -0,0 +1,204 @@
+"""
+Paquetes de factores de emisión versionados (por país o por versión de base de datos).
+
+El paquete "defecto" son los factores de `nucleo/factores.py`. Los demás se leen de
+archivos JSON (en `nucleo/datos/` o desde una ruta) con esta estructura:
+
+    {
+        "nombre": "ipcc2006-ar5",
+        "version": "2006.1",
+        "descripcion": "...",
+        "base": "defecto",
+        "factores": {
+            "EF5": 0.0075,
+            "GWP": {"CH4": 28, "N2O": 265},
+            "valores_defecto": {"fe_electricidad": 0.25},
+            "factores_combustible": {"Eléctrico": 0.25}
+        }
+    }
+
+Un paquete solo declara lo que cambia respecto de su base: los valores simples y las
+listas reemplazan a los de la base, y los dicts se combinan un nivel (las claves del
+paquete reemplazan a las de la base; p. ej. un producto de `factores_fertilizantes`
+reemplaza todas sus variantes). Los valores derivados de otros no se recalculan: en el
+ejemplo, el factor de la electricidad que usan las calculadoras es el de
+`factores_combustible["Eléctrico"]`, y `valores_defecto["fe_electricidad"]` se cambia
+junto con él para que ambos coincidan.
+
+Cada paquete tiene su propia copia de los factores, así que modificar los de un paquete
+no altera `nucleo/factores.py` ni los demás paquetes.
+
+Cada paquete se lee una sola vez por proceso y se comparte entre sesiones. El paquete
+usado por los cálculos se elige con `usar_paquete(...)` (o el parámetro `paquete` de
+`calcular_proyecto`); sin selección se usa "defecto".
+"""
+
+import copy
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from types import MappingProxyType
+
+from . import factores as _factores
+from .registro import RegistroFactores, registro_factores
+
+PAQUETE_DEFECTO = "defecto"
+DIRECTORIO_PAQUETES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos")
+
+# Nombres que puede definir un paquete (los mismos de nucleo/factores.py)
+FACTORES_PAQUETE = [
+    "GWP",
+    "EF1",
+    "EF4",
+    "EF5",
+    "EF_CO2_UREA",
+    "FRAC_VOLATILIZACION_INORG",
+    "FRAC_VOLATILIZACION_ORG",
+    "FRAC_LIXIVIACION",
+    "EF_CH4_QUEMA",
+    "EF_N2O_QUEMA",
+    "FRACCION_SECA_QUEMA",
+    "FRACCION_QUEMADA",
+    "FACTORES_ORGANICOS",
+    "FE_N_GEN",
+    "FE_P2O5_GEN",
+    "FE_K2O_GEN",
+    "valores_defecto",
+    "factores_fertilizantes",
+    "factores_emision",
+    "factores_residuos",
+    "factores_combustible",
+    "rendimientos_maquinaria",
+    "opciones_labores",
+]
+
+class PaqueteFactores:
+    """
+    Conjunto de factores de emisión de solo lectura. Se accede como un dict:
+    paquete["EF1"], paquete["factores_combustible"], ...
+    """
+    def __init__(self, nombre, version, factores, descripcion="", registro=None):
+        self.nombre = nombre
+        self.version = version
+        self.descripcion = descripcion
+        self.factores = MappingProxyType(factores)
+        self._registro = registro
+        self._huella = None
+
+    def __getitem__(self, clave):
+        return self.factores[clave]
+
+    def __repr__(self):
+        return f"PaqueteFactores({self.nombre!r}, version={self.version!r})"
+
+    @property
+    def registro(self):
+        """Registro indexado de fertilizantes del paquete (se arma la primera vez que se usa)."""
+        if self._registro is None:
+            self._registro = RegistroFactores(self.factores["factores_fertilizantes"])
+        return self._registro
+
+    def identificador(self):
+        return f"{self.nombre}@{self.version}"
+
+    def huella(self):
+        """
+        Hash del contenido de los factores (se calcula la primera vez que se usa). Distingue
+        paquetes distintos con el mismo nombre y versión; para claves de caché.
+        """
+        if self._huella is None:
+            texto = json.dumps(dict(self.factores), sort_keys=True, ensure_ascii=False, default=repr)
+            self._huella = hashlib.blake2b(texto.encode("utf-8"), digest_size=16).hexdigest()
+        return self._huella
+
+def _paquete_defecto():
+    # Copia profunda: los dicts anidados no se comparten con nucleo/factores.py
+    factores = {nombre: copy.deepcopy(getattr(_factores, nombre)) for nombre in FACTORES_PAQUETE}
+    return PaqueteFactores(
+        PAQUETE_DEFECTO,
+        "integrado",
+        factores,
+        descripcion="Factores de nucleo/factores.py (IPCC 2019, AR6, DEFRA, Fertilizers Europe)",
+        registro=registro_factores
+    )
+
+def _combinar(base, cambios):
+    # Copia profunda de la base: el paquete nuevo no comparte dicts anidados con ella
+    factores = copy.deepcopy(dict(base))
+    for nombre, valor in cambios.items():
+        if nombre not in FACTORES_PAQUETE:
+            raise ValueError(f"Factor desconocido en el paquete: '{nombre}'")
+        if isinstance(valor, dict) and isinstance(base.get(nombre), dict):
+            factores[nombre] = {**factores[nombre], **valor}
+        else:
+            factores[nombre] = valor
+    return factores
+
+def _ruta_paquete(nombre):
+    if nombre.lower().endswith(".json") or os.sep in nombre:
+        return nombre
+    return os.path.join(DIRECTORIO_PAQUETES, f"{nombre}.json")
+
+def cargar_paquete(nombre=PAQUETE_DEFECTO):
+    """
+    Devuelve el paquete `nombre` ("defecto", un nombre de `nucleo/datos/` o una ruta .json).
+    El archivo se lee una sola vez por proceso.
+    """
+    if nombre != PAQUETE_DEFECTO:
+        nombre = os.path.abspath(_ruta_paquete(nombre))
+    return _cargar_paquete(nombre)
+
+@lru_cache(maxsize=None)
+def _cargar_paquete(nombre):
+    if nombre == PAQUETE_DEFECTO:
+        return _paquete_defecto()
+    ruta = nombre
+    if not os.path.exists(ruta):
+        raise ValueError(f"No existe el paquete de factores '{ruta}'")
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+    base = cargar_paquete(datos.get("base", PAQUETE_DEFECTO))
+    return PaqueteFactores(
+        datos.get("nombre", os.path.basename(ruta)[:-5]),
+        str(datos.get("version", "")),
+        _combinar(base.factores, datos.get("factores", {})),
+        descripcion=datos.get("descripcion", "")
+    )
+
+def paquetes_disponibles():
+    """Nombres de los paquetes incluidos ("defecto" primero)."""
+    nombres = [PAQUETE_DEFECTO]
+    if os.path.isdir(DIRECTORIO_PAQUETES):
+        nombres += sorted(f[:-5] for f in os.listdir(DIRECTORIO_PAQUETES) if f.endswith(".json"))
+    return nombres
+
+_paquete_activo = ContextVar("paquete_factores", default=None)
+
+def paquete_activo():
+    """Paquete usado por los cálculos en el contexto actual."""
+    paquete = _paquete_activo.get()
+    return paquete if paquete is not None else _cargar_paquete(PAQUETE_DEFECTO)
+
+def obtener_paquete(paquete):
+    """Acepta None (paquete activo), un nombre/ruta o un PaqueteFactores."""
+    if paquete is None:
+        return paquete_activo()
+    if isinstance(paquete, PaqueteFactores):
+        return paquete
+    return cargar_paquete(paquete)
+
+@contextmanager
+def usar_paquete(paquete):
+    """
+    Selecciona el paquete de factores para los cálculos dentro del bloque `with`.
+    La selección es por contexto (hilo o tarea asyncio), así que cálculos simultáneos
+    pueden usar paquetes distintos.
+    """
+    token = _paquete_activo.set(obtener_paquete(paquete))
+    try:
+        yield paquete_activo()
+    finally:
+        _paquete_activo.reset(token)
@@ -0,0 +1,74 @@
+"""
+Registro indexado de factores de fertilizantes.
+
+`factores_fertilizantes` guarda las variantes de cada producto como listas; buscar una
+variante por origen implica recorrerlas. El registro arma una sola vez índices hash por
+(producto, origen), por producto, por origen y por fuente, y devuelve registros de solo
+lectura que se pueden usar igual que los dicts originales (v["origen"], v.get(...)).
+Lo comparten la aplicación y el núcleo de cálculo.
+"""
+
+from types import MappingProxyType
+
+from .factores import factores_fertilizantes
+
+class RegistroFactores:
+    def __init__(self, fertilizantes):
+        por_clave = {}
+        por_tipo = {}
+        por_origen = {}
+        por_fuente = {}
+        for tipo, variantes in fertilizantes.items():
+            if not isinstance(variantes, list):
+                continue
+            registros = []
+            for v in variantes:
+                registro = MappingProxyType(dict(v, tipo=tipo))
+                registros.append(registro)
+                # Ante orígenes repetidos en un mismo producto gana el primero (como el recorrido lineal)
+                por_clave.setdefault((tipo, v["origen"]), registro)
+                por_origen.setdefault(v["origen"], []).append(registro)
+                if v.get("Fuente"):
+                    por_fuente.setdefault(v["Fuente"], []).append(registro)
+            por_tipo[tipo] = tuple(registros)
+        self._por_clave = por_clave
+        self._por_tipo = por_tipo
+        self._origenes = {t: tuple(r["origen"] for r in regs) for t, regs in por_tipo.items()}
+        self._por_origen = {o: tuple(regs) for o, regs in por_origen.items()}
+        self._por_fuente = {f: tuple(regs) for f, regs in por_fuente.items()}
+
+    def tipos(self):
+        """Productos inorgánicos disponibles, en el orden de la base de datos."""
+        return list(self._por_tipo)
+
+    def variantes(self, tipo):
+        """Variantes (registros de solo lectura) de un producto; tupla vacía si no existe."""
+        return self._por_tipo.get(tipo, ())
+
+    def origenes(self, tipo):
+        """Orígenes disponibles para un producto, en el orden de la base de datos."""
+        return self._origenes.get(tipo, ())
+
+    def variante(self, tipo, origen=None):
+        """
+        Variante de `tipo` para `origen`. Si el origen no coincide se usa la primera variante
+        del producto; si el producto no existe, devuelve None.
+        """
+        registro = self._por_clave.get((tipo, origen))
+        if registro is not None:
+            return registro
+        variantes = self._por_tipo.get(tipo)
+        return variantes[0] if variantes else None
+
+    def por_origen(self, origen):
+        """Todas las variantes de un origen (país o región)."""
+        return self._por_origen.get(origen, ())
+
+    def por_fuente(self, fuente):
+        """Todas las variantes tomadas de una misma fuente bibliográfica."""
+        return self._por_fuente.get(fuente, ())
+
+    def fuentes(self):
+        return list(self._por_fuente)
+
+registro_factores = RegistroFactores(factores_fertilizantes)
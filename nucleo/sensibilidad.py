@@ -0,0 +1,274 @@
+"""
+Análisis de sensibilidad global (Morris y Sobol) de la huella de un proyecto.
+
+Cada emisión del modelo es un producto de parámetros (p. ej. N aplicado × EF1 × GWP N₂O),
+así que el proyecto se descompone una sola vez en términos "coeficiente × parámetros"
+con las calculadoras escalares. Un conjunto de perturbaciones es una matriz de
+multiplicadores relativos (muestras × parámetros) y se evalúa con productos de NumPy:
+miles de evaluaciones toman milisegundos.
+
+    from nucleo.sensibilidad import analizar_sensibilidad
+
+    r = analizar_sensibilidad(proyecto, metodo="morris", semilla=1)
+    for p in r["parametros"]:
+        print(p["parametro"], p["mu_estrella"], p["bajo"], p["alto"])
+
+Parámetros: GWP de CH₄ y N₂O, EF1, EF4, EF5, EF_CO2_UREA, fracciones de volatilización
+y lixiviación, FE de producción de cada fertilizante, cada entrada de
+`factores_combustible` usada (maquinaria y energía de riego), FE de cada agroquímico,
+factores de quema y compostaje, FE del agua de riego y los datos de actividad por grupo.
+Los factores con rango IPCC (ver `nucleo/incertidumbre.py`) varían en ese rango; el
+resto ±VARIACION_RELATIVA. Requiere NumPy.
+"""
+
+import numpy as np
+
+from .calculos import (
+    calcular_emisiones_compostaje,
+    calcular_emisiones_quema_residuos,
+    resolver_fertilizante,
+)
+from .etapas import _normalizar_actividad_riego, _normalizar_agroquimico
+from .incertidumbre import DISTRIBUCIONES_FACTORES, FACTORES_RELATIVOS
+from .paquetes import usar_paquete
+
+VARIACION_RELATIVA = 0.20
+# Incertidumbre de los GWP a 100 años (IPCC AR5 GT1, Cap. 8: ±40 % CH₄, ±30 % N₂O)
+RANGOS_RELATIVOS = {
+    "GWP CH₄": (0.60, 1.40),
+    "GWP N₂O": (0.70, 1.30),
+}
+METODOS = ["morris", "sobol"]
+OBJETIVOS = ["em_total", "huella"]
+
+def _factores_paquete(ajustes, *pares):
+    """Factores de los pares (ajuste, factor) que toman el valor del paquete (sin ajuste del usuario)."""
+    return tuple(factor for campo, factor in pares if ajustes.get(campo) is None)
+
+class ModeloSensibilidad:
+    """
+    Proyecto (formato de `calcular_proyecto`) descompuesto en términos multiplicativos.
+    `evaluar(X)` recibe multiplicadores relativos (muestras × parámetros; 1 = valor nominal).
+    """
+    def __init__(self, proyecto, paquete=None, variacion=VARIACION_RELATIVA):
+        self._terminos = {}
+        self._produccion = {}
+        with usar_paquete(paquete if paquete is not None else proyecto.get("paquete")) as f:
+            self.paquete = f
+            self._armar(proyecto, f)
+        self.parametros = sorted({p for clave in list(self._terminos) + list(self._produccion) for p in clave})
+        indice = {p: j for j, p in enumerate(self.parametros)}
+        self._grupos = [(coef, [indice[p] for p in clave]) for clave, coef in self._terminos.items() if coef]
+        self._grupos_produccion = [(coef, [indice[p] for p in clave]) for clave, coef in self._produccion.items() if coef]
+        self.rangos = np.array([self._rango(p, f, variacion) for p in self.parametros]).reshape(-1, 2)
+
+    def _rango(self, parametro, f, variacion):
+        if parametro in RANGOS_RELATIVOS:
+            return RANGOS_RELATIVOS[parametro]
+        if parametro in DISTRIBUCIONES_FACTORES:
+            minimo, maximo = DISTRIBUCIONES_FACTORES[parametro]
+            if parametro in FACTORES_RELATIVOS:
+                return minimo, maximo
+            nominal = f[parametro]
+            if nominal:
+                return min(minimo / nominal, 1.0), max(maximo / nominal, 1.0)
+        return 1 - variacion, 1 + variacion
+
+    def _agregar(self, coef, *parametros):
+        clave = tuple(sorted(set(parametros)))
+        self._terminos[clave] = self._terminos.get(clave, 0) + coef
+
+    def _armar(self, proyecto, f):
+        anual = proyecto.get("tipo", "perenne") == "anual"
+        gwp_n2o = (44/28) * f["GWP"]["N2O"]
+        for etapa in proyecto.get("etapas", []):
+            rep = int(etapa.get("ciclos", 1)) if anual else 1
+            duracion = etapa.get("duracion", 1)
+            d = duracion * rep
+
+            act = "Actividad: fertilizantes"
+            for fert in etapa.get("fertilizantes", []):
+                r = resolver_fertilizante(fert, f)
+                if r["fe_produccion"]:
+                    nombre = fert.get("tipo", "")
+                    if fert.get("origen"):
+                        nombre += f" ({fert['origen']})"
+                    self._agregar(r["cantidad"] * r["fe_produccion"] * d, act, f"FE producción: {nombre}")
+                if r["es_urea"]:
+                    self._agregar(r["cantidad"] * f["EF_CO2_UREA"] * d, act, "EF_CO2_UREA")
+                n = r["n_aplicado"] * d
+                frac_vol = "FRAC_VOLATILIZACION_ORG" if r["es_organico"] else "FRAC_VOLATILIZACION_INORG"
+                self._agregar(n * f["EF1"] * gwp_n2o, act, "EF1", "GWP N₂O")
+                self._agregar(n * r["frac_vol"] * f["EF4"] * gwp_n2o, act, frac_vol, "EF4", "GWP N₂O")
+                self._agregar(n * r["frac_lix"] * f["EF5"] * gwp_n2o, act, "FRAC_LIXIVIACION", "EF5", "GWP N₂O")
+
+            for ag in etapa.get("agroquimicos", []):
+                ag = _normalizar_agroquimico(ag)
+                nombre = ag.get("nombre_comercial") or ag.get("tipo", "")
+                self._agregar(ag["emisiones"] * d, "Actividad: agroquímicos", f"FE agroquímico: {nombre}")
+
+            d_riego = (duracion if etapa.get("riego_por_anio", True) else 1) * rep
+            for ea in etapa.get("riego", []):
+                ea = _normalizar_actividad_riego(ea)
+                self._agregar(ea["emisiones_agua"] * d_riego, "Actividad: agua de riego", "FE agua de riego")
+                self._agregar(ea["emisiones_energia"] * d_riego, "Actividad: energía de riego",
+                              f"Combustible: {ea.get('tipo_energia') or 'genérico'}")
+
+            factores_combustible = f["factores_combustible"]
+            for labor in etapa.get("labores", []):
+                fe = labor.get("fe_personalizado", None)
+                if fe is not None and fe > 0:
+                    parametro = f"FE personalizado: {labor.get('nombre_labor', '')}"
+                else:
+                    fe = factores_combustible.get(labor.get("tipo_combustible"), 0)
+                    parametro = f"Combustible: {labor.get('tipo_combustible')}"
+                self._agregar(labor.get("litros", 0) * fe * d, "Actividad: maquinaria", parametro)
+
+            act = "Actividad: residuos"
+            for via, datos in etapa.get("residuos", {}).items():
+                biomasa = datos.get("biomasa", 0) * rep
+                ajustes = datos.get("ajustes", {})
+                if via == "Quema":
+                    em_ch4, em_n2o = calcular_emisiones_quema_residuos(
+                        biomasa,
+                        fraccion_seca=ajustes.get("fraccion_seca"),
+                        fraccion_quemada=ajustes.get("fraccion_quemada"),
+                        ef_ch4=ajustes.get("ef_ch4"),
+                        ef_n2o=ajustes.get("ef_n2o")
+                    )
+                    # Los factores del paquete solo varían donde no hay un ajuste del usuario
+                    # (un ajuste es un dato de la actividad, como en nucleo/incertidumbre.py)
+                    comunes = (act,) + _factores_paquete(
+                        ajustes, ("fraccion_seca", "FRACCION_SECA_QUEMA"), ("fraccion_quemada", "FRACCION_QUEMADA")
+                    )
+                    self._agregar(em_ch4, *comunes, *_factores_paquete(ajustes, ("ef_ch4", "EF_CH4_QUEMA")), "GWP CH₄")
+                    self._agregar(em_n2o, *comunes, *_factores_paquete(ajustes, ("ef_n2o", "EF_N2O_QUEMA")), "GWP N₂O")
+                elif via == "Compostaje":
+                    base = ajustes.get("base_calculo", "base_humeda")
+                    em_ch4, em_n2o = calcular_emisiones_compostaje(biomasa, base_calculo=base,
+                                                                    fraccion_seca=ajustes.get("fraccion_seca"))
+                    comunes = (act, "Fracción seca (compostaje)") if base == "base_seca" else (act,)
+                    self._agregar(em_ch4, *comunes, "Compostaje EF_CH4", "GWP CH₄")
+                    self._agregar(em_n2o, *comunes, "Compostaje EF_N2O", "GWP N₂O")
+
+            clave = ("Producción",)
+            self._produccion[clave] = self._produccion.get(clave, 0) + etapa.get("produccion", 0) * d
+
+    def _suma(self, grupos, X):
+        total = np.zeros(X.shape[0])
+        for coef, columnas in grupos:
+            total += coef * np.prod(X[:, columnas], axis=1)
+        return total
+
+    def evaluar(self, X, objetivo="em_total"):
+        """Emisiones totales (kg CO2e/ha) o huella (kg CO2e/kg) para cada fila de multiplicadores X."""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        em = self._suma(self._grupos, X)
+        if objetivo == "em_total":
+            return em
+        prod = self._suma(self._grupos_produccion, X)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(prod > 0, em / prod, np.nan)
+
+    def escalar(self, U):
+        """Lleva puntos del hipercubo unitario a multiplicadores dentro de los rangos de cada parámetro."""
+        return self.rangos[:, 0] + U * (self.rangos[:, 1] - self.rangos[:, 0])
+
+    def tornado(self, objetivo="em_total"):
+        """Resultado con cada parámetro en su mínimo y en su máximo (los demás en su valor nominal)."""
+        k = len(self.parametros)
+        X = np.ones((2 * k, k))
+        X[np.arange(k), np.arange(k)] = self.rangos[:, 0]
+        X[k + np.arange(k), np.arange(k)] = self.rangos[:, 1]
+        y = self.evaluar(X, objetivo)
+        return y[:k], y[k:]
+
+def _morris(modelo, r, rng, objetivo, niveles=4):
+    """Efectos elementales (Morris) con r trayectorias; devuelve (mu_estrella, mu, sigma, evaluaciones)."""
+    k = len(modelo.parametros)
+    delta = niveles / (2 * (niveles - 1))
+    direccion = rng.choice([-1.0, 1.0], size=(r, k))
+    inicio = rng.integers(0, niveles // 2, size=(r, k)) / (niveles - 1)
+    inicio = np.where(direccion > 0, inicio, inicio + delta)
+    orden = np.argsort(rng.random((r, k)), axis=1)
+    filas = np.arange(r)
+    U = np.empty((r, k + 1, k))
+    U[:, 0, :] = inicio
+    for j in range(k):
+        U[:, j + 1, :] = U[:, j, :]
+        U[filas, j + 1, orden[:, j]] += direccion[filas, orden[:, j]] * delta
+    y = modelo.evaluar(modelo.escalar(U.reshape(-1, k)), objetivo).reshape(r, k + 1)
+    efectos = np.empty((r, k))
+    efectos[filas[:, None], orden] = np.diff(y, axis=1) / (direccion[filas[:, None], orden] * delta)
+    return np.nanmean(np.abs(efectos), axis=0), np.nanmean(efectos, axis=0), np.nanstd(efectos, axis=0), r * (k + 1)
+
+def _sobol(modelo, n, rng, objetivo):
+    """Índices de Sobol de primer orden y totales (Saltelli 2010 / Jansen); devuelve (S1, ST, evaluaciones)."""
+    k = len(modelo.parametros)
+    A = rng.random((n, k))
+    B = rng.random((n, k))
+    AB = np.repeat(A[None, :, :], k, axis=0)
+    AB[np.arange(k), :, np.arange(k)] = B.T
+    y = modelo.evaluar(modelo.escalar(np.vstack([A, B, AB.reshape(-1, k)])), objetivo)
+    yA, yB, yAB = y[:n], y[n:2 * n], y[2 * n:].reshape(k, n)
+    varianza = np.nanvar(np.concatenate([yA, yB]))
+    if not varianza:
+        return np.zeros(k), np.zeros(k), n * (k + 2)
+    s1 = np.nanmean(yB * (yAB - yA), axis=1) / varianza
+    st = 0.5 * np.nanmean((yA - yAB) ** 2, axis=1) / varianza
+    return s1, st, n * (k + 2)
+
+def analizar_sensibilidad(proyecto, metodo="morris", n=None, semilla=None, objetivo="em_total",
+                          variacion=VARIACION_RELATIVA, paquete=None):
+    """
+    Ordena los parámetros del proyecto según su influencia en el resultado.
+    - metodo: "morris" (n trayectorias, por defecto 100) o "sobol" (n muestras base, por defecto 2048)
+    - objetivo: "em_total" (kg CO2e/ha) o "huella" (kg CO2e/kg)
+    - variacion: variación relativa de los parámetros sin rango IPCC
+    Devuelve: dict con "nominal", "evaluaciones" y "parametros" (lista ordenada de mayor a
+    menor influencia, con rango relativo, resultado en el mínimo y máximo del parámetro
+    —para el gráfico de tornado— y los índices del método).
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método desconocido '{metodo}'; use uno de {METODOS}")
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"Objetivo desconocido '{objetivo}'; use uno de {OBJETIVOS}")
+    modelo = ModeloSensibilidad(proyecto, paquete, variacion)
+    k = len(modelo.parametros)
+    nominal = float(modelo.evaluar(np.ones((1, k)), objetivo)[0]) if k else 0.0
+    if not k:
+        return {"metodo": metodo, "objetivo": objetivo, "nominal": nominal, "evaluaciones": 0, "parametros": []}
+    rng = np.random.default_rng(semilla)
+    bajo, alto = modelo.tornado(objetivo)
+    filas = []
+    if metodo == "morris":
+        mu_estrella, mu, sigma, evaluaciones = _morris(modelo, n or 100, rng, objetivo)
+        for j, p in enumerate(modelo.parametros):
+            filas.append({"mu_estrella": float(mu_estrella[j]), "mu": float(mu[j]), "sigma": float(sigma[j])})
+        clave = "mu_estrella"
+    else:
+        s1, st, evaluaciones = _sobol(modelo, n or 2048, rng, objetivo)
+        for j, p in enumerate(modelo.parametros):
+            filas.append({"S1": float(s1[j]), "ST": float(st[j])})
+        clave = "ST"
+    parametros = []
+    for j, p in enumerate(modelo.parametros):
+        parametros.append(dict(
+            {
+                "parametro": p,
+                "minimo": float(modelo.rangos[j, 0]),
+                "maximo": float(modelo.rangos[j, 1]),
+                "bajo": float(bajo[j]),
+                "alto": float(alto[j]),
+            },
+            **filas[j]
+        ))
+    parametros.sort(key=lambda fila: (-(np.nan_to_num(fila[clave])), fila["parametro"]))
+    return {
+        "metodo": metodo,
+        "objetivo": objetivo,
+        "nominal": nominal,
+        "evaluaciones": evaluaciones + 2 * k,
+        "paquete_factores": modelo.paquete.identificador(),
+        "parametros": parametros
+    }
@@ -0,0 +1,450 @@
+"""
+Servicio HTTP local de cálculo (solo biblioteca estándar: asyncio).
+
+Uso:
+    python -m nucleo.servicio --puerto 8765
+
+Rutas (cuerpo y respuesta en JSON; el cuerpo puede incluir "paquete" para elegir
+el paquete de factores de esa solicitud, entre los de `paquetes_disponibles()`):
+    POST /proyecto       proyecto de `calcular_proyecto` o archivo de proyecto de la aplicación
+                         (nucleo/archivo.py) (+ "desglose": false para omitir desgloses)
+    POST /etapa          etapa de `calcular_etapa` -> {"em_total", "produccion", "fuentes"}
+    POST /fertilizantes  {"fertilizantes": [...], "duracion": 1, "desglose": false}
+    POST /agroquimicos   {"agroquimicos": [...], "duracion": 1}
+    POST /maquinaria     {"labores": [...], "duracion": 1}
+    POST /riego          {"riego": [...], "duracion": 1}
+    POST /residuos       {"residuos": {"vía": {"biomasa": ..., "ajustes": {...}}}}
+    GET  /salud          estado del servicio y largo de la cola
+
+Los dicts de actividades son los mismos que arman las funciones `ingresar_*` de la
+aplicación. Las solicitudes concurrentes se agrupan en lotes: mientras se calcula un
+lote, las que llegan esperan en una cola acotada y se calculan juntas en el siguiente,
+en una sola llamada al hilo de cálculo y un solo cambio de paquete. Las solicitudes de
+fertilizantes de un lote grande se calculan en una sola pasada vectorizada (si pandas
+está instalado); los valores de cada solicitud se validan antes, así que una solicitud
+recibe la misma respuesta con cualquiera de los dos cálculos. Con la cola llena el servicio responde 503 en vez de acumular demora.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from .actividades import a_json
+from .archivo import abrir_archivo
+from .calculos import (
+    calcular_agroquimico,
+    calcular_actividad_riego,
+    calcular_emisiones_agroquimicos,
+    calcular_emisiones_maquinaria,
+    calcular_emisiones_residuos,
+    calcular_emisiones_riego,
+    calcular_fertilizantes,
+)
+from .etapas import calcular_etapa, calcular_proyecto, quitar_desglose
+from .paquetes import PAQUETE_DEFECTO, obtener_paquete, paquetes_disponibles, usar_paquete
+
+try:
+    from .vectorizado import totales_fertilizantes_por_grupo
+    import pandas as pd
+except ImportError:  # pandas/NumPy son opcionales para el servicio
+    totales_fertilizantes_por_grupo = None
+
+LOTE_MAXIMO = 256
+COLA_MAXIMA = 2048
+# Filas de fertilizantes a partir de las cuales conviene la pasada vectorizada
+# (por debajo, el costo fijo de armar el DataFrame supera al cálculo escalar)
+UMBRAL_VECTORIZADO = 2000
+TAMANO_MAXIMO_CUERPO = 1 << 20
+
+# Campos de los fertilizantes que se validan (ver _validar_fertilizantes)
+CAMPOS_NUMERICOS_FERTILIZANTE = ["cantidad", "N", "P", "K", "fraccion_seca", "fe_personalizado"]
+CAMPOS_TEXTO_FERTILIZANTE = ["tipo", "origen", "modo_otros", "nutriente"]
+
+ESTADOS_HTTP = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+# -----------------------------
+# Cálculo de cada ruta
+# -----------------------------
+def _duracion(datos):
+    return datos.get("duracion", 1)
+
+def _totales_fertilizantes(r):
+    total = r["emision_produccion"] + r["emision_co2_urea"] + r["n2o_directo_co2e"] + r["n2o_indirecto_co2e"]
+    return {
+        "emision_produccion": r["emision_produccion"],
+        "emision_co2_urea": r["emision_co2_urea"],
+        "n2o_directo_co2e": r["n2o_directo_co2e"],
+        "n2o_indirecto_co2e": r["n2o_indirecto_co2e"],
+        "total": total
+    }
+
+def _ruta_proyecto(datos):
+    # También acepta un archivo de proyecto guardado desde la aplicación (nucleo.archivo)
+    proyecto = abrir_archivo(datos)["proyecto"]
+    # El paquete guardado en el proyecto también debe ser uno de los disponibles
+    _paquete_solicitud(proyecto, None, paquetes_disponibles())
+    resultados = calcular_proyecto(proyecto)
+    if datos.get("desglose", True) is False:
+        resultados = quitar_desglose(resultados)
+    return resultados
+
+def _ruta_etapa(datos):
+    em_total, produccion, fuentes = calcular_etapa(datos)
+    return {"em_total": em_total, "produccion": produccion, "fuentes": fuentes}
+
+def _es_numero(valor):
+    return type(valor) in (int, float) and math.isfinite(valor)
+
+def _validar_fertilizantes(datos):
+    """
+    Revisa los tipos de una solicitud de fertilizantes (ValueError si alguno no sirve).
+    Se aplica antes de elegir entre el cálculo escalar y el vectorizado, que de otro modo
+    tratarían distinto los valores inválidos (el vectorizado los leería como 0).
+    """
+    if not _es_numero(_duracion(datos)):
+        raise ValueError("duracion debe ser un número")
+    fertilizantes = datos.get("fertilizantes", [])
+    if not isinstance(fertilizantes, list):
+        raise ValueError("fertilizantes debe ser una lista")
+    for i, fert in enumerate(fertilizantes):
+        if not isinstance(fert, dict):
+            raise ValueError(f"fertilizantes[{i}] debe ser un objeto")
+        for campo in CAMPOS_NUMERICOS_FERTILIZANTE:
+            if fert.get(campo) is not None and not _es_numero(fert[campo]):
+                raise ValueError(f"fertilizantes[{i}].{campo} debe ser un número")
+        for campo in CAMPOS_TEXTO_FERTILIZANTE:
+            if fert.get(campo) is not None and not isinstance(fert[campo], str):
+                raise ValueError(f"fertilizantes[{i}].{campo} debe ser un texto")
+        if fert.get("es_organico") is not None and not isinstance(fert["es_organico"], bool):
+            raise ValueError(f"fertilizantes[{i}].es_organico debe ser true o false")
+
+def _ruta_fertilizantes(datos):
+    _validar_fertilizantes(datos)
+    r = calcular_fertilizantes(datos.get("fertilizantes", []), _duracion(datos))
+    respuesta = _totales_fertilizantes(r)
+    if datos.get("desglose"):
+        respuesta["desglose"] = r["desglose"]
+    return respuesta
+
+def _ruta_agroquimicos(datos):
+    agroquimicos = [
+        calcular_agroquimico(
+            ag.get("categoria", "pesticidas"),
+            ag.get("tipo", "Media"),
+            ag.get("cantidad_ia", 0),
+            ag.get("fe"),
+            ag.get("nombre_comercial")
+        )
+        for ag in datos.get("agroquimicos", [])
+    ]
+    return {"total": calcular_emisiones_agroquimicos(agroquimicos, _duracion(datos)), "agroquimicos": agroquimicos}
+
+def _ruta_maquinaria(datos):
+    return {"total": calcular_emisiones_maquinaria(datos.get("labores", []), _duracion(datos))}
+
+def _ruta_riego(datos):
+    actividades = [
+        calcular_actividad_riego(
+            ea.get("actividad", ea.get("tipo_actividad", "")),
+            ea.get("tipo_actividad", ""),
+            ea.get("agua_total_m3", 0),
+            ea.get("consumo_energia", 0),
+            ea.get("tipo_energia", ""),
+            ea.get("fe_energia")
+        )
+        for ea in datos.get("riego", [])
+    ]
+    em_agua, em_energia = calcular_emisiones_riego(actividades, _duracion(datos))
+    return {"total": em_agua + em_energia, "emisiones_agua": em_agua, "emisiones_energia": em_energia,
+            "actividades": actividades}
+
+def _ruta_residuos(datos):
+    total, detalle = calcular_emisiones_residuos(datos.get("residuos", {}))
+    return {"total": total, "detalle": detalle}
+
+RUTAS = {
+    "/proyecto": _ruta_proyecto,
+    "/etapa": _ruta_etapa,
+    "/fertilizantes": _ruta_fertilizantes,
+    "/agroquimicos": _ruta_agroquimicos,
+    "/maquinaria": _ruta_maquinaria,
+    "/riego": _ruta_riego,
+    "/residuos": _ruta_residuos,
+}
+
+def _fertilizantes_vectorizados(solicitudes):
+    """Totales de varias solicitudes de fertilizantes en una sola pasada vectorizada."""
+    filas = []
+    for i, datos in solicitudes:
+        duracion = _duracion(datos)
+        for fert in datos.get("fertilizantes", []):
+            filas.append(dict(fert, _solicitud=i, _duracion=duracion))
+    tabla = totales_fertilizantes_por_grupo(pd.DataFrame(filas), "_solicitud", "_duracion") if filas else None
+    resultados = {}
+    for i, _ in solicitudes:
+        if tabla is not None and i in tabla.index:
+            fila = tabla.loc[i]
+            resultados[i] = {c: float(fila[c]) for c in tabla.columns}
+        else:
+            resultados[i] = {"emision_produccion": 0, "emision_co2_urea": 0,
+                             "n2o_directo_co2e": 0, "n2o_indirecto_co2e": 0, "total": 0}
+    return resultados
+
+def _calcular(funcion, datos):
+    try:
+        return 200, funcion(datos)
+    except (AttributeError, KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+        return 400, {"error": f"{type(e).__name__}: {e}"}
+    except Exception as e:
+        # Un error inesperado solo afecta a su solicitud, no al resto del lote
+        return 500, {"error": f"{type(e).__name__}: {e}"}
+
+def _vectorizable(datos):
+    """Solicitud de fertilizantes sin desglose y con valores válidos (ver _validar_fertilizantes)."""
+    if datos.get("desglose"):
+        return False
+    try:
+        _validar_fertilizantes(datos)
+    except ValueError:
+        return False  # se calcula por la vía escalar, que responde el error
+    return True
+
+def _paquete_solicitud(datos, paquete, disponibles):
+    """Nombre del paquete de una solicitud; ValueError si no es uno de `disponibles`."""
+    nombre = datos.get("paquete")
+    if nombre is None or nombre == "":
+        return paquete or PAQUETE_DEFECTO
+    if not isinstance(nombre, str):
+        raise ValueError("paquete debe ser un texto")
+    if nombre not in disponibles:
+        raise ValueError(f"Paquete desconocido: '{nombre}' (disponibles: {', '.join(disponibles)})")
+    return nombre
+
+def calcular_lote(solicitudes, paquete=None, umbral_vectorizado=UMBRAL_VECTORIZADO):
+    """
+    Calcula un lote de solicitudes [(ruta, datos), ...] y devuelve [(estado_http, respuesta), ...]
+    en el mismo orden. Las solicitudes se agrupan por paquete de factores.
+    - paquete: paquete para las solicitudes que no indican uno (nombre, ruta o
+      PaqueteFactores; lo elige quien levanta el servicio). Las solicitudes solo pueden
+      pedir paquetes de `paquetes_disponibles()`.
+    """
+    respuestas = [None] * len(solicitudes)
+    por_paquete = {}
+    disponibles = paquetes_disponibles()
+    for i, (ruta, datos) in enumerate(solicitudes):
+        if not isinstance(datos, dict):
+            respuestas[i] = (400, {"error": "El cuerpo debe ser un objeto JSON"})
+            continue
+        try:
+            nombre = _paquete_solicitud(datos, paquete, disponibles)
+        except ValueError as e:
+            respuestas[i] = (400, {"error": str(e)})
+            continue
+        por_paquete.setdefault(nombre, []).append(i)
+
+    for nombre, indices in por_paquete.items():
+        try:
+            f = obtener_paquete(nombre)
+        except (ValueError, OSError) as e:
+            for i in indices:
+                respuestas[i] = (400, {"error": str(e)})
+            continue
+        with usar_paquete(f):
+            fertilizantes = [
+                (i, solicitudes[i][1]) for i in indices
+                if solicitudes[i][0] == "/fertilizantes" and _vectorizable(solicitudes[i][1])
+            ]
+            n_filas = sum(len(datos.get("fertilizantes", [])) for _, datos in fertilizantes)
+            if totales_fertilizantes_por_grupo is not None and n_filas >= umbral_vectorizado:
+                try:
+                    for i, r in _fertilizantes_vectorizados(fertilizantes).items():
+                        respuestas[i] = (200, r)
+                except Exception:
+                    pass  # error inesperado: se calculan una a una para aislarlo
+            for i in indices:
+                if respuestas[i] is None:
+                    ruta, datos = solicitudes[i]
+                    if ruta in RUTAS:
+                        respuestas[i] = _calcular(RUTAS[ruta], datos)
+                    else:
+                        respuestas[i] = (404, {"error": f"Ruta desconocida: {ruta}"})
+    return respuestas
+
+# -----------------------------
+# Servidor HTTP
+# -----------------------------
+def _largo_cuerpo(encabezados):
+    """Largo del cuerpo según Content-Length (0 si no viene); None si no es un entero >= 0."""
+    valor = encabezados.get("content-length", "")
+    if not valor:
+        return 0
+    if not (valor.isascii() and valor.isdigit()):
+        return None
+    return int(valor)
+
+class ServicioCalculo:
+    """
+    Servidor HTTP/1.1 (con conexiones persistentes) que agrupa las solicitudes
+    concurrentes en lotes de hasta `lote_maximo` y rechaza con 503 cuando hay más de
+    `cola_maxima` esperando. `espera` (segundos) retiene un lote incompleto para
+    juntar más solicitudes; con 0 se agrupa solo lo que llegó durante el lote anterior.
+    """
+    def __init__(self, host="127.0.0.1", puerto=8765, lote_maximo=LOTE_MAXIMO, cola_maxima=COLA_MAXIMA,
+                 espera=0, paquete=None, umbral_vectorizado=UMBRAL_VECTORIZADO):
+        self.host = host
+        self.puerto = puerto
+        self.lote_maximo = lote_maximo
+        self.cola_maxima = cola_maxima
+        self.espera = espera
+        self.paquete = paquete
+        self.umbral_vectorizado = umbral_vectorizado
+        self.cola = None
+        self.servidor = None
+        self._despachador = None
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="calculo")
+
+    async def iniciar(self):
+        self.cola = asyncio.Queue(maxsize=self.cola_maxima)
+        self._despachador = asyncio.create_task(self._despachar())
+        self.servidor = await asyncio.start_server(self._atender, self.host, self.puerto)
+        self.puerto = self.servidor.sockets[0].getsockname()[1]
+        return self
+
+    async def detener(self):
+        self.servidor.close()
+        await self.servidor.wait_closed()
+        self._despachador.cancel()
+        self._ejecutor.shutdown(wait=False)
+
+    async def _despachar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self.cola.get()]
+            if self.espera and self.cola.empty():
+                await asyncio.sleep(self.espera)
+            while len(lote) < self.lote_maximo and not self.cola.empty():
+                lote.append(self.cola.get_nowait())
+            try:
+                respuestas = await loop.run_in_executor(
+                    self._ejecutor, calcular_lote,
+                    [(ruta, datos) for ruta, datos, _ in lote], self.paquete, self.umbral_vectorizado
+                )
+            except Exception as e:
+                respuestas = [(500, {"error": str(e)})] * len(lote)
+            for (_, _, futuro), respuesta in zip(lote, respuestas):
+                if not futuro.done():
+                    futuro.set_result(respuesta)
+
+    async def _responder_solicitud(self, metodo, ruta, cuerpo):
+        if ruta == "/salud":
+            return 200, {"estado": "ok", "cola": self.cola.qsize(), "paquete": self.paquete or PAQUETE_DEFECTO}
+        if ruta not in RUTAS:
+            return 404, {"error": f"Ruta desconocida: {ruta}"}
+        if metodo != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            datos = json.loads(cuerpo or b"{}")
+        except ValueError as e:
+            return 400, {"error": f"JSON inválido: {e}"}
+        if not isinstance(datos, dict):
+            return 400, {"error": "El cuerpo debe ser un objeto JSON"}
+        futuro = asyncio.get_running_loop().create_future()
+        try:
+            self.cola.put_nowait((ruta, datos, futuro))
+        except asyncio.QueueFull:
+            return 503, {"error": "Servicio saturado; reintente"}
+        return await futuro
+
+    async def _atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    cabecera = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                lineas = cabecera.decode("latin-1").split("\r\n")
+                try:
+                    metodo, objetivo, version = lineas[0].split(" ", 2)
+                except ValueError:
+                    break
+                encabezados = {}
+                for linea in lineas[1:]:
+                    if ":" in linea:
+                        clave, valor = linea.split(":", 1)
+                        encabezados[clave.strip().lower()] = valor.strip()
+                largo = _largo_cuerpo(encabezados)
+                conexion = encabezados.get("connection", "").lower()
+                mantener = conexion != "close" and (version != "HTTP/1.0" or conexion == "keep-alive")
+
+                if largo is None:
+                    # Sin un largo válido no se sabe dónde termina el cuerpo: se cierra la conexión
+                    estado, respuesta = 400, {"error": "Content-Length inválido"}
+                    mantener = False
+                elif largo > TAMANO_MAXIMO_CUERPO:
+                    estado, respuesta = 413, {"error": "Cuerpo demasiado grande"}
+                    mantener = False
+                else:
+                    cuerpo = await reader.readexactly(largo) if largo else b""
+                    estado, respuesta = await self._responder_solicitud(metodo, objetivo.split("?", 1)[0], cuerpo)
+
+                contenido = json.dumps(respuesta, ensure_ascii=False, default=a_json).encode("utf-8")
+                encabezado = (
+                    f"HTTP/1.1 {estado} {ESTADOS_HTTP.get(estado, 'Error')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(contenido)}\r\n"
+                    f"Connection: {'keep-alive' if mantener else 'close'}\r\n"
+                )
+                if estado == 503:
+                    encabezado += "Retry-After: 1\r\n"
+                writer.write(encabezado.encode("latin-1") + b"\r\n" + contenido)
+                await writer.drain()
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def _servir(args):
+    servicio = await ServicioCalculo(
+        host=args.host,
+        puerto=args.puerto,
+        lote_maximo=args.lote_maximo,
+        cola_maxima=args.cola_maxima,
+        espera=args.espera_ms / 1000,
+        paquete=args.paquete
+    ).iniciar()
+    print(f"Servicio de cálculo en http://{servicio.host}:{servicio.puerto}", file=sys.stderr)
+    async with servicio.servidor:
+        await servicio.servidor.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m nucleo.servicio",
+        description="Servicio HTTP local para calcular huellas de carbono desde otros sistemas."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección de escucha (por defecto 127.0.0.1)")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto (por defecto 8765)")
+    parser.add_argument("--lote-maximo", type=int, default=LOTE_MAXIMO, help="Solicitudes por lote de cálculo")
+    parser.add_argument("--cola-maxima", type=int, default=COLA_MAXIMA, help="Solicitudes en espera antes de responder 503")
+    parser.add_argument("--espera-ms", type=float, default=0, help="Espera para completar un lote (ms; por defecto 0)")
+    parser.add_argument("--paquete", help="Paquete de factores por defecto (nombre de nucleo/datos o ruta .json)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_servir(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,475 @@
+"""
+Cálculo vectorizado de emisiones sobre tablas de actividades.
+
+Equivalente columnar de `calcular_emisiones_fertilizantes`, pensado para carteras con
+muchas aplicaciones. Recibe un DataFrame con una fila por fertilizante y las mismas
+columnas que los campos de `actividades.Fertilizante`:
+
+    tipo, origen, cantidad, N, es_organico, fraccion_seca, modo_otros, nutriente, fe_personalizado
+
+(las columnas ausentes o vacías toman los mismos valores por defecto que el cálculo escalar).
+
+Para agroquímicos, labores y riego, `agroquimicos_vectorizado`, `labores_vectorizado` y
+`riego_vectorizado` calculan en una sola pasada los registros que arman `calcular_agroquimico`,
+`calcular_labor` y `calcular_actividad_riego` (con su emisión por fila); `registros` los
+convierte en la lista de registros (`actividades`) que reciben las calculadoras y `calcular_proyecto`.
+Requiere pandas y NumPy; el resto del núcleo no depende de ellos.
+"""
+
+from weakref import WeakKeyDictionary
+
+import numpy as np
+import pandas as pd
+
+from .paquetes import paquete_activo
+
+COLUMNAS_DESGLOSE = [
+    "Tipo fertilizante",
+    "tipo",
+    "origen",
+    "cantidad",
+    "emision_produccion",
+    "emision_co2_urea",
+    "emision_n2o_directa",
+    "emision_n2o_indirecta",
+    "emision_n2o_ind_volatilizacion",
+    "emision_n2o_ind_lixiviacion",
+    "total"
+]
+COLUMNAS_AGROQUIMICOS = ["categoria", "tipo", "nombre_comercial", "cantidad_ia", "fe", "emisiones"]
+COLUMNAS_LABORES = ["nombre_labor", "tipo_maquinaria", "tipo_combustible", "litros", "emisiones", "fe_personalizado"]
+COLUMNAS_RIEGO = [
+    "actividad", "tipo_actividad", "agua_total_m3", "emisiones_agua",
+    "consumo_energia", "tipo_energia", "fe_energia", "emisiones_energia"
+]
+
+# Columnas de entrada de las tablas de ingreso (nombre -> tipo de dato); las vacías toman
+# los valores por defecto de cada función
+COLUMNAS_ENTRADA = {
+    "fertilizantes": {
+        "es_organico": "bool", "tipo": "object", "origen": "object", "cantidad": "float64",
+        "N": "float64", "fraccion_seca": "float64", "fe_personalizado": "float64"
+    },
+    "agroquimicos": {
+        "categoria": "object", "tipo": "object", "nombre_comercial": "object",
+        "cantidad_ia": "float64", "fe": "float64"
+    },
+    "labores": {
+        "nombre_labor": "object", "tipo_maquinaria": "object", "tipo_combustible": "object",
+        "pasadas": "float64", "litros_pasada": "float64", "horas_pasada": "float64",
+        "rendimiento": "float64", "fe_personalizado": "float64"
+    },
+    "riego": {
+        "tipo_actividad": "object", "actividad": "object", "agua_total_m3": "float64",
+        "tipo_energia": "object", "consumo_energia": "float64", "fe_energia": "float64"
+    },
+}
+
+_catalogos = WeakKeyDictionary()
+
+def _catalogo_fertilizantes(paquete):
+    """
+    Arreglos con los parámetros de cada variante del registro de factores del paquete y
+    la posición de cada registro en ellos. Se arma una sola vez por paquete.
+    """
+    catalogo = _catalogos.get(paquete)
+    if catalogo is None:
+        registro = paquete.registro
+        parametros = {"N_porcentaje": [], "Frac_volatilizacion": [], "Frac_lixiviacion": [], "FE_produccion_producto": []}
+        posiciones = {}
+        for tipo in registro.tipos():
+            for v in registro.variantes(tipo):
+                posiciones[id(v)] = len(parametros["N_porcentaje"])
+                parametros["N_porcentaje"].append(v.get("N_porcentaje", 0))
+                parametros["Frac_volatilizacion"].append(v.get("Frac_volatilizacion", paquete["FRAC_VOLATILIZACION_INORG"]))
+                parametros["Frac_lixiviacion"].append(v.get("Frac_lixiviacion", paquete["FRAC_LIXIVIACION"]))
+                parametros["FE_produccion_producto"].append(v.get("FE_produccion_producto", 0) or 0)
+        parametros = {k: np.array(v, dtype=float) for k, v in parametros.items()}
+        catalogo = (parametros, posiciones)
+        _catalogos[paquete] = catalogo
+    return catalogo
+
+def _es_nulo(valor):
+    return valor is None or (isinstance(valor, float) and np.isnan(valor))
+
+def _factorizar(serie):
+    return pd.factorize(serie, use_na_sentinel=False)
+
+def _por_valor(factorizacion, funcion, dtype=float):
+    """
+    Aplica `funcion` una vez por valor distinto de una columna factorizada y expande el
+    resultado a todas las filas (las columnas de texto tienen pocos valores distintos
+    frente al número de filas).
+    """
+    codigos, unicos = factorizacion
+    valores = np.array([funcion(u) for u in unicos], dtype=dtype)
+    if len(valores) == 0:
+        return np.zeros(len(codigos), dtype=dtype)
+    return valores[codigos]
+
+def _columna(df, nombre, defecto):
+    if nombre in df.columns:
+        return df[nombre]
+    return pd.Series(defecto, index=df.index, dtype=object if isinstance(defecto, str) or defecto is None else float)
+
+def _numerica(df, nombre):
+    return pd.to_numeric(_columna(df, nombre, np.nan), errors="coerce").to_numpy(dtype=float)
+
+def _columnas_fertilizantes(df, duracion):
+    """Calcula por fila el N aplicado, volatilizado y lixiviado y las emisiones del desglose."""
+    n_filas = len(df)
+    duracion = np.broadcast_to(np.asarray(duracion, dtype=float), (n_filas,))
+    f = paquete_activo()
+    FRAC_VOLATILIZACION_INORG = f["FRAC_VOLATILIZACION_INORG"]
+    FRAC_LIXIVIACION = f["FRAC_LIXIVIACION"]
+    FACTORES_ORGANICOS = f["FACTORES_ORGANICOS"]
+
+    tipo = _columna(df, "tipo", None)
+    origen = _columna(df, "origen", None)
+    modo = _columna(df, "modo_otros", None)
+    cantidad_in = _numerica(df, "cantidad")
+    cantidad = np.nan_to_num(cantidad_in, nan=0.0)
+    n_pct = _numerica(df, "N")
+    fe_pers = _numerica(df, "fe_personalizado")
+    fraccion_seca = _numerica(df, "fraccion_seca")
+    es_org = _columna(df, "es_organico", False).eq(True).to_numpy()
+
+    modo_arr = modo.to_numpy()
+    f_tipo = _factorizar(tipo)
+    es_otros = ~es_org & (_por_valor(f_tipo, lambda t: t == "Otros", bool) | (modo_arr == "porcentaje") | (modo_arr == "nutriente"))
+    es_cat = ~es_org & ~es_otros
+
+    n_aplicado = np.zeros(n_filas)
+    frac_vol = np.zeros(n_filas)
+    frac_lix = np.zeros(n_filas)
+    em_prod = np.zeros(n_filas)
+    em_urea = np.zeros(n_filas)
+
+    # --- Orgánicos: N = cantidad · fracción seca · N% ---
+    if es_org.any():
+        def valores_org(t):
+            return FACTORES_ORGANICOS.get("Otros" if _es_nulo(t) else t, FACTORES_ORGANICOS["Otros"])
+        fs_def = _por_valor(f_tipo, lambda t: valores_org(t)["fraccion_seca"])
+        n_def = _por_valor(f_tipo, lambda t: valores_org(t)["N"])
+        fs = np.where(np.isnan(fraccion_seca), fs_def, fraccion_seca)
+        n = np.where(np.isnan(n_pct), n_def, n_pct) / 100
+        n_aplicado = np.where(es_org, cantidad * fs * n, n_aplicado)
+        frac_vol = np.where(es_org, f["FRAC_VOLATILIZACION_ORG"], frac_vol)
+        frac_lix = np.where(es_org, FRAC_LIXIVIACION, frac_lix)
+
+    # --- "Otros": por porcentaje de N o por nutriente aplicado ---
+    if es_otros.any():
+        es_n = _por_valor(
+            _factorizar(_columna(df, "nutriente", None)),
+            lambda u: not _es_nulo(u) and str(u).strip().upper() == "N",
+            bool
+        )
+        n_otros = np.where(
+            modo_arr == "porcentaje",
+            cantidad * (np.nan_to_num(n_pct, nan=0.0) / 100),
+            np.where((modo_arr == "nutriente") & es_n, cantidad, 0.0)
+        )
+        con_n = es_otros & (n_otros > 0)
+        n_aplicado = np.where(es_otros, n_otros, n_aplicado)
+        frac_vol = np.where(con_n, FRAC_VOLATILIZACION_INORG, frac_vol)
+        frac_lix = np.where(con_n, FRAC_LIXIVIACION, frac_lix)
+        usa_fe = es_otros & (fe_pers > 0)
+        em_prod = np.where(usa_fe, cantidad * np.nan_to_num(fe_pers) * duracion, em_prod)
+
+    # --- Catálogo: variante por (tipo, origen) o la primera del tipo ---
+    if es_cat.any():
+        parametros, posiciones = _catalogo_fertilizantes(f)
+        codigos_tipo, tipos = f_tipo
+        codigos_origen, origenes = _factorizar(origen)
+        ancho = len(origenes) + 1
+        codigos, pares = pd.factorize(codigos_tipo * ancho + codigos_origen)
+        pos_pares = []
+        for par in pares:
+            variante = f.registro.variante(tipos[par // ancho], origenes[par % ancho])
+            pos_pares.append(posiciones[id(variante)] if variante is not None else -1)
+        pos_pares = np.array(pos_pares, dtype=int)
+        pos = pos_pares[codigos] if len(pos_pares) else np.full(n_filas, -1)
+        con_variante = es_cat & (pos >= 0)
+        idx = np.maximum(pos, 0)
+
+        n_porcentaje = parametros["N_porcentaje"][idx]
+        fv = parametros["Frac_volatilizacion"][idx]
+        fl = parametros["Frac_lixiviacion"][idx]
+        fe_def = parametros["FE_produccion_producto"][idx]
+
+        n_aplicado = np.where(con_variante, cantidad * n_porcentaje, n_aplicado)
+        frac_vol = np.where(es_cat, np.where(con_variante, fv, FRAC_VOLATILIZACION_INORG), frac_vol)
+        frac_lix = np.where(es_cat, np.where(con_variante, fl, FRAC_LIXIVIACION), frac_lix)
+
+        es_urea = con_variante & _por_valor(f_tipo, lambda t: not _es_nulo(t) and "Urea" in t, bool)
+        em_urea = np.where(es_urea, cantidad * f["EF_CO2_UREA"] * duracion, em_urea)
+        em_prod = np.where(
+            con_variante,
+            np.where(fe_pers > 0, cantidad * np.nan_to_num(fe_pers) * duracion, cantidad * fe_def * duracion),
+            em_prod
+        )
+
+    # --- N2O directo e indirecto por fila (IPCC 2019, mismo orden de operaciones que el cálculo escalar) ---
+    n_volatilizado = n_aplicado * frac_vol
+    n_lixiviado = n_aplicado * frac_lix
+    em_n2o_dir = n_aplicado * f["EF1"] * (44/28) * f["GWP"]["N2O"]
+    em_n2o_ind_vol = n_volatilizado * f["EF4"] * (44/28) * f["GWP"]["N2O"]
+    em_n2o_ind_lix = n_lixiviado * f["EF5"] * (44/28) * f["GWP"]["N2O"]
+    em_n2o_ind = em_n2o_ind_vol + em_n2o_ind_lix
+
+    tipo_desglose = tipo.where(tipo.notna(), _columna(df, "nutriente", "")).fillna("")
+    return {
+        "duracion": duracion,
+        "n_aplicado": n_aplicado,
+        "n_volatilizado": n_volatilizado,
+        "n_lixiviado": n_lixiviado,
+        "desglose": pd.DataFrame({
+            "Tipo fertilizante": np.where(es_org, "Orgánico", "Inorgánico"),
+            "tipo": tipo_desglose.to_numpy(),
+            "origen": origen.fillna("").to_numpy(),
+            "cantidad": cantidad,
+            "emision_produccion": em_prod,
+            "emision_co2_urea": em_urea,
+            "emision_n2o_directa": em_n2o_dir,
+            "emision_n2o_indirecta": em_n2o_ind,
+            "emision_n2o_ind_volatilizacion": em_n2o_ind_vol,
+            "emision_n2o_ind_lixiviacion": em_n2o_ind_lix,
+            "total": em_prod + em_urea + em_n2o_dir + em_n2o_ind
+        }, index=df.index, columns=COLUMNAS_DESGLOSE)
+    }
+
+def _n2o_totales(total_n_aplicado, total_n_volatilizado, total_n_lixiviado):
+    f = paquete_activo()
+    n2o_directo_co2e = total_n_aplicado * f["EF1"] * (44/28) * f["GWP"]["N2O"]
+    n2o_indirecto_co2e = (total_n_volatilizado * f["EF4"] * (44/28) + total_n_lixiviado * f["EF5"] * (44/28)) * f["GWP"]["N2O"]
+    return n2o_directo_co2e, n2o_indirecto_co2e
+
+def desglose_fertilizantes_vectorizado(df, duracion=1):
+    """
+    Desglose por aplicación (mismas columnas que el `desglose` escalar) en una sola pasada.
+    - duracion: años de la etapa; escalar o arreglo alineado con las filas de `df`.
+    Como en el cálculo escalar, producción y CO₂ de urea se multiplican por la duración
+    y el N₂O del desglose queda por año.
+    """
+    return _columnas_fertilizantes(df, duracion)["desglose"]
+
+def calcular_emisiones_fertilizantes_vectorizado(df, duracion=1):
+    """
+    Versión columnar de `calcular_emisiones_fertilizantes`.
+    Devuelve: emision_produccion, emision_co2_urea, n2o_directo_co2e, n2o_indirecto_co2e, desglose (DataFrame)
+    Los resultados coinciden con los del cálculo escalar salvo redondeo de punto flotante.
+    """
+    col = _columnas_fertilizantes(df, duracion)
+    desglose = col["desglose"]
+    dur = col["duracion"]
+    n2o_directo_co2e, n2o_indirecto_co2e = _n2o_totales(
+        float(np.sum(col["n_aplicado"] * dur)),
+        float(np.sum(col["n_volatilizado"] * dur)),
+        float(np.sum(col["n_lixiviado"] * dur))
+    )
+    return (
+        float(desglose["emision_produccion"].sum()),
+        float(desglose["emision_co2_urea"].sum()),
+        n2o_directo_co2e,
+        n2o_indirecto_co2e,
+        desglose
+    )
+
+def totales_fertilizantes_por_grupo(df, por, duracion=1):
+    """
+    Totales de fertilizantes por grupo (p. ej. por finca y etapa) en una sola pasada.
+    - por: columna o lista de columnas de `df` que definen el grupo
+    - duracion: escalar, arreglo alineado con `df` o nombre de una columna de `df`
+    Devuelve un DataFrame indexado por grupo con emision_produccion, emision_co2_urea,
+    n2o_directo_co2e, n2o_indirecto_co2e y total.
+    """
+    if isinstance(duracion, str):
+        duracion = pd.to_numeric(df[duracion], errors="coerce").fillna(1).to_numpy(dtype=float)
+    col = _columnas_fertilizantes(df, duracion)
+    dur = col["duracion"]
+    desglose = col["desglose"]
+    claves = [por] if isinstance(por, str) else list(por)
+    tabla = pd.DataFrame({
+        "emision_produccion": desglose["emision_produccion"].to_numpy(),
+        "emision_co2_urea": desglose["emision_co2_urea"].to_numpy(),
+        "n_aplicado": col["n_aplicado"] * dur,
+        "n_volatilizado": col["n_volatilizado"] * dur,
+        "n_lixiviado": col["n_lixiviado"] * dur,
+    }, index=df.index)
+    for clave in claves:
+        tabla[clave] = df[clave].to_numpy()
+    sumas = tabla.groupby(claves, sort=False).sum()
+    n2o_directo_co2e, n2o_indirecto_co2e = _n2o_totales(
+        sumas["n_aplicado"], sumas["n_volatilizado"], sumas["n_lixiviado"]
+    )
+    resultado = pd.DataFrame({
+        "emision_produccion": sumas["emision_produccion"],
+        "emision_co2_urea": sumas["emision_co2_urea"],
+        "n2o_directo_co2e": n2o_directo_co2e,
+        "n2o_indirecto_co2e": n2o_indirecto_co2e,
+    })
+    resultado["total"] = resultado.sum(axis=1)
+    return resultado
+
+# -----------------------------
+# Agroquímicos, labores y riego
+# -----------------------------
+def _texto(df, nombre, defecto):
+    """Columna de texto con las celdas vacías (None, NaN o "") reemplazadas por `defecto`."""
+    serie = _columna(df, nombre, None).astype(object)
+    vacia = serie.isna() | (serie.astype(str).str.strip() == "")
+    return serie.where(~vacia, defecto)
+
+def _por_par(serie_a, serie_b, funcion, dtype=float):
+    """Como `_por_valor`, pero una vez por cada par distinto (a, b) de dos columnas."""
+    codigos_a, unicos_a = _factorizar(serie_a)
+    codigos_b, unicos_b = _factorizar(serie_b)
+    ancho = len(unicos_b) + 1
+    codigos, pares = pd.factorize(codigos_a * ancho + codigos_b)
+    valores = np.array([funcion(unicos_a[par // ancho], unicos_b[par % ancho]) for par in pares], dtype=dtype)
+    if len(valores) == 0:
+        return np.zeros(len(codigos), dtype=dtype)
+    return valores[codigos]
+
+def tabla_vacia(categoria):
+    """Tabla de ingreso sin filas, con las columnas (y tipos) de `COLUMNAS_ENTRADA[categoria]`."""
+    return pd.DataFrame({c: pd.Series(dtype=t) for c, t in COLUMNAS_ENTRADA[categoria].items()})
+
+def tabla_registros(categoria, filas):
+    """
+    Tabla de ingreso con las filas dadas (inversa de `registros`): solo las columnas de
+    `COLUMNAS_ENTRADA[categoria]`, con sus tipos; los campos que faltan quedan vacíos.
+    """
+    if not filas:
+        return tabla_vacia(categoria)
+    tabla = pd.DataFrame(filas).reindex(columns=list(COLUMNAS_ENTRADA[categoria]))
+    for columna, tipo in COLUMNAS_ENTRADA[categoria].items():
+        if tipo == "bool":
+            tabla[columna] = tabla[columna].eq(True)  # vacío -> False
+    return tabla.astype(COLUMNAS_ENTRADA[categoria])
+
+def normalizar_fertilizantes(df):
+    """
+    Completa una tabla de fertilizantes para `registros`: es_organico (marcado, o un tipo que
+    solo existe en FACTORES_ORGANICOS) y modo_otros="porcentaje" para los inorgánicos "Otros".
+    """
+    f = paquete_activo()
+    tipos_inorg = set(f.registro.tipos())
+    organicos = f["FACTORES_ORGANICOS"]
+    tabla = df.copy()
+    tipo = _columna(tabla, "tipo", None)
+    solo_organico = _por_valor(_factorizar(tipo), lambda t: t in organicos and t not in tipos_inorg, bool)
+    marcado = _columna(tabla, "es_organico", False)
+    es_org = marcado.where(marcado.notna(), False).astype(bool).to_numpy() | solo_organico
+    tabla["es_organico"] = es_org
+    modo = _columna(tabla, "modo_otros", None)
+    otros = ~es_org & (tipo == "Otros").to_numpy() & modo.isna().to_numpy()
+    tabla["modo_otros"] = modo.where(~otros, "porcentaje")
+    return tabla
+
+def agroquimicos_vectorizado(df):
+    """
+    Registros de agroquímicos (columnas de `calcular_agroquimico`) a partir de una tabla con
+    categoria, tipo, nombre_comercial, cantidad_ia y fe (opcional, kg CO₂e/kg i.a.).
+    Sin fe se usa el de `factores_emision` para (categoria, tipo), o el genérico.
+    """
+    f = paquete_activo()
+    factores = f["factores_emision"]
+    fe_generico = f["valores_defecto"]["fe_agroquimico"]
+    categoria = _texto(df, "categoria", "pesticidas")
+    tipo = _texto(df, "tipo", "Media")
+    fe_in = _numerica(df, "fe")
+    fe_def = _por_par(categoria, tipo, lambda c, t: factores.get(c, {}).get(t, fe_generico))
+    fe = np.where(np.isnan(fe_in), fe_def, fe_in)
+    cantidad_ia = np.nan_to_num(_numerica(df, "cantidad_ia"), nan=0.0)
+    return pd.DataFrame({
+        "categoria": categoria.to_numpy(),
+        "tipo": tipo.to_numpy(),
+        "nombre_comercial": _texto(df, "nombre_comercial", None).fillna(tipo).to_numpy(),
+        "cantidad_ia": cantidad_ia,
+        "fe": fe,
+        "emisiones": cantidad_ia * fe
+    }, index=df.index, columns=COLUMNAS_AGROQUIMICOS)
+
+def labores_vectorizado(df):
+    """
+    Registros de labores (columnas de `calcular_labor`) a partir de una tabla con
+    nombre_labor, tipo_maquinaria ("Manual" para labores sin maquinaria), tipo_combustible,
+    fe_personalizado y el consumo como:
+        - litros: litros totales de la labor, o si está vacío
+        - pasadas × litros_pasada, o pasadas × horas_pasada × rendimiento (litros/hora;
+          por defecto el de `rendimientos_maquinaria` para el tipo de maquinaria)
+    """
+    f = paquete_activo()
+    factores_combustible = f["factores_combustible"]
+    rendimientos = f["rendimientos_maquinaria"]
+    maquinaria = _texto(df, "tipo_maquinaria", "Otro")
+    combustible = _texto(df, "tipo_combustible", "N/A")
+    manual = (maquinaria == "Manual").to_numpy()
+
+    rendimiento_def = _por_valor(_factorizar(maquinaria), lambda m: rendimientos.get(m, rendimientos.get("Otro", 10)))
+    rendimiento = _numerica(df, "rendimiento")
+    rendimiento = np.where(np.isnan(rendimiento), rendimiento_def, rendimiento)
+    pasadas = np.nan_to_num(_numerica(df, "pasadas"), nan=1.0)
+    litros_pasada = _numerica(df, "litros_pasada")
+    horas_pasada = np.nan_to_num(_numerica(df, "horas_pasada"), nan=0.0)
+    litros_pasada = np.where(np.isnan(litros_pasada), horas_pasada * rendimiento, litros_pasada)
+    litros = _numerica(df, "litros")
+    litros = np.where(np.isnan(litros), pasadas * litros_pasada, litros)
+    litros = np.where(manual, 0.0, litros)
+
+    fe_pers = _numerica(df, "fe_personalizado")
+    fe_def = _por_valor(_factorizar(combustible), lambda c: factores_combustible.get(c, 0))
+    fe = np.where(np.isnan(fe_pers), fe_def, fe_pers)
+    return pd.DataFrame({
+        "nombre_labor": _texto(df, "nombre_labor", "").to_numpy(),
+        "tipo_maquinaria": maquinaria.to_numpy(),
+        "tipo_combustible": np.where(manual, "N/A", combustible.to_numpy()),
+        "litros": litros,
+        "emisiones": np.where(manual, 0.0, litros * fe),
+        "fe_personalizado": np.where(manual, np.nan, fe_pers)
+    }, index=df.index, columns=COLUMNAS_LABORES)
+
+def riego_vectorizado(df):
+    """
+    Registros de actividades de riego y energía (columnas de `calcular_actividad_riego`) a
+    partir de una tabla con tipo_actividad, actividad (nombre; por defecto el tipo),
+    agua_total_m3, tipo_energia, consumo_energia (kWh o litros) y fe_energia (opcional).
+    """
+    f = paquete_activo()
+    factores_combustible = f["factores_combustible"]
+    fe_generico = f["valores_defecto"]["fe_combustible_generico"]
+    tipo_actividad = _texto(df, "tipo_actividad", "Otro")
+    tipo_energia = _texto(df, "tipo_energia", "Otro")
+    agua = np.nan_to_num(_numerica(df, "agua_total_m3"), nan=0.0)
+    consumo = np.nan_to_num(_numerica(df, "consumo_energia"), nan=0.0)
+    fe_in = _numerica(df, "fe_energia")
+    fe_def = _por_valor(_factorizar(tipo_energia), lambda t: factores_combustible.get(t, fe_generico))
+    fe = np.where(np.isnan(fe_in), fe_def, fe_in)
+    return pd.DataFrame({
+        "actividad": _texto(df, "actividad", None).fillna(tipo_actividad).to_numpy(),
+        "tipo_actividad": tipo_actividad.to_numpy(),
+        "agua_total_m3": agua,
+        "emisiones_agua": agua * 1000 * f["valores_defecto"]["fe_agua"],
+        "consumo_energia": consumo,
+        "tipo_energia": tipo_energia.to_numpy(),
+        "fe_energia": fe,
+        "emisiones_energia": consumo * fe
+    }, index=df.index, columns=COLUMNAS_RIEGO)
+
+def registros(df, tipo=None):
+    """
+    Filas de una tabla como lista de dicts con valores de Python, omitiendo las celdas
+    vacías (así las calculadoras escalares aplican sus valores por defecto).
+    - tipo: registro de `nucleo.actividades` (p. ej. Labor) para devolver registros en
+      lugar de dicts; las columnas que no son campos del registro se descartan
+    """
+    columnas = list(df.columns)
+    valores = df.astype(object).where(df.notna(), None).to_numpy().tolist()
+    filas = [
+        {c: v for c, v in zip(columnas, fila) if v is not None and v != ""}
+        for fila in valores
+    ]
+    if tipo is None:
+        return filas
+    return [tipo.desde(fila) for fila in filas]
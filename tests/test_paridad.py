@@ -0,0 +1,250 @@
+"""
+Paridad de los motores alternativos con `calcular_proyecto` (el cálculo escalar de referencia).
+
+Cada motor (vectorizado, grafo incremental, memoización, barrido de escenarios, modelos de
+incertidumbre y de sensibilidad en su valor nominal, servicio por lotes) debe dar los mismos
+números que `calcular_proyecto` sobre proyectos que cubren todas las fuentes: fertilizantes
+de catálogo, orgánicos (con y sin N indicado), "Otros" por porcentaje y por nutriente,
+agroquímicos con y sin FE propio, labores manuales y con combustible, riego eléctrico y
+diésel (por año y por etapa) y residuos con quema (con y sin ajustes), compostaje,
+incorporación y sin gestión.
+
+    python -m pytest tests
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nucleo import calcular_etapa, calcular_proyecto
+from nucleo.actividades import ActividadRiego, Agroquimico, Labor
+from nucleo.calculos import calcular_emisiones_fertilizantes
+from nucleo.escenarios import aplicar_cambios, barrer_escenarios
+from nucleo.etapas import FUENTES
+from nucleo.incertidumbre import ModeloIncertidumbre
+from nucleo.incremental import GrafoProyecto
+from nucleo.memoria import calcular_etapa as calcular_etapa_memoizada
+from nucleo.sensibilidad import ModeloSensibilidad
+from nucleo.servicio import calcular_lote
+from nucleo.vectorizado import (
+    agroquimicos_vectorizado,
+    calcular_emisiones_fertilizantes_vectorizado,
+    labores_vectorizado,
+    registros,
+    riego_vectorizado,
+)
+
+TOLERANCIA = 1e-9
+
+def _etapa(nombre, duracion, produccion, riego_por_anio=True):
+    return {
+        "nombre": nombre,
+        "duracion": duracion,
+        "produccion": produccion,
+        "riego_por_anio": riego_por_anio,
+        "fertilizantes": [
+            {"tipo": "Urea", "origen": "Unión Europea", "cantidad": 120},
+            {"tipo": "Nitrato de amonio (AN)", "cantidad": 80},
+            {"tipo": "Guano rojo", "cantidad": 1500, "es_organico": True},
+            {"tipo": "Guano de vacuno", "cantidad": 2000, "es_organico": True, "N": 1.2, "fraccion_seca": 0.4},
+            {"tipo": "Otros", "modo_otros": "porcentaje", "N": 12, "cantidad": 60, "fe_personalizado": 1.5},
+            {"tipo": "Otros", "modo_otros": "nutriente", "nutriente": "N", "cantidad": 15},
+            {"tipo": "Otros", "modo_otros": "porcentaje", "cantidad": 40},  # N desconocido
+        ],
+        "agroquimicos": [
+            {"categoria": "pesticidas", "tipo": "Media", "cantidad_ia": 2},
+            {"categoria": "fungicidas", "tipo": "Maneb", "cantidad_ia": 1.5, "nombre_comercial": "Fungi"},
+            {"categoria": "herbicidas", "tipo": "Glifosato", "cantidad_ia": 1, "fe": 12.0},
+        ],
+        "labores": [
+            {"nombre_labor": "Arado", "tipo_maquinaria": "Tractor",
+             "tipo_combustible": "Diesel (100% mineral)", "litros": 40},
+            {"nombre_labor": "Fumigación", "tipo_maquinaria": "Pulverizadora",
+             "tipo_combustible": "Gasolina (100% gasolina mineral)", "litros": 12, "fe_personalizado": 2.4},
+            {"nombre_labor": "Poda", "tipo_maquinaria": "Manual", "tipo_combustible": "N/A", "litros": 0},
+        ],
+        "riego": [
+            {"actividad": "Goteo", "tipo_actividad": "Riego por goteo", "agua_total_m3": 3000,
+             "consumo_energia": 500, "tipo_energia": "Eléctrico"},
+            {"actividad": "Bombeo", "tipo_actividad": "Bombeo", "agua_total_m3": 0,
+             "consumo_energia": 80, "tipo_energia": "Diesel (100% mineral)"},
+        ],
+        "residuos": {
+            "Quema": {"biomasa": 2000, "ajustes": {}},
+            "Compostaje": {"biomasa": 1000, "ajustes": {"base_calculo": "base_seca", "fraccion_seca": 0.5}},
+            "Incorporación al suelo": {"biomasa": 800, "ajustes": {}},
+            "Sin gestión": {"biomasa": 300, "ajustes": {}},
+        },
+    }
+
+def proyecto_perenne():
+    implantacion = _etapa("Implantación", 1, 0, riego_por_anio=False)
+    crecimiento = _etapa("Crecimiento", 3, 2000)
+    produccion = _etapa("Producción", 20, 12000)
+    produccion["residuos"]["Quema"] = {"biomasa": 3000, "ajustes": {"fraccion_seca": 0.6, "fraccion_quemada": 0.8}}
+    return {"tipo": "perenne", "etapas": [implantacion, crecimiento, produccion]}
+
+def proyecto_anual():
+    ciclo = _etapa("Ciclo típico", 1, 9000)
+    ciclo["ciclos"] = 3
+    otro = _etapa("Ciclo corto", 1, 5000, riego_por_anio=False)
+    return {"tipo": "anual", "etapas": [ciclo, otro]}
+
+PROYECTOS = {"perenne": proyecto_perenne, "anual": proyecto_anual}
+
+@pytest.fixture(params=list(PROYECTOS))
+def proyecto(request):
+    return PROYECTOS[request.param]()
+
+def _iguales(a, b):
+    assert a == pytest.approx(b, rel=TOLERANCIA, abs=TOLERANCIA)
+
+def _por_fuente(resultados):
+    """{etapa: {fuente: kg CO2e/ha}} de `calcular_proyecto`, incluidas las repeticiones."""
+    if resultados["tipo"] == "anual":
+        por_etapa = {}
+        for fila in resultados["desglose_fuentes_ciclos"]:
+            por_etapa.setdefault(fila["Ciclo"], {f: fila[f] for f in FUENTES})
+        return por_etapa
+    return {e: {f: d[f] for f in FUENTES} for e, d in resultados["emisiones_fuente_etapa"].items()}
+
+# -----------------------------
+# Motor vectorizado
+# -----------------------------
+def test_fertilizantes_vectorizado(proyecto):
+    for etapa in proyecto["etapas"]:
+        duracion = etapa["duracion"]
+        escalar = calcular_emisiones_fertilizantes({"fertilizantes": etapa["fertilizantes"]}, duracion)
+        vectorizado = calcular_emisiones_fertilizantes_vectorizado(pd.DataFrame(etapa["fertilizantes"]), duracion)
+        for a, b in zip(vectorizado[:4], escalar[:4]):
+            _iguales(a, b)
+        desglose = pd.DataFrame(escalar[4])
+        for columna in ["emision_produccion", "emision_co2_urea", "emision_n2o_directa", "emision_n2o_indirecta", "total"]:
+            np.testing.assert_allclose(vectorizado[4][columna].to_numpy(), desglose[columna].to_numpy(), rtol=TOLERANCIA)
+
+def test_proyecto_vectorizado(proyecto):
+    """Agroquímicos, labores y riego calculados en tablas dan el mismo proyecto."""
+    vectorizado = copy.deepcopy(proyecto)
+    for etapa in vectorizado["etapas"]:
+        etapa["agroquimicos"] = registros(agroquimicos_vectorizado(pd.DataFrame(etapa["agroquimicos"])), Agroquimico)
+        etapa["labores"] = registros(labores_vectorizado(pd.DataFrame(etapa["labores"])), Labor)
+        etapa["riego"] = registros(riego_vectorizado(pd.DataFrame(etapa["riego"])), ActividadRiego)
+    esperado = calcular_proyecto(proyecto)
+    obtenido = calcular_proyecto(vectorizado)
+    _iguales(obtenido["em_total"], esperado["em_total"])
+    for etapa, fuentes in _por_fuente(esperado).items():
+        for fuente, valor in fuentes.items():
+            _iguales(_por_fuente(obtenido)[etapa][fuente], valor)
+
+# -----------------------------
+# Grafo incremental y memoización
+# -----------------------------
+def test_grafo_incremental(proyecto):
+    esperado = calcular_proyecto(proyecto)
+    grafo = GrafoProyecto(proyecto["tipo"])
+    for etapa in proyecto["etapas"]:
+        grafo.actualizar_etapa(etapa["nombre"], etapa)
+    _iguales(grafo.em_total, esperado["em_total"])
+    _iguales(grafo.prod_total, esperado["prod_total"])
+    for fuente in FUENTES:
+        _iguales(grafo.emisiones_fuentes[fuente], esperado["emisiones_fuentes"][fuente])
+
+    # Cambiar un ítem solo recalcula ese ítem y da el mismo resultado que recalcular todo
+    etapa = proyecto["etapas"][-1]
+    etapa["fertilizantes"][0] = dict(etapa["fertilizantes"][0], cantidad=300)
+    assert grafo.actualizar_etapa(etapa["nombre"], etapa) == 1
+    _iguales(grafo.em_total, calcular_proyecto(proyecto)["em_total"])
+
+def test_memoizacion(proyecto):
+    esperado = calcular_proyecto(proyecto)
+    for _ in range(2):  # la segunda vez, desde la caché
+        obtenido = calcular_proyecto(proyecto, calculadora=calcular_etapa_memoizada)
+        _iguales(obtenido["em_total"], esperado["em_total"])
+
+# -----------------------------
+# Escenarios
+# -----------------------------
+GRILLA = {
+    "fertilizantes": {"Actual": None, "Urea China": {"Urea": "China, carbón"}},
+    "combustible": {"Actual": None, "Biodiésel": {"Diesel (100% mineral)": "Diesel (mezcla promedio biocombustibles)"}},
+    "energia_riego": {"Actual": None, "Bomba eléctrica": {"Diesel (100% mineral)": "Eléctrico"}},
+    "residuos": {"Actual": None, "Compostar todo": {"Compostaje": 1.0}},
+}
+
+def test_escenarios(proyecto):
+    resultado = barrer_escenarios(proyecto, GRILLA)
+    _iguales(resultado["base"]["em_total"], calcular_proyecto(proyecto)["em_total"])
+    assert len(resultado["escenarios"]) == 2 ** len(GRILLA)
+    for fila in resultado["escenarios"]:
+        cambios = {eje: GRILLA[eje][fila[eje]] for eje in GRILLA}
+        modificado = dict(proyecto, etapas=[aplicar_cambios(e, cambios) for e in proyecto["etapas"]])
+        esperado = calcular_proyecto(modificado)
+        _iguales(fila["em_total"], esperado["em_total"])
+        for fuente in FUENTES:
+            _iguales(fila[fuente], esperado["emisiones_fuentes"][fuente])
+
+# -----------------------------
+# Incertidumbre y sensibilidad en el valor nominal
+# -----------------------------
+def test_incertidumbre_nominal(proyecto):
+    esperado = calcular_proyecto(proyecto)
+    modelo = ModeloIncertidumbre(proyecto)
+    r = modelo.evaluar(n=1)
+    _iguales(float(r["em_total"][0]), esperado["em_total"])
+    _iguales(float(r["prod_total"][0]), esperado["prod_total"])
+    if proyecto["tipo"] == "perenne":
+        for etapa, fuentes in _por_fuente(esperado).items():
+            for fuente, valor in fuentes.items():
+                _iguales(float(r["etapas"][etapa][fuente][0]), valor)
+
+@pytest.mark.parametrize("objetivo", ["em_total", "huella"])
+def test_sensibilidad_nominal(proyecto, objetivo):
+    esperado = calcular_proyecto(proyecto)
+    modelo = ModeloSensibilidad(proyecto)
+    valor = float(modelo.evaluar(np.ones((1, len(modelo.parametros))), objetivo)[0])
+    if objetivo == "em_total":
+        _iguales(valor, esperado["em_total"])
+    else:
+        _iguales(valor, esperado["em_total"] / esperado["prod_total"])
+
+def test_sensibilidad_quema_con_ajustes():
+    """Con fraccion_seca ajustada, la quema no depende del factor del paquete."""
+    etapa = _etapa("Única", 1, 1000)
+    etapa["residuos"] = {"Quema": {"biomasa": 1000, "ajustes": {"fraccion_seca": 0.5}}}
+    modelo = ModeloSensibilidad({"tipo": "perenne", "etapas": [etapa]})
+    assert "FRACCION_SECA_QUEMA" not in modelo.parametros
+
+def test_proyecto_sin_emisiones_calculadas():
+    """Ítems con emisiones en None (proyectos por lotes o guardados) se calculan en todos los motores."""
+    proyecto = proyecto_perenne()
+    for etapa in proyecto["etapas"]:
+        etapa["agroquimicos"] = [Agroquimico(**ag) for ag in etapa["agroquimicos"]]
+        etapa["riego"] = [ActividadRiego(**ea) for ea in etapa["riego"]]
+    esperado = calcular_proyecto(proyecto)["em_total"]
+    _iguales(float(ModeloIncertidumbre(proyecto).evaluar(n=1)["em_total"][0]), esperado)
+    modelo = ModeloSensibilidad(proyecto)
+    _iguales(float(modelo.evaluar(np.ones((1, len(modelo.parametros))))[0]), esperado)
+
+# -----------------------------
+# Servicio: cálculo escalar y vectorizado de un lote
+# -----------------------------
+def test_servicio_escalar_y_vectorizado():
+    solicitudes = [
+        ("/fertilizantes", {"fertilizantes": etapa["fertilizantes"], "duracion": etapa["duracion"]})
+        for etapa in proyecto_perenne()["etapas"] + proyecto_anual()["etapas"]
+    ]
+    invalidas = [
+        ("/fertilizantes", {"fertilizantes": [{"tipo": "Urea", "cantidad": "abc"}]}),
+        ("/fertilizantes", {"fertilizantes": [{"tipo": "Urea", "cantidad": 100}], "duracion": "2"}),
+    ]
+    vectorizado = calcular_lote(solicitudes + invalidas, umbral_vectorizado=1)
+    escalar = calcular_lote(solicitudes + invalidas, umbral_vectorizado=10**9)
+    for (estado_v, r_v), (estado_e, r_e), (_, datos) in zip(vectorizado, escalar, solicitudes):
+        assert estado_v == estado_e == 200
+        for campo, valor in r_e.items():
+            _iguales(r_v[campo], valor)
+        em = calcular_etapa({"duracion": datos["duracion"], "fertilizantes": datos["fertilizantes"]})[2]
+        _iguales(r_e["total"], em["Fertilizantes"])
+    assert [e for e, _ in vectorizado[-2:]] == [e for e, _ in escalar[-2:]] == [400, 400]